@@ -1 +1,2 @@
+from lomas_client.async_client import AsyncClient  # noqa
 from lomas_client.client import Client  # noqa
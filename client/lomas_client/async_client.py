@@ -0,0 +1,224 @@
+import asyncio
+import copy
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, TypeVar
+
+from lomas_client.client import (
+    JOB_PENDING,
+    JOB_POLL_INTERVAL,
+    JOB_RUNNING,
+    Client,
+)
+
+# Maximum number of requests sent concurrently by an AsyncClient
+ASYNC_MAX_CONCURRENCY = 8
+
+T = TypeVar("T")
+
+
+def _mirror(method: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    """Makes a coroutine method running a method of Client in the thread pool
+    of the AsyncClient.
+
+    Args:
+        method (Callable[..., T]): The method of Client.
+
+    Returns:
+        Callable[..., Awaitable[T]]: The coroutine method, with the signature
+            and documentation of the method of Client.
+    """
+
+    @functools.wraps(method)
+    async def wrapper(self: "AsyncClient", *args: Any, **kwargs: Any) -> T:
+        return await self.run(method, *args, **kwargs)
+
+    return wrapper
+
+
+class AsyncClient:
+    """Asynchronous client to send concurrent requests to the server.
+
+    Each method of Client is available as a coroutine with the same
+    arguments and return value. The requests run in a pool of threads
+    sharing the connections of a single session, at most max_concurrency
+    of them at the same time.
+
+    Example:
+        async with AsyncClient(url, user_name, dataset_name) as client:
+            costs = await client.map(
+                "estimate_smartnoise_sql_cost",
+                [{"query": query, "epsilon": eps, "delta": 1e-5} for eps in epsilons],
+            )
+    """
+
+    def __init__(
+        self,
+        url: str,
+        user_name: str,
+        dataset_name: str,
+        max_concurrency: int = ASYNC_MAX_CONCURRENCY,
+        **client_kwargs: Any,
+    ) -> None:
+        """Initializes the AsyncClient with the specified URL, user name, and
+        dataset name.
+
+        Args:
+            url (str): The base URL for the API server.
+            user_name (str): The name of the user allowed to perform queries.
+            dataset_name (str): The name of the dataset to be accessed or manipulated.
+            max_concurrency (int, optional): Maximum number of requests sent
+                at the same time.
+                Defaults to ASYNC_MAX_CONCURRENCY.
+            **client_kwargs: Other arguments of Client (max_retries,
+                connect_timeout, compress_requests).
+        """
+        self.client = Client(
+            url,
+            user_name,
+            dataset_name,
+            pool_maxsize=max_concurrency,
+            **client_kwargs,
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="lomas_client"
+        )
+
+    def with_dataset(self, dataset_name: str) -> "AsyncClient":
+        """Creates an AsyncClient querying another dataset, which shares the
+        connections and the concurrency limit of this one. Closing either
+        client closes both.
+
+        Args:
+            dataset_name (str): The name of the other dataset.
+
+        Returns:
+            AsyncClient: The client of the other dataset.
+        """
+        other = copy.copy(self)
+        other.client = copy.copy(self.client)
+        other.client.dataset_name = dataset_name
+        return other
+
+    async def run(
+        self, method: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        """Runs a method of Client in the thread pool.
+
+        Args:
+            method (Callable[..., T]): The method of Client.
+            *args: The positional arguments of the method.
+            **kwargs: The keyword arguments of the method.
+
+        Returns:
+            T: The return value of the method.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            functools.partial(method, self.client, *args, **kwargs),
+        )
+
+    get_dataset_metadata = _mirror(Client.get_dataset_metadata)
+    get_dummy_dataset = _mirror(Client.get_dummy_dataset)
+    smartnoise_sql_query = _mirror(Client.smartnoise_sql_query)
+    estimate_smartnoise_sql_cost = _mirror(Client.estimate_smartnoise_sql_cost)
+    smartnoise_synth_query = _mirror(Client.smartnoise_synth_query)
+    estimate_smartnoise_synth_cost = _mirror(
+        Client.estimate_smartnoise_synth_cost
+    )
+    opendp_query = _mirror(Client.opendp_query)
+    estimate_opendp_cost = _mirror(Client.estimate_opendp_cost)
+    diffprivlib_query = _mirror(Client.diffprivlib_query)
+    estimate_diffprivlib_cost = _mirror(Client.estimate_diffprivlib_cost)
+    get_initial_budget = _mirror(Client.get_initial_budget)
+    get_total_spent_budget = _mirror(Client.get_total_spent_budget)
+    get_remaining_budget = _mirror(Client.get_remaining_budget)
+    get_previous_queries = _mirror(Client.get_previous_queries)
+    submit_smartnoise_sql_query = _mirror(Client.submit_smartnoise_sql_query)
+    submit_smartnoise_synth_query = _mirror(
+        Client.submit_smartnoise_synth_query
+    )
+    submit_opendp_query = _mirror(Client.submit_opendp_query)
+    submit_diffprivlib_query = _mirror(Client.submit_diffprivlib_query)
+    get_job_status = _mirror(Client.get_job_status)
+    get_job_result = _mirror(Client.get_job_result)
+    cancel_job = _mirror(Client.cancel_job)
+
+    async def wait(
+        self,
+        job_id: str,
+        timeout: Optional[float] = None,
+        poll_interval: float = JOB_POLL_INTERVAL,
+    ) -> Optional[dict]:
+        """This function waits for a job to finish and retrieves its response,
+        without blocking the event loop between two status requests.
+
+        Args:
+            job_id (str): The id of the job.
+            timeout (Optional[float], optional): Maximum number of seconds to
+                wait, waits until the job finishes if None.
+                Defaults to None.
+            poll_interval (float, optional): Number of seconds between two
+                status requests.
+                Defaults to JOB_POLL_INTERVAL.
+
+        Raises:
+            TimeoutError: If the job is not finished after timeout seconds.
+
+        Returns:
+            Optional[dict]: The query response, as returned by the
+                corresponding query function.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            job = await self.get_job_status(job_id)
+            if job is None:
+                return None
+            if job["status"] not in (JOB_PENDING, JOB_RUNNING):
+                return await self.get_job_result(job_id)
+            if deadline is not None and loop.time() >= deadline:
+                raise TimeoutError(
+                    f"Job {job_id} is still {job['status']} "
+                    + f"after {timeout} seconds."
+                )
+            await asyncio.sleep(poll_interval)
+
+    async def map(
+        self,
+        method_name: str,
+        calls: Iterable[dict],
+        return_exceptions: bool = False,
+    ) -> List[Any]:
+        """Calls a method concurrently with each set of keyword arguments.
+
+        Args:
+            method_name (str): The name of the method, e.g. "smartnoise_sql_query".
+            calls (Iterable[dict]): The keyword arguments of each call.
+            return_exceptions (bool, optional): Whether to return the
+                exceptions raised by the calls in the results instead of
+                raising the first one.
+                Defaults to False.
+
+        Returns:
+            List[Any]: The return values of the calls, in the order of calls.
+        """
+        method = getattr(self, method_name)
+        return await asyncio.gather(
+            *(method(**kwargs) for kwargs in calls),
+            return_exceptions=return_exceptions,
+        )
+
+    async def close(self) -> None:
+        """Waits for the running requests and closes the connections."""
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self.executor.shutdown, wait=True)
+        )
+        self.client.close()
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
@@ -1,19 +1,25 @@
+# pylint: disable=C0302
 import base64
+import gzip
 import json
 import pickle
+import time
 from enum import StrEnum
-from typing import Dict, List, Optional, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import opendp as dp
 import pandas as pd
+import pyarrow as pa
 import requests
 from diffprivlib_logger import serialise_pipeline
 from opendp.mod import enable_features
 from opendp_logger import enable_logging, make_load_json
+from requests.adapters import HTTPAdapter
 from sklearn.pipeline import Pipeline
 from smartnoise_synth_logger import serialise_constraints
+from urllib3.util.retry import Retry
 
-from lomas_client.utils import validate_synthesizer
+from lomas_client.utils import LazyDecodedDict, validate_synthesizer
 
 # Opendp_logger
 enable_logging()
@@ -22,14 +28,41 @@ enable_features("contrib")
 # Client constants: may be modified
 DUMMY_NB_ROWS = 100
 DUMMY_SEED = 42
+DUMMY_CHUNK_SIZE = 10000
 HTTP_200_OK = 200
 CONNECT_TIMEOUT = 5
 DEFAULT_READ_TIMEOUT = 10
 DIFFPRIVLIB_READ_TIMEOUT = DEFAULT_READ_TIMEOUT * 10
 SMARTNOISE_SYNTH_READ_TIMEOUT = DEFAULT_READ_TIMEOUT * 100
 
+# HTTP session: connections kept alive per host, retries of the requests
+# which can safely be sent again and compression of large request bodies
+POOL_MAXSIZE = 10
+MAX_RETRIES = 3
+RETRY_BACKOFF_FACTOR = 0.5  # seconds, doubled after each retry
+RETRY_STATUS_FORCELIST = (502, 503, 504)
+IDEMPOTENT_ENDPOINT_PREFIXES = (
+    "estimate_",
+    "dummy_",
+    "get_",
+    "stream_dummy_dataset",
+    "job_status",
+    "job_result",
+)
+COMPRESSION_MIN_SIZE = 1024  # bytes
+
 SNSYNTH_DEFAULT_SYMPLES_NB = 200
 
+PREVIOUS_QUERIES_PAGE_SIZE = 100
+
+# Query responses with dataframes or models are received as Arrow IPC streams
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_RESPONSE_KEY = b"lomas_response"
+
+JOB_POLL_INTERVAL = 1  # seconds between two job status requests
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+
 
 class DPLibraries(StrEnum):
     """Enum of the DP librairies used in the server
@@ -55,21 +88,199 @@ def error_message(res: requests.Response) -> str:
     return f"Server error status {res.status_code}: {res.text}"
 
 
-class Client:
+def decode_query_response(dp_library: str, response: dict) -> dict:
+    """Deserialises the query_response of a query response.
+
+    Args:
+        dp_library (str): The DP library of the query.
+        response (dict): The response decoded from json.
+
+    Returns:
+        dict: The response with the query_response deserialised.
+    """
+    query_response = response["query_response"]
+    match dp_library:
+        case DPLibraries.SMARTNOISE_SQL:
+            response["query_response"] = pd.DataFrame.from_dict(
+                query_response, orient="tight"
+            )
+        case DPLibraries.SMARTNOISE_SYNTH:
+            # Models are pickled, samples are sent as records
+            if isinstance(query_response, str):
+                model = base64.b64decode(query_response)
+                response["query_response"] = pickle.loads(model)
+            else:
+                response["query_response"] = pd.DataFrame(query_response)
+        case DPLibraries.DIFFPRIVLIB:
+            model = base64.b64decode(query_response["model"])
+            query_response["model"] = pickle.loads(model)
+    return response
+
+
+def decode_arrow_response(dp_library: str, content: bytes) -> dict:
+    """Deserialises a query response received as an Arrow IPC stream.
+
+    Dataframes are the table of the stream and pickled models are the raw
+    bytes of its "model" column, the other fields of the response are in
+    the schema metadata.
+
+    Args:
+        dp_library (str): The DP library of the query.
+        content (bytes): The Arrow IPC stream.
+
+    Returns:
+        dict: The response with the query_response deserialised.
+    """
+    table = pa.ipc.open_stream(content).read_all()
+    response = json.loads(table.schema.metadata[ARROW_RESPONSE_KEY])
+    match dp_library:
+        case DPLibraries.SMARTNOISE_SQL:
+            response["query_response"] = table.to_pandas()
+        case DPLibraries.SMARTNOISE_SYNTH:
+            # Samples are converted from pandas, models are not
+            if table.schema.pandas_metadata is None:
+                model = table.column("model")[0].as_py()
+                response["query_response"] = pickle.loads(model)
+            else:
+                response["query_response"] = table.to_pandas()
+        case DPLibraries.DIFFPRIVLIB:
+            model = table.column("model")[0].as_py()
+            response["query_response"]["model"] = pickle.loads(model)
+    return response
+
+
+def read_query_response(dp_library: str, res: requests.Response) -> dict:
+    """Deserialises a query response, sent by the server as an Arrow IPC
+    stream or as json.
+
+    Args:
+        dp_library (str): The DP library of the query.
+        res (requests.Response): The response of the server.
+
+    Returns:
+        dict: The response with the query_response deserialised.
+    """
+    content_type = res.headers.get("content-type", "")
+    if content_type.startswith(ARROW_STREAM_MEDIA_TYPE):
+        return decode_arrow_response(dp_library, res.content)
+    return decode_query_response(dp_library, res.json())
+
+
+def unpickle(serialised: str) -> Any:
+    """Deserialises a base64 encoded pickled object.
+
+    Args:
+        serialised (str): The base64 encoded pickle.
+
+    Returns:
+        Any: The deserialised object.
+    """
+    return pickle.loads(base64.b64decode(serialised))
+
+
+def decode_previous_query(query: dict) -> dict:
+    """Wraps the serialised fields of a previous query to deserialise them
+    when they are first accessed.
+
+    Args:
+        query (dict): The previous query decoded from json.
+
+    Raises:
+        ValueError: If the query type is unknown.
+
+    Returns:
+        dict: The query with lazily deserialised fields.
+    """
+    response = query["response"]
+    match query["dp_librairy"]:
+        case DPLibraries.SMARTNOISE_SQL:
+            pass
+        case DPLibraries.SMARTNOISE_SYNTH:
+            if query["client_input"]["return_model"]:
+                decoder = unpickle
+            else:
+                decoder = pd.DataFrame
+            query["response"] = LazyDecodedDict(
+                response, {"query_response": decoder}
+            )
+        case DPLibraries.OPENDP:
+            query["client_input"] = LazyDecodedDict(
+                query["client_input"], {"opendp_json": make_load_json}
+            )
+        case DPLibraries.DIFFPRIVLIB:
+            if "query_response" in response:
+                response["query_response"] = LazyDecodedDict(
+                    response["query_response"], {"model": unpickle}
+                )
+        case _:
+            raise ValueError(
+                "Cannot deserialise unknown query type:"
+                + f"{query['dp_librairy']}"
+            )
+    return query
+
+
+class Client:  # pylint: disable=R0904
     """Client class to send requests to the server
     Handle all serialisation and deserialisation steps
     """
 
-    def __init__(self, url: str, user_name: str, dataset_name: str) -> None:
+    def __init__(  # pylint: disable=R0913
+        self,
+        url: str,
+        user_name: str,
+        dataset_name: str,
+        pool_maxsize: int = POOL_MAXSIZE,
+        max_retries: int = MAX_RETRIES,
+        connect_timeout: float = CONNECT_TIMEOUT,
+        compress_requests: bool = True,
+    ) -> None:
         """Initializes the Client with the specified URL, user name, and dataset name.
 
+        Requests are sent through a persistent session: connections are kept
+        alive and reused, responses are compressed by the server and the
+        requests of cost, dummy and read-only endpoints are retried on
+        connection errors and unavailable server.
+
         Args:
             url (str): The base URL for the API server.
             user_name (str): The name of the user allowed to perform queries.
             dataset_name (str): The name of the dataset to be accessed or manipulated.
+            pool_maxsize (int, optional): Maximum number of connections kept
+                alive to the server.
+                Defaults to POOL_MAXSIZE.
+            max_retries (int, optional): Maximum number of retries of the
+                requests which can safely be sent again.
+                Defaults to MAX_RETRIES.
+            connect_timeout (float, optional): Number of seconds to wait for
+                the connection to the server.
+                Defaults to CONNECT_TIMEOUT.
+            compress_requests (bool, optional): Whether to compress the request
+                bodies larger than COMPRESSION_MIN_SIZE with gzip.
+                Defaults to True.
         """
         self.url = url
-        self.headers = {"Content-type": "application/json", "Accept": "*/*"}
+        self.connect_timeout = connect_timeout
+        self.compress_requests = compress_requests
+        self.session = requests.Session()
+        self.session.mount(url, HTTPAdapter(pool_maxsize=pool_maxsize))
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=RETRY_BACKOFF_FACTOR,
+            status_forcelist=RETRY_STATUS_FORCELIST,
+            allowed_methods=frozenset(["POST"]),
+            raise_on_status=False,
+        )
+        for prefix in IDEMPOTENT_ENDPOINT_PREFIXES:
+            # The adapter with the longest matching prefix is used
+            self.session.mount(
+                self.url + "/" + prefix,
+                HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=retry),
+            )
+        self.headers = {
+            "Content-type": "application/json",
+            "Accept": f"{ARROW_STREAM_MEDIA_TYPE}, */*",
+        }
         self.headers["user-name"] = user_name
         self.dataset_name = dataset_name
 
@@ -133,6 +344,89 @@ class Client:
         print(error_message(res))
         return None
 
+    def iter_dummy_dataset(
+        self,
+        nb_rows: int = DUMMY_NB_ROWS,
+        seed: int = DUMMY_SEED,
+        chunk_size: int = DUMMY_CHUNK_SIZE,
+    ) -> Optional[Iterator[pd.DataFrame]]:
+        """This function streams a dummy dataset by chunks of rows.
+
+        Only one chunk is held in memory at a time on the server and the
+        client, use this function for large dummy datasets.
+
+        Args:
+            nb_rows (int, optional): The number of rows in the dummy dataset.
+
+                Defaults to DUMMY_NB_ROWS.
+
+            seed (int, optional): The random seed for generating the dummy dataset.
+
+                Defaults to DUMMY_SEED.
+
+            chunk_size (int, optional): The number of rows per chunk.
+
+                Defaults to DUMMY_CHUNK_SIZE.
+
+        Returns:
+            Optional[Iterator[pd.DataFrame]]: An iterator over Pandas DataFrames,
+                the successive chunks of the dummy dataset.
+        """
+        res = self._exec(
+            "stream_dummy_dataset",
+            {
+                "dataset_name": self.dataset_name,
+                "dummy_nb_rows": nb_rows,
+                "dummy_seed": seed,
+                "chunk_size": chunk_size,
+            },
+            stream=True,
+        )
+
+        if res.status_code == HTTP_200_OK:
+            return self._iter_dummy_chunks(res, chunk_size)
+
+        print(error_message(res))
+        return None
+
+    def _iter_dummy_chunks(
+        self, res: requests.Response, chunk_size: int
+    ) -> Iterator[pd.DataFrame]:
+        """Parse a streamed dummy dataset into chunks of rows.
+
+        Args:
+            res (requests.Response): The streamed response of the server,
+                the first line contains the column types, each following line
+                is a row of the dataset.
+            chunk_size (int): The number of rows per chunk.
+
+        Yields:
+            pd.DataFrame: The successive chunks of the dummy dataset.
+        """
+
+        def to_dataframe(records: List[dict]) -> pd.DataFrame:
+            chunk_df = pd.DataFrame.from_records(records)
+            chunk_df = chunk_df.astype(header["dtypes"])
+            for col in header["datetime_columns"]:
+                chunk_df[col] = pd.to_datetime(chunk_df[col])
+            return chunk_df
+
+        with res:
+            lines = res.iter_lines()
+            header_line = next(lines, None)
+            if header_line is None:
+                return
+            header = json.loads(header_line)
+            records = []
+            for line in lines:
+                if line:
+                    records.append(json.loads(line))
+                if len(records) == chunk_size:
+                    yield to_dataframe(records)
+                    records = []
+            if records:
+                yield to_dataframe(records)
+
     def smartnoise_sql_query(
         self,
         query: str,
@@ -174,14 +468,9 @@ class Client:
         Returns:
             Optional[dict]: A Pandas DataFrame containing the query results.
         """
-        body_json = {
-            "query_str": query,
-            "dataset_name": self.dataset_name,
-            "epsilon": epsilon,
-            "delta": delta,
-            "mechanisms": mechanisms,
-            "postprocess": postprocess,
-        }
+        body_json = self._smartnoise_sql_body(
+            query, epsilon, delta, mechanisms, postprocess
+        )
         if dummy:
             endpoint = "dummy_smartnoise_sql_query"
             body_json["dummy_nb_rows"] = nb_rows
@@ -192,12 +481,7 @@ class Client:
         res = self._exec(endpoint, body_json)
 
         if res.status_code == HTTP_200_OK:
-            data = res.content.decode("utf8")
-            response_dict = json.loads(data)
-            response_dict["query_response"] = pd.DataFrame.from_dict(
-                response_dict["query_response"], orient="tight"
-            )
-            return response_dict
+            return read_query_response(DPLibraries.SMARTNOISE_SQL, res)
 
         print(error_message(res))
         return None
@@ -308,22 +592,18 @@ class Client:
         Returns:
             Optional[dict]: A Pandas DataFrame containing the query results.
         """
-        validate_synthesizer(synth_name, return_model)
-        constraints = serialise_constraints(constraints) if constraints else ""
-
-        body_json = {
-            "dataset_name": self.dataset_name,
-            "synth_name": synth_name,
-            "epsilon": epsilon,
-            "delta": delta,
-            "select_cols": select_cols,
-            "synth_params": synth_params,
-            "nullable": nullable,
-            "constraints": constraints,
-            "return_model": return_model,
-            "condition": condition,
-            "nb_samples": nb_samples,
-        }
+        body_json = self._smartnoise_synth_body(
+            synth_name,
+            epsilon,
+            delta,
+            select_cols,
+            synth_params,
+            nullable,
+            constraints,
+            return_model,
+            condition,
+            nb_samples,
+        )
         if dummy:
             endpoint = "dummy_smartnoise_synth_query"
             body_json["dummy_nb_rows"] = nb_rows
@@ -336,14 +616,7 @@ class Client:
         )
 
         if res.status_code == HTTP_200_OK:
-            response = res.json()
-            query_response = response["query_response"]
-            if return_model:
-                model = base64.b64decode(query_response)
-                response["query_response"] = pickle.loads(model)
-            else:
-                response["query_response"] = pd.DataFrame(query_response)
-            return response
+            return read_query_response(DPLibraries.SMARTNOISE_SYNTH, res)
 
         print(error_message(res))
         return None
@@ -453,12 +726,7 @@ class Client:
         Returns:
             Optional[dict]: A Pandas DataFrame containing the query results.
         """
-        opendp_json = opendp_pipeline.to_json()
-        body_json = {
-            "dataset_name": self.dataset_name,
-            "opendp_json": opendp_json,
-            "fixed_delta": fixed_delta,
-        }
+        body_json = self._opendp_body(opendp_pipeline, fixed_delta)
         if dummy:
             endpoint = "dummy_opendp_query"
             body_json["dummy_nb_rows"] = nb_rows
@@ -555,15 +823,14 @@ class Client:
         Returns:
             Optional[Pipeline]: A trained DiffPrivLip pipeline
         """
-        body_json = {
-            "dataset_name": self.dataset_name,
-            "diffprivlib_json": serialise_pipeline(pipeline),
-            "feature_columns": feature_columns,
-            "target_columns": target_columns,
-            "test_size": test_size,
-            "test_train_split_seed": test_train_split_seed,
-            "imputer_strategy": imputer_strategy,
-        }
+        body_json = self._diffprivlib_body(
+            pipeline,
+            feature_columns,
+            target_columns,
+            test_size,
+            test_train_split_seed,
+            imputer_strategy,
+        )
         if dummy:
             endpoint = "dummy_diffprivlib_query"
             body_json["dummy_nb_rows"] = nb_rows
@@ -575,10 +842,7 @@ class Client:
             endpoint, body_json, read_timeout=DIFFPRIVLIB_READ_TIMEOUT
         )
         if res.status_code == HTTP_200_OK:
-            response = res.json()
-            model = base64.b64decode(response["query_response"]["model"])
-            response["query_response"]["model"] = pickle.loads(model)
-            return response
+            return read_query_response(DPLibraries.DIFFPRIVLIB, res)
         print(
             f"Error while processing DiffPrivLib request in server \
                 status code: {res.status_code} message: {res.text}"
@@ -695,9 +959,31 @@ class Client:
         print(error_message(res))
         return None
 
-    def get_previous_queries(self) -> Optional[List[dict]]:
+    def get_previous_queries(
+        self,
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None,
+        dp_libraries: Optional[List[str]] = None,
+        metadata_only: bool = False,
+        page_size: int = PREVIOUS_QUERIES_PAGE_SIZE,
+    ) -> Optional[List[dict]]:
         """This function retrieves the previous queries of the user.
 
+        Models, DataFrames and OpenDP pipelines are deserialised when they
+        are first accessed.
+
+        Args:
+            start_time (Optional[float], optional): Only queries from this
+                timestamp. Defaults to None.
+            end_time (Optional[float], optional): Only queries before this
+                timestamp. Defaults to None.
+            dp_libraries (Optional[List[str]], optional): Only queries with
+                these DP libraries. Defaults to None, all the libraries.
+            metadata_only (bool, optional): Whether to leave out the query
+                responses. Defaults to False.
+            page_size (int, optional): The number of queries per request.
+                Defaults to PREVIOUS_QUERIES_PAGE_SIZE.
+
         Raises:
             ValueError: If an unknown query type is encountered during deserialization.
 
@@ -705,65 +991,454 @@ class Client:
             Optional[List[dict]]: A list of dictionary containing the different queries
             on the private dataset.
         """
-        body_json = {
+        queries: List[dict] = []
+        body_json = self._previous_queries_body(
+            start_time, end_time, dp_libraries, metadata_only, page_size
+        )
+        while True:
+            page = self._get_previous_queries_page(body_json)
+            if page is None:
+                return None
+            page_queries, body_json["cursor"] = page
+            queries.extend(page_queries)
+            if body_json["cursor"] is None:
+                return queries
+
+    def iter_previous_queries(
+        self,
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None,
+        dp_libraries: Optional[List[str]] = None,
+        metadata_only: bool = False,
+        page_size: int = PREVIOUS_QUERIES_PAGE_SIZE,
+    ) -> Iterator[dict]:
+        """This function iterates over the previous queries of the user,
+        requesting the next page of queries when needed.
+
+        Models, DataFrames and OpenDP pipelines are deserialised when they
+        are first accessed.
+
+        Args:
+            start_time (Optional[float], optional): Only queries from this
+                timestamp. Defaults to None.
+            end_time (Optional[float], optional): Only queries before this
+                timestamp. Defaults to None.
+            dp_libraries (Optional[List[str]], optional): Only queries with
+                these DP libraries. Defaults to None, all the libraries.
+            metadata_only (bool, optional): Whether to leave out the query
+                responses. Defaults to False.
+            page_size (int, optional): The number of queries per request.
+                Defaults to PREVIOUS_QUERIES_PAGE_SIZE.
+
+        Raises:
+            ValueError: If an unknown query type is encountered during deserialization.
+
+        Yields:
+            Iterator[dict]: The queries on the private dataset, the iteration
+            stops early if the server returns an error.
+        """
+        body_json = self._previous_queries_body(
+            start_time, end_time, dp_libraries, metadata_only, page_size
+        )
+        while True:
+            page = self._get_previous_queries_page(body_json)
+            if page is None:
+                return
+            page_queries, body_json["cursor"] = page
+            yield from page_queries
+            if body_json["cursor"] is None:
+                return
+
+    def _previous_queries_body(
+        self,
+        start_time: Optional[float],
+        end_time: Optional[float],
+        dp_libraries: Optional[List[str]],
+        metadata_only: bool,
+        page_size: int,
+    ) -> dict:
+        """Build the request body of the first page of previous queries.
+
+        Args:
+            start_time (Optional[float]): Only queries from this timestamp.
+            end_time (Optional[float]): Only queries before this timestamp.
+            dp_libraries (Optional[List[str]]): Only queries with these DP
+                libraries, None for all the libraries.
+            metadata_only (bool): Whether to leave out the query responses.
+            page_size (int): The number of queries per request.
+
+        Returns:
+            dict: The request body.
+        """
+        return {
             "dataset_name": self.dataset_name,
+            "limit": page_size,
+            "cursor": None,
+            "start_time": start_time,
+            "end_time": end_time,
+            "dp_libraries": dp_libraries,
+            "metadata_only": metadata_only,
         }
+
+    def _get_previous_queries_page(
+        self, body_json: dict
+    ) -> Optional[Tuple[List[dict], Optional[str]]]:
+        """Request a page of previous queries.
+
+        Args:
+            body_json (dict): The request body, with the cursor of the page.
+
+        Raises:
+            ValueError: If an unknown query type is encountered during deserialization.
+
+        Returns:
+            Optional[Tuple[List[dict], Optional[str]]]: The queries with lazily
+                deserialised fields and the cursor of the next page.
+        """
         res = self._exec("get_previous_queries", body_json)
+        if res.status_code != HTTP_200_OK:
+            print(error_message(res))
+            return None
+
+        page = json.loads(res.content.decode("utf8"))
+        queries = [
+            decode_previous_query(query) for query in page["previous_queries"]
+        ]
+        return queries, page["next_cursor"]
+
+    def submit_smartnoise_sql_query(
+        self,
+        query: str,
+        epsilon: float,
+        delta: float,
+        mechanisms: dict[str, str] = {},
+        postprocess: bool = True,
+    ) -> Optional[dict]:
+        """This function submits a SmartNoise SQL query run in the background.
+
+        Args:
+            See :py:meth:`smartnoise_sql_query`.
+
+        Returns:
+            Optional[dict]: A dictionary describing the job, its job_id
+                is used to get its status and result.
+        """
+        body_json = self._smartnoise_sql_body(
+            query, epsilon, delta, mechanisms, postprocess
+        )
+        return self._submit("submit_smartnoise_sql_query", body_json)
+
+    def submit_smartnoise_synth_query(
+        self,
+        synth_name: str,
+        epsilon: float,
+        delta: Optional[float] = None,
+        select_cols: List[str] = [],
+        synth_params: dict = {},
+        nullable: bool = True,
+        constraints: dict = {},
+        return_model: bool = False,
+        condition: str = "",
+        nb_samples: int = SNSYNTH_DEFAULT_SYMPLES_NB,
+    ) -> Optional[dict]:
+        """This function submits a SmartNoise Synth query run in the
+        background.
+
+        Args:
+            See :py:meth:`smartnoise_synth_query`.
+
+        Returns:
+            Optional[dict]: A dictionary describing the job, its job_id
+                is used to get its status and result.
+        """
+        body_json = self._smartnoise_synth_body(
+            synth_name,
+            epsilon,
+            delta,
+            select_cols,
+            synth_params,
+            nullable,
+            constraints,
+            return_model,
+            condition,
+            nb_samples,
+        )
+        return self._submit("submit_smartnoise_synth_query", body_json)
+
+    def submit_opendp_query(
+        self,
+        opendp_pipeline: dp.Measurement,
+        fixed_delta: Optional[float] = None,
+    ) -> Optional[dict]:
+        """This function submits an OpenDP query run in the background.
+
+        Args:
+            See :py:meth:`opendp_query`.
+
+        Returns:
+            Optional[dict]: A dictionary describing the job, its job_id
+                is used to get its status and result.
+        """
+        body_json = self._opendp_body(opendp_pipeline, fixed_delta)
+        return self._submit("submit_opendp_query", body_json)
+
+    def submit_diffprivlib_query(
+        self,
+        pipeline: Pipeline,
+        feature_columns: List[str],
+        target_columns: Optional[List[str]] = None,
+        test_size: float = 0.2,
+        test_train_split_seed: int = 1,
+        imputer_strategy: str = "drop",
+    ) -> Optional[dict]:
+        """This function submits a DiffPrivLib query run in the background.
+
+        Args:
+            See :py:meth:`diffprivlib_query`.
+
+        Returns:
+            Optional[dict]: A dictionary describing the job, its job_id
+                is used to get its status and result.
+        """
+        body_json = self._diffprivlib_body(
+            pipeline,
+            feature_columns,
+            target_columns,
+            test_size,
+            test_train_split_seed,
+            imputer_strategy,
+        )
+        return self._submit("submit_diffprivlib_query", body_json)
+
+    def get_job_status(self, job_id: str) -> Optional[dict]:
+        """This function retrieves the status of a submitted job.
+
+        Args:
+            job_id (str): The id of the job.
+
+        Returns:
+            Optional[dict]: A dictionary describing the job, its status is
+                one of pending, running, completed, failed or cancelled.
+        """
+        res = self._exec("job_status", {"job_id": job_id})
 
         if res.status_code == HTTP_200_OK:
-            queries = json.loads(res.content.decode("utf8"))[
-                "previous_queries"
-            ]
+            return res.json()
 
-            if not queries:
-                return queries
+        print(error_message(res))
+        return None
 
-            deserialised_queries = []
-            for query in queries:
-                match query["dp_librairy"]:
-                    case DPLibraries.SMARTNOISE_SQL:
-                        pass
-                    case DPLibraries.SMARTNOISE_SYNTH:
-                        return_model = query["client_input"]["return_model"]
-                        res = query["response"]["query_response"]
-                        if return_model:
-                            query["response"]["query_response"] = pickle.loads(
-                                base64.b64decode(res)
-                            )
-                        else:
-                            query["response"]["query_response"] = pd.DataFrame(
-                                res
-                            )
-                    case DPLibraries.OPENDP:
-                        opdp_query = make_load_json(
-                            query["client_input"]["opendp_json"]
-                        )
-                        query["client_input"]["opendp_json"] = opdp_query
-                    case DPLibraries.DIFFPRIVLIB:
-                        model = base64.b64decode(
-                            query["response"]["query_response"]["model"]
-                        )
-                        query["response"]["query_response"]["model"] = (
-                            pickle.loads(model)
-                        )
-                    case _:
-                        raise ValueError(
-                            "Cannot deserialise unknown query type:"
-                            + f"{query['dp_librairy']}"
-                        )
-
-                deserialised_queries.append(query)
-
-            return deserialised_queries
+    def get_job_result(self, job_id: str) -> Optional[dict]:
+        """This function retrieves the response of a finished job.
+
+        Args:
+            job_id (str): The id of the job.
+
+        Returns:
+            Optional[dict]: The query response, as returned by the
+                corresponding query function.
+        """
+        job = self.get_job_status(job_id)
+        if job is None:
+            return None
+
+        res = self._exec(
+            "job_result",
+            {"job_id": job_id},
+            read_timeout=SMARTNOISE_SYNTH_READ_TIMEOUT,
+        )
+        if res.status_code == HTTP_200_OK:
+            return read_query_response(job["dp_library"], res)
+
+        print(error_message(res))
+        return None
+
+    def cancel_job(self, job_id: str) -> Optional[dict]:
+        """This function cancels a job which has not started yet.
+
+        Args:
+            job_id (str): The id of the job.
+
+        Returns:
+            Optional[dict]: A dictionary describing the cancelled job.
+        """
+        res = self._exec("cancel_job", {"job_id": job_id})
+
+        if res.status_code == HTTP_200_OK:
+            return res.json()
 
         print(error_message(res))
         return None
 
+    def wait(
+        self,
+        job_id: str,
+        timeout: Optional[float] = None,
+        poll_interval: float = JOB_POLL_INTERVAL,
+    ) -> Optional[dict]:
+        """This function waits for a job to finish and retrieves its response.
+
+        Args:
+            job_id (str): The id of the job.
+            timeout (Optional[float], optional): Maximum number of seconds to
+                wait, waits until the job finishes if None.
+                Defaults to None.
+            poll_interval (float, optional): Number of seconds between two
+                status requests.
+                Defaults to JOB_POLL_INTERVAL.
+
+        Raises:
+            TimeoutError: If the job is not finished after timeout seconds.
+
+        Returns:
+            Optional[dict]: The query response, as returned by the
+                corresponding query function.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get_job_status(job_id)
+            if job is None:
+                return None
+            if job["status"] not in (JOB_PENDING, JOB_RUNNING):
+                return self.get_job_result(job_id)
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(
+                    f"Job {job_id} is still {job['status']} "
+                    + f"after {timeout} seconds."
+                )
+            time.sleep(poll_interval)
+
+    def _submit(self, endpoint: str, body_json: dict) -> Optional[dict]:
+        """Submits a query job to the specified endpoint.
+
+        Args:
+            endpoint (str): The API endpoint submitting the job.
+            body_json (dict): The query.
+
+        Returns:
+            Optional[dict]: A dictionary describing the job.
+        """
+        res = self._exec(endpoint, body_json)
+
+        if res.status_code == HTTP_200_OK:
+            return res.json()
+
+        print(error_message(res))
+        return None
+
+    def _smartnoise_sql_body(
+        self,
+        query: str,
+        epsilon: float,
+        delta: float,
+        mechanisms: dict[str, str],
+        postprocess: bool,
+    ) -> dict:
+        """Builds the body of a SmartNoise SQL query.
+
+        Args:
+            See :py:meth:`smartnoise_sql_query`.
+
+        Returns:
+            dict: The body of the query.
+        """
+        return {
+            "query_str": query,
+            "dataset_name": self.dataset_name,
+            "epsilon": epsilon,
+            "delta": delta,
+            "mechanisms": mechanisms,
+            "postprocess": postprocess,
+        }
+
+    def _smartnoise_synth_body(
+        self,
+        synth_name: str,
+        epsilon: float,
+        delta: Optional[float],
+        select_cols: List[str],
+        synth_params: dict,
+        nullable: bool,
+        constraints: dict,
+        return_model: bool,
+        condition: str,
+        nb_samples: int,
+    ) -> dict:
+        """Builds the body of a SmartNoise Synth query.
+
+        Args:
+            See :py:meth:`smartnoise_synth_query`.
+
+        Returns:
+            dict: The body of the query.
+        """
+        validate_synthesizer(synth_name, return_model)
+        return {
+            "dataset_name": self.dataset_name,
+            "synth_name": synth_name,
+            "epsilon": epsilon,
+            "delta": delta,
+            "select_cols": select_cols,
+            "synth_params": synth_params,
+            "nullable": nullable,
+            "constraints": (
+                serialise_constraints(constraints) if constraints else ""
+            ),
+            "return_model": return_model,
+            "condition": condition,
+            "nb_samples": nb_samples,
+        }
+
+    def _opendp_body(
+        self, opendp_pipeline: dp.Measurement, fixed_delta: Optional[float]
+    ) -> dict:
+        """Builds the body of an OpenDP query.
+
+        Args:
+            See :py:meth:`opendp_query`.
+
+        Returns:
+            dict: The body of the query.
+        """
+        return {
+            "dataset_name": self.dataset_name,
+            "opendp_json": opendp_pipeline.to_json(),
+            "fixed_delta": fixed_delta,
+        }
+
+    def _diffprivlib_body(
+        self,
+        pipeline: Pipeline,
+        feature_columns: List[str],
+        target_columns: Optional[List[str]],
+        test_size: float,
+        test_train_split_seed: int,
+        imputer_strategy: str,
+    ) -> dict:
+        """Builds the body of a DiffPrivLib query.
+
+        Args:
+            See :py:meth:`diffprivlib_query`.
+
+        Returns:
+            dict: The body of the query.
+        """
+        return {
+            "dataset_name": self.dataset_name,
+            "diffprivlib_json": serialise_pipeline(pipeline),
+            "feature_columns": feature_columns,
+            "target_columns": target_columns,
+            "test_size": test_size,
+            "test_train_split_seed": test_train_split_seed,
+            "imputer_strategy": imputer_strategy,
+        }
+
     def _exec(
         self,
         endpoint: str,
         body_json: dict = {},
         read_timeout: int = DEFAULT_READ_TIMEOUT,
+        stream: bool = False,
     ) -> requests.Response:
         """Executes a POST request to the specified endpoint with the provided
         JSON body.
@@ -775,14 +1450,33 @@ class Client:
             read_timeout (int): number of seconds that client wait for the server
                 to send a response.
                 Defaults to DEFAULT_READ_TIMEOUT.
+            stream (bool): whether to read the response content lazily,
+                the read timeout then applies between received chunks.
+                Defaults to False.
 
         Returns:
             requests.Response: The response object resulting from the POST request.
         """
-        r = requests.post(
+        headers = self.headers
+        data = json.dumps(body_json).encode("utf-8")
+        if self.compress_requests and len(data) >= COMPRESSION_MIN_SIZE:
+            data = gzip.compress(data)
+            headers = {**headers, "Content-Encoding": "gzip"}
+        r = self.session.post(
             self.url + "/" + endpoint,
-            json=body_json,
-            headers=self.headers,
-            timeout=(CONNECT_TIMEOUT, read_timeout),
+            data=data,
+            headers=headers,
+            timeout=(self.connect_timeout, read_timeout),
+            stream=stream,
         )
         return r
+
+    def close(self) -> None:
+        """Closes the connections of the session to the server."""
+        self.session.close()
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
@@ -1,5 +1,6 @@
 import warnings
 from enum import StrEnum
+from typing import Any, Callable, Dict
 
 
 class SSynthMarginalSynthesizer(StrEnum):
@@ -49,3 +50,35 @@ def validate_synthesizer(synth_name: str, return_model: bool = False):
             f"{synth_name} synthesizer not supported. "
             + "Please choose another synthesizer."
         )
+
+
+class LazyDecodedDict(dict):
+    """Dictionary decoding some of its values when they are first accessed
+    with ``[]`` or ``get``, the decoded values are then kept.
+    """
+
+    def __init__(
+        self, data: dict, decoders: Dict[str, Callable[[Any], Any]]
+    ) -> None:
+        """Initializes the dictionary with the raw values and their decoders.
+
+        Args:
+            data (dict): The raw values.
+            decoders (Dict[str, Callable[[Any], Any]]): The functions decoding
+                the raw value of their key.
+        """
+        super().__init__(data)
+        self._decoders = {k: f for k, f in decoders.items() if k in data}
+
+    def __getitem__(self, key: Any) -> Any:
+        decoder = self._decoders.pop(key, None)
+        if decoder is not None:
+            super().__setitem__(key, decoder(super().__getitem__(key)))
+        return super().__getitem__(key)
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._decoders.pop(key, None)
+        super().__setitem__(key, value)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        return self[key] if key in self else default
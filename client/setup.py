@@ -49,6 +49,7 @@ setup(
         "opendp==0.10.0",
         "opendp_logger==0.3.0",
         "pandas>=2.2.2",
+        "pyarrow>=16.1.0",
         "requests>=2.32.0",
         "scikit-learn==1.4.0",
         "smartnoise-synth==1.0.4",
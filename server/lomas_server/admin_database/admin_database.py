@@ -1,15 +1,33 @@
 import argparse
+import base64
+import binascii
+import json
+import threading
 import time
+import uuid
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from functools import wraps
-from typing import Callable, Dict, List
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
+from lomas_server.admin_database.blob_store import BlobStore
+from lomas_server.admin_database.dataset_cache import DatasetCache
+from lomas_server.constants import (
+    BUDGET_RESERVATION_LEASE,
+    BUDGET_RESERVATION_RENEWAL_INTERVAL,
+)
 from lomas_server.utils.collection_models import Metadata
 from lomas_server.utils.error_handler import (
+    InternalServerException,
     InvalidQueryException,
     UnauthorizedAccessException,
 )
-from lomas_server.utils.query_models import RequestModel, model_input_to_lib
+from lomas_server.utils.logger import LOG
+from lomas_server.utils.query_models import (
+    GetPreviousQueries,
+    RequestModel,
+    model_input_to_lib,
+)
 
 
 def user_must_exist(func: Callable) -> Callable:  # type: ignore
@@ -112,13 +130,156 @@ def user_must_have_access_to_dataset(
     return wrapper_decorator
 
 
-class AdminDatabase(ABC):
+def new_budget_reservation(
+    epsilon: float, delta: float, lease_duration: float
+) -> dict:
+    """
+    Create a reservation of budget for a query.
+
+    Args:
+        epsilon (float): The reserved epsilon.
+        delta (float): The reserved delta.
+        lease_duration (float): Number of seconds after which the
+            reservation expires and no longer counts against the budget.
+
+    Returns:
+        dict: The reservation, stored in the dataset of the user.
+    """
+    return {
+        "reservation_id": str(uuid.uuid4()),
+        "epsilon": epsilon,
+        "delta": delta,
+        "expires_at": time.time() + lease_duration,
+    }
+
+
+def check_budget_for_reservation(
+    user: dict, dataset: dict, epsilon: float, delta: float
+) -> None:
+    """
+    Check that a user may reserve budget on a dataset.
+
+    The budget still available is the initial budget minus the spent
+    budget and the budget of the reservations that have not expired.
+
+    Args:
+        user (dict): The user document.
+        dataset (dict): The dataset document from the datasets_list of
+            the user.
+        epsilon (float): The epsilon to reserve.
+        delta (float): The delta to reserve.
+
+    Raises:
+        UnauthorizedAccessException: If the user may not query.
+        InvalidQueryException: If there is not enough budget.
+    """
+    if not user["may_query"]:
+        raise UnauthorizedAccessException(
+            f"User {user['user_name']} is not allowed to query."
+        )
+    check_budget_available(dataset, epsilon, delta)
+
+
+def check_budget_available(
+    dataset: dict, epsilon: float, delta: float
+) -> None:
+    """
+    Check that the budget of a dataset not spent nor reserved by a
+    reservation that has not expired covers a query.
+
+    Args:
+        dataset (dict): The dataset document from the datasets_list of
+            the user.
+        epsilon (float): The epsilon of the query.
+        delta (float): The delta of the query.
+
+    Raises:
+        InvalidQueryException: If there is not enough budget.
+    """
+    now = time.time()
+    reservations = [
+        r
+        for r in dataset.get("budget_reservations", [])
+        if r["expires_at"] > now
+    ]
+    eps_remain = (
+        dataset["initial_epsilon"]
+        - dataset["total_spent_epsilon"]
+        - sum(r["epsilon"] for r in reservations)
+    )
+    delta_remain = (
+        dataset["initial_delta"]
+        - dataset["total_spent_delta"]
+        - sum(r["delta"] for r in reservations)
+    )
+    if (eps_remain < epsilon) or (delta_remain < delta):
+        raise InvalidQueryException(
+            "Not enough budget for this query epsilon remaining "
+            f"{eps_remain}, delta remaining {delta_remain}."
+        )
+
+
+def decode_queries_cursor(
+    cursor: Optional[str],
+) -> Optional[Tuple[float, int]]:
+    """
+    Decode a cursor of the previous queries.
+
+    Args:
+        cursor (Optional[str]): The cursor sent to the client.
+
+    Raises:
+        InvalidQueryException: If the cursor is not valid.
+
+    Returns:
+        Optional[Tuple[float, int]]: The timestamp of the last query of
+            the previous page and the number of queries at this timestamp
+            already returned, None for the first page.
+    """
+    if cursor is None:
+        return None
+    try:
+        timestamp, skip = json.loads(base64.urlsafe_b64decode(cursor))
+        return float(timestamp), int(skip)
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise InvalidQueryException(f"Invalid cursor {cursor}.") from e
+
+
+def encode_queries_cursor(
+    after: Optional[Tuple[float, int]], page: List[dict]
+) -> str:
+    """
+    Encode the cursor of the page following page.
+
+    Args:
+        after (Optional[Tuple[float, int]]): The decoded cursor of page.
+        page (List[dict]): The queries of the page, sorted by timestamp.
+
+    Returns:
+        str: The cursor of the next page.
+    """
+    timestamp = page[-1]["timestamp"]
+    skip = sum(1 for q in page if q["timestamp"] == timestamp)
+    if after is not None and after[0] == timestamp:
+        skip += after[1]
+    return base64.urlsafe_b64encode(
+        json.dumps([timestamp, skip]).encode("utf-8")
+    ).decode("utf-8")
+
+
+class AdminDatabase(ABC):  # pylint: disable=R0904
     """
     Overall database management for server state.
 
     This is an abstract class.
     """
 
+    # Set by the subclasses, see get_dataset and get_dataset_metadata
+    dataset_cache: DatasetCache
+
+    # Store of the large query responses, see prepare_save_query
+    blob_store: Optional[BlobStore] = None
+
     @abstractmethod
     def __init__(self, **connection_parameters: Dict[str, str]) -> None:
         """
@@ -154,55 +315,86 @@ class AdminDatabase(ABC):
         """
 
     @abstractmethod
-    @dataset_must_exist
-    @user_must_have_access_to_dataset
-    def get_dataset_metadata(self, dataset_name: str) -> Metadata:
+    def get_datasets_version(self) -> int:
+        """
+        Get the version of the datasets and metadata, which changes
+        when they are modified by the administration functions.
+
+        Returns:
+            int: The datasets version.
         """
-        Returns the metadata dictionnary of the dataset.
 
-        Wrapped by :py:func:`dataset_must_exist`.
+    @abstractmethod
+    def load_dataset(self, dataset_name: str) -> Optional[dict]:
+        """
+        Load the dataset document from the database, without cache.
 
         Args:
-            dataset_name (str): name of the dataset to get the metadata
+            dataset_name (str): name of the dataset
 
         Returns:
-            Metadata: The metadata object.
+            Optional[dict]: The dataset document, None if it does not exist.
         """
 
     @abstractmethod
-    @user_must_exist
-    def set_may_user_query(self, user_name: str, may_query: bool) -> bool:
+    def load_dataset_metadata(self, dataset_name: str) -> dict:
         """
-        Sets if a user may query the server..
+        Load the metadata of an existing dataset, without cache.
 
-        (Set False before querying and True after updating budget)
+        Args:
+            dataset_name (str): name of the dataset
 
-        Wrapped by :py:func:`user_must_exist`.
+        Returns:
+            dict: The metadata dictionnary.
+        """
 
-        Args:
-            user_name (str): name of the user
-            may_query (bool): flag give or remove access to user
+    def get_dataset(self, dataset_name: str) -> dict:
         """
+        Get the dataset document, from the cache if it was loaded recently.
 
-    @abstractmethod
-    @user_must_exist
-    def get_and_set_may_user_query(
-        self, user_name: str, may_query: bool
-    ) -> bool:
+        Args:
+            dataset_name (str): name of the dataset
+
+        Raises:
+            InvalidQueryException: If the dataset does not exist.
+
+        Returns:
+            dict: The dataset document.
         """
-        Atomic operation to check and set if the user may query the server.
 
-        (Set False before querying and True after updating budget)
+        def load() -> dict:
+            dataset = self.load_dataset(dataset_name)
+            if dataset is None:
+                raise InvalidQueryException(
+                    f"Dataset {dataset_name} does not exist. "
+                    + "Please, verify the client object initialisation.",
+                )
+            return dataset
 
-        Wrapped by :py:func:`user_must_exist`.
+        return self.dataset_cache.get_or_load(("dataset", dataset_name), load)
+
+    def get_dataset_metadata(self, dataset_name: str) -> Metadata:
+        """
+        Returns the metadata of the dataset, from the cache if it was
+        loaded recently.
 
         Args:
-            user_name (str): name of the user
-            may_query (bool): flag give or remove access to user
+            dataset_name (str): name of the dataset to get the metadata
+
+        Raises:
+            InvalidQueryException: If the dataset does not exist.
 
         Returns:
-            bool: The may_query status of the user before the update.
-        """
+            Metadata: The metadata object, shared by the callers which
+                must not modify it.
+        """
+        self.get_dataset(dataset_name)
+        return self.dataset_cache.get_or_load(
+            ("metadata", dataset_name),
+            lambda: Metadata.model_validate(
+                self.load_dataset_metadata(dataset_name)
+            ),
+        )
 
     @abstractmethod
     @user_must_exist
@@ -390,36 +582,248 @@ class AdminDatabase(ABC):
         self.update_delta(user_name, dataset_name, spent_delta)
 
     @abstractmethod
-    @dataset_must_exist
+    @user_must_have_access_to_dataset
+    def reserve_budget(  # pylint: disable=too-many-arguments
+        self,
+        user_name: str,
+        dataset_name: str,
+        epsilon: float,
+        delta: float,
+        lease_duration: float = BUDGET_RESERVATION_LEASE,
+    ) -> str:
+        """
+        Atomic operation to check and reserve the budget of a query.
+
+        The reserved budget is not available to other queries until the
+        reservation is committed with :py:meth:`commit_budget`, refunded
+        with :py:meth:`refund_budget` or expires.
+
+        Wrapped by :py:func:`user_must_have_access_to_dataset`.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            epsilon (float): epsilon cost of the query
+            delta (float): delta cost of the query
+            lease_duration (float, optional): Number of seconds after which
+                the reservation expires, in case the server stops before
+                the end of the query. Defaults to BUDGET_RESERVATION_LEASE.
+
+        Raises:
+            UnauthorizedAccessException: If the user may not query.
+            InvalidQueryException: If there is not enough budget.
+
+        Returns:
+            str: The reservation id.
+        """
+
+    @abstractmethod
+    def commit_budget(  # pylint: disable=too-many-arguments
+        self,
+        user_name: str,
+        dataset_name: str,
+        reservation_id: str,
+        spent_epsilon: float,
+        spent_delta: float,
+    ) -> None:
+        """
+        Spend the budget of a reservation once the query is done.
+
+        If the reservation has expired, its budget may have been reserved
+        by another query: the budget is then only spent if it is still
+        available, the query fails otherwise.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            reservation_id (str): id returned by :py:meth:`reserve_budget`
+            spent_epsilon (float): value of epsilon spent on the query
+            spent_delta (float): value of delta spent on the query
+
+        Raises:
+            InvalidQueryException: If the reservation has expired and
+                there is not enough budget left for the query.
+        """
+
+    @abstractmethod
+    def renew_budget_reservation(
+        self,
+        user_name: str,
+        dataset_name: str,
+        reservation_id: str,
+        lease_duration: float = BUDGET_RESERVATION_LEASE,
+    ) -> bool:
+        """
+        Extend the lease of a reservation which has not expired.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            reservation_id (str): id returned by :py:meth:`reserve_budget`
+            lease_duration (float, optional): Number of seconds from now
+                after which the reservation expires.
+                Defaults to BUDGET_RESERVATION_LEASE.
+
+        Returns:
+            bool: True if the lease was extended, False if the reservation
+                does not exist anymore or has expired.
+        """
+
+    @contextmanager
+    def keep_budget_reserved(  # pylint: disable=too-many-arguments
+        self,
+        user_name: str,
+        dataset_name: str,
+        reservation_id: str,
+        lease_duration: float = BUDGET_RESERVATION_LEASE,
+        renewal_interval: float = BUDGET_RESERVATION_RENEWAL_INTERVAL,
+    ) -> Iterator[None]:
+        """
+        Renew the lease of a reservation while the query runs, so that
+        the reservation of a query longer than the lease does not expire.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            reservation_id (str): id returned by :py:meth:`reserve_budget`
+            lease_duration (float, optional): Number of seconds from each
+                renewal after which the reservation expires.
+                Defaults to BUDGET_RESERVATION_LEASE.
+            renewal_interval (float, optional): Number of seconds between
+                two renewals. Defaults to BUDGET_RESERVATION_RENEWAL_INTERVAL.
+
+        Yields:
+            Iterator[None]: Context in which the lease is renewed.
+        """
+        stop = threading.Event()
+
+        def renew() -> None:
+            while not stop.wait(renewal_interval):
+                try:
+                    if not self.renew_budget_reservation(
+                        user_name, dataset_name, reservation_id, lease_duration
+                    ):
+                        return
+                except Exception as e:  # pylint: disable=broad-except
+                    LOG.warning(
+                        f"Could not renew budget reservation {reservation_id}"
+                        + f" of user {user_name}: {e}"
+                    )
+
+        renewer = threading.Thread(target=renew, daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            renewer.join()
+
+    @abstractmethod
+    def refund_budget(
+        self, user_name: str, dataset_name: str, reservation_id: str
+    ) -> None:
+        """
+        Release the budget of a reservation if the query failed.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            reservation_id (str): id returned by :py:meth:`reserve_budget`
+        """
+
     def get_dataset_field(self, dataset_name: str, key: str) -> str:
         """
         Get dataset field type based on dataset name and key
 
-        Wrapped by :py:func:`dataset_must_exist`.
-
         Args:
             dataset_name (str): Name of the dataset.
             key (str): Key for the value to get in the dataset dict.
 
+        Raises:
+            InvalidQueryException: If the dataset does not exist.
+            InternalServerException: If the field does not exist.
+
         Returns:
             str: The requested value.
         """
+        dataset = self.get_dataset(dataset_name)
+        if key not in dataset:
+            raise InternalServerException(
+                f"Field {key} does not exist for dataset {dataset_name}."
+            )
+        return dataset[key]
 
-    @abstractmethod
     @user_must_have_access_to_dataset
     def get_user_previous_queries(
         self,
         user_name: str,
         dataset_name: str,
-    ) -> List[dict]:
+        query_filter: Optional[GetPreviousQueries] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
         """
-        Retrieves and return the queries already done by a user
+        Retrieves and return the queries already done by a user,
+        sorted by timestamp.
 
         Wrapped by :py:func:`user_must_have_access_to_dataset`.
 
         Args:
             user_name (str): name of the user
             dataset_name (str): name of the dataset
+            query_filter (Optional[GetPreviousQueries], optional):
+                Pagination, filters and projection of the queries.
+                Defaults to None, all the queries.
+
+        Raises:
+            InvalidQueryException: If the cursor is not valid.
+
+        Returns:
+            Tuple[List[dict], Optional[str]]: List of previous queries and
+                the cursor of the next page, None if it is the last page.
+        """
+        if query_filter is None:
+            query_filter = GetPreviousQueries(dataset_name=dataset_name)
+        after = decode_queries_cursor(query_filter.cursor)
+        limit = query_filter.limit
+        # One more query tells if there is a next page
+        queries = self.find_previous_queries(
+            user_name,
+            dataset_name,
+            query_filter,
+            after,
+            None if limit is None else limit + 1,
+        )
+
+        next_cursor = None
+        if limit is not None and len(queries) > limit:
+            queries = queries[:limit]
+            next_cursor = encode_queries_cursor(after, queries)
+        if not query_filter.metadata_only:
+            queries = self.restore_archived_responses(queries)
+        return queries, next_cursor
+
+    @abstractmethod
+    def find_previous_queries(  # pylint: disable=too-many-arguments
+        self,
+        user_name: str,
+        dataset_name: str,
+        query_filter: GetPreviousQueries,
+        after: Optional[Tuple[float, int]],
+        limit: Optional[int],
+    ) -> List[dict]:
+        """
+        Find the archived queries of a user on a dataset, sorted by
+        timestamp then by insertion order.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            query_filter (GetPreviousQueries): Filters and projection of
+                the queries, with metadata_only the query responses are
+                not returned.
+            after (Optional[Tuple[float, int]]): Only queries from this
+                timestamp, skipping this number of queries at this
+                timestamp. None for all the queries.
+            limit (Optional[int]): Maximum number of queries, None for all.
 
         Returns:
             List[dict]: List of previous queries.
@@ -440,7 +844,8 @@ class AdminDatabase(ABC):
             InternalServerException: If the type of query is unknown.
 
         Returns:
-            dict: The query archive dictionary.
+            dict: The query archive dictionary. With a blob store, a large
+                query response is replaced by a "response_blob" reference.
         """
         to_archive = {
             "user_name": user_name,
@@ -450,9 +855,36 @@ class AdminDatabase(ABC):
             "response": response,
             "timestamp": time.time(),
         }
+        if self.blob_store is not None:
+            response, blob = self.blob_store.archive_response(response)
+            if blob is not None:
+                to_archive["response"] = response
+                to_archive["response_blob"] = blob
 
         return to_archive
 
+    def restore_archived_responses(self, queries: List[dict]) -> List[dict]:
+        """Put back the query responses stored in the blob store.
+
+        Args:
+            queries (List[dict]): archives of the queries.
+
+        Raises:
+            InternalServerException: If a response is in a blob store
+                that is not configured.
+
+        Returns:
+            List[dict]: The archives with their query responses.
+        """
+        if self.blob_store is not None:
+            return self.blob_store.restore_responses(queries)
+        if any("response_blob" in q for q in queries):
+            raise InternalServerException(
+                "Query responses are archived in a blob store "
+                + "which is not configured."
+            )
+        return queries
+
     @abstractmethod
     def save_query(
         self, user_name: str, query_json: RequestModel, response: dict
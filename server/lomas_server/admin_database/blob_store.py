@@ -0,0 +1,320 @@
+import hashlib
+import json
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from lomas_server.constants import ARCHIVE_MIN_BLOB_SIZE
+from lomas_server.data_connector.s3_connector import create_s3_client
+from lomas_server.utils.config import S3CredentialsConfig
+from lomas_server.utils.error_handler import InternalServerException
+
+
+class BlobStore(ABC):
+    """
+    Content-addressed store of the large query responses of the archives.
+
+    Blobs are named by the sha256 digest of their content, identical
+    responses are stored once.
+    """
+
+    def __init__(self, min_blob_size: int = ARCHIVE_MIN_BLOB_SIZE) -> None:
+        """Initializer.
+
+        Args:
+            min_blob_size (int, optional): Size in bytes of the serialised
+                query responses from which they are stored as blobs.
+                Defaults to ARCHIVE_MIN_BLOB_SIZE.
+        """
+        self.min_blob_size = min_blob_size
+
+    @abstractmethod
+    def exists(self, digest: str) -> bool:
+        """Check if a blob is in the store.
+
+        Args:
+            digest (str): sha256 hex digest of the blob.
+
+        Returns:
+            bool: True if the blob exists, False otherwise.
+        """
+
+    @abstractmethod
+    def write(self, digest: str, data: bytes) -> None:
+        """Write a blob to the store.
+
+        Args:
+            digest (str): sha256 hex digest of the blob.
+            data (bytes): content of the blob.
+        """
+
+    @abstractmethod
+    def read(self, digest: str) -> bytes:
+        """Read a blob from the store.
+
+        Args:
+            digest (str): sha256 hex digest of the blob.
+
+        Returns:
+            bytes: content of the blob.
+        """
+
+    def put(self, data: bytes) -> str:
+        """Store a blob unless an identical one is already stored.
+
+        Args:
+            data (bytes): content of the blob.
+
+        Returns:
+            str: sha256 hex digest of the blob.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.exists(digest):
+            self.write(digest, data)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """Get a blob and verify its content.
+
+        Args:
+            digest (str): sha256 hex digest of the blob.
+
+        Raises:
+            InternalServerException: If the content does not match.
+
+        Returns:
+            bytes: content of the blob.
+        """
+        data = self.read(digest)
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise InternalServerException(
+                f"Archived query response {digest} is corrupted."
+            )
+        return data
+
+    def archive_response(self, response: dict) -> Tuple[dict, Optional[dict]]:
+        """Move the query response of a large response to a blob.
+
+        Args:
+            response (dict): response sent to the client.
+
+        Returns:
+            Tuple[dict, Optional[dict]]: The response to archive and the
+                reference to the blob of its query response, None if the
+                query response is small enough to be archived inline.
+        """
+        data = json.dumps(response["query_response"]).encode("utf-8")
+        if len(data) < self.min_blob_size:
+            return response, None
+        digest = self.put(data)
+        return (
+            {**response, "query_response": None},
+            {"sha256": digest, "size": len(data)},
+        )
+
+    def restore_responses(self, queries: List[dict]) -> List[dict]:
+        """Put back the query responses stored as blobs in the archives.
+
+        Each blob is read once, the archives are not modified.
+
+        Args:
+            queries (List[dict]): archives of the queries.
+
+        Returns:
+            List[dict]: The archives with their query responses.
+        """
+        blobs: Dict[str, Any] = {}
+        restored = []
+        for query in queries:
+            if "response_blob" not in query:
+                restored.append(query)
+                continue
+            query = dict(query)
+            digest = query.pop("response_blob")["sha256"]
+            if digest not in blobs:
+                blobs[digest] = json.loads(self.get(digest))
+            query["response"] = {
+                **query["response"],
+                "query_response": blobs[digest],
+            }
+            restored.append(query)
+        return restored
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Blob store in a directory of the local filesystem.
+    """
+
+    def __init__(
+        self, directory: str, min_blob_size: int = ARCHIVE_MIN_BLOB_SIZE
+    ) -> None:
+        """Initializer.
+
+        Args:
+            directory (str): Directory of the blobs.
+            min_blob_size (int, optional): Size in bytes of the serialised
+                query responses from which they are stored as blobs.
+                Defaults to ARCHIVE_MIN_BLOB_SIZE.
+        """
+        super().__init__(min_blob_size)
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _get_path(self, digest: str) -> str:
+        """Get the path of a blob.
+
+        Args:
+            digest (str): sha256 hex digest of the blob.
+
+        Returns:
+            str: The path of the blob file.
+        """
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def exists(self, digest: str) -> bool:
+        """Check if a blob is in the store.
+
+        Args:
+            digest (str): sha256 hex digest of the blob.
+
+        Returns:
+            bool: True if the blob exists, False otherwise.
+        """
+        return os.path.exists(self._get_path(digest))
+
+    def write(self, digest: str, data: bytes) -> None:
+        """Write a blob to the store.
+
+        The file is written under a temporary name and atomically moved in
+        place, so a partial blob is never read.
+
+        Args:
+            digest (str): sha256 hex digest of the blob.
+            data (bytes): content of the blob.
+
+        Raises:
+            InternalServerException: If the file cannot be written.
+        """
+        path = self._get_path(digest)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(path), suffix=".tmp"
+            )
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as err:
+            raise InternalServerException(
+                f"Error writing archived query response {digest}: {err}"
+            ) from err
+
+    def read(self, digest: str) -> bytes:
+        """Read a blob from the store.
+
+        Args:
+            digest (str): sha256 hex digest of the blob.
+
+        Raises:
+            InternalServerException: If the file cannot be read.
+
+        Returns:
+            bytes: content of the blob.
+        """
+        try:
+            with open(self._get_path(digest), "rb") as f:
+                return f.read()
+        except OSError as err:
+            raise InternalServerException(
+                f"Error reading archived query response {digest}: {err}"
+            ) from err
+
+
+class S3BlobStore(BlobStore):
+    """
+    Blob store in a S3 bucket.
+    """
+
+    def __init__(
+        self,
+        credentials: S3CredentialsConfig,
+        prefix: str = "",
+        min_blob_size: int = ARCHIVE_MIN_BLOB_SIZE,
+    ) -> None:
+        """Initializer.
+
+        Args:
+            credentials (S3CredentialsConfig): The S3 credentials, endpoint
+                and bucket.
+            prefix (str, optional): Prefix of the keys of the blobs.
+                Defaults to "".
+            min_blob_size (int, optional): Size in bytes of the serialised
+                query responses from which they are stored as blobs.
+                Defaults to ARCHIVE_MIN_BLOB_SIZE.
+        """
+        super().__init__(min_blob_size)
+        self.client = create_s3_client(credentials)
+        self.bucket: str = credentials.bucket
+        self.prefix = prefix
+
+    def exists(self, digest: str) -> bool:
+        """Check if a blob is in the store.
+
+        Args:
+            digest (str): sha256 hex digest of the blob.
+
+        Returns:
+            bool: True if the blob exists, False otherwise.
+        """
+        try:
+            self.client.head_object(
+                Bucket=self.bucket, Key=self.prefix + digest
+            )
+        except Exception:  # pylint: disable=broad-exception-caught
+            return False
+        return True
+
+    def write(self, digest: str, data: bytes) -> None:
+        """Write a blob to the store.
+
+        Args:
+            digest (str): sha256 hex digest of the blob.
+            data (bytes): content of the blob.
+
+        Raises:
+            InternalServerException: If the object cannot be written.
+        """
+        try:
+            self.client.put_object(
+                Bucket=self.bucket, Key=self.prefix + digest, Body=data
+            )
+        except Exception as err:
+            raise InternalServerException(
+                "Error writing archived query response at s3 path:"
+                + f"{self.bucket}/{self.prefix}{digest}: {err}"
+            ) from err
+
+    def read(self, digest: str) -> bytes:
+        """Read a blob from the store.
+
+        Args:
+            digest (str): sha256 hex digest of the blob.
+
+        Raises:
+            InternalServerException: If the object cannot be read.
+
+        Returns:
+            bytes: content of the blob.
+        """
+        try:
+            obj = self.client.get_object(
+                Bucket=self.bucket, Key=self.prefix + digest
+            )
+            return obj["Body"].read()
+        except Exception as err:
+            raise InternalServerException(
+                "Error reading archived query response at s3 path:"
+                + f"{self.bucket}/{self.prefix}{digest}: {err}"
+            ) from err
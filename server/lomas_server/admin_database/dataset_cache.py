@@ -0,0 +1,89 @@
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional, TypeVar
+
+from lomas_server.constants import (
+    ADMIN_DB_CACHE_SIZE,
+    ADMIN_DB_CACHE_TTL,
+    ADMIN_DB_VERSION_CHECK_INTERVAL,
+)
+from lomas_server.utils.lru_cache import LRUCache
+
+ValueT = TypeVar("ValueT")
+
+
+class DatasetCache:
+    """
+    Read-through cache of the dataset documents and metadata of an
+    admin database.
+
+    Values are reloaded after a time to live. They are all invalidated
+    when the datasets version of the database changes, the version is
+    read at most once per check interval.
+    """
+
+    def __init__(
+        self,
+        get_version: Callable[[], int],
+        ttl: float = ADMIN_DB_CACHE_TTL,
+        version_check_interval: float = ADMIN_DB_VERSION_CHECK_INTERVAL,
+        max_size: int = ADMIN_DB_CACHE_SIZE,
+    ) -> None:
+        """Initializer.
+
+        Args:
+            get_version (Callable[[], int]): Function reading the datasets
+                version of the database.
+            ttl (float, optional): Number of seconds a value is cached.
+                Defaults to ADMIN_DB_CACHE_TTL.
+            version_check_interval (float, optional): Minimum number of
+                seconds between two reads of the version.
+                Defaults to ADMIN_DB_VERSION_CHECK_INTERVAL.
+            max_size (int, optional): Maximum number of cached values.
+                Defaults to ADMIN_DB_CACHE_SIZE.
+        """
+        self.get_version = get_version
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        self._values: LRUCache[tuple[float, Any]] = LRUCache(max_size)
+        self._version: Optional[int] = None
+        self._version_checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, load: Callable[[], ValueT]) -> ValueT:
+        """Get a cached value or load it with load and cache it.
+
+        Args:
+            key (Hashable): The key of the value.
+            load (Callable[[], ValueT]): Function loading the value from
+                the database, exceptions are raised and nothing is cached.
+
+        Returns:
+            ValueT: The cached or loaded value.
+        """
+        self.check_version()
+        now = time.monotonic()
+        entry = self._values.get(key)
+        if entry is not None and now - entry[0] < self.ttl:
+            return entry[1]
+
+        value = load()
+        self._values.put(key, (now, value))
+        return value
+
+    def check_version(self) -> None:
+        """Clear the cache if the datasets version changed since the
+        last check, unless it was checked less than an interval ago."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._version_checked_at < self.version_check_interval:
+                return
+            version = self.get_version()
+            self._version_checked_at = now
+            if version != self._version:
+                self._version = version
+                self._values.clear()
+
+    def clear(self) -> None:
+        """Remove all the cached values."""
+        self._values.clear()
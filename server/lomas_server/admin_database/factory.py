@@ -1,8 +1,26 @@
+from typing import List, Optional
+
 from lomas_server.admin_database.admin_database import AdminDatabase
+from lomas_server.admin_database.blob_store import (
+    BlobStore,
+    LocalBlobStore,
+    S3BlobStore,
+)
 from lomas_server.admin_database.mongodb_database import AdminMongoDatabase
 from lomas_server.admin_database.utils import get_mongodb_url
 from lomas_server.admin_database.yaml_database import AdminYamlDatabase
-from lomas_server.utils.config import DBConfig, MongoDBConfig, YamlDBConfig
+from lomas_server.constants import PrivateDatabaseType
+from lomas_server.data_connector.factory import get_dataset_credentials
+from lomas_server.utils.config import (
+    ArchiveConfig,
+    DBConfig,
+    LocalBlobStoreConfig,
+    MongoDBConfig,
+    PrivateDBCredentials,
+    S3BlobStoreConfig,
+    S3CredentialsConfig,
+    YamlDBConfig,
+)
 from lomas_server.utils.error_handler import InternalServerException
 
 
@@ -29,6 +47,59 @@ def admin_database_factory(config: DBConfig) -> AdminDatabase:
 
         case YamlDBConfig():
             yaml_database_file = config.db_file
-            return AdminYamlDatabase(yaml_database_file)
+            return AdminYamlDatabase(
+                yaml_database_file,
+                journal_path=config.journal_file,
+                fsync=config.journal_fsync,
+                compaction_records=config.journal_compaction_records,
+            )
         case _:
             raise InternalServerException("Database type not supported.")
+
+
+def blob_store_factory(
+    config: ArchiveConfig,
+    private_db_credentials: List[PrivateDBCredentials],
+) -> Optional[BlobStore]:
+    """Instantiates and returns the blob store of the archived query
+    responses described in the provided config.
+
+    Args:
+        config (ArchiveConfig): An instance of ArchiveConfig.
+        private_db_credentials (List[PrivateDBCredentials]):
+            The list of private database credentials.
+
+    Raises:
+        InternalServerException: If the S3 credentials are not found.
+
+    Returns:
+        Optional[BlobStore]: The blob store, None if the query responses
+            are archived inline.
+    """
+    match config.blob_store:
+        case LocalBlobStoreConfig():
+            return LocalBlobStore(
+                config.blob_store.directory, config.min_blob_size
+            )
+        case S3BlobStoreConfig():
+            credentials = get_dataset_credentials(
+                private_db_credentials,
+                PrivateDatabaseType.S3,
+                config.blob_store.credentials_name,
+            )
+            if not isinstance(credentials, S3CredentialsConfig):
+                raise InternalServerException(
+                    "Could not get correct credentials"
+                )
+            # Copied, the credentials may be shared with private datasets
+            credentials = credentials.model_copy(
+                update={
+                    "endpoint_url": config.blob_store.endpoint_url,
+                    "bucket": config.blob_store.bucket,
+                }
+            )
+            return S3BlobStore(
+                credentials, config.blob_store.prefix, config.min_blob_size
+            )
+        case _:
+            return None
@@ -1,19 +1,48 @@
-from typing import List
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-from pymongo import MongoClient
+from pymongo import ASCENDING, MongoClient
 from pymongo.database import Database
 from pymongo.errors import WriteConcernError
 from pymongo.results import _WriteResult
 
 from lomas_server.admin_database.admin_database import (
     AdminDatabase,
-    dataset_must_exist,
+    check_budget_for_reservation,
+    new_budget_reservation,
     user_must_exist,
-    user_must_have_access_to_dataset,
 )
-from lomas_server.utils.collection_models import Metadata
-from lomas_server.utils.error_handler import InvalidQueryException
-from lomas_server.utils.query_models import RequestModel
+from lomas_server.admin_database.dataset_cache import DatasetCache
+from lomas_server.constants import (
+    BUDGET_RESERVATION_LEASE,
+    BUDGET_RESERVATION_MAX_ATTEMPTS,
+)
+from lomas_server.utils.error_handler import (
+    InternalServerException,
+    InvalidQueryException,
+    UnauthorizedAccessException,
+)
+from lomas_server.utils.logger import LOG
+from lomas_server.utils.query_models import GetPreviousQueries, RequestModel
+
+# Document of the versions collection holding the datasets version
+DATASETS_VERSION_ID = "datasets"
+
+# Indexes of the lookups done on each request, by collection
+COLLECTION_INDEXES: Dict[str, List[List[Tuple[str, int]]]] = {
+    "users": [
+        [("user_name", ASCENDING), ("datasets_list.dataset_name", ASCENDING)]
+    ],
+    "datasets": [[("dataset_name", ASCENDING)]],
+    "metadata": [[("dataset_name", ASCENDING)]],
+    "queries_archives": [
+        [
+            ("user_name", ASCENDING),
+            ("dataset_name", ASCENDING),
+            ("timestamp", ASCENDING),
+        ]
+    ],
+}
 
 
 class AdminMongoDatabase(AdminDatabase):
@@ -29,6 +58,22 @@ class AdminMongoDatabase(AdminDatabase):
             database_name (str): Mongodb database name.
         """
         self.db: Database = MongoClient(connection_string)[database_name]
+        self.create_indexes()
+        self.dataset_cache = DatasetCache(self.get_datasets_version)
+
+    def create_indexes(self) -> None:
+        """Create the indexes of the lookups done on each request.
+
+        Creating an index that already exists does nothing.
+        """
+        create_indexes(self.db)
+        if self.db.metadata.count_documents(
+            {"dataset_name": {"$exists": False}}, limit=1
+        ):
+            LOG.warning(
+                "Metadata collection has documents not keyed by dataset "
+                + "name, run the migrate_metadata administration command."
+            )
 
     def does_user_exist(self, user_name: str) -> bool:
         """Checks if user exist in the database
@@ -40,7 +85,7 @@ class AdminMongoDatabase(AdminDatabase):
             bool: True if the user exists, False otherwise.
         """
         doc_count = self.db.users.count_documents(
-            {"user_name": f"{user_name}"}
+            {"user_name": f"{user_name}"}, limit=1
         )
         return doc_count > 0
 
@@ -53,74 +98,45 @@ class AdminMongoDatabase(AdminDatabase):
         Returns:
             bool: True if the dataset exists, False otherwise.
         """
-        collection_query = self.db.datasets.find({})
-        for document in collection_query:
-            if document["dataset_name"] == dataset_name:
-                return True
-
-        return False
-
-    @dataset_must_exist
-    def get_dataset_metadata(self, dataset_name: str) -> Metadata:
-        """Returns the metadata dictionnary of the dataset.
-
-        Wrapped by :py:func:`dataset_must_exist`.
+        doc_count = self.db.datasets.count_documents(
+            {"dataset_name": dataset_name}, limit=1
+        )
+        return doc_count > 0
 
-        Args:
-            dataset_name (str): name of the dataset to get the metadata
+    def get_datasets_version(self) -> int:
+        """Get the version of the datasets and metadata, incremented by
+        the administration functions modifying them.
 
         Returns:
-            Metadata: The metadata model.
+            int: The datasets version, 0 if never incremented.
         """
-        metadatas = self.db.metadata.find_one(
-            {dataset_name: {"$exists": True}}
-        )
-        return Metadata.model_validate(metadatas[dataset_name])  # type: ignore
+        version = self.db.versions.find_one({"_id": DATASETS_VERSION_ID})
+        return version["version"] if version else 0
 
-    @user_must_exist
-    def set_may_user_query(self, user_name: str, may_query: bool) -> None:
-        """Sets if a user may query the server.
-
-        (Set False before querying and True after updating budget)
-
-        Wrapped by :py:func:`user_must_exist`.
+    def load_dataset(self, dataset_name: str) -> Optional[dict]:
+        """Load the dataset document, without cache.
 
         Args:
-            user_name (str): name of the user
-            may_query (bool): flag give or remove access to user
+            dataset_name (str): name of the dataset
 
-        Raises:
-            WriteConcernError: If the result is not acknowledged.
+        Returns:
+            Optional[dict]: The dataset document, None if it does not exist.
         """
-        res = self.db.users.update_one(
-            {"user_name": f"{user_name}"},
-            {"$set": {"may_query": may_query}},
+        return self.db.datasets.find_one(
+            {"dataset_name": dataset_name}, {"_id": 0}
         )
-        check_result_acknowledged(res)
 
-    @user_must_exist
-    def get_and_set_may_user_query(
-        self, user_name: str, may_query: bool
-    ) -> bool:
-        """
-        Atomic operation to check and set if the user may query the server.
-
-        (Set False before querying and True after updating budget)
-
-        Wrapped by :py:func:`user_must_exist`.
+    def load_dataset_metadata(self, dataset_name: str) -> dict:
+        """Load the metadata of an existing dataset, without cache.
 
         Args:
-            user_name (str): name of the user
-            may_query (bool): flag give or remove access to user
+            dataset_name (str): name of the dataset
 
         Returns:
-            bool: The may_query status of the user before the update.
+            dict: The metadata dictionnary.
         """
-        res = self.db.users.find_one_and_update(
-            {"user_name": user_name}, {"$set": {"may_query": may_query}}
-        )
-
-        return res["may_query"]  # type: ignore
+        metadatas = self.db.metadata.find_one({"dataset_name": dataset_name})
+        return metadatas["metadata"]  # type: ignore
 
     @user_must_exist
     def has_user_access_to_dataset(
@@ -150,6 +166,40 @@ class AdminMongoDatabase(AdminDatabase):
         )
         return doc_count > 0
 
+    def get_user_and_dataset(
+        self, user_name: str, dataset_name: str
+    ) -> Tuple[dict, dict]:
+        """Get the user and its dataset from the datasets_list in a
+        single query, projected on the dataset.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+
+        Raises:
+            UnauthorizedAccessException: If the user does not exist or
+                does not have access to the dataset.
+            InvalidQueryException: If the dataset does not exist.
+
+        Returns:
+            Tuple[dict, dict]: The user, with only the dataset in its
+                datasets_list, and the dataset of the user.
+        """
+        user = self.db.users.find_one(
+            {
+                "user_name": user_name,
+                "datasets_list.dataset_name": dataset_name,
+            },
+            {"_id": 0, "user_name": 1, "may_query": 1, "datasets_list.$": 1},
+        )
+        if user is None:
+            # Raises if the user or the dataset does not exist
+            self.has_user_access_to_dataset(user_name, dataset_name)
+            raise UnauthorizedAccessException(
+                f"{user_name} does not have access to {dataset_name}.",
+            )
+        return user, user["datasets_list"][0]
+
     def get_epsilon_or_delta(
         self, user_name: str, dataset_name: str, parameter: str
     ) -> float:
@@ -164,19 +214,75 @@ class AdminMongoDatabase(AdminDatabase):
         Returns:
             float: The requested budget value.
         """
-        return list(
-            self.db.users.aggregate(
-                [
-                    {"$unwind": "$datasets_list"},
-                    {
-                        "$match": {
-                            "user_name": f"{user_name}",
-                            "datasets_list.dataset_name": f"{dataset_name}",
-                        }
-                    },
-                ]
-            )
-        )[0]["datasets_list"][parameter]
+        _, dataset = self.get_user_and_dataset(user_name, dataset_name)
+        return dataset[parameter]
+
+    def get_total_spent_budget(
+        self, user_name: str, dataset_name: str
+    ) -> List[float]:
+        """Get the total spent epsilon and delta spent by a specific user
+        on a specific dataset (since the initialisation)
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+
+        Raises:
+            UnauthorizedAccessException: If the user does not exist or
+                does not have access to the dataset.
+            InvalidQueryException: If the dataset does not exist.
+
+        Returns:
+            List[float]: The first value of the list is the epsilon value,
+                the second value is the delta value.
+        """
+        _, dataset = self.get_user_and_dataset(user_name, dataset_name)
+        return [dataset["total_spent_epsilon"], dataset["total_spent_delta"]]
+
+    def get_initial_budget(
+        self, user_name: str, dataset_name: str
+    ) -> List[float]:
+        """Get the initial epsilon and delta budget
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+
+        Raises:
+            UnauthorizedAccessException: If the user does not exist or
+                does not have access to the dataset.
+            InvalidQueryException: If the dataset does not exist.
+
+        Returns:
+            List[float]: The first value of the list is the epsilon value,
+                the second value is the delta value.
+        """
+        _, dataset = self.get_user_and_dataset(user_name, dataset_name)
+        return [dataset["initial_epsilon"], dataset["initial_delta"]]
+
+    def get_remaining_budget(
+        self, user_name: str, dataset_name: str
+    ) -> List[float]:
+        """Get the remaining epsilon and delta budget (initial - total spent)
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+
+        Raises:
+            UnauthorizedAccessException: If the user does not exist or
+                does not have access to the dataset.
+            InvalidQueryException: If the dataset does not exist.
+
+        Returns:
+            List[float]: The first value of the list is the epsilon value,
+                the second value is the delta value.
+        """
+        _, dataset = self.get_user_and_dataset(user_name, dataset_name)
+        return [
+            dataset["initial_epsilon"] - dataset["total_spent_epsilon"],
+            dataset["initial_delta"] - dataset["total_spent_delta"],
+        ]
 
     def update_epsilon_or_delta(
         self,
@@ -207,47 +313,282 @@ class AdminMongoDatabase(AdminDatabase):
         )
         check_result_acknowledged(res)
 
-    @dataset_must_exist
-    def get_dataset_field(self, dataset_name: str, key: str) -> str:
-        """Get dataset field type based on dataset name and key
+    def reserve_budget(  # pylint: disable=too-many-arguments
+        self,
+        user_name: str,
+        dataset_name: str,
+        epsilon: float,
+        delta: float,
+        lease_duration: float = BUDGET_RESERVATION_LEASE,
+    ) -> str:
+        """Atomic operation to check and reserve the budget of a query.
 
-        Wrapped by :py:func:`dataset_must_exist`.
+        The reservation is pushed by an update filtered on the budget
+        still available, so concurrent reservations cannot overspend it.
+        The access of the user is checked by the same update, the reason
+        is only looked up if the update fails.
 
         Args:
-            dataset_name (str): Name of the dataset.
-            key (str): Key for the value to get in the dataset dict.
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            epsilon (float): epsilon cost of the query
+            delta (float): delta cost of the query
+            lease_duration (float, optional): Number of seconds after which
+                the reservation expires, in case the server stops before
+                the end of the query. Defaults to BUDGET_RESERVATION_LEASE.
+
+        Raises:
+            UnauthorizedAccessException: If the user may not query, does
+                not exist or does not have access to the dataset.
+            InvalidQueryException: If there is not enough budget or the
+                dataset does not exist.
+            InternalServerException: If the budget kept changing
+                during the reservation.
 
         Returns:
-            str: The requested value.
+            str: The reservation id.
         """
-        dataset = self.db.datasets.find_one({"dataset_name": dataset_name})
-        return dataset[key]  # type: ignore
+        reservation = new_budget_reservation(epsilon, delta, lease_duration)
+        for _ in range(BUDGET_RESERVATION_MAX_ATTEMPTS):
+            res = self.db.users.update_one(
+                {
+                    "user_name": user_name,
+                    "may_query": True,
+                    "datasets_list.dataset_name": dataset_name,
+                    "$expr": budget_available_expr(
+                        dataset_name, epsilon, delta, time.time()
+                    ),
+                },
+                {
+                    "$push": {
+                        "datasets_list.$.budget_reservations": reservation
+                    }
+                },
+            )
+            check_result_acknowledged(res)
+            if res.modified_count:
+                return reservation["reservation_id"]
+
+            # Raise the reason of the failure, unless the budget was
+            # released since the update.
+            user, dataset = self.get_user_and_dataset(user_name, dataset_name)
+            check_budget_for_reservation(user, dataset, epsilon, delta)
+        raise InternalServerException(
+            f"Could not reserve budget of user {user_name} "
+            + f"on dataset {dataset_name}."
+        )
 
-    @user_must_have_access_to_dataset
-    def get_user_previous_queries(
+    def commit_budget(  # pylint: disable=too-many-arguments
         self,
         user_name: str,
         dataset_name: str,
-    ) -> List[dict]:
-        """Retrieves and return the queries already done by a user
+        reservation_id: str,
+        spent_epsilon: float,
+        spent_delta: float,
+    ) -> None:
+        """Spend the budget of a reservation once the query is done.
 
-        Wrapped by :py:func:`user_must_have_access_to_dataset`.
+        The update is filtered on the reservation not having expired or,
+        if it has, on the budget still being available: the budget of an
+        expired reservation may have been reserved by another query.
+        Expired reservations are removed at the same time.
 
         Args:
             user_name (str): name of the user
             dataset_name (str): name of the dataset
+            reservation_id (str): id returned by :py:meth:`reserve_budget`
+            spent_epsilon (float): value of epsilon spent on the query
+            spent_delta (float): value of delta spent on the query
+
+        Raises:
+            WriteConcernError: If the result is not acknowledged.
+            InvalidQueryException: If the reservation has expired and
+                there is not enough budget left for the query.
+        """
+        now = time.time()
+        res = self.db.users.update_one(
+            {
+                "user_name": user_name,
+                "datasets_list.dataset_name": dataset_name,
+                "$or": [
+                    {
+                        "datasets_list": {
+                            "$elemMatch": {
+                                "dataset_name": dataset_name,
+                                "budget_reservations": {
+                                    "$elemMatch": {
+                                        "reservation_id": reservation_id,
+                                        "expires_at": {"$gt": now},
+                                    }
+                                },
+                            }
+                        }
+                    },
+                    {
+                        "$expr": budget_available_expr(
+                            dataset_name, spent_epsilon, spent_delta, now
+                        )
+                    },
+                ],
+            },
+            {
+                "$inc": {
+                    "datasets_list.$[dataset].total_spent_epsilon": (
+                        spent_epsilon
+                    ),
+                    "datasets_list.$[dataset].total_spent_delta": spent_delta,
+                },
+                "$pull": {
+                    "datasets_list.$[dataset].budget_reservations": (
+                        reservation_filter(reservation_id, now)
+                    )
+                },
+            },
+            array_filters=[{"dataset.dataset_name": dataset_name}],
+        )
+        check_result_acknowledged(res)
+        if not res.modified_count:
+            self.refund_budget(user_name, dataset_name, reservation_id)
+            raise InvalidQueryException(
+                f"The budget reservation {reservation_id} of user "
+                + f"{user_name} expired and there is not enough budget "
+                + "left for the query."
+            )
+
+    def renew_budget_reservation(
+        self,
+        user_name: str,
+        dataset_name: str,
+        reservation_id: str,
+        lease_duration: float = BUDGET_RESERVATION_LEASE,
+    ) -> bool:
+        """Extend the lease of a reservation which has not expired.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            reservation_id (str): id returned by :py:meth:`reserve_budget`
+            lease_duration (float, optional): Number of seconds from now
+                after which the reservation expires.
+                Defaults to BUDGET_RESERVATION_LEASE.
+
+        Raises:
+            WriteConcernError: If the result is not acknowledged.
 
         Returns:
-            List[dict]: List of previous queries.
+            bool: True if the lease was extended, False if the reservation
+                does not exist anymore or has expired.
         """
-        queries = self.db.queries_archives.find(
+        now = time.time()
+        res = self.db.users.update_one(
+            {"user_name": user_name},
             {
-                "user_name": f"{user_name}",
-                "dataset_name": f"{dataset_name}",
+                "$set": {
+                    "datasets_list.$[dataset].budget_reservations"
+                    + ".$[reservation].expires_at": now
+                    + lease_duration
+                }
             },
-            {"_id": 0},
+            array_filters=[
+                {"dataset.dataset_name": dataset_name},
+                {
+                    "reservation.reservation_id": reservation_id,
+                    "reservation.expires_at": {"$gt": now},
+                },
+            ],
         )
-        return list(queries)
+        check_result_acknowledged(res)
+        return bool(res.modified_count)
+
+    def refund_budget(
+        self, user_name: str, dataset_name: str, reservation_id: str
+    ) -> None:
+        """Release the budget of a reservation if the query failed.
+
+        Expired reservations are removed at the same time.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            reservation_id (str): id returned by :py:meth:`reserve_budget`
+
+        Raises:
+            WriteConcernError: If the result is not acknowledged.
+        """
+        res = self.db.users.update_one(
+            {
+                "user_name": user_name,
+                "datasets_list.dataset_name": dataset_name,
+            },
+            {
+                "$pull": {
+                    "datasets_list.$.budget_reservations": (
+                        reservation_filter(reservation_id, time.time())
+                    )
+                },
+            },
+        )
+        check_result_acknowledged(res)
+
+    def find_previous_queries(  # pylint: disable=too-many-arguments
+        self,
+        user_name: str,
+        dataset_name: str,
+        query_filter: GetPreviousQueries,
+        after: Optional[Tuple[float, int]],
+        limit: Optional[int],
+    ) -> List[dict]:
+        """Find the archived queries of a user on a dataset, sorted by
+        timestamp then by insertion order.
+
+        Uses the (user_name, dataset_name, timestamp) index.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            query_filter (GetPreviousQueries): Filters and projection of
+                the queries, with metadata_only the query responses are
+                not returned.
+            after (Optional[Tuple[float, int]]): Only queries from this
+                timestamp, skipping this number of queries at this
+                timestamp. None for all the queries.
+            limit (Optional[int]): Maximum number of queries, None for all.
+
+        Returns:
+            List[dict]: List of previous queries.
+        """
+        timestamp: Dict[str, float] = {}
+        if query_filter.start_time is not None:
+            timestamp["$gte"] = query_filter.start_time
+        if after is not None and timestamp.get("$gte", after[0]) <= after[0]:
+            timestamp["$gte"] = after[0]
+        if query_filter.end_time is not None:
+            timestamp["$lt"] = query_filter.end_time
+
+        mongo_filter: Dict[str, Any] = {
+            "user_name": user_name,
+            "dataset_name": dataset_name,
+        }
+        if timestamp:
+            mongo_filter["timestamp"] = timestamp
+        if query_filter.dp_libraries is not None:
+            mongo_filter["dp_librairy"] = {"$in": query_filter.dp_libraries}
+
+        projection = {"_id": 0}
+        if query_filter.metadata_only:
+            projection.update(
+                {"response.query_response": 0, "response_blob": 0}
+            )
+
+        cursor = self.db.queries_archives.find(mongo_filter, projection).sort(
+            [("timestamp", ASCENDING), ("_id", ASCENDING)]
+        )
+        # Skipped queries all have the timestamp of the cursor
+        if after is not None and timestamp["$gte"] == after[0]:
+            cursor = cursor.skip(after[1])
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        return list(cursor)
 
     def save_query(
         self, user_name: str, query_json: RequestModel, response: dict
@@ -270,6 +611,127 @@ class AdminMongoDatabase(AdminDatabase):
         check_result_acknowledged(res)
 
 
+def budget_available_expr(
+    dataset_name: str, epsilon: float, delta: float, now: float
+) -> dict:
+    """Aggregation expression checking that a user document has enough
+    budget on a dataset for a new reservation.
+
+    Args:
+        dataset_name (str): name of the dataset
+        epsilon (float): epsilon to reserve
+        delta (float): delta to reserve
+        now (float): current timestamp, reservations expired
+            before are not counted.
+
+    Returns:
+        dict: The expression, to use in a $expr filter.
+    """
+    dataset = {
+        "$arrayElemAt": [
+            {
+                "$filter": {
+                    "input": "$datasets_list",
+                    "cond": {"$eq": ["$$this.dataset_name", dataset_name]},
+                }
+            },
+            0,
+        ]
+    }
+    reservations = {
+        "$filter": {
+            "input": {"$ifNull": ["$$dataset.budget_reservations", []]},
+            "cond": {"$gt": ["$$this.expires_at", now]},
+        }
+    }
+
+    def budget_left(parameter: str, cost: float) -> dict:
+        return {
+            "$lte": [
+                {
+                    "$add": [
+                        f"$$dataset.total_spent_{parameter}",
+                        {"$sum": f"$$reservations.{parameter}"},
+                        cost,
+                    ]
+                },
+                f"$$dataset.initial_{parameter}",
+            ]
+        }
+
+    return {
+        "$let": {
+            "vars": {"dataset": dataset},
+            "in": {
+                "$let": {
+                    "vars": {"reservations": reservations},
+                    "in": {
+                        "$and": [
+                            budget_left("epsilon", epsilon),
+                            budget_left("delta", delta),
+                        ]
+                    },
+                }
+            },
+        }
+    }
+
+
+def reservation_filter(reservation_id: str, now: float) -> dict:
+    """Filter of the reservations to pull from a dataset of a user.
+
+    Args:
+        reservation_id (str): id of the reservation to remove
+        now (float): current timestamp, reservations expired
+            before are removed too.
+
+    Returns:
+        dict: The $pull condition.
+    """
+    return {
+        "$or": [
+            {"reservation_id": reservation_id},
+            {"expires_at": {"$lte": now}},
+        ]
+    }
+
+
+def create_indexes(
+    db: Database, collections: Optional[List[str]] = None
+) -> None:
+    """Create the indexes of the lookups done on each request.
+
+    Dropping a collection drops its indexes, they must be created again
+    so that the lookups do not scan the whole collection. Creating an
+    index that already exists does nothing.
+
+    Args:
+        db (Database): mongo database object
+        collections (Optional[List[str]], optional): The collections to
+            index. Defaults to None, all the collections.
+    """
+    for collection, indexes in COLLECTION_INDEXES.items():
+        if collections is None or collection in collections:
+            for index in indexes:
+                getattr(db, collection).create_index(index)
+
+
+def increment_datasets_version(db: Database) -> None:
+    """Increment the datasets version after modifying the datasets or
+    metadata, so that the servers invalidate their cached values.
+
+    Args:
+        db (Database): mongo database object
+
+    Raises:
+        WriteConcernError: If the result is not acknowledged.
+    """
+    res = db.versions.update_one(
+        {"_id": DATASETS_VERSION_ID}, {"$inc": {"version": 1}}, upsert=True
+    )
+    check_result_acknowledged(res)
+
+
 def check_result_acknowledged(res: _WriteResult) -> None:
     """Raises an exception if the result is not acknowledged.
 
@@ -1,36 +1,236 @@
+import os
+import threading
+import time
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 import yaml
 
 from lomas_server.admin_database.admin_database import (
     AdminDatabase,
-    dataset_must_exist,
+    check_budget_available,
+    check_budget_for_reservation,
+    new_budget_reservation,
     user_must_exist,
     user_must_have_access_to_dataset,
 )
-from lomas_server.utils.collection_models import Metadata
+from lomas_server.admin_database.dataset_cache import DatasetCache
+from lomas_server.admin_database.yaml_journal import YamlJournal, read_journal
+from lomas_server.constants import (
+    BUDGET_RESERVATION_LEASE,
+    YAML_JOURNAL_COMPACTION_RECORDS,
+)
 from lomas_server.utils.error_handler import (
     InternalServerException,
     InvalidQueryException,
 )
-from lomas_server.utils.query_models import RequestModel
+from lomas_server.utils.logger import LOG
+from lomas_server.utils.query_models import GetPreviousQueries, RequestModel
 
 
-class AdminYamlDatabase(AdminDatabase):
+class AdminYamlDatabase(AdminDatabase):  # pylint: disable=R0902, R0904
     """
     Overall Yaml database management for server state
     """
 
-    def __init__(self, yaml_db_path: str) -> None:
+    def __init__(
+        self,
+        yaml_db_path: str,
+        journal_path: Optional[str] = None,
+        fsync: bool = True,
+        compaction_records: int = YAML_JOURNAL_COMPACTION_RECORDS,
+    ) -> None:
         """Load DB from disk.
 
         Args:
             yaml_db_path (str): path to yaml db file.
+            journal_path (Optional[str], optional): path to the journal of
+                the spent budgets and archived queries. The journal is
+                replayed and compacted in the yaml db file at startup.
+                Changes are only kept in memory if None. Defaults to None.
+            fsync (bool, optional): Whether the journal records are synced
+                to disk before returning. Defaults to True.
+            compaction_records (int, optional): Number of journal records
+                after which the journal is compacted in the yaml db file.
+                Defaults to YAML_JOURNAL_COMPACTION_RECORDS.
         """
         self.path: str = yaml_db_path
         with open(yaml_db_path, mode="r", encoding="utf-8") as f:
             self.database = yaml.safe_load(f)
+        # Sequence number of the last journal record in the yaml db file
+        self.journal_seq: int = self.database.pop("journal_seq", 0)
+        self.build_indexes()
+        # Makes the budget reservations atomic between request threads,
+        # also orders the journal records with the changes in memory.
+        self.budget_lock = threading.Lock()
+        self.dataset_cache = DatasetCache(self.get_datasets_version)
+
+        self.journal: Optional[YamlJournal] = None
+        self.compaction_records = compaction_records
+        self.compaction_lock = threading.Lock()
+        self.compacting = False
+        if journal_path is not None:
+            self.open_journal(journal_path, fsync)
+
+    def build_indexes(self) -> None:
+        """Index the users, datasets, datasets of the users and queries
+        of the database by name.
+
+        The indexes reference the documents of the database, changes to
+        their fields are seen through both.
+        """
+        self.users: Dict[str, dict] = {}
+        self.user_datasets: Dict[Tuple[str, str], dict] = {}
+        for user in self.database["users"]:
+            user_name = user["user_name"]
+            self.users.setdefault(user_name, user)
+            for dataset in user["datasets_list"]:
+                self.user_datasets.setdefault(
+                    (user_name, dataset["dataset_name"]), dataset
+                )
+
+        self.datasets: Dict[str, dict] = {}
+        for dt in self.database["datasets"]:
+            self.datasets.setdefault(dt["dataset_name"], dt)
+
+        self.user_queries: Dict[Tuple[str, str], List[dict]] = {}
+        for q in self.database["queries"]:
+            self.user_queries.setdefault(
+                (q["user_name"], q["dataset_name"]), []
+            ).append(q)
+
+    def open_journal(self, journal_path: str, fsync: bool) -> None:
+        """Replay the journal records that are not in the yaml db file yet,
+        then compact them in the yaml db file.
+
+        Args:
+            journal_path (str): path to the journal file.
+            fsync (bool): Whether the journal records are synced to disk.
+        """
+        rotated_path = journal_path + ".compacting"
+        seq = self.journal_seq
+        # A compaction may have stopped before removing the rotated journal
+        for path in [rotated_path, journal_path]:
+            for record in read_journal(path):
+                if record["seq"] <= seq:
+                    continue
+                self.apply_record(record)
+                seq = record["seq"]
+
+        self.journal = YamlJournal(journal_path, seq, fsync)
+        if seq > self.journal_seq or os.path.exists(rotated_path):
+            LOG.info(f"Replayed journal {journal_path} up to record {seq}")
+            self.compact()
+
+    def apply_record(self, record: dict) -> None:
+        """Apply a journal record to the database in memory.
+
+        Args:
+            record (dict): record written by :py:meth:`write_journal`.
+        """
+        if record["type"] == "query":
+            self.add_query(record["query"])
+            return
+
+        key = (record["user_name"], record["dataset_name"])
+        dataset = self.user_datasets.get(key)
+        if dataset is None:
+            LOG.warning(f"Skipping budget of journal record {record['seq']}")
+            return
+        for parameter in ["total_spent_epsilon", "total_spent_delta"]:
+            if parameter in record:
+                dataset[parameter] += record[parameter]
+
+    def write_journal(self, record: dict) -> int:
+        """Append a record to the journal, must be called with the budget
+        lock before the change is applied in memory.
+
+        Args:
+            record (dict): The "budget" or "query" record.
+
+        Returns:
+            int: The sequence number of the record, 0 without journal.
+        """
+        if self.journal is None:
+            return 0
+        return self.journal.write(record)
+
+    def sync_journal(self, seq: int) -> None:
+        """Wait until a journal record is on disk and start a compaction
+        in the background if the journal is large enough.
+
+        Args:
+            seq (int): The sequence number of the record.
+        """
+        if self.journal is None:
+            return
+        self.journal.sync(seq)
+        with self.budget_lock:
+            if (
+                self.compacting
+                or self.journal.nb_records < self.compaction_records
+            ):
+                return
+            self.compacting = True
+        threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self) -> None:
+        """Write the database to the yaml db file and remove the journal
+        records it contains.
+
+        The database is copied with the budget lock held, the yaml file
+        is written without blocking the queries.
+        """
+        if self.journal is None:
+            return
+        try:
+            with self.compaction_lock:
+                rotated_path = self.journal.path + ".compacting"
+                with self.budget_lock:
+                    snapshot = self.snapshot()
+                    seq = self.journal.rotate(rotated_path)
+                snapshot["journal_seq"] = seq
+
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, mode="w", encoding="utf-8") as f:
+                    yaml.dump(snapshot, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                os.remove(rotated_path)
+                self.journal_seq = seq
+        finally:
+            self.compacting = False
+
+    def snapshot(self) -> dict:
+        """Copy the database without the budget reservations, must be
+        called with the budget lock.
+
+        Only the budgets and the list of queries change, the other
+        documents are not copied.
+
+        Returns:
+            dict: The copy of the database.
+        """
+        users = [
+            {
+                **user,
+                "datasets_list": [
+                    {
+                        k: v
+                        for k, v in dataset.items()
+                        if k != "budget_reservations"
+                    }
+                    for dataset in user["datasets_list"]
+                ],
+            }
+            for user in self.database["users"]
+        ]
+        return {
+            **self.database,
+            "users": users,
+            "queries": list(self.database["queries"]),
+        }
 
     def does_user_exist(self, user_name: str) -> bool:
         """Checks if user exist in the database
@@ -41,11 +241,7 @@ class AdminYamlDatabase(AdminDatabase):
         Returns:
             bool: True if the user exists, False otherwise.
         """
-        for user in self.database["users"]:
-            if user["user_name"] == user_name:
-                return True
-
-        return False
+        return user_name in self.users
 
     def does_dataset_exist(self, dataset_name: str) -> bool:
         """Checks if dataset exist in the database
@@ -56,81 +252,45 @@ class AdminYamlDatabase(AdminDatabase):
         Returns:
             bool: True if the dataset exists, False otherwise.
         """
-        for dt in self.database["datasets"]:
-            if dt["dataset_name"] == dataset_name:
-                return True
-
-        return False
+        return dataset_name in self.datasets
 
-    @dataset_must_exist
-    def get_dataset_metadata(self, dataset_name: str) -> Metadata:
-        """Returns the metadata dictionnary of the dataset.
+    def get_datasets_version(self) -> int:
+        """Get the version of the datasets and metadata.
 
-        Wrapped by :py:func:`dataset_must_exist`.
-
-        Args:
-            dataset_name (str): name of the dataset to get the metadata
+        The datasets are loaded once from the yaml file, the metadata
+        files are reloaded once cached values expire.
 
         Returns:
-            Metadata: The metadata model.
+            int: Always 0.
         """
-        for dt in self.database["datasets"]:
-            if dt["dataset_name"] == dataset_name:
-                metadata_path = dt["metadata"]["metadata_path"]
-
-                with open(metadata_path, mode="r", encoding="utf-8") as f:
-                    metadata = yaml.safe_load(f)
-
-        return Metadata.model_validate(metadata)
+        return 0
 
-    @user_must_exist
-    def set_may_user_query(self, user_name: str, may_query: bool) -> None:
-        """Sets if a user may query the server.
-
-        (Set False before querying and True after updating budget)
-
-        Wrapped by :py:func:`user_must_exist`.
+    def load_dataset(self, dataset_name: str) -> Optional[dict]:
+        """Load the dataset document, without cache.
 
         Args:
-            user_name (str): name of the user
-            may_query (bool): flag give or remove access to user
-        """
-        users = self.database["users"]
-        for user in users:
-            if user["user_name"] == user_name:
-                user["may_query"] = may_query
-        self.database["users"] = users
+            dataset_name (str): name of the dataset
 
-    @user_must_exist
-    def get_and_set_may_user_query(
-        self, user_name: str, may_query: bool
-    ) -> bool:
+        Returns:
+            Optional[dict]: The dataset document, None if it does not exist.
         """
-        Atomic operation to check and set if the user may query the server.
-
-        (Set False before querying and True after updating budget)
+        return self.datasets.get(dataset_name)
 
-        Wrapped by :py:func:`user_must_exist`.
+    def load_dataset_metadata(self, dataset_name: str) -> dict:
+        """Load the metadata of an existing dataset from its yaml file,
+        without cache.
 
         Args:
-            user_name (str): name of the user
-            may_query (bool): flag give or remove access to user
+            dataset_name (str): name of the dataset
 
         Returns:
-            bool: The may_query status of the user before the update.
+            dict: The metadata dictionnary.
         """
-        previous_may_query = False
-
-        users = self.database["users"]
-        new_users = []
-        for user in users:
-            if user["user_name"] == user_name:
-                previous_may_query = user["may_query"]
-                user["may_query"] = may_query
-                new_users.append(user)
-        self.database["users"] = new_users
-
-        return previous_may_query
+        metadata_path = self.get_dataset(dataset_name)["metadata"][
+            "metadata_path"
+        ]
+        with open(metadata_path, mode="r", encoding="utf-8") as f:
+            return yaml.safe_load(f)
 
     @user_must_exist
     def has_user_access_to_dataset(
@@ -152,12 +312,7 @@ class AdminYamlDatabase(AdminDatabase):
                 f"Dataset {dataset_name} does not exist. "
                 + "Please, verify the client object initialisation.",
             )
-        for user in self.database["users"]:
-            if user["user_name"] == user_name:
-                for dataset in user["datasets_list"]:
-                    if dataset["dataset_name"] == dataset_name:
-                        return True
-        return False
+        return (user_name, dataset_name) in self.user_datasets
 
     def get_epsilon_or_delta(
         self, user_name: str, dataset_name: str, parameter: str
@@ -173,12 +328,10 @@ class AdminYamlDatabase(AdminDatabase):
         Returns:
             float: The requested budget value.
         """
-        for user in self.database["users"]:
-            if user["user_name"] == user_name:
-                for dataset in user["datasets_list"]:
-                    if dataset["dataset_name"] == dataset_name:
-                        return dataset[parameter]
-        return False
+        dataset = self.user_datasets.get((user_name, dataset_name))
+        if dataset is None:
+            return False
+        return dataset[parameter]
 
     def update_epsilon_or_delta(
         self,
@@ -196,61 +349,298 @@ class AdminYamlDatabase(AdminDatabase):
             parameter (str): "current_epsilon" or "current_delta"
             spent_value (float): spending of epsilon or delta on last query
         """
-        users = self.database["users"]
-        for user in users:
-            if user["user_name"] == user_name:
-                for dataset in user["datasets_list"]:
-                    if dataset["dataset_name"] == dataset_name:
-                        dataset[parameter] += spent_value
-        self.database["users"] = users
-
-    @dataset_must_exist
-    def get_dataset_field(
-        self, dataset_name: str, key: str
-    ) -> str:  # type: ignore
-        """Get dataset field type based on dataset name and key
-
-        Wrapped by :py:func:`dataset_must_exist`.
+        with self.budget_lock:
+            dataset = self.user_datasets.get((user_name, dataset_name))
+            if dataset is None:
+                return
+            seq = self.write_journal(
+                {
+                    "type": "budget",
+                    "user_name": user_name,
+                    "dataset_name": dataset_name,
+                    parameter: spent_value,
+                }
+            )
+            dataset[parameter] += spent_value
+        self.sync_journal(seq)
+
+    def get_user_and_dataset(
+        self, user_name: str, dataset_name: str
+    ) -> Tuple[dict, dict]:
+        """Get the user and its dataset from the datasets_list
 
         Args:
-            dataset_name (str): Name of the dataset.
-            key (str): Key for the value to get in the dataset dict.
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+
+        Raises:
+            InternalServerException: If the user does not have the dataset.
 
         Returns:
-            str: The requested value.
+            Tuple[dict, dict]: The user and the dataset of the user.
         """
-        for dt in self.database["datasets"]:
-            if dt["dataset_name"] == dataset_name:
-                return dt[key]
+        dataset = self.user_datasets.get((user_name, dataset_name))
+        if dataset is not None:
+            return self.users[user_name], dataset
         raise InternalServerException(
-            f"Field {key} does not exist for dataset {dataset_name}."
+            f"User {user_name} does not have dataset {dataset_name}."
         )
 
     @user_must_have_access_to_dataset
-    def get_user_previous_queries(
+    def reserve_budget(  # pylint: disable=too-many-arguments
         self,
         user_name: str,
         dataset_name: str,
-    ) -> List[dict]:
-        """Retrieves and return the queries already done by a user
+        epsilon: float,
+        delta: float,
+        lease_duration: float = BUDGET_RESERVATION_LEASE,
+    ) -> str:
+        """Atomic operation to check and reserve the budget of a query.
+
+        Expired reservations are removed at the same time.
 
         Wrapped by :py:func:`user_must_have_access_to_dataset`.
 
         Args:
             user_name (str): name of the user
             dataset_name (str): name of the dataset
+            epsilon (float): epsilon cost of the query
+            delta (float): delta cost of the query
+            lease_duration (float, optional): Number of seconds after which
+                the reservation expires, in case the server stops before
+                the end of the query. Defaults to BUDGET_RESERVATION_LEASE.
+
+        Raises:
+            UnauthorizedAccessException: If the user may not query.
+            InvalidQueryException: If there is not enough budget.
 
         Returns:
-            List[dict]: List of previous queries.
+            str: The reservation id.
         """
-        previous_queries = []
-        for q in self.database["queries"]:
+        reservation = new_budget_reservation(epsilon, delta, lease_duration)
+        with self.budget_lock:
+            user, dataset = self.get_user_and_dataset(user_name, dataset_name)
+            now = time.time()
+            dataset["budget_reservations"] = [
+                r
+                for r in dataset.get("budget_reservations", [])
+                if r["expires_at"] > now
+            ]
+            check_budget_for_reservation(user, dataset, epsilon, delta)
+            dataset["budget_reservations"].append(reservation)
+        return reservation["reservation_id"]
+
+    def commit_budget(  # pylint: disable=too-many-arguments
+        self,
+        user_name: str,
+        dataset_name: str,
+        reservation_id: str,
+        spent_epsilon: float,
+        spent_delta: float,
+    ) -> None:
+        """Spend the budget of a reservation once the query is done.
+
+        If the reservation has expired, its budget may have been reserved
+        by another query: the budget is then only spent if it is still
+        available, the query fails otherwise.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            reservation_id (str): id returned by :py:meth:`reserve_budget`
+            spent_epsilon (float): value of epsilon spent on the query
+            spent_delta (float): value of delta spent on the query
+
+        Raises:
+            InvalidQueryException: If the reservation has expired and
+                there is not enough budget left for the query.
+        """
+        with self.budget_lock:
+            if (
+                self.find_reservation(user_name, dataset_name, reservation_id)
+                is None
+            ):
+                dataset = self.remove_reservation(
+                    user_name, dataset_name, reservation_id
+                )
+                try:
+                    check_budget_available(dataset, spent_epsilon, spent_delta)
+                except InvalidQueryException as e:
+                    raise InvalidQueryException(
+                        f"The budget reservation {reservation_id} of user "
+                        + f"{user_name} expired and there is not enough "
+                        + "budget left for the query."
+                    ) from e
+            seq = self.write_journal(
+                {
+                    "type": "budget",
+                    "user_name": user_name,
+                    "dataset_name": dataset_name,
+                    "total_spent_epsilon": spent_epsilon,
+                    "total_spent_delta": spent_delta,
+                }
+            )
+            dataset = self.remove_reservation(
+                user_name, dataset_name, reservation_id
+            )
+            dataset["total_spent_epsilon"] += spent_epsilon
+            dataset["total_spent_delta"] += spent_delta
+        self.sync_journal(seq)
+
+    def renew_budget_reservation(
+        self,
+        user_name: str,
+        dataset_name: str,
+        reservation_id: str,
+        lease_duration: float = BUDGET_RESERVATION_LEASE,
+    ) -> bool:
+        """Extend the lease of a reservation which has not expired.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            reservation_id (str): id returned by :py:meth:`reserve_budget`
+            lease_duration (float, optional): Number of seconds from now
+                after which the reservation expires.
+                Defaults to BUDGET_RESERVATION_LEASE.
+
+        Returns:
+            bool: True if the lease was extended, False if the reservation
+                does not exist anymore or has expired.
+        """
+        with self.budget_lock:
+            reservation = self.find_reservation(
+                user_name, dataset_name, reservation_id
+            )
+            if reservation is None:
+                return False
+            reservation["expires_at"] = time.time() + lease_duration
+            return True
+
+    def find_reservation(
+        self, user_name: str, dataset_name: str, reservation_id: str
+    ) -> Optional[dict]:
+        """Find a reservation which has not expired, must be called with
+        the budget lock.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            reservation_id (str): id returned by :py:meth:`reserve_budget`
+
+        Returns:
+            Optional[dict]: The reservation, None if it does not exist
+                anymore or has expired.
+        """
+        _, dataset = self.get_user_and_dataset(user_name, dataset_name)
+        now = time.time()
+        for reservation in dataset.get("budget_reservations", []):
             if (
-                q["user_name"] == user_name
-                and q["dataset_name"] == dataset_name
+                reservation["reservation_id"] == reservation_id
+                and reservation["expires_at"] > now
             ):
-                previous_queries.append(q)
-        return previous_queries
+                return reservation
+        return None
+
+    def refund_budget(
+        self, user_name: str, dataset_name: str, reservation_id: str
+    ) -> None:
+        """Release the budget of a reservation if the query failed.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            reservation_id (str): id returned by :py:meth:`reserve_budget`
+        """
+        with self.budget_lock:
+            self.remove_reservation(user_name, dataset_name, reservation_id)
+
+    def remove_reservation(
+        self, user_name: str, dataset_name: str, reservation_id: str
+    ) -> dict:
+        """Remove a reservation, must be called with the budget lock.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            reservation_id (str): id returned by :py:meth:`reserve_budget`
+
+        Returns:
+            dict: The dataset of the user.
+        """
+        _, dataset = self.get_user_and_dataset(user_name, dataset_name)
+        dataset["budget_reservations"] = [
+            r
+            for r in dataset.get("budget_reservations", [])
+            if r["reservation_id"] != reservation_id
+        ]
+        return dataset
+
+    def find_previous_queries(  # pylint: disable=too-many-arguments
+        self,
+        user_name: str,
+        dataset_name: str,
+        query_filter: GetPreviousQueries,
+        after: Optional[Tuple[float, int]],
+        limit: Optional[int],
+    ) -> List[dict]:
+        """Find the archived queries of a user on a dataset, sorted by
+        timestamp then by insertion order.
+
+        Args:
+            user_name (str): name of the user
+            dataset_name (str): name of the dataset
+            query_filter (GetPreviousQueries): Filters and projection of
+                the queries, with metadata_only the query responses are
+                not returned.
+            after (Optional[Tuple[float, int]]): Only queries from this
+                timestamp, skipping this number of queries at this
+                timestamp. None for all the queries.
+            limit (Optional[int]): Maximum number of queries, None for all.
+
+        Returns:
+            List[dict]: List of previous queries.
+        """
+        # Stable sort, in case the clock went backwards between queries
+        queries = sorted(
+            self.user_queries.get((user_name, dataset_name), []),
+            key=lambda q: q["timestamp"],
+        )
+        start_time = query_filter.start_time
+        end_time = query_filter.end_time
+        dp_libraries = query_filter.dp_libraries
+        skip = 0
+        if after is not None:
+            skip = after[1]
+            if start_time is None or start_time < after[0]:
+                start_time = after[0]
+
+        found: List[dict] = []
+        for q in queries:
+            if limit is not None and len(found) == limit:
+                break
+            if start_time is not None and q["timestamp"] < start_time:
+                continue
+            if end_time is not None and q["timestamp"] >= end_time:
+                break
+            if dp_libraries is not None and q["dp_librairy"] not in (
+                dp_libraries
+            ):
+                continue
+            if skip > 0 and after is not None and q["timestamp"] == after[0]:
+                skip -= 1
+                continue
+            if query_filter.metadata_only:
+                q = {
+                    **{k: v for k, v in q.items() if k != "response_blob"},
+                    "response": {
+                        k: v
+                        for k, v in q["response"].items()
+                        if k != "query_response"
+                    },
+                }
+            found.append(q)
+        return found
 
     def save_query(
         self, user_name: str, query_json: RequestModel, response: dict
@@ -266,13 +656,33 @@ class AdminYamlDatabase(AdminDatabase):
         to_archive = super().prepare_save_query(
             user_name, query_json, response
         )
+        with self.budget_lock:
+            seq = self.write_journal({"type": "query", "query": to_archive})
+            self.add_query(to_archive)
+        self.sync_journal(seq)
+
+    def add_query(self, to_archive: dict) -> None:
+        """Add an archived query to the queries and their index.
+
+        Args:
+            to_archive (dict): The query archive dictionary.
+        """
         self.database["queries"].append(to_archive)
+        self.user_queries.setdefault(
+            (to_archive["user_name"], to_archive["dataset_name"]), []
+        ).append(to_archive)
 
     def save_current_database(self) -> None:
         """Saves the current database with updated parameters in new yaml
         with the date and hour in the path
         Might be useful to verify state of DB during development
+
+        With a journal, the journal is compacted in the yaml db file
+        instead.
         """
+        if self.journal is not None:
+            self.compact()
+            return
         new_path = self.path.replace(
             ".yaml", f'_{datetime.now().strftime("%m_%d_%Y__%H_%M")}.yaml'
         )
@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+from typing import Iterator
+
+from lomas_server.utils.logger import LOG
+
+
+def read_journal(path: str) -> Iterator[dict]:
+    """Read the records of a journal file.
+
+    A record partially written when the server stopped is skipped.
+
+    Args:
+        path (str): path to the journal file.
+
+    Yields:
+        Iterator[dict]: The records, in the order they were written.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, mode="r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                LOG.warning(f"Skipping incomplete record of journal {path}.")
+                return
+
+
+class YamlJournal:  # pylint: disable=too-many-instance-attributes
+    """
+    Append-only journal of the changes of a yaml database, one JSON
+    record per line.
+
+    Records are numbered with an increasing sequence number. Writes are
+    flushed to the operating system immediately and made durable with
+    fsync by :py:meth:`sync`: concurrent writers share a single fsync.
+    """
+
+    def __init__(self, path: str, seq: int = 0, fsync: bool = True) -> None:
+        """Initializer.
+
+        Args:
+            path (str): path to the journal file, opened in append mode.
+            seq (int, optional): Sequence number of the last record.
+                Defaults to 0.
+            fsync (bool, optional): Whether :py:meth:`sync` calls fsync.
+                Defaults to True.
+        """
+        self.path = path
+        self.fsync = fsync
+        self.nb_records = 0
+        self._file = open(  # pylint: disable=consider-using-with
+            path, mode="a", encoding="utf-8"
+        )
+        self._written = seq
+        self._synced = seq
+        self._syncing = False
+        self._cond = threading.Condition()
+
+    def write(self, record: dict) -> int:
+        """Append a record to the journal, without waiting for fsync.
+
+        Args:
+            record (dict): JSON serializable record, its "seq" key is set.
+
+        Returns:
+            int: The sequence number of the record.
+        """
+        with self._cond:
+            record["seq"] = self._written + 1
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            self._written += 1
+            self.nb_records += 1
+            return self._written
+
+    def sync(self, seq: int) -> None:
+        """Wait until the record with sequence number seq is on disk.
+
+        The first waiting thread calls fsync for all the records written
+        so far, the others wait for it and call fsync again if needed.
+
+        Args:
+            seq (int): sequence number returned by :py:meth:`write`.
+        """
+        if not self.fsync:
+            return
+        with self._cond:
+            while self._synced < seq:
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                self._syncing = True
+                target = self._written
+                fd = self._file.fileno()
+                self._cond.release()
+                try:
+                    os.fsync(fd)
+                finally:
+                    self._cond.acquire()
+                    self._syncing = False
+                    self._cond.notify_all()
+                self._synced = max(self._synced, target)
+
+    def rotate(self, rotated_path: str) -> int:
+        """Move the records to rotated_path and start an empty journal.
+
+        Args:
+            rotated_path (str): path of the rotated journal file.
+
+        Returns:
+            int: The sequence number of the last rotated record.
+        """
+        with self._cond:
+            while self._syncing:
+                self._cond.wait()
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._synced = self._written
+            self._cond.notify_all()
+            os.replace(self.path, rotated_path)
+            self._file = open(  # pylint: disable=consider-using-with
+                self.path, mode="a", encoding="utf-8"
+            )
+            self.nb_records = 0
+            return self._written
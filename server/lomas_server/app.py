@@ -2,21 +2,32 @@ from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 from typing import Callable
 
+import pandas as pd
 from fastapi import FastAPI, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
 
-from lomas_server.admin_database.factory import admin_database_factory
+from lomas_server.admin_database.factory import (
+    admin_database_factory,
+    blob_store_factory,
+)
 from lomas_server.admin_database.utils import add_demo_data_to_mongodb_admin
 from lomas_server.constants import (
     CONFIG_NOT_LOADED,
     DB_NOT_LOADED,
+    GZIP_MIN_RESPONSE_SIZE,
     SERVER_LIVE,
     AdminDBType,
 )
+from lomas_server.data_connector.data_cache import DataFrameCache
+from lomas_server.data_connector.mmap_store import MmapDatasetStore
 from lomas_server.dp_queries.dp_libraries.opendp import (
     set_opendp_features_config,
 )
+from lomas_server.dp_queries.jobs import JobManager
+from lomas_server.dp_queries.process_pool import QueryProcessPool
 from lomas_server.routes import routes_admin, routes_dp
 from lomas_server.utils.anti_timing_att import anti_timing_att
+from lomas_server.utils.compression import GZipRequestMiddleware
 from lomas_server.utils.config import get_config
 from lomas_server.utils.error_handler import (
     InternalServerException,
@@ -24,6 +35,10 @@ from lomas_server.utils.error_handler import (
 )
 from lomas_server.utils.logger import LOG
 
+# Datasets are shared between queries (data cache, dummy datasets), with
+# copy-on-write they are only copied when a query modifies them.
+pd.set_option("mode.copy_on_write", True)
+
 
 @asynccontextmanager
 async def lifespan(
@@ -47,6 +62,10 @@ async def lifespan(
 
     # Set some app state
     app.state.admin_database = None
+    app.state.data_cache = None
+    app.state.job_manager = None
+    app.state.process_pool = None
+    app.state.time_attack = None
 
     # General server state, can add fields if need be.
     app.state.server_state = {
@@ -63,6 +82,8 @@ async def lifespan(
         app.state.server_state["message"].append("Loading config")
         config = get_config()
         app.state.private_credentials = config.private_db_credentials
+        # Read once here rather than by the middleware on every request
+        app.state.time_attack = config.server.time_attack
     except InternalServerException:
         LOG.info("Config could not loaded")
         app.state.server_state["state"].append(CONFIG_NOT_LOADED)
@@ -91,6 +112,9 @@ async def lifespan(
             app.state.admin_database = admin_database_factory(
                 config.admin_database
             )
+            app.state.admin_database.blob_store = blob_store_factory(
+                config.archive, app.state.private_credentials
+            )
         except InternalServerException as e:
             LOG.exception(f"Failed at startup: {str(e)}")
             app.state.server_state["state"].append(DB_NOT_LOADED)
@@ -100,6 +124,34 @@ async def lifespan(
             app.state.server_state["LIVE"] = False
             status_ok = False
 
+        # Shared cache of the loaded private datasets
+        if config.data_cache.enabled:
+            mmap_store = None
+            if config.data_cache.mmap_dir:
+                LOG.info("Memory-mapping private datasets")
+                mmap_store = MmapDatasetStore(config.data_cache.mmap_dir)
+            app.state.data_cache = DataFrameCache(
+                int(config.data_cache.max_size_mb * 1024 * 1024), mmap_store
+            )
+
+        # Worker processes of the DP computations
+        if config.process_pool.enabled:
+            LOG.info("Starting DP computation worker processes")
+            app.state.process_pool = QueryProcessPool(
+                config.process_pool.max_workers,
+                config.dp_libraries.opendp,
+                config.data_cache,
+            )
+
+        # Background runner of the submitted query jobs
+        app.state.job_manager = JobManager(
+            config.jobs.max_workers,
+            config.jobs.max_jobs_per_user,
+            config.jobs.max_finished_jobs,
+            int(config.jobs.results_max_size_mb * 1024 * 1024),
+            config.jobs.result_ttl,
+        )
+
         app.state.server_state["state"].append("Startup completed")
         app.state.server_state["message"].append("Startup completed")
 
@@ -115,6 +167,12 @@ async def lifespan(
     yield  # app is handling requests
 
     # Shutdown event
+    if app.state.job_manager is not None:
+        app.state.job_manager.shutdown()
+
+    if app.state.process_pool is not None:
+        app.state.process_pool.shutdown()
+
     if (
         config is not None
         and app.state.admin_database is not None
@@ -126,6 +184,10 @@ async def lifespan(
 # This object holds the server object
 app = FastAPI(lifespan=lifespan)
 
+# Compress large responses and decompress gzip request bodies
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_RESPONSE_SIZE)
+app.add_middleware(GZipRequestMiddleware)
+
 
 # A simple hack to hinder the timing attackers
 @app.middleware("http")
@@ -133,7 +195,9 @@ async def middleware(
     request: Request, call_next: Callable[[Request], Response]
 ) -> Response:
     """Adds delays to requests response to protect against timing attack"""
-    return await anti_timing_att(request, call_next, get_config())
+    return await anti_timing_att(
+        request, call_next, request.app.state.time_attack
+    )
 
 
 # Add custom exception handlers
@@ -84,9 +84,96 @@ class PrivateDatabaseType(StrEnum):
     S3 = "S3_DB"
 
 
+class DatasetFileFormat(StrEnum):
+    """File formats of private datasets"""
+
+    CSV = "csv"
+    PARQUET = "parquet"
+    FEATHER = "feather"
+
+
+DATASET_FILE_EXTENSIONS = {
+    ".csv": DatasetFileFormat.CSV,
+    ".parquet": DatasetFileFormat.PARQUET,
+    ".pq": DatasetFileFormat.PARQUET,
+    ".feather": DatasetFileFormat.FEATHER,
+    ".arrow": DatasetFileFormat.FEATHER,
+    ".ipc": DatasetFileFormat.FEATHER,
+}
+DATASET_COMPRESSION_EXTENSIONS = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".zip": "zip",
+    ".xz": "xz",
+    ".zst": "zstd",
+}
+
+# Private datasets cache
+DATA_CACHE_MAX_SIZE_MB = 1024
+
+
+# Asynchronous query jobs
+class JobStatus(StrEnum):
+    """Status of a query job"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+JOBS_MAX_WORKERS = 4  # jobs running at the same time
+JOBS_MAX_PER_USER = 8  # pending and running jobs of a user
+JOBS_MAX_FINISHED = 64  # finished jobs kept for their result
+JOBS_RESULTS_MAX_SIZE_MB = 128  # total size of the kept results
+JOBS_RESULT_TTL = 10 * 60  # seconds a finished job is kept
+
+# Cache of the dataset documents and metadata of the admin database
+ADMIN_DB_CACHE_SIZE = 1024
+ADMIN_DB_CACHE_TTL = 10 * 60  # seconds before reloading a cached value
+ADMIN_DB_VERSION_CHECK_INTERVAL = 5  # seconds between datasets version reads
+
+# Budget reserved for a query expires after (in seconds)
+BUDGET_RESERVATION_LEASE = 60 * 60
+# The lease of a running query is renewed every (in seconds)
+BUDGET_RESERVATION_RENEWAL_INTERVAL = 5 * 60
+BUDGET_RESERVATION_MAX_ATTEMPTS = 3
+
+# Journal of the yaml admin database, compacted in the yaml file after
+YAML_JOURNAL_COMPACTION_RECORDS = 10_000
+
+
+class BlobStoreType(StrEnum):
+    """Types of stores of the archived query responses"""
+
+    LOCAL: str = "local"
+    S3: str = "s3"
+
+
+# Query responses archived in the blob store from (in bytes)
+ARCHIVE_MIN_BLOB_SIZE = 64 * 1024
+
+# Maximum number of previous queries per page
+PREVIOUS_QUERIES_MAX_LIMIT = 1000
+
+# Responses compressed with gzip from (in bytes)
+GZIP_MIN_RESPONSE_SIZE = 1000
+# Maximum size of the gzip request bodies once decompressed (in bytes)
+GZIP_MAX_REQUEST_SIZE = 100 * 1024 * 1024
+
+# Media type of the query responses encoded as an Arrow IPC stream
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Worker processes of the DP computations
+PROCESS_POOL_MAX_WORKERS = 2
+
 # Smartnoise sql
 SSQL_STATS = ["count", "sum_int", "sum_large_int", "sum_float", "threshold"]
 SSQL_MAX_ITERATION = 5
+SSQL_READER_CACHE_SIZE = 16  # datasets loaded in smartnoise-sql readers
+SSQL_READER_CACHE_MAX_SIZE_MB = 512  # larger readers are not cached
+SSQL_QUERY_CACHE_SIZE = 1024  # parsed smartnoise-sql queries
 
 
 # Smartnoise synth
@@ -127,6 +214,11 @@ class SSynthColumnType(StrEnum):
 SSYNTH_PRIVATE_COLUMN = "uuid4"
 SSYNTH_DEFAULT_BINS = 10
 SSYNTH_MIN_ROWS_PATE_GAN = 1000
+SSYNTH_DEFAULT_BATCH_SIZE = 500  # of DP-CTGAN
+# RDP orders of the opacus privacy engine of DP-CTGAN
+SSYNTH_DPCTGAN_ALPHAS = [1 + x / 10.0 for x in range(1, 100)] + list(
+    range(12, 64)
+)
 
 
 # OpenDP
@@ -155,6 +247,12 @@ class OpenDPDatasetInputMetric(StrEnum):
     INT_DISTANCE = "u32"  # opendp type for distance between datasets
 
 
+OPENDP_INPUT_DOMAIN = "AtomDomain<String>"  # the dataset as a csv string
+OPENDP_CSV_CACHE_SIZE = 4  # datasets kept encoded as csv strings
+OPENDP_CSV_CACHE_MAX_SIZE_MB = 256  # larger csv strings are not cached
+OPENDP_PIPELINE_CACHE_SIZE = 256  # reconstructed pipelines and privacy maps
+
+
 # Dummy dataset generation
 DUMMY_NB_ROWS = 100
 DUMMY_SEED = 42
@@ -162,6 +260,10 @@ RANDOM_STRINGS = list(
     string.ascii_lowercase + string.ascii_uppercase + string.digits
 )
 NB_RANDOM_NONE = 5  # if nullable, how many random none to add
+DUMMY_CACHE_SIZE = 32  # number of generated dummy datasets kept in memory
+DUMMY_CACHE_MAX_ROWS = 100_000  # larger dummy datasets are not cached
+DUMMY_CACHE_MAX_SIZE_MB = 256  # total size of the cached dummy datasets
+DUMMY_STREAM_CHUNK_SIZE = 10_000  # rows per chunk of streamed dummy datasets
 
 
 # Data preprocessing
@@ -0,0 +1,349 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from lomas_server.data_connector.mmap_store import MmapDatasetStore
+from lomas_server.utils.logger import LOG
+
+# Dataset name, source fingerprint and projected columns (None for all)
+CacheKey = Tuple[str, str, Optional[Tuple[str, ...]]]
+
+
+class DataFrameCache:
+    """
+    Process-wide LRU cache of private datasets loaded as pandas DataFrames.
+
+    Entries are keyed by dataset name and a fingerprint of the data source
+    (e.g. file modification time and size, S3 ETag) so that a modified
+    source is reloaded on the next query. Column projections of a dataset
+    are cached separately from the full DataFrame. The total memory of the
+    cached DataFrames is bounded by a byte budget, least recently used
+    entries are evicted first.
+
+    With a memory-mapped store, datasets are loaded from files shared by
+    all the worker processes instead of each process parsing its own copy.
+    """
+
+    def __init__(
+        self,
+        max_size_bytes: int,
+        mmap_store: Optional[MmapDatasetStore] = None,
+    ) -> None:
+        """Initializer.
+
+        Args:
+            max_size_bytes (int): Maximum total size in bytes of
+                the cached DataFrames.
+            mmap_store (Optional[MmapDatasetStore], optional): Store of
+                memory-mapped datasets. Defaults to None, datasets are
+                loaded in process memory.
+        """
+        self.max_size_bytes: int = max_size_bytes
+        self.mmap_store: Optional[MmapDatasetStore] = mmap_store
+        self.current_size_bytes: int = 0
+        self._entries: OrderedDict[CacheKey, Tuple[pd.DataFrame, int]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._load_locks: Dict[CacheKey, threading.Lock] = {}
+
+    def get(
+        self,
+        dataset_name: str,
+        fingerprint: str,
+        columns: Optional[List[str]] = None,
+    ) -> Optional[pd.DataFrame]:
+        """Get a cached DataFrame and mark it as recently used.
+
+        A projection is served from the full DataFrame if it is cached.
+
+        Args:
+            dataset_name (str): Name of the dataset.
+            fingerprint (str): Fingerprint of the data source.
+            columns (Optional[List[str]], optional): Projected columns.
+                Defaults to None, the full DataFrame.
+
+        Returns:
+            Optional[pd.DataFrame]: The cached DataFrame or None if absent.
+        """
+        with self._lock:
+            full_df = self._get_entry((dataset_name, fingerprint, None))
+            if columns is None:
+                return full_df
+            if full_df is not None:
+                return full_df[columns]
+            return self._get_entry((dataset_name, fingerprint, tuple(columns)))
+
+    def put(
+        self,
+        dataset_name: str,
+        fingerprint: str,
+        df: pd.DataFrame,
+        columns: Optional[List[str]] = None,
+    ) -> None:
+        """Add a DataFrame to the cache.
+
+        Stale entries of the same dataset (other fingerprints) are dropped
+        and least recently used entries are evicted until the new entry
+        fits in the byte budget. DataFrames larger than the whole budget
+        are not cached.
+
+        Args:
+            dataset_name (str): Name of the dataset.
+            fingerprint (str): Fingerprint of the data source.
+            df (pd.DataFrame): The loaded DataFrame.
+            columns (Optional[List[str]], optional): Projected columns.
+                Defaults to None, the full DataFrame.
+        """
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_size_bytes:
+            LOG.info(
+                f"Dataset {dataset_name} ({size} bytes) exceeds the cache "
+                + f"budget of {self.max_size_bytes} bytes, not cached."
+            )
+            return
+
+        with self._lock:
+            for key in [
+                k
+                for k in self._entries
+                if k[0] == dataset_name and k[1] != fingerprint
+            ]:
+                self._remove(key)
+
+            while self._entries and (
+                self.current_size_bytes + size > self.max_size_bytes
+            ):
+                lru_key = next(iter(self._entries))
+                LOG.info(f"Evicting dataset {lru_key[0]} from cache.")
+                self._remove(lru_key)
+
+            key = (dataset_name, fingerprint, tuple(columns or ()) or None)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (df, size)
+            self.current_size_bytes += size
+
+    def get_or_load(
+        self,
+        dataset_name: str,
+        fingerprint: str,
+        loader: Callable[[Optional[List[str]]], pd.DataFrame],
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """Get a cached DataFrame or load it with loader and cache it.
+
+        Concurrent requests for the same entry wait for a single load.
+
+        Args:
+            dataset_name (str): Name of the dataset.
+            fingerprint (str): Fingerprint of the data source.
+            loader (Callable[[Optional[List[str]]], pd.DataFrame]): Function
+                loading the (projected) DataFrame from the data source.
+            columns (Optional[List[str]], optional): Columns to load.
+                Defaults to None, the full DataFrame.
+
+        Returns:
+            pd.DataFrame: The DataFrame of the dataset.
+        """
+        df = self.get(dataset_name, fingerprint, columns)
+        if df is not None:
+            return df
+
+        key = (dataset_name, fingerprint, tuple(columns or ()) or None)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            df = self.get(dataset_name, fingerprint, columns)
+            if df is None:
+                if self.mmap_store is not None:
+                    df = self.mmap_store.get_or_create(
+                        dataset_name, fingerprint, loader, columns
+                    )
+                else:
+                    df = loader(columns)
+                self.put(dataset_name, fingerprint, df, columns)
+
+        with self._lock:
+            self._load_locks.pop(key, None)
+
+        return df
+
+    def invalidate(
+        self, dataset_name: Optional[str] = None, remove_files: bool = True
+    ) -> int:
+        """Remove entries from the cache (and their memory-mapped files).
+
+        Args:
+            dataset_name (Optional[str], optional): Name of the dataset to
+                invalidate. Defaults to None, which clears the whole cache.
+            remove_files (bool, optional): Whether to remove the files of
+                the memory-mapped store too. Worker processes catching up
+                with an invalidation keep them, as they may already belong
+                to the new generation. Defaults to True.
+
+        Returns:
+            int: The number of removed entries.
+        """
+        with self._lock:
+            keys = [
+                k
+                for k in self._entries
+                if dataset_name is None or k[0] == dataset_name
+            ]
+            for key in keys:
+                self._remove(key)
+        if remove_files and self.mmap_store is not None:
+            self.mmap_store.invalidate(dataset_name)
+        return len(keys)
+
+    def get_stats(self) -> dict:
+        """Get the current state of the cache.
+
+        Returns:
+            dict: The cached dataset names, their size in bytes (all
+                projections included), the total size and the byte budget.
+        """
+        with self._lock:
+            datasets: Dict[str, int] = {}
+            for key, (_, size) in self._entries.items():
+                datasets[key[0]] = datasets.get(key[0], 0) + size
+            return {
+                "datasets": datasets,
+                "current_size_bytes": self.current_size_bytes,
+                "max_size_bytes": self.max_size_bytes,
+                "mmap_dir": (
+                    self.mmap_store.directory if self.mmap_store else None
+                ),
+            }
+
+    def _get_entry(self, key: CacheKey) -> Optional[pd.DataFrame]:
+        """Get an entry and mark it as recently used.
+
+        The cache lock must be held by the caller.
+
+        Args:
+            key (CacheKey): The key of the entry.
+
+        Returns:
+            Optional[pd.DataFrame]: The cached DataFrame or None if absent.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _remove(self, key: CacheKey) -> None:
+        """Remove an entry, the cache lock must be held by the caller.
+
+        Args:
+            key (CacheKey): The key of the entry to remove.
+        """
+        _, size = self._entries.pop(key)
+        self.current_size_bytes -= size
+
+
+# Cache of the datasets loaded by a worker process, set at its startup
+WORKER_DATA_CACHE: Optional[DataFrameCache] = None
+
+
+def set_worker_data_cache(data_cache: Optional[DataFrameCache]) -> None:
+    """Set the cache used by the connectors sent to this worker process.
+
+    Args:
+        data_cache (Optional[DataFrameCache]): The cache of the process.
+    """
+    global WORKER_DATA_CACHE  # pylint: disable=global-statement
+    WORKER_DATA_CACHE = data_cache
+
+
+def get_worker_data_cache() -> Optional[DataFrameCache]:
+    """Get the cache used by the connectors sent to this worker process.
+
+    Returns:
+        Optional[DataFrameCache]: The cache, None if disabled or if not
+            in a worker process.
+    """
+    return WORKER_DATA_CACHE
+
+
+# Number of invalidations of each dataset in this process, the
+# invalidations of all the datasets are counted under the None key
+DATA_GENERATIONS: Dict[Optional[str], int] = {}
+# Functions clearing the caches of data derived from the datasets
+DATA_INVALIDATION_CALLBACKS: List[Callable[[Optional[str]], object]] = []
+_generations_lock = threading.Lock()
+
+
+def on_data_invalidation(callback: Callable[[Optional[str]], object]) -> None:
+    """Register a function clearing a cache of data derived from datasets.
+
+    The function is called with the name of the invalidated dataset, or
+    None when all the datasets are invalidated.
+
+    Args:
+        callback (Callable[[Optional[str]], object]): The function.
+    """
+    DATA_INVALIDATION_CALLBACKS.append(callback)
+
+
+def get_data_generation(dataset_name: str) -> int:
+    """Get the invalidation generation of a dataset in this process.
+
+    The generation is part of the fingerprints keying the cached data,
+    so that data cached before an invalidation is never used after it.
+
+    Args:
+        dataset_name (str): Name of the dataset.
+
+    Returns:
+        int: The number of invalidations of the dataset.
+    """
+    with _generations_lock:
+        return DATA_GENERATIONS.get(None, 0) + DATA_GENERATIONS.get(
+            dataset_name, 0
+        )
+
+
+def invalidate_data(dataset_name: Optional[str] = None) -> None:
+    """Start a new generation of a dataset and clear the derived caches.
+
+    Args:
+        dataset_name (Optional[str], optional): Name of the dataset to
+            invalidate. Defaults to None, which invalidates all datasets.
+    """
+    with _generations_lock:
+        DATA_GENERATIONS[dataset_name] = (
+            DATA_GENERATIONS.get(dataset_name, 0) + 1
+        )
+    for callback in DATA_INVALIDATION_CALLBACKS:
+        callback(dataset_name)
+
+
+def sync_data_generation(dataset_name: str, generation: int) -> None:
+    """Catch up with the invalidations of a dataset made by another process.
+
+    Worker processes receive the generation of the dataset of each task
+    from the server process. The caches derived from the dataset are
+    cleared if the dataset was invalidated since the last task.
+
+    Args:
+        dataset_name (str): Name of the dataset.
+        generation (int): The generation of the dataset in the server.
+    """
+    with _generations_lock:
+        behind = generation - (
+            DATA_GENERATIONS.get(None, 0)
+            + DATA_GENERATIONS.get(dataset_name, 0)
+        )
+        if behind <= 0:
+            return
+        DATA_GENERATIONS[dataset_name] = (
+            DATA_GENERATIONS.get(dataset_name, 0) + behind
+        )
+    for callback in DATA_INVALIDATION_CALLBACKS:
+        callback(dataset_name)
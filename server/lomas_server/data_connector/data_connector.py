@@ -1,9 +1,21 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Tuple
+from typing import IO, Callable, Dict, List, Optional, Tuple, Union
 
 import pandas as pd
 
+from lomas_server.constants import (
+    DATASET_COMPRESSION_EXTENSIONS,
+    DATASET_FILE_EXTENSIONS,
+    DatasetFileFormat,
+)
+from lomas_server.data_connector.data_cache import (
+    DataFrameCache,
+    get_data_generation,
+    get_worker_data_cache,
+    sync_data_generation,
+)
 from lomas_server.utils.collection_models import DatetimeMetadata, Metadata
+from lomas_server.utils.error_handler import InvalidQueryException
 
 
 class DataConnector(ABC):
@@ -12,6 +24,9 @@ class DataConnector(ABC):
     """
 
     df: Optional[pd.DataFrame] = None
+    dataset_name: Optional[str] = None
+    generation: int = 0
+    data_cache: Optional[DataFrameCache] = None
 
     def __init__(self, metadata: Metadata) -> None:
         """Initializer.
@@ -26,13 +41,155 @@ class DataConnector(ABC):
         self.datetime_columns: List[str] = datetime_columns
 
     @abstractmethod
-    def get_pandas_df(self) -> pd.DataFrame:
+    def get_pandas_df(
+        self, columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
         """Get the data in pandas dataframe format
 
+        Args:
+            columns (Optional[List[str]], optional): Columns to load.
+                Defaults to None, all the columns.
+
         Returns:
             pd.DataFrame: The pandas dataframe for this dataset.
         """
 
+    def get_fingerprint(self) -> Optional[str]:
+        """Get a fingerprint of the data source.
+
+        The fingerprint identifies the data source and changes when the
+        underlying data changes. None means that the source cannot be
+        fingerprinted and must not be cached.
+
+        Returns:
+            Optional[str]: The fingerprint of the data source.
+        """
+        return None
+
+    def get_cache_fingerprint(self) -> Optional[str]:
+        """Get the fingerprint keying the data cached from this source.
+
+        It is the fingerprint of the data source at the invalidation
+        generation of the dataset, so that invalidating a dataset also
+        reloads the sources whose fingerprint does not change (e.g.
+        remote files).
+
+        Returns:
+            Optional[str]: The fingerprint, None if the data source cannot
+                be fingerprinted and must not be cached.
+        """
+        fingerprint = self.get_fingerprint()  # pylint: disable=E1128
+        if fingerprint is None:
+            return None
+        return f"{fingerprint}#{self.generation}"
+
+    def set_dataset_name(self, dataset_name: str) -> None:
+        """Set the name of the dataset and its current invalidation
+        generation.
+
+        Args:
+            dataset_name (str): The name of the dataset.
+        """
+        self.dataset_name = dataset_name
+        self.generation = get_data_generation(dataset_name)
+
+    def set_data_cache(
+        self, data_cache: DataFrameCache, dataset_name: str
+    ) -> None:
+        """Share loaded data with other connectors of the same dataset.
+
+        Args:
+            data_cache (DataFrameCache): The process-wide DataFrame cache.
+            dataset_name (str): The name of the dataset, used as cache key.
+        """
+        self.data_cache = data_cache
+        self.dataset_name = dataset_name
+
+    def __getstate__(self) -> dict:
+        """Get the state sent to worker processes.
+
+        The data cache belongs to the process, it is not sent.
+
+        Returns:
+            dict: The attributes of the connector.
+        """
+        state = self.__dict__.copy()
+        state.pop("data_cache", None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore a connector in a worker process, using the data cache
+        of the worker.
+
+        The caches of the worker are cleared if the dataset was
+        invalidated in the server process since the previous task.
+
+        Args:
+            state (dict): The attributes of the connector.
+        """
+        self.__dict__.update(state)
+        if self.dataset_name is not None:
+            sync_data_generation(self.dataset_name, self.generation)
+        data_cache = get_worker_data_cache()
+        if data_cache is not None and self.dataset_name is not None:
+            self.set_data_cache(data_cache, self.dataset_name)
+
+    def get_projection(
+        self, columns: Optional[List[str]]
+    ) -> Optional[List[str]]:
+        """Normalise a column projection to the metadata column order.
+
+        Args:
+            columns (Optional[List[str]]): Requested columns.
+
+        Raises:
+            InvalidQueryException: If a column is not in the metadata.
+
+        Returns:
+            Optional[List[str]]: The columns in metadata order, None if
+                all the columns are requested.
+        """
+        if columns is None:
+            return None
+
+        unknown_columns = set(columns) - set(self.metadata.columns)
+        if unknown_columns:
+            raise InvalidQueryException(
+                f"Columns {sorted(unknown_columns)} not found in dataset."
+            )
+
+        projection = [col for col in self.metadata.columns if col in columns]
+        if len(projection) == len(self.metadata.columns):
+            return None
+        return projection
+
+    def _load_with_cache(
+        self,
+        loader: Callable[[Optional[List[str]]], pd.DataFrame],
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """Load the data with loader, through the cache if one is set.
+
+        Args:
+            loader (Callable[[Optional[List[str]]], pd.DataFrame]): Function
+                reading the (projected) data from the source.
+            columns (Optional[List[str]], optional): Columns to load, as
+                returned by get_projection. Defaults to None, all columns.
+
+        Returns:
+            pd.DataFrame: The pandas dataframe of the dataset.
+        """
+        if self.data_cache is None or self.dataset_name is None:
+            return loader(columns)
+
+        fingerprint = self.get_cache_fingerprint()
+        if fingerprint is None:
+            return loader(columns)
+
+        return self.data_cache.get_or_load(
+            self.dataset_name, fingerprint, loader, columns
+        )
+
     def get_metadata(self) -> Metadata:
         """Get the metadata for this dataset
 
@@ -41,6 +198,14 @@ class DataConnector(ABC):
         """
         return self.metadata
 
+    def get_nb_rows(self) -> int:
+        """Get the number of rows of the dataset without loading it.
+
+        Returns:
+            int: The number of rows declared in the metadata.
+        """
+        return self.metadata.rows
+
 
 def get_column_dtypes(metadata: Metadata) -> Tuple[Dict[str, str], List[str]]:
     """Extracts and returns the column types from the metadata.
@@ -63,3 +228,99 @@ def get_column_dtypes(metadata: Metadata) -> Tuple[Dict[str, str], List[str]]:
         else:
             dtypes[col_name] = data.type
     return dtypes, datetime_columns
+
+
+def get_file_format(path: str) -> Tuple[DatasetFileFormat, Optional[str]]:
+    """Infer the format and compression of a dataset file from its name.
+
+    Args:
+        path (str): Path, url or key of the dataset file.
+
+    Raises:
+        InvalidQueryException: If the file format is not supported.
+
+    Returns:
+        Tuple[DatasetFileFormat, Optional[str]]:
+            DatasetFileFormat: The file format.
+            Optional[str]: The compression of a csv file, None if
+                not compressed.
+    """
+    name = path.lower().rsplit("/", 1)[-1]
+
+    compression = None
+    for extension, compression_name in DATASET_COMPRESSION_EXTENSIONS.items():
+        if name.endswith(extension):
+            name = name.removesuffix(extension)
+            compression = compression_name
+            break
+
+    for extension, file_format in DATASET_FILE_EXTENSIONS.items():
+        if name.endswith(extension):
+            if compression and file_format != DatasetFileFormat.CSV:
+                break
+            return file_format, compression
+
+    raise InvalidQueryException(
+        f"File type of {path} not supported for loading into pandas "
+        + "DataFrame. Supported extensions are "
+        + f"{list(DATASET_FILE_EXTENSIONS)} (csv may be compressed with "
+        + f"{list(DATASET_COMPRESSION_EXTENSIONS)})."
+    )
+
+
+def read_dataset_file(  # pylint: disable=too-many-arguments
+    source: Union[str, IO],
+    file_format: DatasetFileFormat,
+    dtypes: Dict[str, str],
+    datetime_columns: List[str],
+    columns: Optional[List[str]] = None,
+    compression: Optional[str] = None,
+) -> pd.DataFrame:
+    """Read a dataset file, only parsing the projected columns.
+
+    Columnar formats (parquet, feather/arrow) only decode the requested
+    columns, csv files skip the conversion of the other columns.
+
+    Args:
+        source (Union[str, IO]): Path, url or file-like object to read.
+        file_format (DatasetFileFormat): Format of the file.
+        dtypes (Dict[str, str]): Column types from the metadata.
+        datetime_columns (List[str]): Columns of datetime type.
+        columns (Optional[List[str]], optional): Columns to load.
+            Defaults to None, all the columns.
+        compression (Optional[str], optional): Compression of a csv file.
+            Defaults to None, inferred from the path by pandas.
+
+    Returns:
+        pd.DataFrame: The pandas dataframe of the dataset.
+    """
+    if columns is not None:
+        dtypes = {col: dtypes[col] for col in columns if col in dtypes}
+        datetime_columns = [col for col in datetime_columns if col in columns]
+
+    if file_format == DatasetFileFormat.CSV:
+        return pd.read_csv(
+            source,
+            dtype=dtypes,
+            parse_dates=datetime_columns,
+            usecols=columns,
+            compression=compression or "infer",
+        )
+
+    if file_format == DatasetFileFormat.PARQUET:
+        df = pd.read_parquet(source, columns=columns)
+    else:
+        df = pd.read_feather(source, columns=columns)
+
+    # Columnar files carry their own schema, align it with the metadata
+    df = df.astype(
+        {
+            col: dtype
+            for col, dtype in dtypes.items()
+            if col in df.columns and col not in datetime_columns
+        }
+    )
+    for col in datetime_columns:
+        if not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col])
+    return df
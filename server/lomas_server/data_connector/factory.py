@@ -1,7 +1,8 @@
-from typing import List
+from typing import List, Optional
 
 from lomas_server.admin_database.admin_database import AdminDatabase
 from lomas_server.constants import PrivateDatabaseType
+from lomas_server.data_connector.data_cache import DataFrameCache
 from lomas_server.data_connector.data_connector import DataConnector
 from lomas_server.data_connector.path_connector import PathConnector
 from lomas_server.data_connector.s3_connector import S3Connector
@@ -13,6 +14,7 @@ def data_connector_factory(
     dataset_name: str,
     admin_database: AdminDatabase,
     private_db_credentials: List[PrivateDBCredentials],
+    data_cache: Optional[DataFrameCache] = None,
 ) -> DataConnector:
     """
     Returns the appropriate dataset class based on dataset storage location
@@ -21,6 +23,10 @@ def data_connector_factory(
         dataset_name (str): The dataset name.
         admin_database (AdminDatabase): An initialized instance
             of AdminDatabase.
+        private_db_credentials (List[PrivateDBCredentials]):
+            The list of private database credentials.
+        data_cache (Optional[DataFrameCache], optional): Process-wide cache
+            of loaded datasets shared by the connectors. Defaults to None.
 
     Raises:
         InternalServerException: If the dataset type does not exist.
@@ -34,12 +40,13 @@ def data_connector_factory(
 
     ds_metadata = admin_database.get_dataset_metadata(dataset_name)
 
+    data_connector: DataConnector
     match database_type:
         case PrivateDatabaseType.PATH:
             dataset_path = admin_database.get_dataset_field(
                 dataset_name, "dataset_path"
             )
-            return PathConnector(ds_metadata, dataset_path)
+            data_connector = PathConnector(ds_metadata, dataset_path)
         case PrivateDatabaseType.S3:
 
             credentials_name = admin_database.get_dataset_field(
@@ -65,12 +72,18 @@ def data_connector_factory(
                 dataset_name, "key"
             )
 
-            return S3Connector(ds_metadata, credentials)
+            data_connector = S3Connector(ds_metadata, credentials)
         case _:
             raise InternalServerException(
                 f"Unknown database type: {database_type}"
             )
 
+    data_connector.set_dataset_name(dataset_name)
+    if data_cache is not None:
+        data_connector.set_data_cache(data_cache, dataset_name)
+
+    return data_connector
+
 
 def get_dataset_credentials(
     private_db_credentials: List[PrivateDBCredentials],
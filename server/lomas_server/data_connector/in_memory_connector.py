@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 import pandas as pd
 
 from lomas_server.data_connector.data_connector import DataConnector
@@ -7,6 +9,11 @@ from lomas_server.utils.collection_models import Metadata
 class InMemoryConnector(DataConnector):
     """
     DataConnector for a dataset created from an in-memory pandas DataFrame.
+
+    With pandas copy-on-write enabled (as done by the server), the dataset is
+    never copied: every call returns a lazy copy sharing the column data and
+    only the columns modified by the caller are copied. Otherwise, full
+    copies are made for safety.
     """
 
     def __init__(
@@ -21,13 +28,40 @@ class InMemoryConnector(DataConnector):
             dataset_df (pd.DataFrame): Dataframe of the dataset
         """
         super().__init__(metadata)
-        self.df: pd.DataFrame = dataset_df.copy()
+        self.df: pd.DataFrame = dataset_df.copy(deep=not is_copy_on_write())
 
-    def get_pandas_df(self) -> pd.DataFrame:
+    def get_pandas_df(
+        self, columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
         """Get the data in pandas dataframe format
 
+        Args:
+            columns (Optional[List[str]], optional): Columns to select.
+                Defaults to None, all the columns.
+
         Returns:
-            pd.DataFrame: pandas dataframe of dataset (a copy)
+            pd.DataFrame: pandas dataframe of dataset (a copy, lazy with
+                copy-on-write)
         """
+        projection = self.get_projection(columns)
+        df = self.df if projection is None else self.df[projection]
         # We use a copy here for safety.
-        return self.df.copy()
+        return df.copy(deep=not is_copy_on_write())
+
+    def get_nb_rows(self) -> int:
+        """Get the number of rows of the dataset.
+
+        Returns:
+            int: The number of rows of the in-memory dataframe.
+        """
+        return len(self.df)
+
+
+def is_copy_on_write() -> bool:
+    """Check whether pandas copy-on-write mode is enabled.
+
+    Returns:
+        bool: True if modifications of a DataFrame never propagate to the
+            DataFrames it shares data with.
+    """
+    return pd.options.mode.copy_on_write is True
@@ -0,0 +1,162 @@
+import glob
+import hashlib
+import os
+import tempfile
+from typing import Callable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import ipc
+
+from lomas_server.utils.error_handler import InternalServerException
+from lomas_server.utils.logger import LOG
+
+MMAP_FILE_SUFFIX = ".arrow"
+
+
+class MmapDatasetStore:
+    """
+    Store of private datasets as uncompressed Arrow IPC files, memory-mapped
+    read-only when loaded.
+
+    A dataset is parsed once from its source and written to the store
+    directory. Every process then maps the same file: the pages are shared
+    through the OS page cache and numeric columns without missing values are
+    returned as zero-copy, read-only views of the mapping.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Initializer.
+
+        Args:
+            directory (str): Directory of the memory-mapped files, shared
+                by all the server worker processes.
+        """
+        self.directory: str = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_or_create(
+        self,
+        dataset_name: str,
+        fingerprint: str,
+        loader: Callable[[Optional[List[str]]], pd.DataFrame],
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """Map a dataset file, writing it with loader if it does not exist.
+
+        Args:
+            dataset_name (str): Name of the dataset.
+            fingerprint (str): Fingerprint of the data source.
+            loader (Callable[[Optional[List[str]]], pd.DataFrame]): Function
+                loading the (projected) DataFrame from the data source.
+            columns (Optional[List[str]], optional): Columns to load.
+                Defaults to None, the full DataFrame.
+
+        Raises:
+            InternalServerException: If the file cannot be written or read.
+
+        Returns:
+            pd.DataFrame: The memory-mapped DataFrame of the dataset.
+        """
+        path = self._get_path(dataset_name, fingerprint, columns)
+        if not os.path.exists(path):
+            self._write(dataset_name, path, loader(columns))
+
+        try:
+            source = pa.memory_map(path, "r")
+            table = ipc.open_file(source).read_all()
+            return table.to_pandas(split_blocks=True)
+        except Exception as err:
+            raise InternalServerException(
+                f"Error reading memory-mapped dataset at {path}: {err}"
+            ) from err
+
+    def invalidate(self, dataset_name: Optional[str] = None) -> int:
+        """Remove the files of a dataset from the store.
+
+        Processes that already mapped a file keep their mapping valid.
+
+        Args:
+            dataset_name (Optional[str], optional): Name of the dataset to
+                invalidate. Defaults to None, which clears the whole store.
+
+        Returns:
+            int: The number of removed files.
+        """
+        prefix = self._get_prefix(dataset_name) if dataset_name else ""
+        paths = glob.glob(
+            os.path.join(self.directory, f"{prefix}*{MMAP_FILE_SUFFIX}")
+        )
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return len(paths)
+
+    def _write(self, dataset_name: str, path: str, df: pd.DataFrame) -> None:
+        """Write a DataFrame to an Arrow IPC file.
+
+        The file is written under a temporary name and atomically moved in
+        place, so other processes never map a partial file.
+
+        Args:
+            dataset_name (str): Name of the dataset.
+            path (str): Destination of the file.
+            df (pd.DataFrame): The DataFrame to write.
+
+        Raises:
+            InternalServerException: If the file cannot be written.
+        """
+        LOG.info(f"Writing memory-mapped file of dataset {dataset_name}.")
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            with pa.OSFile(tmp_path, "wb") as sink:
+                with ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)
+        except Exception as err:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise InternalServerException(
+                f"Error writing memory-mapped dataset {dataset_name}: {err}"
+            ) from err
+
+    def _get_path(
+        self,
+        dataset_name: str,
+        fingerprint: str,
+        columns: Optional[List[str]],
+    ) -> str:
+        """Get the path of the file of a dataset version and projection.
+
+        Args:
+            dataset_name (str): Name of the dataset.
+            fingerprint (str): Fingerprint of the data source.
+            columns (Optional[List[str]]): Projected columns, None for all.
+
+        Returns:
+            str: The path of the file.
+        """
+        version = hashlib.sha256(
+            f"{fingerprint}/{columns}".encode("utf-8")
+        ).hexdigest()[:16]
+        return os.path.join(
+            self.directory,
+            f"{self._get_prefix(dataset_name)}{version}{MMAP_FILE_SUFFIX}",
+        )
+
+    @staticmethod
+    def _get_prefix(dataset_name: str) -> str:
+        """Get the file name prefix of a dataset.
+
+        Args:
+            dataset_name (str): Name of the dataset.
+
+        Returns:
+            str: The prefix, safe to use in a file name.
+        """
+        name_hash = hashlib.sha256(dataset_name.encode("utf-8")).hexdigest()
+        return f"{name_hash[:16]}-"
@@ -1,13 +1,15 @@
-from typing import Optional
+import os
+from typing import List, Optional
 
 import pandas as pd
 
-from lomas_server.data_connector.data_connector import DataConnector
-from lomas_server.utils.collection_models import Metadata
-from lomas_server.utils.error_handler import (
-    InternalServerException,
-    InvalidQueryException,
+from lomas_server.data_connector.data_connector import (
+    DataConnector,
+    get_file_format,
+    read_dataset_file,
 )
+from lomas_server.utils.collection_models import Metadata
+from lomas_server.utils.error_handler import InternalServerException
 
 
 class PathConnector(DataConnector):
@@ -32,32 +34,88 @@ class PathConnector(DataConnector):
         self.ds_path: str = dataset_path
         self.df: Optional[pd.DataFrame] = None
 
-    def get_pandas_df(self) -> pd.DataFrame:
+    def __getstate__(self) -> dict:
+        """Get the state sent to worker processes, without the loaded data.
+
+        Returns:
+            dict: The attributes of the connector.
+        """
+        state = super().__getstate__()
+        state["df"] = None
+        return state
+
+    def get_fingerprint(self) -> Optional[str]:
+        """Get a fingerprint of the dataset file.
+
+        Local files are fingerprinted with their path, modification time
+        and size. Remote (http) files are considered static and identified
+        by their path.
+
+        Returns:
+            Optional[str]: The fingerprint, None if the file cannot be found.
+        """
+        if self.ds_path.startswith(("http://", "https://")):
+            return self.ds_path
+        try:
+            stat = os.stat(self.ds_path)
+        except OSError:
+            return None
+        return f"{self.ds_path}:{stat.st_mtime_ns}-{stat.st_size}"
+
+    def get_pandas_df(
+        self, columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
         """Get the data in pandas dataframe format
 
+        The dataframe may be shared with other queries through the
+        data cache and must not be modified in place.
+
+        Args:
+            columns (Optional[List[str]], optional): Columns to load, the
+                others are not parsed. Defaults to None, all the columns.
+
+        Raises:
+            InvalidQueryException: If the file format is not supported
+                or a column is not in the dataset.
+            InternalServerException: If the file cannot be read.
+
+        Returns:
+            pd.DataFrame: pandas dataframe of dataset
+        """
+        projection = self.get_projection(columns)
+        if projection is None and self.df is not None:
+            return self.df
+
+        df = self._load_with_cache(self._read_file, projection)
+        if projection is None:
+            self.df = df
+        return df
+
+    def _read_file(self, columns: Optional[List[str]]) -> pd.DataFrame:
+        """Read the columns of the dataset file.
+
+        Args:
+            columns (Optional[List[str]]): Columns to load, None for all.
+
         Raises:
-            InternalServerException: If the file format is not supported.
+            InvalidQueryException: If the file format is not supported.
+            InternalServerException: If the file cannot be read.
 
         Returns:
             pd.DataFrame: pandas dataframe of dataset
         """
-        if self.df is None:
-            if self.ds_path.endswith(".csv"):
-                try:
-                    self.df = pd.read_csv(
-                        self.ds_path,
-                        dtype=self.dtypes,
-                        parse_dates=self.datetime_columns,
-                    )
-                except Exception as err:
-                    raise InternalServerException(
-                        "Error reading csv at http path:"
-                        f"{self.ds_path}: {err}",
-                    ) from err
-            else:
-                return InvalidQueryException(
-                    "File type other than .csv not supported for"
-                    "loading into pandas DataFrame."
-                )
-
-        return self.df
+        file_format, compression = get_file_format(self.ds_path)
+        try:
+            return read_dataset_file(
+                self.ds_path,
+                file_format,
+                self.dtypes,
+                self.datetime_columns,
+                columns,
+                compression,
+            )
+        except Exception as err:
+            raise InternalServerException(
+                f"Error reading {file_format} at path:"
+                + f"{self.ds_path}: {err}",
+            ) from err
@@ -1,9 +1,15 @@
-from typing import Optional
+import io
+from typing import Any, List, Optional
 
 import boto3
 import pandas as pd
 
-from lomas_server.data_connector.data_connector import DataConnector
+from lomas_server.constants import DatasetFileFormat
+from lomas_server.data_connector.data_connector import (
+    DataConnector,
+    get_file_format,
+    read_dataset_file,
+)
 from lomas_server.utils.collection_models import Metadata
 from lomas_server.utils.config import S3CredentialsConfig
 from lomas_server.utils.error_handler import InternalServerException
@@ -27,33 +33,136 @@ class S3Connector(DataConnector):
         """
         super().__init__(metadata)
 
-        self.client = boto3.client(
-            "s3",
-            endpoint_url=credentials.endpoint_url,
-            aws_access_key_id=credentials.access_key_id,
-            aws_secret_access_key=credentials.secret_access_key,
-        )
+        self.credentials: S3CredentialsConfig = credentials
+        self.client = create_s3_client(credentials)
         self.bucket: str = credentials.bucket
         self.key: str = credentials.key
         self.df: Optional[pd.DataFrame] = None
+        self.fingerprint: Optional[str] = None
 
-    def get_pandas_df(self) -> pd.DataFrame:
-        """Get the data in pandas dataframe format
+    def __getstate__(self) -> dict:
+        """Get the state sent to worker processes, without the loaded data
+        and the S3 client.
+
+        Returns:
+            dict: The attributes of the connector.
+        """
+        state = super().__getstate__()
+        state["df"] = None
+        state.pop("client")
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore a connector in a worker process with a new S3 client.
+
+        Args:
+            state (dict): The attributes of the connector.
+        """
+        super().__setstate__(state)
+        self.client = create_s3_client(self.credentials)
+
+    def get_fingerprint(self) -> Optional[str]:
+        """Get a fingerprint of the dataset object from its path and ETag.
+
+        The object metadata is only requested once per connector.
 
         Raises:
-            InternalServerException: If the dataset cannot be read.
+            InternalServerException: If the object metadata cannot be read.
 
         Returns:
-            pd.DataFrame: pandas dataframe of dataset
+            Optional[str]: The path and ETag of the S3 object.
         """
-        if self.df is None:
-            obj = self.client.get_object(Bucket=self.bucket, Key=self.key)
+        if self.fingerprint is None:
             try:
-                self.df = pd.read_csv(obj["Body"], dtype=self.dtypes)
+                head = self.client.head_object(
+                    Bucket=self.bucket, Key=self.key
+                )
             except Exception as err:
                 raise InternalServerException(
-                    "Error reading csv at s3 path:"
+                    "Error reading object metadata at s3 path:"
                     + f"{self.bucket}/{self.key}: {err}"
                 ) from err
+            self.fingerprint = f"{self.bucket}/{self.key}:{head['ETag']}"
+        return self.fingerprint
+
+    def get_pandas_df(
+        self, columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """Get the data in pandas dataframe format
+
+        The dataframe may be shared with other queries through the
+        data cache and must not be modified in place.
+
+        Args:
+            columns (Optional[List[str]], optional): Columns to load, the
+                others are not parsed. Defaults to None, all the columns.
+
+        Raises:
+            InvalidQueryException: If the file format is not supported
+                or a column is not in the dataset.
+            InternalServerException: If the dataset cannot be read.
 
-        return self.df
+        Returns:
+            pd.DataFrame: pandas dataframe of dataset
+        """
+        projection = self.get_projection(columns)
+        if projection is None and self.df is not None:
+            return self.df
+
+        df = self._load_with_cache(self._read_object, projection)
+        if projection is None:
+            self.df = df
+        return df
+
+    def _read_object(self, columns: Optional[List[str]]) -> pd.DataFrame:
+        """Read the columns of the dataset object.
+
+        Columnar formats need random access, so their object is buffered
+        in memory before only the requested columns are decoded.
+
+        Args:
+            columns (Optional[List[str]]): Columns to load, None for all.
+
+        Raises:
+            InvalidQueryException: If the file format is not supported.
+            InternalServerException: If the dataset cannot be read.
+
+        Returns:
+            pd.DataFrame: pandas dataframe of dataset
+        """
+        file_format, compression = get_file_format(self.key)
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self.key)
+            body = obj["Body"]
+            if file_format != DatasetFileFormat.CSV:
+                body = io.BytesIO(body.read())
+            return read_dataset_file(
+                body,
+                file_format,
+                self.dtypes,
+                self.datetime_columns,
+                columns,
+                compression,
+            )
+        except Exception as err:
+            raise InternalServerException(
+                f"Error reading {file_format} at s3 path:"
+                + f"{self.bucket}/{self.key}: {err}"
+            ) from err
+
+
+def create_s3_client(credentials: S3CredentialsConfig) -> Any:
+    """Create a client of the S3 storage.
+
+    Args:
+        credentials (S3CredentialsConfig): The S3 credentials and endpoint.
+
+    Returns:
+        Any: The boto3 S3 client.
+    """
+    return boto3.client(
+        "s3",
+        endpoint_url=credentials.endpoint_url,
+        aws_access_key_id=credentials.access_key_id,
+        aws_secret_access_key=credentials.secret_access_key,
+    )
@@ -1,6 +1,7 @@
 import warnings
 from typing import Dict, Optional
 
+import numpy as np
 import pandas as pd
 from diffprivlib.utils import PrivacyLeakWarning
 from diffprivlib_logger import deserialise_pipeline
@@ -18,6 +19,7 @@ from lomas_server.dp_queries.dp_querier import DPQuerier
 from lomas_server.utils.error_handler import (
     ExternalLibraryException,
     InternalServerException,
+    InvalidQueryException,
 )
 from lomas_server.utils.query_models import (
     DiffPrivLibQueryModel,
@@ -43,12 +45,13 @@ class DiffPrivLibQuerier(
         self.y_test: Optional[pd.DataFrame] = None
 
     def fit_model_on_data(
-        self, query_json: DiffPrivLibRequestModel
+        self, query_json: DiffPrivLibRequestModel, dpl_pipeline: Pipeline
     ) -> tuple[Pipeline, pd.DataFrame, pd.DataFrame]:
         """Perform necessary steps to fit the model on the data
 
         Args:
             query_json (BaseModel): The JSON request object for the query.
+            dpl_pipeline (Pipeline): The deserialised pipeline to fit.
 
         Raises:
             ExternalLibraryException: For exceptions from libraries
@@ -60,15 +63,15 @@ class DiffPrivLibQuerier(
             y_test (pd.DataFrame): test data target
         """
         # Prepare data
-        raw_data = self.data_connector.get_pandas_df()
+        columns = list(query_json.feature_columns)
+        if query_json.target_columns is not None:
+            columns += query_json.target_columns
+        raw_data = self.data_connector.get_pandas_df(columns)
         data = handle_missing_data(raw_data, query_json.imputer_strategy)
         x_train, x_test, y_train, y_test = split_train_test_data(
             data, query_json
         )
 
-        # Prepare DiffPrivLib pipeline
-        dpl_pipeline = deserialise_pipeline(query_json.diffprivlib_json)
-
         # Fit the pipeline on the training set
         warnings.simplefilter("error", PrivacyLeakWarning)
         try:
@@ -93,32 +96,26 @@ class DiffPrivLibQuerier(
     def cost(self, query_json: DiffPrivLibRequestModel) -> tuple[float, float]:
         """Estimate cost of query
 
+        The cost is read from the privacy parameters of the pipeline steps,
+        the model is only fitted on the data when the query is performed.
+
         Args:
             query_json (DiffPrivLibRequestModel): The request model object.
 
         Raises:
-            ExternalLibraryException: For exceptions from libraries
-                external to this package.
+            InvalidQueryException: If a step of the pipeline is not
+                a diffprivlib model.
 
         Returns:
             tuple[float, float]: The tuple of costs, the first value
                 is the epsilon cost, the second value is the delta value.
         """
-        self.dpl_pipeline, self.x_test, self.y_test = self.fit_model_on_data(
-            query_json
-        )
-
-        # Compute budget
-        spent_epsilon = 0.0
-        spent_delta = 0.0
-        for step in self.dpl_pipeline.steps:
-            spent_epsilon += step[1].accountant.spent_budget[0][0]
-            spent_delta += step[1].accountant.spent_budget[0][1]
-        return spent_epsilon, spent_delta
+        self.dpl_pipeline = deserialise_pipeline(query_json.diffprivlib_json)
+        return get_pipeline_cost(self.dpl_pipeline)
 
     def query(
         self,
-        query_json: DiffPrivLibQueryModel,  # pylint: disable=unused-argument
+        query_json: DiffPrivLibQueryModel,
     ) -> Dict:
         """Perform the query and return the response.
 
@@ -128,8 +125,9 @@ class DiffPrivLibQuerier(
         Raises:
             ExternalLibraryException: For exceptions from libraries
                 external to this package.
-            InvalidQueryException: If the budget values are too small to
-                perform the query.
+            InternalServerException: If the query is performed before the
+                cost estimation or if fitting the model spent another
+                budget than the estimated cost.
 
         Returns:
             dict: The dictionary encoding of the resulting pd.DataFrame.
@@ -138,6 +136,19 @@ class DiffPrivLibQuerier(
             raise InternalServerException(
                 "DiffPrivLib `query` method called before `cost` method"
             )
+        expected_cost = get_pipeline_cost(self.dpl_pipeline)
+
+        self.dpl_pipeline, self.x_test, self.y_test = self.fit_model_on_data(
+            query_json, self.dpl_pipeline
+        )
+
+        # Check that the spent budget is the estimated cost
+        spent_cost = get_spent_budget(self.dpl_pipeline)
+        if not np.allclose(spent_cost, expected_cost):
+            raise InternalServerException(
+                f"DiffPrivLib pipeline spent {spent_cost} instead of the "
+                + f"estimated cost {expected_cost}."
+            )
 
         # Model accuracy
         score = self.dpl_pipeline.score(self.x_test, self.y_test)
@@ -150,6 +161,49 @@ class DiffPrivLibQuerier(
         return query_response
 
 
+def get_pipeline_cost(dpl_pipeline: Pipeline) -> tuple[float, float]:
+    """Get the budget that fitting a pipeline will spend.
+
+    Args:
+        dpl_pipeline (Pipeline): The deserialised pipeline.
+
+    Raises:
+        InvalidQueryException: If a step of the pipeline is not
+            a diffprivlib model.
+
+    Returns:
+        tuple[float, float]: The epsilon and delta cost of the steps.
+    """
+    spent_epsilon = 0.0
+    spent_delta = 0.0
+    for name, step in dpl_pipeline.steps:
+        if not hasattr(step, "epsilon") or not hasattr(step, "accountant"):
+            raise InvalidQueryException(
+                f"Step {name} of the pipeline is not a diffprivlib model,"
+                + " its privacy cost is unknown."
+            )
+        # diffprivlib models spend (epsilon, 0) when fitted
+        spent_epsilon += step.epsilon
+    return spent_epsilon, spent_delta
+
+
+def get_spent_budget(dpl_pipeline: Pipeline) -> tuple[float, float]:
+    """Get the budget spent by fitting a pipeline.
+
+    Args:
+        dpl_pipeline (Pipeline): The fitted pipeline.
+
+    Returns:
+        tuple[float, float]: The epsilon and delta spent by the steps.
+    """
+    spent_epsilon = 0.0
+    spent_delta = 0.0
+    for step in dpl_pipeline.steps:
+        spent_epsilon += step[1].accountant.spent_budget[0][0]
+        spent_delta += step[1].accountant.spent_budget[0][1]
+    return spent_epsilon, spent_delta
+
+
 def split_train_test_data(
     df: pd.DataFrame, query_json: DiffPrivLibRequestModel
 ) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from lomas_server.admin_database.admin_database import AdminDatabase
 from lomas_server.constants import DPLibraries
 from lomas_server.data_connector.data_connector import DataConnector
@@ -10,6 +12,7 @@ from lomas_server.dp_queries.dp_libraries.smartnoise_synth import (
     SmartnoiseSynthQuerier,
 )
 from lomas_server.dp_queries.dp_querier import DPQuerier
+from lomas_server.dp_queries.process_pool import QueryProcessPool
 from lomas_server.utils.error_handler import InternalServerException
 
 
@@ -17,6 +20,7 @@ def querier_factory(
     lib: str,
     data_connector: DataConnector,
     admin_database: AdminDatabase,
+    process_pool: Optional[QueryProcessPool] = None,
 ) -> DPQuerier:
     """Builds the correct DPQuerier instance.
 
@@ -26,6 +30,9 @@ def querier_factory(
         data_connector (DataConnector): The dataset to query.
         admin_database (AdminDatabase): An initialized instance of
                 an AdminDatabase.
+        process_pool (Optional[QueryProcessPool], optional): Worker
+            processes running the cost estimations and queries.
+            Defaults to None, they run in the calling thread.
 
     Raises:
         InternalServerException: If the library is unknown.
@@ -49,4 +56,7 @@ def querier_factory(
 
         case _:
             raise InternalServerException(f"Unknown library: {lib}")
+
+    if process_pool is not None:
+        querier.set_process_pool(process_pool)
     return querier
@@ -1,4 +1,5 @@
-from typing import List, Union
+import hashlib
+from typing import Any, List, Union
 
 import opendp as dp
 from opendp.metrics import metric_distance_type, metric_type
@@ -6,10 +7,15 @@ from opendp.mod import enable_features
 from opendp_logger import make_load_json
 
 from lomas_server.constants import (
+    OPENDP_CSV_CACHE_MAX_SIZE_MB,
+    OPENDP_CSV_CACHE_SIZE,
+    OPENDP_INPUT_DOMAIN,
+    OPENDP_PIPELINE_CACHE_SIZE,
     DPLibraries,
     OpenDPDatasetInputMetric,
     OpenDPMeasurement,
 )
+from lomas_server.data_connector.data_cache import on_data_invalidation
 from lomas_server.dp_queries.dp_querier import DPQuerier
 from lomas_server.utils.config import OpenDPConfig
 from lomas_server.utils.error_handler import (
@@ -18,11 +24,26 @@ from lomas_server.utils.error_handler import (
     InvalidQueryException,
 )
 from lomas_server.utils.logger import LOG
+from lomas_server.utils.lru_cache import LRUCache
 from lomas_server.utils.query_models import (
     OpenDPQueryModel,
     OpenDPRequestModel,
 )
 
+# Datasets encoded as csv strings, keyed by data source fingerprint
+CSV_INPUTS_CACHE: LRUCache[str] = LRUCache(
+    OPENDP_CSV_CACHE_SIZE, OPENDP_CSV_CACHE_MAX_SIZE_MB * 1024 * 1024
+)
+on_data_invalidation(lambda _: CSV_INPUTS_CACHE.clear())
+
+# Validated pipelines and their privacy maps, keyed by pipeline hash
+PIPELINES_CACHE: LRUCache[dp.Measurement] = LRUCache(
+    OPENDP_PIPELINE_CACHE_SIZE
+)
+PRIVACY_MAPS_CACHE: LRUCache[tuple[str, Any]] = LRUCache(
+    OPENDP_PIPELINE_CACHE_SIZE
+)
+
 
 class OpenDPQuerier(DPQuerier[OpenDPRequestModel, OpenDPQueryModel]):
     """
@@ -50,21 +71,12 @@ class OpenDPQuerier(DPQuerier[OpenDPRequestModel, OpenDPQueryModel]):
         """
         opendp_pipe = reconstruct_measurement_pipeline(query_json.opendp_json)
 
-        measurement_type = get_output_measure(opendp_pipe)
-        # https://docs.opendp.org/en/stable/user/combinators.html#measure-casting
-        if measurement_type == OpenDPMeasurement.ZERO_CONCENTRATED_DIVERGENCE:
-            opendp_pipe = dp.combinators.make_zCDP_to_approxDP(opendp_pipe)
-            measurement_type = OpenDPMeasurement.SMOOTHED_MAX_DIVERGENCE
-
-        max_ids = self.data_connector.get_metadata().max_ids
-        try:
-            # d_in is int as input metric is a dataset metric
-            cost = opendp_pipe.map(d_in=int(max_ids))
-        except Exception as e:
-            LOG.exception(e)
-            raise ExternalLibraryException(
-                DPLibraries.OPENDP, "Error obtaining cost:" + str(e)
-            ) from e
+        # The privacy map only depends on the pipeline and the dataset max_ids
+        max_ids = int(self.data_connector.get_metadata().max_ids)
+        measurement_type, cost = PRIVACY_MAPS_CACHE.get_or_create(
+            (get_pipeline_key(query_json.opendp_json), max_ids),
+            lambda: get_privacy_map(opendp_pipe, max_ids),
+        )
 
         # Cost interpretation
         match measurement_type:
@@ -104,9 +116,7 @@ class OpenDPQuerier(DPQuerier[OpenDPRequestModel, OpenDPQueryModel]):
         """
         opendp_pipe = reconstruct_measurement_pipeline(query_json.opendp_json)
 
-        input_data = self.data_connector.get_pandas_df().to_csv(
-            header=False, index=False
-        )
+        input_data = self.get_csv_input()
 
         try:
             release_data = opendp_pipe(input_data)
@@ -119,6 +129,30 @@ class OpenDPQuerier(DPQuerier[OpenDPRequestModel, OpenDPQueryModel]):
 
         return release_data
 
+    def get_csv_input(self) -> str:
+        """Get the dataset encoded as a csv string without header.
+
+        Encoding the whole dataset is costly, so the csv string is shared
+        by the queries on the same version of the dataset, within the byte
+        budget of the cache. Datasets without fingerprint (e.g. dummy
+        datasets) are encoded every time.
+
+        Returns:
+            str: The csv string of the dataset.
+        """
+        fingerprint = self.data_connector.get_cache_fingerprint()
+        if fingerprint is None:
+            return self.data_connector.get_pandas_df().to_csv(
+                header=False, index=False
+            )
+
+        return CSV_INPUTS_CACHE.get_or_create(
+            fingerprint,
+            lambda: self.data_connector.get_pandas_df().to_csv(
+                header=False, index=False
+            ),
+        )
+
 
 def is_measurement(pipeline: dp.Measurement) -> None:
     """Check if the pipeline is a measurement.
@@ -168,9 +202,45 @@ def has_dataset_input_metric(pipeline: dp.Measurement) -> None:
         raise InvalidQueryException(e)
 
 
+def has_csv_input_domain(pipeline: dp.Measurement) -> None:
+    """Check that the pipeline takes the dataset as a csv string.
+
+    Args:
+        pipeline (dp.Measurement): The pipeline to check.
+
+    Raises:
+        InvalidQueryException: If the pipeline input domain is not
+                                a string domain.
+    """
+    input_domain = pipeline.input_domain.type
+    if input_domain != OPENDP_INPUT_DOMAIN:
+        e = (
+            f"The input domain {input_domain} is not {OPENDP_INPUT_DOMAIN}."
+            + " The dataset is provided as a csv string, the pipeline must"
+            + " start by parsing it (e.g. with make_split_dataframe)."
+        )
+        LOG.exception(e)
+        raise InvalidQueryException(e)
+
+
+def get_pipeline_key(pipeline: str) -> str:
+    """Get the key of a pipeline in the caches.
+
+    Args:
+        pipeline (str): The JSON string encoding of the pipeline.
+
+    Returns:
+        str: The hash of the pipeline.
+    """
+    return hashlib.sha256(pipeline.encode("utf-8")).hexdigest()
+
+
 def reconstruct_measurement_pipeline(pipeline: str) -> dp.Measurement:
     """Reconstruct OpenDP pipeline from json representation.
 
+    Validated pipelines are cached, a pipeline sent again (e.g. for the
+    query after its cost estimation) is not deserialised again.
+
     Args:
         pipeline (str): The JSON string encoding of the pipeline.
 
@@ -180,14 +250,58 @@ def reconstruct_measurement_pipeline(pipeline: str) -> dp.Measurement:
     Returns:
         dp.Measurement: The reconstructed pipeline.
     """
-    # Reconstruct pipeline
-    opendp_pipe = make_load_json(pipeline)
 
-    # Verify that the pipeline is safe and valid
-    is_measurement(opendp_pipe)
-    has_dataset_input_metric(opendp_pipe)
+    def load_pipeline() -> dp.Measurement:
+        # Reconstruct pipeline
+        opendp_pipe = make_load_json(pipeline)
 
-    return opendp_pipe
+        # Verify that the pipeline is safe and valid
+        is_measurement(opendp_pipe)
+        has_dataset_input_metric(opendp_pipe)
+        has_csv_input_domain(opendp_pipe)
+
+        return opendp_pipe
+
+    return PIPELINES_CACHE.get_or_create(
+        get_pipeline_key(pipeline), load_pipeline
+    )
+
+
+def get_privacy_map(
+    opendp_pipe: dp.Measurement, max_ids: int
+) -> tuple[str, Any]:
+    """Get the privacy map of a pipeline for the dataset max_ids.
+
+    Zero concentrated divergence pipelines are converted to
+    smoothed max divergence.
+
+    Args:
+        opendp_pipe (dp.Measurement): The pipeline.
+        max_ids (int): Maximum number of rows of an individual.
+
+    Raises:
+        ExternalLibraryException: If opendp cannot compute the map.
+        InternalServerException: If the measure type is unknown.
+
+    Returns:
+        tuple[str, Any]: One of :py:class:`OpenDPMeasurement` and
+            the output distance of the pipeline.
+    """
+    measurement_type = get_output_measure(opendp_pipe)
+    # https://docs.opendp.org/en/stable/user/combinators.html#measure-casting
+    if measurement_type == OpenDPMeasurement.ZERO_CONCENTRATED_DIVERGENCE:
+        opendp_pipe = dp.combinators.make_zCDP_to_approxDP(opendp_pipe)
+        measurement_type = OpenDPMeasurement.SMOOTHED_MAX_DIVERGENCE
+
+    try:
+        # d_in is int as input metric is a dataset metric
+        cost = opendp_pipe.map(d_in=max_ids)
+    except Exception as e:
+        LOG.exception(e)
+        raise ExternalLibraryException(
+            DPLibraries.OPENDP, "Error obtaining cost:" + str(e)
+        ) from e
+    return measurement_type, cost
 
 
 def get_output_measure(opendp_pipe: dp.Measurement) -> str:
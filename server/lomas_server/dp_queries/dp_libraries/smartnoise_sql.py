@@ -1,11 +1,28 @@
-from typing import Optional
+import copy
+import re
+import threading
+from typing import List, Optional
 
 import pandas as pd
-from snsql import Mechanism, Privacy, Stat, from_connection
-from snsql.reader.base import Reader
+from snsql import Mechanism, Privacy, Stat
+from snsql.metadata import Metadata as SmartnoiseMetadata
+from snsql.sql.parse import Query
+from snsql.sql.private_reader import PrivateReader
+from snsql.sql.reader.base import SqlReader
+from snsql.sql.reader.pandas import PandasReader
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
 
 from lomas_server.admin_database.admin_database import AdminDatabase
-from lomas_server.constants import SSQL_MAX_ITERATION, SSQL_STATS, DPLibraries
+from lomas_server.constants import (
+    SSQL_MAX_ITERATION,
+    SSQL_QUERY_CACHE_SIZE,
+    SSQL_READER_CACHE_MAX_SIZE_MB,
+    SSQL_READER_CACHE_SIZE,
+    SSQL_STATS,
+    DPLibraries,
+)
+from lomas_server.data_connector.data_cache import on_data_invalidation
 from lomas_server.data_connector.data_connector import DataConnector
 from lomas_server.dp_queries.dp_querier import DPQuerier
 from lomas_server.utils.collection_models import Metadata
@@ -14,12 +31,125 @@ from lomas_server.utils.error_handler import (
     InternalServerException,
     InvalidQueryException,
 )
+from lomas_server.utils.lru_cache import LRUCache
 from lomas_server.utils.query_models import (
     SmartnoiseSQLQueryModel,
     SmartnoiseSQLRequestModel,
 )
 
 
+class SharedPandasReader(PandasReader):
+    """
+    PandasReader whose in-memory sqlite database can be shared by threads.
+
+    The default PandasReader engine keeps one sqlite connection per thread,
+    so the loaded data is only visible from the thread that created it.
+    Here the data is loaded in a single connection usable from any thread
+    and the queries on it are serialised.
+    """
+
+    def __init__(  # pylint: disable=super-init-not-called
+        self, df: pd.DataFrame, metadata: SmartnoiseMetadata
+    ) -> None:
+        """Initializer. Loads the dataframe in the sqlite database.
+
+        Args:
+            df (pd.DataFrame): The dataframe of the dataset.
+            metadata (SmartnoiseMetadata): The smartnoise-sql metadata.
+        """
+        SqlReader.__init__(self, self.ENGINE)  # pylint: disable=W0233
+        self.metadata = metadata
+        self.table_names = list(metadata.m_tables.keys())
+        self.db_engine = create_engine(
+            "sqlite://",
+            poolclass=StaticPool,
+            connect_args={"check_same_thread": False},
+        )
+        for table_name in self.table_names:
+            df.to_sql(
+                table_name.replace(".", "_"), con=self.db_engine, index=False
+            )
+        with self.db_engine.connect() as connection:
+            size = connection.exec_driver_sql(
+                "SELECT page_count * page_size "
+                + "FROM pragma_page_count(), pragma_page_size()"
+            ).scalar()
+        self.size_bytes: int = int(size or 0)
+        self._lock = threading.Lock()
+
+    def execute(self, query, *ignore, accuracy: bool = False):
+        """Executes a raw SQL string against the shared database.
+
+        Args:
+            query (str): The SQL query.
+            accuracy (bool, optional): Unused. Defaults to False.
+
+        Returns:
+            list: The column names followed by the rows as tuples.
+        """
+        with self._lock:
+            return super().execute(query, *ignore, accuracy=accuracy)
+
+
+class CachedPrivateReader(PrivateReader):
+    """
+    PrivateReader reusing the queries already parsed on the same metadata.
+
+    Parsing is the most expensive step of a cost estimation, the parsed
+    queries are kept in a cache and a copy is returned as the reader
+    modifies them while rewriting.
+    """
+
+    def __init__(
+        self,
+        reader: SqlReader,
+        metadata: SmartnoiseMetadata,
+        privacy: Privacy,
+        metadata_key: str,
+    ) -> None:
+        """Initializer.
+
+        Args:
+            reader (SqlReader): The reader over the dataset.
+            metadata (SmartnoiseMetadata): The smartnoise-sql metadata.
+            privacy (Privacy): The privacy parameters of the request.
+            metadata_key (str): Key of the metadata in the parsed queries
+                cache.
+        """
+        super().__init__(reader, metadata, privacy=privacy)
+        self.metadata_key = metadata_key
+
+    def parse_query_string(self, query_string: str) -> Query:
+        """Parse a query string, from the cache if already parsed.
+
+        Args:
+            query_string (str): The SQL query.
+
+        Returns:
+            Query: The parsed query.
+        """
+        key = (self.metadata_key, query_string)
+        query = PARSED_QUERIES_CACHE.get(key)
+        if query is None:
+            query = super().parse_query_string(query_string)
+            PARSED_QUERIES_CACHE.put(key, query)
+        return copy.deepcopy(query)
+
+
+# Process-wide caches shared by the smartnoise-sql queries
+SMARTNOISE_METADATA_CACHE: LRUCache[SmartnoiseMetadata] = LRUCache(
+    SSQL_READER_CACHE_SIZE
+)
+READERS_CACHE: LRUCache[SharedPandasReader] = LRUCache(
+    SSQL_READER_CACHE_SIZE,
+    SSQL_READER_CACHE_MAX_SIZE_MB * 1024 * 1024,
+    sizeof=lambda reader: reader.size_bytes,
+)
+PARSED_QUERIES_CACHE: LRUCache[Query] = LRUCache(SSQL_QUERY_CACHE_SIZE)
+COSTS_CACHE: LRUCache[tuple[float, float]] = LRUCache(SSQL_QUERY_CACHE_SIZE)
+on_data_invalidation(lambda _: READERS_CACHE.clear())
+
+
 class SmartnoiseSQLQuerier(
     DPQuerier[SmartnoiseSQLRequestModel, SmartnoiseSQLQueryModel]
 ):
@@ -33,7 +163,7 @@ class SmartnoiseSQLQuerier(
         admin_database: AdminDatabase,
     ) -> None:
         super().__init__(data_connector, admin_database)
-        self.reader: Optional[Reader] = None
+        self.reader: Optional[PrivateReader] = None
 
     def cost(
         self, query_json: SmartnoiseSQLRequestModel
@@ -55,16 +185,43 @@ class SmartnoiseSQLQuerier(
         privacy = set_mechanisms(privacy, query_json.mechanisms)
 
         metadata = self.data_connector.get_metadata()
-        smartnoise_metadata = convert_to_smartnoise_metadata(metadata)
-
-        self.reader = from_connection(
-            self.data_connector.get_pandas_df(),
-            privacy=privacy,
-            metadata=smartnoise_metadata,
+        metadata_key = metadata.model_dump_json()
+
+        # Only load the columns referenced in the query in new readers
+        columns = get_query_columns(query_json.query_str, metadata)
+
+        # The cost only depends on the metadata, query and privacy parameters
+        cost_key = (
+            metadata_key,
+            query_json.query_str,
+            query_json.epsilon,
+            query_json.delta,
+            tuple(sorted(query_json.mechanisms.items())),
         )
+        try:
+            smartnoise_metadata = SMARTNOISE_METADATA_CACHE.get_or_create(
+                metadata_key,
+                lambda: SmartnoiseMetadata.from_(
+                    convert_to_smartnoise_metadata(metadata)
+                ),
+            )
+        except Exception as e:
+            raise ExternalLibraryException(
+                DPLibraries.SMARTNOISE_SQL,
+                "Error obtaining cost: " + str(e),
+            ) from e
 
+        sql_reader = self._get_sql_reader(
+            columns, smartnoise_metadata, metadata_key
+        )
         try:
-            epsilon, delta = self.reader.get_privacy_cost(query_json.query_str)
+            reader = CachedPrivateReader(
+                sql_reader, smartnoise_metadata, privacy, metadata_key
+            )
+            epsilon, delta = COSTS_CACHE.get_or_create(
+                cost_key, lambda: reader.get_privacy_cost(query_json.query_str)
+            )
+            self.reader = reader
         except Exception as e:
             raise ExternalLibraryException(
                 DPLibraries.SMARTNOISE_SQL,
@@ -73,6 +230,44 @@ class SmartnoiseSQLQuerier(
 
         return epsilon, delta
 
+    def _get_sql_reader(
+        self,
+        columns: List[str],
+        smartnoise_metadata: SmartnoiseMetadata,
+        metadata_key: str,
+    ) -> SqlReader:
+        """Get a reader over the columns of the dataset.
+
+        Loading the dataset in the reader database is costly, so readers
+        are shared by the queries on the same version of the dataset,
+        within the byte budget of the cache. A shared reader holds all the
+        columns, so that the queries on different columns do not load
+        other copies of the dataset.
+        Datasets without fingerprint (e.g. dummy datasets) are loaded in a
+        new reader with only the columns of the query.
+
+        Args:
+            columns (List[str]): The columns of the query.
+            smartnoise_metadata (SmartnoiseMetadata): The metadata.
+            metadata_key (str): The serialised metadata.
+
+        Returns:
+            SqlReader: The reader over the dataset.
+        """
+        fingerprint = self.data_connector.get_cache_fingerprint()
+        if fingerprint is None:
+            return PandasReader(
+                self.data_connector.get_pandas_df(columns),
+                smartnoise_metadata,
+            )
+
+        return READERS_CACHE.get_or_create(
+            (fingerprint, metadata_key),
+            lambda: SharedPandasReader(
+                self.data_connector.get_pandas_df(), smartnoise_metadata
+            ),
+        )
+
     def query(self, query_json: SmartnoiseSQLQueryModel) -> dict:
         """Performs the query and returns the response.
 
@@ -180,3 +375,35 @@ def convert_to_smartnoise_metadata(metadata: Metadata) -> dict:
     metadata_dict.update(metadata_dict["columns"])
     del metadata_dict["columns"]
     return {"": {"": {"df": metadata_dict}}}
+
+
+def get_query_columns(query_str: str, metadata: Metadata) -> List[str]:
+    """Get the dataset columns that a query may reference.
+
+    Every metadata column whose name appears as an identifier in the query
+    is kept (a superset of the referenced columns), as well as private id
+    columns which smartnoise-sql uses to bound user contributions. The first
+    column is kept for queries without any column (e.g. COUNT(*)).
+
+    Args:
+        query_str (str): The SQL query.
+        metadata (Metadata): Dataset metadata from admin database
+
+    Returns:
+        List[str]: The columns to load.
+    """
+    query_lower = query_str.lower()
+    identifiers = set(re.findall(r"\w+", query_lower))
+
+    columns = []
+    for col_name, col_metadata in metadata.columns.items():
+        name = col_name.lower()
+        referenced = (
+            name in identifiers if name.isidentifier() else name in query_lower
+        )
+        if referenced or col_metadata.private_id:
+            columns.append(col_name)
+
+    if not columns:
+        columns.append(next(iter(metadata.columns)))
+    return columns
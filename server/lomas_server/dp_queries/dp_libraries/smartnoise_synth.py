@@ -2,7 +2,9 @@ import re
 from datetime import datetime
 from typing import Dict, List, Optional, TypeAlias, TypeGuard, Union
 
+import numpy as np
 import pandas as pd
+from opacus import privacy_analysis
 from smartnoise_synth_logger import deserialise_constraints
 from snsynth import Synthesizer
 from snsynth.transform import (
@@ -19,7 +21,9 @@ from snsynth.transform.table import TableTransformer
 from lomas_server.admin_database.admin_database import AdminDatabase
 from lomas_server.constants import (
     SECONDS_IN_A_DAY,
+    SSYNTH_DEFAULT_BATCH_SIZE,
     SSYNTH_DEFAULT_BINS,
+    SSYNTH_DPCTGAN_ALPHAS,
     SSYNTH_MIN_ROWS_PATE_GAN,
     SSYNTH_PRIVATE_COLUMN,
     DPLibraries,
@@ -275,27 +279,21 @@ class SmartnoiseSynthQuerier(
 
         return constraints
 
-    def _get_fit_model(
-        self,
-        private_data: pd.DataFrame,
-        transformer: TableTransformer,
-        query_json: SmartnoiseSynthRequestModel,
+    def _create_model(
+        self, query_json: SmartnoiseSynthRequestModel
     ) -> Synthesizer:
         """
-        Create and fit the synthesizer model.
+        Create the synthesizer model, without fitting it.
 
         Args:
-            private_data (pd.DataFrame): Private data for fitting the model
-            transformer (TableTransformer): Transformer to pre/postprocess data
             query_json (SmartnoiseSynthRequestModel): JSON request object for the query
-                synth_name (str): name of the Yanthesizer model to use
-                epsilon (float): epsilon budget value
-                nullable (bool): True if some data cells may be null
-                synth_params (dict): Keyword arguments to pass to the synthesizer
-                    constructor.
+
+        Raises:
+            ExternalLibraryException: If the model cannot be created with
+                the given parameters.
 
         Returns:
-            Synthesizer: Fitted synthesizer model
+            Synthesizer: Unfitted synthesizer model
         """
         if query_json.delta is not None:
             query_json.synth_params["delta"] = query_json.delta
@@ -304,7 +302,7 @@ class SmartnoiseSynthQuerier(
             query_json.synth_params["disabled_dp"] = False
 
         try:
-            model = Synthesizer.create(
+            return Synthesizer.create(
                 synth=query_json.synth_name,
                 epsilon=query_json.epsilon,
                 **query_json.synth_params,
@@ -313,6 +311,30 @@ class SmartnoiseSynthQuerier(
             raise ExternalLibraryException(
                 DPLibraries.SMARTNOISE_SYNTH, "Error creating model: " + str(e)
             ) from e
+
+    def _get_fit_model(
+        self,
+        private_data: pd.DataFrame,
+        transformer: TableTransformer,
+        query_json: SmartnoiseSynthRequestModel,
+    ) -> Synthesizer:
+        """
+        Create and fit the synthesizer model.
+
+        Args:
+            private_data (pd.DataFrame): Private data for fitting the model
+            transformer (TableTransformer): Transformer to pre/postprocess data
+            query_json (SmartnoiseSynthRequestModel): JSON request object for the query
+                synth_name (str): name of the Yanthesizer model to use
+                epsilon (float): epsilon budget value
+                nullable (bool): True if some data cells may be null
+                synth_params (dict): Keyword arguments to pass to the synthesizer
+                    constructor.
+
+        Returns:
+            Synthesizer: Fitted synthesizer model
+        """
+        model = self._create_model(query_json)
         try:
             model.fit(
                 data=private_data,
@@ -354,19 +376,8 @@ class SmartnoiseSynthQuerier(
         Returns:
             model: Smartnoise Synthesizer
         """
-        if (
-            query_json.synth_name == SSynthMarginalSynthesizer.MST
-            and query_json.return_model
-        ):
-            raise InvalidQueryException(
-                "mst synthesizer cannot be returned, only samples. "
-                + "Please, change model or set `return_model=False`"
-            )
-        if query_json.synth_name == SSynthMarginalSynthesizer.PAC_SYNTH:
-            raise InvalidQueryException(
-                "pacsynth synthesizer not supported due to Rust panic. "
-                + "Please select another Synthesizer."
-            )
+        metadata = self.data_connector.get_metadata()
+        self._check_query(query_json, metadata)
 
         # Table Transformation depenps on the type of Synthesizer
         if query_json.synth_name in [
@@ -376,16 +387,6 @@ class SmartnoiseSynthQuerier(
         else:
             table_transformer_style = SSynthTableTransStyle.GAN
 
-        # Preprocessing information from metadata
-        metadata = self.data_connector.get_metadata()
-        if query_json.synth_name == SSynthGanSynthesizer.PATE_GAN:
-            if metadata.rows < SSYNTH_MIN_ROWS_PATE_GAN:
-                raise ExternalLibraryException(
-                    DPLibraries.SMARTNOISE_SYNTH,
-                    f"{SSynthGanSynthesizer.PATE_GAN} not reliable "
-                    + "with this dataset.",
-                )
-
         constraints = self._get_default_constraints(
             metadata, query_json, table_transformer_style
         )
@@ -402,14 +403,13 @@ class SmartnoiseSynthQuerier(
             constraints.update(custom_constraints)
 
         # Prepare private data
-        private_data = self.data_connector.get_pandas_df()
         if query_json.select_cols:
-            try:
-                private_data = private_data[query_json.select_cols]
-            except KeyError as e:
-                raise InvalidQueryException(
-                    "Error while selecting provided select_cols: " + str(e)
-                ) from e
+            # Only load the selected columns
+            private_data = self.data_connector.get_pandas_df(
+                query_json.select_cols
+            )[query_json.select_cols]
+        else:
+            private_data = self.data_connector.get_pandas_df()
 
         # Get transformer
         transformer = TableTransformer.create(
@@ -422,11 +422,63 @@ class SmartnoiseSynthQuerier(
         model = self._get_fit_model(private_data, transformer, query_json)
         return model
 
+    def _check_query(
+        self, query_json: SmartnoiseSynthRequestModel, metadata: Metadata
+    ) -> None:
+        """Check that a query can be performed on the dataset.
+
+        Args:
+            query_json (SmartnoiseSynthRequestModel): JSON request object for the query.
+            metadata (Metadata): Metadata of the dataset
+
+        Raises:
+            ExternalLibraryException: If the synthesizer is not reliable
+                on the dataset.
+            InvalidQueryException: If the synthesizer is not supported or
+                the selected columns are not in the dataset.
+        """
+        if (
+            query_json.synth_name == SSynthMarginalSynthesizer.MST
+            and query_json.return_model
+        ):
+            raise InvalidQueryException(
+                "mst synthesizer cannot be returned, only samples. "
+                + "Please, change model or set `return_model=False`"
+            )
+        if query_json.synth_name == SSynthMarginalSynthesizer.PAC_SYNTH:
+            raise InvalidQueryException(
+                "pacsynth synthesizer not supported due to Rust panic. "
+                + "Please select another Synthesizer."
+            )
+
+        if query_json.synth_name == SSynthGanSynthesizer.PATE_GAN:
+            if metadata.rows < SSYNTH_MIN_ROWS_PATE_GAN:
+                raise ExternalLibraryException(
+                    DPLibraries.SMARTNOISE_SYNTH,
+                    f"{SSynthGanSynthesizer.PATE_GAN} not reliable "
+                    + "with this dataset.",
+                )
+
+        missing_cols = [
+            col
+            for col in query_json.select_cols
+            if col not in metadata.columns
+        ]
+        if missing_cols:
+            raise InvalidQueryException(
+                "Error while selecting provided select_cols: "
+                + f"{missing_cols} not in dataset"
+            )
+
     def cost(
         self, query_json: SmartnoiseSynthRequestModel
     ) -> tuple[float, float]:
         """Return cost of query_json
 
+        The cost is computed from the synthesizer parameters and the number
+        of rows of the dataset, the model is only fitted when the query is
+        performed.
+
         Args:
             query_json (SmartnoiseSynthRequestModel): JSON request object for the query.
 
@@ -435,15 +487,11 @@ class SmartnoiseSynthQuerier(
                 is the epsilon cost, the second value is the delta value.
         # TODO: verify and model.rho
         """
-        self.model = self._model_pipeline(query_json)
-        if query_json.synth_name == SSynthMarginalSynthesizer.MWEM:
-            epsilon, delta = self.model.epsilon, 0
-        elif query_json.synth_name == SSynthGanSynthesizer.DP_CTGAN:
-            epsilon, delta = self.model.epsilon_list[-1], self.model.delta
-        else:
-            epsilon, delta = self.model.epsilon, self.model.delta
-
-        return epsilon, delta
+        self._check_query(query_json, self.data_connector.get_metadata())
+        model = self._create_model(query_json)
+        return get_synthesizer_cost(
+            model, query_json.synth_name, self.data_connector.get_nb_rows()
+        )
 
     def query(
         self,
@@ -458,16 +506,28 @@ class SmartnoiseSynthQuerier(
         Raises:
             ExternalLibraryException: For exceptions from libraries
                 external to this package.
+            InternalServerException: If training the model spent more
+                budget than the estimated cost.
             InvalidQueryException: If the budget values are too small to
                 perform the query.
 
         Returns:
             pd.DataFrame: The resulting pd.DataFrame samples.
         """
-        if self.model is None:
+        expected_cost = self.cost(query_json)
+        self.model = self._model_pipeline(query_json)
+
+        # Check that training did not spend more than the estimated cost
+        spent_cost = get_spent_budget(self.model, query_json.synth_name)
+        if any(
+            spent > expected and not np.isclose(spent, expected)
+            for spent, expected in zip(spent_cost, expected_cost)
+        ):
             raise InternalServerException(
-                "Smartnoise Synth `query` method called before `cost` method"
+                f"Synthesizer spent {spent_cost} instead of the "
+                + f"estimated cost {expected_cost}."
             )
+
         if not query_json.return_model:
             # Sample
             df_samples = (
@@ -482,3 +542,100 @@ class SmartnoiseSynthQuerier(
             return df_samples.to_dict(orient="records")
 
         return serialise_model(self.model)
+
+
+def get_synthesizer_cost(
+    model: Synthesizer, synth_name: str, nb_rows: int
+) -> tuple[float, float]:
+    """Compute the budget that fitting a synthesizer will spend.
+
+    Args:
+        model (Synthesizer): The unfitted synthesizer model.
+        synth_name (str): Name of the synthesizer.
+        nb_rows (int): Number of rows of the training data.
+
+    Returns:
+        tuple[float, float]: The epsilon and delta cost of the fit.
+    """
+    if synth_name == SSynthMarginalSynthesizer.MWEM:
+        return model.epsilon, 0
+
+    # GAN synthesizers default delta, see snsynth.pytorch.nn
+    delta = model.delta
+    if delta is None:
+        delta = 1 / (nb_rows * np.sqrt(nb_rows))
+
+    if synth_name == SSynthGanSynthesizer.DP_CTGAN:
+        return get_dpctgan_cost(model, nb_rows, delta), delta
+    return model.epsilon, delta
+
+
+def get_dpctgan_cost(model: Synthesizer, nb_rows: int, delta: float) -> float:
+    """Compute the epsilon that DP-CTGAN training will spend.
+
+    DP-CTGAN checks the privacy spent by its discriminator before each
+    epoch and stops when it exceeds the target epsilon. The same accounting
+    is replayed here from the training parameters.
+
+    Args:
+        model (Synthesizer): The unfitted DP-CTGAN model.
+        nb_rows (int): Number of rows of the training data.
+        delta (float): The delta of the privacy accounting.
+
+    Raises:
+        ExternalLibraryException: If the batch size is larger than the
+            training data.
+
+    Returns:
+        float: The epsilon spent by the training.
+    """
+    batch_size = model._batch_size  # pylint: disable=protected-access
+    sample_rate = batch_size / nb_rows
+    if not 0 < sample_rate <= 1:
+        raise ExternalLibraryException(
+            DPLibraries.SMARTNOISE_SYNTH,
+            f"Error fitting model: sample_rate={sample_rate} is not a "
+            + "valid value. Please provide a float between 0 and 1. "
+            + "Try decreasing batch_size in "
+            + f"synth_params (default batch_size={SSYNTH_DEFAULT_BATCH_SIZE}).",
+        )
+
+    # The discriminator steps twice per batch with the cross entropy loss
+    steps_per_epoch = max(nb_rows // batch_size, 1)
+    if model.loss == "cross_entropy":
+        steps_per_epoch *= 2
+    rdp_per_step = np.array(
+        privacy_analysis.compute_rdp(
+            sample_rate, model.sigma, 1, SSYNTH_DPCTGAN_ALPHAS
+        )
+    )
+
+    epsilon = 0.0
+    for epoch in range(model._epochs):  # pylint: disable=protected-access
+        epsilon, _ = privacy_analysis.get_privacy_spent(
+            SSYNTH_DPCTGAN_ALPHAS,
+            rdp_per_step * epoch * steps_per_epoch,
+            delta,
+        )
+        if model.epsilon < epsilon:
+            break
+    return float(epsilon)
+
+
+def get_spent_budget(
+    model: Synthesizer, synth_name: str
+) -> tuple[float, float]:
+    """Get the budget spent by fitting a synthesizer.
+
+    Args:
+        model (Synthesizer): The fitted synthesizer model.
+        synth_name (str): Name of the synthesizer.
+
+    Returns:
+        tuple[float, float]: The epsilon and delta reported by the model.
+    """
+    if synth_name == SSynthMarginalSynthesizer.MWEM:
+        return model.epsilon, 0
+    if synth_name == SSynthGanSynthesizer.DP_CTGAN:
+        return model.epsilon_list[-1], model.delta
+    return model.epsilon, model.delta
@@ -45,10 +45,11 @@ def handle_missing_data(
         df_num_imputed = imp_mean.fit_transform(df[numerical_cols])
 
         # Impute categorical features with most frequent value
+        # (on a converted copy, the input dataframe must not be modified)
         imp_most_frequent = SimpleImputer(strategy="most_frequent")
-        df[categorical_cols] = df[categorical_cols].astype("object")
-        df[categorical_cols] = df[categorical_cols].replace({pd.NA: np.nan})
-        df_cat_imputed = imp_most_frequent.fit_transform(df[categorical_cols])
+        df_cat = df[categorical_cols].astype("object")
+        df_cat = df_cat.replace({pd.NA: np.nan})
+        df_cat_imputed = imp_most_frequent.fit_transform(df_cat)
 
         # Combine imputed dataframes
         df = pd.concat(
@@ -61,10 +62,9 @@ def handle_missing_data(
     elif imputer_strategy == "most_frequent":
         # Impute all features with most frequent value
         imp_most_frequent = SimpleImputer(strategy=imputer_strategy)
-        df[df.columns] = df[df.columns].astype("object")
-        df[df.columns] = df[df.columns].replace({pd.NA: np.nan})
+        df_obj = df.astype("object").replace({pd.NA: np.nan})
         df = pd.DataFrame(
-            imp_most_frequent.fit_transform(df), columns=df.columns
+            imp_most_frequent.fit_transform(df_obj), columns=df.columns
         )
     else:
         raise InvalidQueryException(
@@ -1,19 +1,20 @@
 from abc import ABC, abstractmethod
-from typing import Any, Generic, List, TypeVar
+from typing import TYPE_CHECKING, Any, Generic, List, Optional, TypeVar
 
 from lomas_server.admin_database.admin_database import AdminDatabase
 from lomas_server.data_connector.data_connector import DataConnector
 from lomas_server.utils.error_handler import (
     KNOWN_EXCEPTIONS,
     InternalServerException,
-    InvalidQueryException,
-    UnauthorizedAccessException,
 )
 from lomas_server.utils.query_models import (  # pylint: disable=W0611
     QueryModel,
     RequestModel,
 )
 
+if TYPE_CHECKING:  # The process pool imports the queriers
+    from lomas_server.dp_queries.process_pool import QueryProcessPool
+
 RequestModelGeneric = TypeVar("RequestModelGeneric", bound="RequestModel")
 QueryModelGeneric = TypeVar("QueryModelGeneric", bound="QueryModel")
 
@@ -40,6 +41,28 @@ class DPQuerier(ABC, Generic[RequestModelGeneric, QueryModelGeneric]):
         """
         self.data_connector = data_connector
         self.admin_database = admin_database
+        self.process_pool: Optional["QueryProcessPool"] = None
+
+    def set_process_pool(self, process_pool: "QueryProcessPool") -> None:
+        """Run the cost estimations and queries in worker processes.
+
+        Args:
+            process_pool (QueryProcessPool): The pool of worker processes.
+        """
+        self.process_pool = process_pool
+
+    def __getstate__(self) -> dict:
+        """Get the state sent to worker processes.
+
+        The admin database and the process pool stay in the server process.
+
+        Returns:
+            dict: The attributes of the querier.
+        """
+        state = self.__dict__.copy()
+        state["admin_database"] = None
+        state["process_pool"] = None
+        return state
 
     @abstractmethod
     def cost(self, query_json: RequestModelGeneric) -> tuple[float, float]:
@@ -70,6 +93,41 @@ class DPQuerier(ABC, Generic[RequestModelGeneric, QueryModelGeneric]):
                 The query result, to be added to the response dict.
         """
 
+    def run_cost(self, query_json: RequestModel) -> tuple[float, float]:
+        """
+        Estimate cost of query, in a worker process if there is a pool.
+
+        Args:
+            query_json (RequestModel): The input object of the request.
+
+        Returns:
+            tuple[float, float]: The tuple of costs, the first value is
+                the epsilon cost, the second value is the delta value.
+        """
+        if self.process_pool is None:
+            return self.cost(query_json)  # type: ignore [arg-type]
+        return self.process_pool.run(run_querier, self, query_json, False)
+
+    def run_query(
+        self, query_json: QueryModel
+    ) -> dict | int | float | List[Any] | Any | str:
+        """
+        Perform the query, in a worker process if there is a pool.
+
+        Without pool, the cost must have been estimated with
+        :py:meth:`run_cost` first.
+
+        Args:
+            query_json (QueryModel): The input object of the query.
+
+        Returns:
+            dict | int | float | List[Any] | Any | str:
+                The query result, to be added to the response dict.
+        """
+        if self.process_pool is None:
+            return self.query(query_json)  # type: ignore [arg-type]
+        return self.process_pool.run(run_querier, self, query_json, True)
+
     def handle_query(
         self,
         query_json: QueryModel,
@@ -84,10 +142,10 @@ class DPQuerier(ABC, Generic[RequestModelGeneric, QueryModelGeneric]):
             user_name (str, optional): User name.
 
         Raises:
-            UnauthorizedAccessException: A query is already
-                ongoing for this user,
-            the user does not exist or does not have access to the dataset.
-            InvalidQueryException: If the query is not valid.
+            UnauthorizedAccessException: If the user may not query, does
+                not exist or does not have access to the dataset.
+            InvalidQueryException: If the query is not valid or there is
+                not enough budget for it.
             InternalServerException: For any other unforseen exceptions.
 
         Returns:
@@ -101,64 +159,77 @@ class DPQuerier(ABC, Generic[RequestModelGeneric, QueryModelGeneric]):
                   for the query.
 
         """
-        # Block access to other queries to user
-        if not self.admin_database.get_and_set_may_user_query(
-            user_name, False
-        ):
-            raise UnauthorizedAccessException(
-                f"User {user_name} is trying to query"
-                + " before end of previous query."
-            )
+        # Get cost of the query
+        eps_cost, delta_cost = self.run_cost(query_json)
 
+        # Reserve the budget, other queries of the user can run meanwhile
+        reservation_id = self.admin_database.reserve_budget(
+            user_name, query_json.dataset_name, eps_cost, delta_cost
+        )
+
+        # Query, the reservation is kept while the query runs
         try:
-            # Get cost of the query
-            eps_cost, delta_cost = self.cost(query_json)  # type: ignore [arg-type]
-
-            # Check that enough budget to do the query
-            try:
-                (
-                    eps_remain,
-                    delta_remain,
-                ) = self.admin_database.get_remaining_budget(
-                    user_name, query_json.dataset_name
-                )
-            except UnauthorizedAccessException as e:
-                raise e
-
-            if (eps_remain < eps_cost) or (delta_remain < delta_cost):
-                raise InvalidQueryException(
-                    "Not enough budget for this query epsilon remaining "
-                    f"{eps_remain}, delta remaining {delta_remain}."
-                )
-
-            # Query
-            try:
-                query_response = self.query(query_json)  # type: ignore [arg-type]
-            except KNOWN_EXCEPTIONS as e:
-                raise e
-            except Exception as e:
-                raise InternalServerException(str(e)) from e
-
-            # Deduce budget from user
-            self.admin_database.update_budget(
-                user_name, query_json.dataset_name, eps_cost, delta_cost
+            with self.admin_database.keep_budget_reserved(
+                user_name, query_json.dataset_name, reservation_id
+            ):
+                query_response = self.run_query(query_json)
+        except KNOWN_EXCEPTIONS as e:
+            self.admin_database.refund_budget(
+                user_name, query_json.dataset_name, reservation_id
             )
-            response = {
-                "requested_by": user_name,
-                "query_response": query_response,
-                "spent_epsilon": eps_cost,
-                "spent_delta": delta_cost,
-            }
-
-            # Add query to db (for archive)
-            self.admin_database.save_query(user_name, query_json, response)
-
-        except Exception as e:
-            self.admin_database.set_may_user_query(user_name, True)
             raise e
-
-        # Re-enable user to query
-        self.admin_database.set_may_user_query(user_name, True)
+        except Exception as e:
+            self.admin_database.refund_budget(
+                user_name, query_json.dataset_name, reservation_id
+            )
+            raise InternalServerException(str(e)) from e
+
+        # Deduce budget from user
+        self.admin_database.commit_budget(
+            user_name,
+            query_json.dataset_name,
+            reservation_id,
+            eps_cost,
+            delta_cost,
+        )
+        response = {
+            "requested_by": user_name,
+            "query_response": query_response,
+            "spent_epsilon": eps_cost,
+            "spent_delta": delta_cost,
+        }
+
+        # Add query to db (for archive)
+        self.admin_database.save_query(user_name, query_json, response)
 
         # Return response
         return response
+
+
+def run_querier(
+    querier: DPQuerier, query_json: RequestModel, with_query: bool
+) -> Any:
+    """Estimate the cost of a query and perform it, in a worker process.
+
+    Args:
+        querier (DPQuerier): The querier, sent without its admin database.
+        query_json (RequestModel): The request or query.
+        with_query (bool): Whether to perform the query after estimating
+            its cost, queriers expect the cost to be estimated first.
+
+    Raises:
+        InternalServerException: For any unforseen exception, unknown
+            exceptions may not be sent back to the server process.
+
+    Returns:
+        Any: The query response if with_query, else the cost.
+    """
+    try:
+        cost = querier.cost(query_json)
+        if not with_query:
+            return cost
+        return querier.query(query_json)
+    except KNOWN_EXCEPTIONS as e:
+        raise e
+    except Exception as e:
+        raise InternalServerException(str(e)) from e
@@ -1,14 +1,23 @@
+from typing import Iterator
+
 import numpy as np
 import pandas as pd
 
 from lomas_server.admin_database.admin_database import AdminDatabase
 from lomas_server.constants import (
+    DUMMY_CACHE_MAX_ROWS,
+    DUMMY_CACHE_MAX_SIZE_MB,
+    DUMMY_CACHE_SIZE,
     DUMMY_NB_ROWS,
     DUMMY_SEED,
+    DUMMY_STREAM_CHUNK_SIZE,
     NB_RANDOM_NONE,
     RANDOM_STRINGS,
 )
-from lomas_server.data_connector.in_memory_connector import InMemoryConnector
+from lomas_server.data_connector.in_memory_connector import (
+    InMemoryConnector,
+    is_copy_on_write,
+)
 from lomas_server.utils.collection_models import (
     BooleanMetadata,
     CategoricalColumnMetadata,
@@ -19,10 +28,21 @@ from lomas_server.utils.collection_models import (
     StrMetadata,
 )
 from lomas_server.utils.error_handler import InternalServerException
+from lomas_server.utils.lru_cache import LRUCache
 from lomas_server.utils.query_models import RequestModel
 
+RANDOM_STRINGS_ARRAY = np.asarray(RANDOM_STRINGS, dtype=object)
+
+# Recently generated dummy datasets, keyed by serialised metadata, number
+# of rows and seed
+DUMMY_DATASETS_CACHE: LRUCache[pd.DataFrame] = LRUCache(
+    DUMMY_CACHE_SIZE,
+    DUMMY_CACHE_MAX_SIZE_MB * 1024 * 1024,
+    sizeof=lambda df: int(df.memory_usage(deep=True).sum()),
+)
+
 
-def make_dummy_dataset(  # pylint: disable=too-many-locals
+def make_dummy_dataset(
     metadata: Metadata, nb_rows: int = DUMMY_NB_ROWS, seed: int = DUMMY_SEED
 ) -> pd.DataFrame:
     """
@@ -42,20 +62,27 @@ def make_dummy_dataset(  # pylint: disable=too-many-locals
     # Creating new random generator with fixed seed
     rng = np.random.default_rng(seed)
 
-    # Create dataframe
-    df = pd.DataFrame()
+    # Create columns
+    columns = {}
     for col_name, data in metadata.columns.items():
         # Create a random serie based on the data type
         match data:
             case CategoricalColumnMetadata():
-                categories = data.categories
-                serie = pd.Series(rng.choice(categories, size=nb_rows))
+                categories = np.asarray(data.categories, dtype=object)
+                serie = pd.Series(
+                    categories[rng.integers(len(categories), size=nb_rows)]
+                )
             case StrMetadata():
-                serie = pd.Series(rng.choice(RANDOM_STRINGS, size=nb_rows))
+                serie = pd.Series(
+                    RANDOM_STRINGS_ARRAY[
+                        rng.integers(len(RANDOM_STRINGS_ARRAY), size=nb_rows)
+                    ]
+                )
             case BooleanMetadata():
                 # type boolean instead of bool will allow null values below
                 serie = pd.Series(
-                    rng.choice([True, False], size=nb_rows), dtype="boolean"
+                    rng.integers(2, size=nb_rows).astype(bool),
+                    dtype="boolean",
                 )
             case IntMetadata():
                 # pd.Series to ensure consistency between different types
@@ -77,10 +104,14 @@ def make_dummy_dataset(  # pylint: disable=too-many-locals
                     * rng.random(size=nb_rows, dtype=np.dtype(dtype))
                 )
             case DatetimeMetadata():
+                # Random days between the bounds, as in a daily date range
+                lower = pd.Timestamp(data.lower)
+                nb_days = (pd.Timestamp(data.upper) - lower).days
                 serie = pd.Series(
-                    rng.choice(
-                        pd.date_range(start=data.lower, end=data.upper),
-                        size=nb_rows,
+                    lower
+                    + pd.to_timedelta(
+                        rng.integers(nb_days, endpoint=True, size=nb_rows),
+                        unit="D",
                     )
                 )
             case _:
@@ -91,16 +122,82 @@ def make_dummy_dataset(  # pylint: disable=too-many-locals
 
         # Add None value if the column is nullable
         if data.nullable:
-            # Get the indexes of 'serie'
-            indexes = serie.index.tolist()
-            for _ in range(0, NB_RANDOM_NONE):
-                index_to_insert = rng.choice(indexes)
-                serie.at[index_to_insert] = None
+            none_mask = np.zeros(nb_rows, dtype=bool)
+            none_mask[rng.integers(nb_rows, size=NB_RANDOM_NONE)] = True
+            serie = serie.where(~none_mask, None)
 
-        # Add randomly generated data as new column of dataframe
-        df[col_name] = serie
+        columns[col_name] = serie
+
+    return pd.DataFrame(columns)
+
+
+def get_cached_dummy_dataset(
+    metadata: Metadata, nb_rows: int = DUMMY_NB_ROWS, seed: int = DUMMY_SEED
+) -> pd.DataFrame:
+    """
+    Get a dummy dataset, from a cache of the recently generated datasets.
+
+    Generation is deterministic for a given metadata, number of rows and
+    seed, so datasets of up to DUMMY_CACHE_MAX_ROWS rows are memoized,
+    within the byte budget of the cache.
+
+    Args:
+        metadata (Metadata): The metadata model for the real dataset.
+        nb_rows (int, optional): Number of rows. Defaults to DUMMY_NB_ROWS.
+        seed (int, optional): Random seed. Defaults to DUMMY_SEED.
 
-    return df
+    Raises:
+        InternalServerException: If any unknown column type occurs.
+
+    Returns:
+        pd.DataFrame: dummy dataframe based on metadata (a copy, lazy with
+            copy-on-write)
+    """
+    if nb_rows > DUMMY_CACHE_MAX_ROWS:
+        return make_dummy_dataset(metadata, nb_rows, seed)
+
+    dummy_df = DUMMY_DATASETS_CACHE.get_or_create(
+        (metadata.model_dump_json(), nb_rows, seed),
+        lambda: make_dummy_dataset(metadata, nb_rows, seed),
+    )
+    return dummy_df.copy(deep=not is_copy_on_write())
+
+
+def iter_dummy_dataset(
+    metadata: Metadata,
+    nb_rows: int = DUMMY_NB_ROWS,
+    seed: int = DUMMY_SEED,
+    chunk_size: int = DUMMY_STREAM_CHUNK_SIZE,
+) -> Iterator[pd.DataFrame]:
+    """
+    Generate a dummy dataset lazily, by chunks of rows.
+
+    Each chunk is generated with its own seed derived from seed, so the
+    stream is reproducible while only one chunk is held in memory. The rows
+    differ from those of make_dummy_dataset with the same seed.
+
+    Args:
+        metadata (Metadata): The metadata model for the real dataset.
+        nb_rows (int, optional): Number of rows. Defaults to DUMMY_NB_ROWS.
+        seed (int, optional): Random seed. Defaults to DUMMY_SEED.
+        chunk_size (int, optional): Maximum number of rows per chunk.
+            Defaults to DUMMY_STREAM_CHUNK_SIZE.
+
+    Raises:
+        InternalServerException: If any unknown column type occurs.
+
+    Yields:
+        pd.DataFrame: The successive chunks of the dummy dataframe.
+    """
+    nb_chunks = -(-nb_rows // chunk_size)
+    chunk_seeds = np.random.SeedSequence(seed).spawn(nb_chunks)
+    for i, chunk_seed in enumerate(chunk_seeds):
+        chunk_nb_rows = min(chunk_size, nb_rows - i * chunk_size)
+        chunk_df = make_dummy_dataset(
+            metadata, chunk_nb_rows, int(chunk_seed.generate_state(1)[0])
+        )
+        chunk_df.index += i * chunk_size
+        yield chunk_df
 
 
 def get_dummy_dataset_for_query(
@@ -119,7 +216,7 @@ def get_dummy_dataset_for_query(
     """
     # Create dummy dataset based on seed and number of rows
     ds_metadata = admin_database.get_dataset_metadata(query_json.dataset_name)
-    ds_df = make_dummy_dataset(
+    ds_df = get_cached_dummy_dataset(
         ds_metadata,
         query_json.dummy_nb_rows,
         query_json.dummy_seed,
@@ -0,0 +1,333 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from lomas_server.constants import (
+    INTERNAL_SERVER_ERROR,
+    JOBS_MAX_FINISHED,
+    JOBS_MAX_PER_USER,
+    JOBS_MAX_WORKERS,
+    JOBS_RESULT_TTL,
+    JOBS_RESULTS_MAX_SIZE_MB,
+    JobStatus,
+)
+from lomas_server.utils.error_handler import (
+    KNOWN_EXCEPTIONS,
+    InternalServerException,
+    InvalidQueryException,
+    UnauthorizedAccessException,
+)
+from lomas_server.utils.logger import LOG
+
+
+class Job:  # pylint: disable=too-many-instance-attributes
+    """
+    A query submitted by a user and run in the background.
+    """
+
+    def __init__(
+        self,
+        user_name: str,
+        dataset_name: str,
+        dp_library: str,
+        task: Callable[[], dict],
+    ) -> None:
+        """Initializer.
+
+        Args:
+            user_name (str): The user who submitted the job.
+            dataset_name (str): The dataset queried by the job.
+            dp_library (str): The DP library of the query.
+            task (Callable[[], dict]): Function running the query and
+                returning its response.
+        """
+        self.job_id: str = str(uuid.uuid4())
+        self.user_name = user_name
+        self.dataset_name = dataset_name
+        self.dp_library = dp_library
+        self.task = task
+        self.status: JobStatus = JobStatus.PENDING
+        self.result: Optional[dict] = None
+        self.error: Optional[BaseException] = None
+        self.future: Optional[Future] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Describe the job without its result.
+
+        Returns:
+            Dict[str, Any]: The job id, status, dataset and DP library
+                and the error message if the job failed.
+        """
+        job = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "dataset_name": self.dataset_name,
+            "dp_library": self.dp_library,
+        }
+        if isinstance(self.error, InternalServerException):
+            job["error"] = INTERNAL_SERVER_ERROR
+        elif self.error is not None:
+            job["error"] = getattr(
+                self.error, "error_message", str(self.error)
+            )
+        return job
+
+
+class JobManager:
+    """
+    Runs the query jobs of the users on a bounded pool of workers.
+
+    The jobs of a user run one at a time in submission order, so that a
+    user cannot hold all the workers. Finished jobs are kept for their
+    result within a number of jobs, a total size of the results and a
+    time to live, the responses stay available in the query archives.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = JOBS_MAX_WORKERS,
+        max_jobs_per_user: int = JOBS_MAX_PER_USER,
+        max_finished_jobs: int = JOBS_MAX_FINISHED,
+        results_max_size_bytes: int = JOBS_RESULTS_MAX_SIZE_MB * 1024 * 1024,
+        result_ttl: float = JOBS_RESULT_TTL,
+    ) -> None:
+        """Initializer.
+
+        Args:
+            max_workers (int, optional): Number of jobs running at the
+                same time. Defaults to JOBS_MAX_WORKERS.
+            max_jobs_per_user (int, optional): Maximum number of pending and
+                running jobs of a user. Defaults to JOBS_MAX_PER_USER.
+            max_finished_jobs (int, optional): Number of finished jobs kept
+                for their result, the oldest are forgotten first.
+                Defaults to JOBS_MAX_FINISHED.
+            results_max_size_bytes (int, optional): Maximum total size in
+                bytes of the results of the finished jobs.
+                Defaults to JOBS_RESULTS_MAX_SIZE_MB.
+            result_ttl (float, optional): Number of seconds a finished job
+                is kept. Defaults to JOBS_RESULT_TTL.
+        """
+        self.max_jobs_per_user = max_jobs_per_user
+        self.max_finished_jobs = max_finished_jobs
+        self.results_max_size_bytes = results_max_size_bytes
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="lomas-job"
+        )
+        self._jobs: Dict[str, Job] = {}
+        # Finish time and result size of the finished jobs, oldest first
+        self._finished: OrderedDict[str, Tuple[float, int]] = OrderedDict()
+        self._finished_size_bytes = 0
+        # Jobs of each user waiting for the previous one to finish
+        self._queues: Dict[str, Deque[Job]] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        user_name: str,
+        dataset_name: str,
+        dp_library: str,
+        task: Callable[[], dict],
+    ) -> Job:
+        """Submit a job, it starts once the previous jobs of the user end.
+
+        Args:
+            user_name (str): The user submitting the job.
+            dataset_name (str): The dataset queried by the job.
+            dp_library (str): The DP library of the query.
+            task (Callable[[], dict]): Function running the query and
+                returning its response.
+
+        Raises:
+            UnauthorizedAccessException: If the user already has the maximum
+                number of pending and running jobs.
+
+        Returns:
+            Job: The submitted job.
+        """
+        job = Job(user_name, dataset_name, dp_library, task)
+        with self._lock:
+            queue = self._queues.setdefault(user_name, deque())
+            if len(queue) >= self.max_jobs_per_user:
+                raise UnauthorizedAccessException(
+                    f"User {user_name} already has {len(queue)} "
+                    + "unfinished jobs, wait for one of them to finish."
+                )
+            self._jobs[job.job_id] = job
+            queue.append(job)
+            if len(queue) == 1:
+                self._start(job)
+        return job
+
+    def get(self, job_id: str, user_name: str) -> Job:
+        """Get a job of the user.
+
+        Args:
+            job_id (str): The job id.
+            user_name (str): The user requesting the job.
+
+        Raises:
+            InvalidQueryException: If the job does not exist.
+            UnauthorizedAccessException: If the job was submitted by
+                another user.
+
+        Returns:
+            Job: The job.
+        """
+        with self._lock:
+            self._forget_finished()
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise InvalidQueryException(
+                f"Job {job_id} does not exist or has expired."
+            )
+        if job.user_name != user_name:
+            raise UnauthorizedAccessException(
+                f"{user_name} does not have access to job {job_id}."
+            )
+        return job
+
+    def get_result(self, job_id: str, user_name: str) -> dict:
+        """Get the response of a finished job of the user.
+
+        Args:
+            job_id (str): The job id.
+            user_name (str): The user requesting the job.
+
+        Raises:
+            InvalidQueryException: If the job does not exist, is not
+                finished or was cancelled.
+            UnauthorizedAccessException: If the job was submitted by
+                another user.
+            BaseException: The exception raised by the query of a failed job.
+
+        Returns:
+            dict: The query response.
+        """
+        job = self.get(job_id, user_name)
+        match job.status:
+            case JobStatus.COMPLETED:
+                assert job.result is not None  # Helps mypy
+                return job.result
+            case JobStatus.FAILED:
+                assert job.error is not None  # Helps mypy
+                raise job.error
+            case _:
+                raise InvalidQueryException(
+                    f"Job {job_id} has no result, its status is {job.status}."
+                )
+
+    def cancel(self, job_id: str, user_name: str) -> Job:
+        """Cancel a pending job of the user.
+
+        Args:
+            job_id (str): The job id.
+            user_name (str): The user requesting the job.
+
+        Raises:
+            InvalidQueryException: If the job does not exist or has already
+                started.
+            UnauthorizedAccessException: If the job was submitted by
+                another user.
+
+        Returns:
+            Job: The cancelled job.
+        """
+        job = self.get(job_id, user_name)
+        with self._lock:
+            if job.status != JobStatus.PENDING or (
+                job.future is not None and not job.future.cancel()
+            ):
+                raise InvalidQueryException(
+                    f"Job {job_id} cannot be cancelled, "
+                    + f"its status is {job.status}."
+                )
+            self._finish(job, JobStatus.CANCELLED)
+        return job
+
+    def shutdown(self) -> None:
+        """Cancel the pending jobs and wait for the running ones."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _start(self, job: Job) -> None:
+        """Submit a job to the workers, must be called with the lock.
+
+        Args:
+            job (Job): The job at the head of its user queue.
+        """
+        job.future = self._executor.submit(self._run, job)
+
+    def _run(self, job: Job) -> None:
+        """Run a job in a worker.
+
+        Args:
+            job (Job): The job to run.
+        """
+        with self._lock:
+            if job.status != JobStatus.PENDING:
+                return
+            job.status = JobStatus.RUNNING
+
+        status = JobStatus.COMPLETED
+        try:
+            job.result = job.task()
+        except KNOWN_EXCEPTIONS as e:
+            job.error = e
+            status = JobStatus.FAILED
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            LOG.exception(f"Job {job.job_id} failed: {e}")
+            job.error = InternalServerException(str(e))
+            status = JobStatus.FAILED
+
+        with self._lock:
+            self._finish(job, status)
+
+    def _finish(self, job: Job, status: JobStatus) -> None:
+        """Mark a job as finished and start the next job of the user,
+        must be called with the lock.
+
+        Args:
+            job (Job): The finished job.
+            status (JobStatus): The final status of the job.
+        """
+        was_head = False
+        queue = self._queues[job.user_name]
+        if queue and queue[0] is job:
+            was_head = True
+        queue.remove(job)
+        job.status = status
+        job.task = lambda: {}  # Release the query inputs
+
+        if was_head and queue:
+            self._start(queue[0])
+        if not queue:
+            del self._queues[job.user_name]
+
+        size = 0
+        if job.result is not None:
+            size = len(json.dumps(job.result, default=str))
+        self._finished[job.job_id] = (time.monotonic(), size)
+        self._finished_size_bytes += size
+        self._forget_finished()
+
+    def _forget_finished(self) -> None:
+        """Forget the oldest finished jobs until the number of jobs, the
+        size of their results and their age are within the limits, must
+        be called with the lock.
+        """
+        expired = time.monotonic() - self.result_ttl
+        while self._finished:
+            job_id, (finished_at, size) = next(iter(self._finished.items()))
+            if (
+                len(self._finished) <= self.max_finished_jobs
+                and self._finished_size_bytes <= self.results_max_size_bytes
+                and finished_at > expired
+            ):
+                break
+            self._finished.popitem(last=False)
+            self._finished_size_bytes -= size
+            del self._jobs[job_id]
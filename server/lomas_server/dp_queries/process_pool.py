@@ -0,0 +1,140 @@
+import importlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, TypeVar
+
+import pandas as pd
+
+from lomas_server.data_connector.data_cache import (
+    DataFrameCache,
+    on_data_invalidation,
+    set_worker_data_cache,
+)
+from lomas_server.data_connector.mmap_store import MmapDatasetStore
+from lomas_server.dp_queries.dp_libraries.opendp import (
+    set_opendp_features_config,
+)
+from lomas_server.utils.config import DataCacheConfig, OpenDPConfig
+from lomas_server.utils.error_handler import InternalServerException
+from lomas_server.utils.logger import LOG
+
+ResultT = TypeVar("ResultT")
+
+
+def init_worker(
+    opendp_config: OpenDPConfig, data_cache_config: DataCacheConfig
+) -> None:
+    """Set up a worker process as the server process is set up.
+
+    Args:
+        opendp_config (OpenDPConfig): The OpenDP features to enable.
+        data_cache_config (DataCacheConfig): The config of the cache of
+            the datasets loaded by the worker.
+    """
+    pd.set_option("mode.copy_on_write", True)
+    set_opendp_features_config(opendp_config)
+
+    if data_cache_config.enabled:
+        mmap_store = None
+        if data_cache_config.mmap_dir:
+            mmap_store = MmapDatasetStore(data_cache_config.mmap_dir)
+        data_cache = DataFrameCache(
+            int(data_cache_config.max_size_mb * 1024 * 1024), mmap_store
+        )
+        set_worker_data_cache(data_cache)
+        on_data_invalidation(
+            lambda dataset_name: data_cache.invalidate(
+                dataset_name, remove_files=False
+            )
+        )
+
+
+def warm_up_worker() -> None:
+    """Import all the DP libraries, run in the workers at startup so that
+    the first queries do not wait for the imports."""
+    importlib.import_module("lomas_server.dp_queries.dp_libraries.factory")
+
+
+class QueryProcessPool:
+    """
+    Pool of worker processes running the CPU-bound DP computations.
+
+    DP libraries hold the GIL during most of their computations, so
+    running them in the server process slows down every other request.
+    The workers are long-lived and keep the datasets and library caches
+    they loaded for the next tasks. The connectors sent with the tasks
+    carry the invalidation generation of their dataset, so that the
+    workers drop their caches of a dataset invalidated in the server.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        opendp_config: OpenDPConfig,
+        data_cache_config: DataCacheConfig,
+    ) -> None:
+        """Initializer. Starts the worker processes.
+
+        Args:
+            max_workers (int): Number of worker processes.
+            opendp_config (OpenDPConfig): The OpenDP features to enable
+                in the workers.
+            data_cache_config (DataCacheConfig): The config of the cache of
+                the datasets loaded by each worker.
+        """
+        self.max_workers = max_workers
+        self.opendp_config = opendp_config
+        self.data_cache_config = data_cache_config
+        self._executor = self._create_executor()
+        self._lock = threading.Lock()
+
+    def run(self, fn: Callable[..., ResultT], *args: Any) -> ResultT:
+        """Run a function in a worker process and wait for its result.
+
+        Args:
+            fn (Callable[..., ResultT]): A module-level function.
+            *args (Any): The picklable arguments of fn.
+
+        Raises:
+            InternalServerException: If the worker process died, the pool
+                is then restarted.
+
+        Returns:
+            ResultT: The result of fn, exceptions raised by fn are raised.
+        """
+        executor = self._executor
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool as e:
+            LOG.exception(f"Worker process died: {e}")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = self._create_executor()
+            raise InternalServerException(
+                "Worker process died while running the query."
+            ) from e
+
+    def shutdown(self) -> None:
+        """Stop the worker processes once their tasks are done."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        """Start the worker processes.
+
+        Workers are spawned rather than forked from the multi-threaded
+        server process.
+
+        Returns:
+            ProcessPoolExecutor: The executor of the worker processes.
+        """
+        executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(self.opendp_config, self.data_cache_config),
+        )
+        for _ in range(self.max_workers):
+            executor.submit(warm_up_worker)
+        return executor
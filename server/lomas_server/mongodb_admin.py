@@ -10,6 +10,8 @@ from pymongo.results import _WriteResult
 
 from lomas_server.admin_database.mongodb_database import (
     check_result_acknowledged,
+    create_indexes,
+    increment_datasets_version,
 )
 from lomas_server.constants import PrivateDatabaseType
 from lomas_server.utils.collection_models import (
@@ -142,7 +144,7 @@ def check_dataset_and_metadata_exist(enforce_true: bool) -> Callable:
                 )
 
             metadata_count = db.metadata.count_documents(
-                {dataset: {"$exists": True}}
+                {"dataset_name": dataset}
             )
 
             if enforce_true and metadata_count == 0:
@@ -429,6 +431,7 @@ def add_users_via_yaml(
     if clean:
         # Collection created from scratch
         db.users.drop()
+        create_indexes(db, ["users"])
         LOG.info("Cleaning done. \n")
 
     # Load yaml data and insert it
@@ -629,8 +632,11 @@ def add_dataset(  # pylint: disable=too-many-arguments, too-many-locals
     # Step 3: Insert into db
     res = db.datasets.insert_one(dataset)
     check_result_acknowledged(res)
-    res = db.metadata.insert_one({dataset_name: metadata_dict})
+    res = db.metadata.insert_one(
+        {"dataset_name": dataset_name, "metadata": metadata_dict}
+    )
     check_result_acknowledged(res)
+    increment_datasets_version(db)
 
     LOG.info(
         f"Added dataset {dataset_name} with database "
@@ -667,6 +673,7 @@ def add_datasets_via_yaml(  # pylint: disable=R0912, R0914, R0915
         # Collection created from scratch
         db.datasets.drop()
         db.metadata.drop()
+        create_indexes(db, ["datasets", "metadata"])
         LOG.info("Cleaning done. \n")
 
     if isinstance(yaml_file, str):
@@ -743,13 +750,13 @@ def add_datasets_via_yaml(  # pylint: disable=R0912, R0914, R0915
                 )
 
         # Overwrite or not depending on config if metadata already exists
-        metadata_filter = {dataset_name: metadata_dict}
+        metadata_filter = {"dataset_name": dataset_name}
         metadata = db.metadata.find_one(metadata_filter)
 
         if metadata and overwrite_metadata:
             LOG.info(f"Metadata updated for dataset : {dataset_name}.")
             res = db.metadata.update_one(
-                metadata_filter, {"$set": {dataset_name: metadata_dict}}
+                metadata_filter, {"$set": {"metadata": metadata_dict}}
             )
             check_result_acknowledged(res)
         elif metadata:
@@ -758,10 +765,14 @@ def add_datasets_via_yaml(  # pylint: disable=R0912, R0914, R0915
                 "Use the command -om to overwrite with new values."
             )
         else:
-            res = db.metadata.insert_one({dataset_name: metadata_dict})
+            res = db.metadata.insert_one(
+                {"dataset_name": dataset_name, "metadata": metadata_dict}
+            )
             check_result_acknowledged(res)
             LOG.info(f"Added metadata of {dataset_name} dataset. ")
 
+    increment_datasets_version(db)
+
 
 @check_dataset_and_metadata_exist(True)
 def del_dataset(db: Database, dataset: str) -> None:
@@ -776,8 +787,9 @@ def del_dataset(db: Database, dataset: str) -> None:
     """
     res = db.datasets.delete_many({"dataset_name": dataset})
     check_result_acknowledged(res)
-    res = db.metadata.delete_many({dataset: {"$exists": True}})
+    res = db.metadata.delete_many({"dataset_name": dataset})
     check_result_acknowledged(res)
+    increment_datasets_version(db)
     LOG.info(f"Deleted dataset and metadata for {dataset}.")
 
 
@@ -810,11 +822,11 @@ def get_metadata_of_dataset(db: Database, dataset: str) -> dict:
         metadata (dict): informations about the metadata
     """
     # Retrieve the document containing metadata for the specified dataset
-    metadata_document = db.metadata.find_one({dataset: {"$exists": True}})
+    metadata_document = db.metadata.find_one({"dataset_name": dataset})
     assert metadata_document is not None, "Metadata must exist"
 
     # Extract metadata for the specified dataset
-    metadata_info = metadata_document[dataset]
+    metadata_info = metadata_document["metadata"]
     LOG.info(metadata_info)
     return metadata_info
 
@@ -835,10 +847,43 @@ def get_list_of_datasets(db: Database) -> list:
     return dataset_names
 
 
+def migrate_metadata(db: Database) -> None:
+    """Migrate the metadata collection to documents keyed by dataset name.
+
+    Metadata used to be stored as {dataset_name: metadata} documents,
+    which cannot be looked up with an index. They are replaced by
+    {"dataset_name": dataset_name, "metadata": metadata} documents.
+
+    Args:
+        db (Database): mongo database object
+
+    Returns:
+        None
+    """
+    nb_migrated = 0
+    for document in db.metadata.find({"dataset_name": {"$exists": False}}):
+        document_id = document.pop("_id")
+        new_documents = [
+            {"dataset_name": dataset_name, "metadata": metadata}
+            for dataset_name, metadata in document.items()
+        ]
+        if new_documents:
+            res: _WriteResult = db.metadata.insert_many(new_documents)
+            check_result_acknowledged(res)
+        res = db.metadata.delete_one({"_id": document_id})
+        check_result_acknowledged(res)
+        nb_migrated += len(new_documents)
+    increment_datasets_version(db)
+    LOG.info(f"Migrated metadata of {nb_migrated} datasets.")
+
+
 #######################  COLLECTIONS  ####################### # noqa: E266
 def drop_collection(db: Database, collection: str) -> None:
     """Delete collection.
 
+    The indexes of the collection are created again for the next
+    documents.
+
     Args:
         db (Database): mongo database object
         collection (str): Collection name to be deleted.
@@ -847,6 +892,9 @@ def drop_collection(db: Database, collection: str) -> None:
         None
     """
     db.drop_collection(collection)
+    create_indexes(db, [collection])
+    if collection in ("datasets", "metadata"):
+        increment_datasets_version(db)
     LOG.info(f"Deleted collection {collection}.")
 
 
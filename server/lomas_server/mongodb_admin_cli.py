@@ -24,6 +24,7 @@ from lomas_server.mongodb_admin import (
     get_list_of_users,
     get_metadata_of_dataset,
     get_user,
+    migrate_metadata,
     set_budget_field,
     set_may_query,
 )
@@ -355,6 +356,14 @@ if __name__ == "__main__":
     )
     get_datasets_parser.set_defaults(func=get_list_of_datasets)
 
+    # Function: Migrate Metadata
+    migrate_metadata_parser = subparsers.add_parser(
+        "migrate_metadata",
+        help="key the metadata collection documents by dataset name",
+        parents=[connection_parser],
+    )
+    migrate_metadata_parser.set_defaults(func=migrate_metadata)
+
     #######################  COLLECTIONS  ####################### # noqa: E266
     # Create the parser for the "drop_collection" command
     drop_collection_parser = subparsers.add_parser(
@@ -459,6 +468,7 @@ if __name__ == "__main__":
             mongo_db, args.dataset
         ),
         "get_list_of_datasets": lambda args: get_list_of_datasets(mongo_db),
+        "migrate_metadata": lambda args: migrate_metadata(mongo_db),
         "drop_collection": lambda args: drop_collection(
             mongo_db, args.collection
         ),
@@ -1,8 +1,19 @@
+import json
+from typing import Iterator
+
 from fastapi import APIRouter, Body, Depends, Header, Request
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import (
+    JSONResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 
+from lomas_server.data_connector.data_cache import invalidate_data
 from lomas_server.data_connector.data_connector import get_column_dtypes
-from lomas_server.dp_queries.dummy_dataset import make_dummy_dataset
+from lomas_server.dp_queries.dummy_dataset import (
+    get_cached_dummy_dataset,
+    iter_dummy_dataset,
+)
 from lomas_server.routes.utils import server_live
 from lomas_server.utils.error_handler import (
     KNOWN_EXCEPTIONS,
@@ -12,8 +23,16 @@ from lomas_server.utils.error_handler import (
 from lomas_server.utils.query_examples import (
     example_get_admin_db_data,
     example_get_dummy_dataset,
+    example_invalidate_data_cache,
+    example_stream_dummy_dataset,
+)
+from lomas_server.utils.query_models import (
+    GetDbData,
+    GetDummyDataset,
+    GetPreviousQueries,
+    InvalidateDataCache,
+    StreamDummyDataset,
 )
-from lomas_server.utils.query_models import GetDbData, GetDummyDataset
 
 router = APIRouter()
 
@@ -52,6 +71,72 @@ async def get_state(
     )
 
 
+# Invalidate cached private datasets
+@router.post(
+    "/invalidate_data_cache",
+    dependencies=[Depends(server_live)],
+    tags=["ADMIN_USER"],
+)
+def invalidate_data_cache(
+    request: Request,
+    query_json: InvalidateDataCache = Body(example_invalidate_data_cache),
+    user_name: str = Header(None),
+) -> JSONResponse:
+    """Removes private datasets from the data caches.
+
+    Cached datasets and the data derived from them (e.g. smartnoise-sql
+    readers, OpenDP inputs, worker processes caches) are reloaded from
+    their source on the next query. Only users with access to the dataset
+    may invalidate it and only known users may invalidate all datasets.
+
+    Args:
+        request (Request): Raw request object
+        query_json (InvalidateDataCache, optional): A JSON object containing:
+            - dataset_name (str, optional): The name of the dataset to
+              invalidate. If not set, all the datasets are invalidated.
+
+            Defaults to Body(example_invalidate_data_cache).
+
+        user_name (str, optional): The user name. Defaults to Header(None).
+
+    Raises:
+        UnauthorizedAccessException: The user does not exist or does not
+            have access to the dataset.
+
+    Returns:
+        JSONResponse: a JSON object with:
+            - requested_by (str): The user name.
+            - invalidated_entries (int): The number of datasets (and
+              projections) removed from the in-memory data cache.
+    """
+    app = request.app
+
+    dataset_name = query_json.dataset_name
+    if dataset_name is None:
+        if not app.state.admin_database.does_user_exist(user_name):
+            raise UnauthorizedAccessException(
+                f"User {user_name} does not exist. "
+                + "Please, verify the client object initialisation.",
+            )
+    elif not app.state.admin_database.has_user_access_to_dataset(
+        user_name, dataset_name
+    ):
+        raise UnauthorizedAccessException(
+            f"{user_name} does not have access to {dataset_name}.",
+        )
+
+    invalidate_data(dataset_name)
+    nb_invalidated = 0
+    if app.state.data_cache is not None:
+        nb_invalidated = app.state.data_cache.invalidate(dataset_name)
+    return JSONResponse(
+        content={
+            "requested_by": user_name,
+            "invalidated_entries": nb_invalidated,
+        }
+    )
+
+
 # Metadata query
 @router.post(
     "/get_dataset_metadata",
@@ -153,7 +238,7 @@ def get_dummy_dataset(
         )
         dtypes, datetime_columns = get_column_dtypes(ds_metadata)
 
-        dummy_df = make_dummy_dataset(
+        dummy_df = get_cached_dummy_dataset(
             ds_metadata,
             query_json.dummy_nb_rows,
             query_json.dummy_seed,
@@ -176,6 +261,84 @@ def get_dummy_dataset(
     )
 
 
+# Streamed dummy dataset query
+@router.post(
+    "/stream_dummy_dataset",
+    dependencies=[Depends(server_live)],
+    tags=["USER_DUMMY"],
+)
+def stream_dummy_dataset(
+    request: Request,
+    query_json: StreamDummyDataset = Body(example_stream_dummy_dataset),
+    user_name: str = Header(None),
+) -> StreamingResponse:
+    """
+    Generates and streams a dummy dataset by chunks of rows.
+
+    The response is newline delimited JSON: the first line contains the
+    column types and the list of datetime columns, each following line is
+    a row of the dataset. Only one chunk of rows is in memory at a time.
+
+    Args:
+        request (Request): Raw request object
+        query_json (StreamDummyDataset, optional):
+            A JSON object containing the following:
+                - nb_rows (int, optional): The number of rows in the
+                  dummy dataset (default: 100).
+                - seed (int, optional): The random seed for generating
+                  the dummy dataset (default: 42).
+                - chunk_size (int, optional): The number of rows
+                  generated at once (default: 10000).
+            Defaults to Body(example_stream_dummy_dataset).
+
+    Raises:
+        InternalServerException: For any other unforseen exceptions.
+        UnauthorizedAccessException: The user does not have access
+            to the dataset.
+
+    Returns:
+        StreamingResponse: the stream of the dummy dataset rows.
+    """
+    app = request.app
+
+    dataset_name = query_json.dataset_name
+    if not app.state.admin_database.has_user_access_to_dataset(
+        user_name, dataset_name
+    ):
+        raise UnauthorizedAccessException(
+            f"{user_name} does not have access to {dataset_name}.",
+        )
+
+    try:
+        ds_metadata = app.state.admin_database.get_dataset_metadata(
+            query_json.dataset_name
+        )
+        dtypes, datetime_columns = get_column_dtypes(ds_metadata)
+    except KNOWN_EXCEPTIONS as e:
+        raise e
+    except Exception as e:
+        raise InternalServerException(str(e)) from e
+
+    def generate_lines() -> Iterator[str]:
+        yield json.dumps(
+            {"dtypes": dtypes, "datetime_columns": datetime_columns}
+        ) + "\n"
+        for chunk_df in iter_dummy_dataset(
+            ds_metadata,
+            query_json.dummy_nb_rows,
+            query_json.dummy_seed,
+            query_json.chunk_size,
+        ):
+            for col in datetime_columns:
+                chunk_df[col] = chunk_df[col].dt.strftime("%Y-%m-%dT%H:%M:%S")
+            # Records are newline terminated
+            yield chunk_df.to_json(orient="records", lines=True)
+
+    return StreamingResponse(
+        generate_lines(), media_type="application/x-ndjson"
+    )
+
+
 # MongoDB get initial budget
 @router.post(
     "/get_initial_budget",
@@ -355,16 +518,28 @@ def get_remaining_budget(
 )
 def get_user_previous_queries(
     request: Request,
-    query_json: GetDbData = Body(example_get_admin_db_data),
+    query_json: GetPreviousQueries = Body(example_get_admin_db_data),
     user_name: str = Header(None),
 ) -> JSONResponse:
     """
-    Returns the query history of a user on a specific dataset.
+    Returns the query history of a user on a specific dataset,
+    sorted by timestamp.
 
     Args:
         request (Request): Raw request object
-        query_json (GetDbData, optional): A JSON object containing:
+        query_json (GetPreviousQueries, optional): A JSON object containing:
             - dataset_name (str): The name of the dataset.
+            - limit (int, optional): The number of queries per page,
+              all the queries if not set.
+            - cursor (str, optional): The next_cursor of the previous page.
+            - start_time (float, optional): Only queries from this
+              timestamp.
+            - end_time (float, optional): Only queries before this
+              timestamp.
+            - dp_libraries (list[str], optional): Only queries with these
+              DP libraries.
+            - metadata_only (bool, optional): Whether to leave out the
+              query responses. Defaults to False.
 
             Defaults to Body(example_get_admin_db_data).
 
@@ -375,7 +550,8 @@ def get_user_previous_queries(
         ExternalLibraryException: For exceptions from libraries
             external to this package.
         InternalServerException: For any other unforseen exceptions.
-        InvalidQueryException: The dataset does not exist.
+        InvalidQueryException: The dataset does not exist or
+            the cursor is not valid.
         UnauthorizedAccessException: The user does not exist or
             the user does not have access to the dataset.
 
@@ -383,16 +559,25 @@ def get_user_previous_queries(
         JSONResponse: A JSON object containing:
             - previous_queries (list[dict]): a list of dictionaries
               containing the previous queries.
+            - next_cursor (str): the cursor of the next page,
+              None if it is the last page.
     """
     app = request.app
 
     try:
-        previous_queries = app.state.admin_database.get_user_previous_queries(
-            user_name, query_json.dataset_name
+        previous_queries, next_cursor = (
+            app.state.admin_database.get_user_previous_queries(
+                user_name, query_json.dataset_name, query_json
+            )
         )
     except KNOWN_EXCEPTIONS as e:
         raise e
     except Exception as e:
         raise InternalServerException(str(e)) from e
 
-    return JSONResponse(content={"previous_queries": previous_queries})
+    return JSONResponse(
+        content={
+            "previous_queries": previous_queries,
+            "next_cursor": next_cursor,
+        }
+    )
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Body, Depends, Header, Request
+from fastapi import APIRouter, Body, Depends, Header, Request, Response
 from fastapi.responses import JSONResponse
 
 from lomas_server.constants import DPLibraries
@@ -7,6 +7,7 @@ from lomas_server.routes.utils import (
     handle_query_on_dummy_dataset,
     handle_query_on_private_dataset,
     server_live,
+    submit_query_on_private_dataset,
 )
 from lomas_server.utils.query_examples import (
     example_diffprivlib,
@@ -14,6 +15,7 @@ from lomas_server.utils.query_examples import (
     example_dummy_opendp,
     example_dummy_smartnoise_sql,
     example_dummy_smartnoise_synth_query,
+    example_job,
     example_opendp,
     example_smartnoise_sql,
     example_smartnoise_sql_cost,
@@ -24,6 +26,7 @@ from lomas_server.utils.query_models import (
     DiffPrivLibDummyQueryModel,
     DiffPrivLibQueryModel,
     DiffPrivLibRequestModel,
+    JobModel,
     OpenDPDummyQueryModel,
     OpenDPQueryModel,
     OpenDPRequestModel,
@@ -34,6 +37,7 @@ from lomas_server.utils.query_models import (
     SmartnoiseSynthQueryModel,
     SmartnoiseSynthRequestModel,
 )
+from lomas_server.utils.response_encoding import encode_query_response
 
 router = APIRouter()
 
@@ -47,7 +51,7 @@ def smartnoise_sql_handler(
     request: Request,
     query_json: SmartnoiseSQLQueryModel = Body(example_smartnoise_sql),
     user_name: str = Header(None),
-) -> JSONResponse:
+) -> Response:
     """
     Handles queries for the SmartNoiseSQL library.
 
@@ -81,7 +85,8 @@ def smartnoise_sql_handler(
             the user does not exist or does not have access to the dataset.
 
     Returns:
-        JSONResponse: A JSON object containing the following:
+        Response: A JSON object or an Arrow IPC stream, depending on the
+            Accept header, containing the following:
             - requested_by (str): The user name.
             - query_response (pd.DataFrame): A DataFrame containing
               the query response.
@@ -90,9 +95,10 @@ def smartnoise_sql_handler(
             - spent_delta (float): The amount of delta budget spent
               for the query.
     """
-    return handle_query_on_private_dataset(
+    response = handle_query_on_private_dataset(
         request, query_json, user_name, DPLibraries.SMARTNOISE_SQL
     )
+    return encode_query_response(request, DPLibraries.SMARTNOISE_SQL, response)
 
 
 # Smartnoise SQL Dummy query
@@ -107,7 +113,7 @@ def dummy_smartnoise_sql_handler(
         example_dummy_smartnoise_sql
     ),
     user_name: str = Header(None),
-) -> JSONResponse:
+) -> Response:
     """
     Handles queries on dummy datasets for the SmartNoiseSQL library.
 
@@ -140,7 +146,8 @@ def dummy_smartnoise_sql_handler(
             does not exist.
 
     Returns:
-        JSONResponse: A JSON object containing:
+        Response: A JSON object or an Arrow IPC stream, depending on the
+            Accept header, containing:
             - query_response (pd.DataFrame): a DataFrame containing
               the query response.
     """
@@ -204,7 +211,7 @@ def smartnoise_synth_handler(
         example_smartnoise_synth_query
     ),
     user_name: str = Header(None),
-) -> JSONResponse:
+) -> Response:
     """
     Handles queries for the SmartNoise Synth library.
     Args:
@@ -240,7 +247,8 @@ def smartnoise_synth_handler(
         UnauthorizedAccessException: A query is already ongoing for this user,
             the user does not exist or does not have access to the dataset.
     Returns:
-        JSONResponse: A JSON object containing the following:
+        Response: A JSON object or an Arrow IPC stream, depending on the
+            Accept header, containing the following:
             - requested_by (str): The user name.
             - query_response (pd.DataFrame): A DataFrame containing
               the query response.
@@ -249,9 +257,12 @@ def smartnoise_synth_handler(
             - spent_delta (float): The amount of delta budget spent
               for the query.
     """
-    return handle_query_on_private_dataset(
+    response = handle_query_on_private_dataset(
         request, query_json, user_name, DPLibraries.SMARTNOISE_SYNTH
     )
+    return encode_query_response(
+        request, DPLibraries.SMARTNOISE_SYNTH, response
+    )
 
 
 @router.post(
@@ -265,7 +276,7 @@ def dummy_smartnoise_synth_handler(
         example_dummy_smartnoise_synth_query
     ),
     user_name: str = Header(None),
-) -> JSONResponse:
+) -> Response:
     """
     Handles queries for the SmartNoise Synth library.
     Args:
@@ -306,7 +317,8 @@ def dummy_smartnoise_synth_handler(
         UnauthorizedAccessException: A query is already ongoing for this user,
             the user does not exist or does not have access to the dataset.
     Returns:
-        JSONResponse: A JSON object containing the following:
+        Response: A JSON object or an Arrow IPC stream, depending on the
+            Accept header, containing the following:
             - requested_by (str): The user name.
             - query_response (pd.DataFrame): A DataFrame containing
               the query response.
@@ -551,7 +563,8 @@ def diffprivlib_query_handler(
             the user does not exist or does not have access to the dataset.
 
     Returns:
-        JSONResponse: A JSON object containing the following:
+        Response: A JSON object or an Arrow IPC stream, depending on the
+            Accept header, containing the following:
             - requested_by (str): The user name.
             - query_response (pd.DataFrame): A DataFrame containing
               the query response.
@@ -560,9 +573,10 @@ def diffprivlib_query_handler(
             - spent_delta (float): The amount of delta budget spent
               for the query.
     """
-    return handle_query_on_private_dataset(
+    response = handle_query_on_private_dataset(
         request, query_json, user_name, DPLibraries.DIFFPRIVLIB
     )
+    return encode_query_response(request, DPLibraries.DIFFPRIVLIB, response)
 
 
 @router.post(
@@ -602,7 +616,8 @@ def dummy_diffprivlib_query_handler(
             does not exist.
 
     Returns:
-        JSONResponse: A JSON object containing:
+        Response: A JSON object or an Arrow IPC stream, depending on the
+            Accept header, containing:
             - query_response (pd.DataFrame): a DataFrame containing
               the query response.
     """
@@ -652,3 +667,270 @@ def estimate_diffprivlib_cost(
     return handle_cost_query(
         request, query_json, user_name, DPLibraries.DIFFPRIVLIB
     )
+
+
+# Asynchronous query jobs
+
+
+@router.post(
+    "/submit_smartnoise_sql_query",
+    dependencies=[Depends(server_live)],
+    tags=["USER_JOB"],
+)
+def submit_smartnoise_sql_query(
+    request: Request,
+    query_json: SmartnoiseSQLQueryModel = Body(example_smartnoise_sql),
+    user_name: str = Header(None),
+) -> JSONResponse:
+    """
+    Submits a SmartNoiseSQL query as a job run in the background.
+
+    The job runs the query of the /smartnoise_sql_query endpoint,
+    its response is obtained with the /job_result endpoint.
+
+    Args:
+        request (Request): Raw request object
+        query_json (SmartnoiseSQLQueryModel): The query, see /smartnoise_sql_query.
+            Defaults to Body(example_smartnoise_sql).
+        user_name (str): The user name.
+            Defaults to Header(None).
+
+    Raises:
+        UnauthorizedAccessException: The user does not exist, does not have
+            access to the dataset or has too many unfinished jobs.
+
+    Returns:
+        JSONResponse: A JSON object describing the job:
+            - job_id (str): The id of the job.
+            - status (str): The status of the job.
+            - dataset_name (str): The dataset queried by the job.
+            - dp_library (str): The DP library of the query.
+    """
+    return submit_query_on_private_dataset(
+        request, query_json, user_name, DPLibraries.SMARTNOISE_SQL
+    )
+
+
+@router.post(
+    "/submit_smartnoise_synth_query",
+    dependencies=[Depends(server_live)],
+    tags=["USER_JOB"],
+)
+def submit_smartnoise_synth_query(
+    request: Request,
+    query_json: SmartnoiseSynthQueryModel = Body(
+        example_smartnoise_synth_query
+    ),
+    user_name: str = Header(None),
+) -> JSONResponse:
+    """
+    Submits a SmartNoise Synth query as a job run in the background.
+
+    The job runs the query of the /smartnoise_synth_query endpoint,
+    its response is obtained with the /job_result endpoint.
+
+    Args:
+        request (Request): Raw request object
+        query_json (SmartnoiseSynthQueryModel): The query, see /smartnoise_synth_query.
+            Defaults to Body(example_smartnoise_synth_query).
+        user_name (str): The user name.
+            Defaults to Header(None).
+
+    Raises:
+        UnauthorizedAccessException: The user does not exist, does not have
+            access to the dataset or has too many unfinished jobs.
+
+    Returns:
+        JSONResponse: A JSON object describing the job:
+            - job_id (str): The id of the job.
+            - status (str): The status of the job.
+            - dataset_name (str): The dataset queried by the job.
+            - dp_library (str): The DP library of the query.
+    """
+    return submit_query_on_private_dataset(
+        request, query_json, user_name, DPLibraries.SMARTNOISE_SYNTH
+    )
+
+
+@router.post(
+    "/submit_opendp_query",
+    dependencies=[Depends(server_live)],
+    tags=["USER_JOB"],
+)
+def submit_opendp_query(
+    request: Request,
+    query_json: OpenDPQueryModel = Body(example_opendp),
+    user_name: str = Header(None),
+) -> JSONResponse:
+    """
+    Submits a OpenDP query as a job run in the background.
+
+    The job runs the query of the /opendp_query endpoint,
+    its response is obtained with the /job_result endpoint.
+
+    Args:
+        request (Request): Raw request object
+        query_json (OpenDPQueryModel): The query, see /opendp_query.
+            Defaults to Body(example_opendp).
+        user_name (str): The user name.
+            Defaults to Header(None).
+
+    Raises:
+        UnauthorizedAccessException: The user does not exist, does not have
+            access to the dataset or has too many unfinished jobs.
+
+    Returns:
+        JSONResponse: A JSON object describing the job:
+            - job_id (str): The id of the job.
+            - status (str): The status of the job.
+            - dataset_name (str): The dataset queried by the job.
+            - dp_library (str): The DP library of the query.
+    """
+    return submit_query_on_private_dataset(
+        request, query_json, user_name, DPLibraries.OPENDP
+    )
+
+
+@router.post(
+    "/submit_diffprivlib_query",
+    dependencies=[Depends(server_live)],
+    tags=["USER_JOB"],
+)
+def submit_diffprivlib_query(
+    request: Request,
+    query_json: DiffPrivLibQueryModel = Body(example_diffprivlib),
+    user_name: str = Header(None),
+) -> JSONResponse:
+    """
+    Submits a DiffPrivLib query as a job run in the background.
+
+    The job runs the query of the /diffprivlib_query endpoint,
+    its response is obtained with the /job_result endpoint.
+
+    Args:
+        request (Request): Raw request object
+        query_json (DiffPrivLibQueryModel): The query, see /diffprivlib_query.
+            Defaults to Body(example_diffprivlib).
+        user_name (str): The user name.
+            Defaults to Header(None).
+
+    Raises:
+        UnauthorizedAccessException: The user does not exist, does not have
+            access to the dataset or has too many unfinished jobs.
+
+    Returns:
+        JSONResponse: A JSON object describing the job:
+            - job_id (str): The id of the job.
+            - status (str): The status of the job.
+            - dataset_name (str): The dataset queried by the job.
+            - dp_library (str): The DP library of the query.
+    """
+    return submit_query_on_private_dataset(
+        request, query_json, user_name, DPLibraries.DIFFPRIVLIB
+    )
+
+
+@router.post(
+    "/job_status",
+    dependencies=[Depends(server_live)],
+    tags=["USER_JOB"],
+)
+def job_status(
+    request: Request,
+    query_json: JobModel = Body(example_job),
+    user_name: str = Header(None),
+) -> JSONResponse:
+    """
+    Returns the status of a job of the user.
+
+    Args:
+        request (Request): Raw request object
+        query_json (JobModel): A JSON object containing the job_id.
+            Defaults to Body(example_job).
+        user_name (str): The user name.
+            Defaults to Header(None).
+
+    Raises:
+        InvalidQueryException: The job does not exist or has expired.
+        UnauthorizedAccessException: The job was submitted by another user.
+
+    Returns:
+        JSONResponse: A JSON object describing the job:
+            - job_id (str): The id of the job.
+            - status (str): pending, running, completed, failed or cancelled.
+            - dataset_name (str): The dataset queried by the job.
+            - dp_library (str): The DP library of the query.
+            - error (str, optional): The error message of a failed job.
+    """
+    job = request.app.state.job_manager.get(query_json.job_id, user_name)
+    return JSONResponse(content=job.to_dict())
+
+
+@router.post(
+    "/job_result",
+    dependencies=[Depends(server_live)],
+    tags=["USER_JOB"],
+)
+def job_result(
+    request: Request,
+    query_json: JobModel = Body(example_job),
+    user_name: str = Header(None),
+) -> Response:
+    """
+    Returns the response of a finished job of the user.
+
+    Args:
+        request (Request): Raw request object
+        query_json (JobModel): A JSON object containing the job_id.
+            Defaults to Body(example_job).
+        user_name (str): The user name.
+            Defaults to Header(None).
+
+    Raises:
+        ExternalLibraryException: For exceptions from libraries
+            external to this package.
+        InternalServerException: For any other unforseen exceptions.
+        InvalidQueryException: The job does not exist, is not finished,
+            was cancelled or its query was invalid.
+        UnauthorizedAccessException: The job was submitted by another user
+            or its query was not authorized.
+
+    Returns:
+        Response: The response of the query, as returned by the
+            synchronous query endpoints.
+    """
+    job_manager = request.app.state.job_manager
+    job = job_manager.get(query_json.job_id, user_name)
+    response = job_manager.get_result(query_json.job_id, user_name)
+    return encode_query_response(request, job.dp_library, response)
+
+
+@router.post(
+    "/cancel_job",
+    dependencies=[Depends(server_live)],
+    tags=["USER_JOB"],
+)
+def cancel_job(
+    request: Request,
+    query_json: JobModel = Body(example_job),
+    user_name: str = Header(None),
+) -> JSONResponse:
+    """
+    Cancels a pending job of the user, running jobs cannot be cancelled.
+
+    Args:
+        request (Request): Raw request object
+        query_json (JobModel): A JSON object containing the job_id.
+            Defaults to Body(example_job).
+        user_name (str): The user name.
+            Defaults to Header(None).
+
+    Raises:
+        InvalidQueryException: The job does not exist or has already started.
+        UnauthorizedAccessException: The job was submitted by another user.
+
+    Returns:
+        JSONResponse: A JSON object describing the cancelled job.
+    """
+    job = request.app.state.job_manager.cancel(query_json.job_id, user_name)
+    return JSONResponse(content=job.to_dict())
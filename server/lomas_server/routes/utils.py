@@ -17,6 +17,7 @@ from lomas_server.utils.query_models import (
     QueryModel,
     RequestModel,
 )
+from lomas_server.utils.response_encoding import encode_query_response
 
 
 async def server_live(request: Request) -> AsyncGenerator:
@@ -80,11 +81,13 @@ def handle_query_on_private_dataset(
         query_json.dataset_name,
         app.state.admin_database,
         app.state.private_credentials,
+        app.state.data_cache,
     )
     dp_querier = querier_factory(
         dp_library,
         data_connector=data_connector,
         admin_database=app.state.admin_database,
+        process_pool=app.state.process_pool,
     )
     try:
         response = dp_querier.handle_query(query_json, user_name)
@@ -138,17 +141,20 @@ def handle_query_on_dummy_dataset(
         dp_library,
         data_connector=ds_data_connector,
         admin_database=app.state.admin_database,
+        process_pool=app.state.process_pool,
     )
 
     try:
-        eps_cost, delta_cost = dummy_querier.cost(query_json)
-        response_df = dummy_querier.query(query_json)
-        response = JSONResponse(
-            content={
+        eps_cost, delta_cost = dummy_querier.run_cost(query_json)
+        response_df = dummy_querier.run_query(query_json)
+        response = encode_query_response(
+            request,
+            dp_library,
+            {
                 "query_response": response_df,
                 "epsilon": eps_cost,
                 "delta": delta_cost,
-            }
+            },
         )
     except KNOWN_EXCEPTIONS as e:
         raise e
@@ -198,14 +204,16 @@ def handle_cost_query(
         query_json.dataset_name,
         app.state.admin_database,
         app.state.private_credentials,
+        app.state.data_cache,
     )
     dp_querier = querier_factory(
         dp_library,
         data_connector=data_connector,
         admin_database=app.state.admin_database,
+        process_pool=app.state.process_pool,
     )
     try:
-        eps_cost, delta_cost = dp_querier.cost(query_json)
+        eps_cost, delta_cost = dp_querier.run_cost(query_json)
     except KNOWN_EXCEPTIONS as e:
         raise e
     except Exception as e:
@@ -214,3 +222,53 @@ def handle_cost_query(
     return JSONResponse(
         content={"epsilon_cost": eps_cost, "delta_cost": delta_cost}
     )
+
+
+def submit_query_on_private_dataset(
+    request: Request,
+    query_json: QueryModel,
+    user_name: str,
+    dp_library: DPLibraries,
+) -> JSONResponse:
+    """
+    Submits a query on a private dataset as a job run in the background.
+
+    The job runs :py:func:`handle_query_on_private_dataset`, the budget
+    is checked and spent when the job runs.
+
+    Args:
+        request (Request): Raw request object
+        query_json (BaseModel): A JSON object containing the user request
+        user_name (str): The user name
+        dp_library: Name of the DP library to use for the query
+
+    Raises:
+        UnauthorizedAccessException: The user does not exist, does not have
+            access to the dataset or has too many unfinished jobs.
+
+    Returns:
+        JSONResponse: A JSON object describing the job:
+            - job_id (str): The id of the job.
+            - status (str): The status of the job.
+            - dataset_name (str): The dataset queried by the job.
+            - dp_library (str): The DP library of the query.
+    """
+    app = request.app
+
+    dataset_name = query_json.dataset_name
+    if not app.state.admin_database.has_user_access_to_dataset(
+        user_name, dataset_name
+    ):
+        raise UnauthorizedAccessException(
+            f"{user_name} does not have access to {dataset_name}.",
+        )
+
+    job = app.state.job_manager.submit(
+        user_name,
+        dataset_name,
+        dp_library,
+        lambda: handle_query_on_private_dataset(
+            request, query_json, user_name, dp_library
+        ),
+    )
+    return JSONResponse(content=job.to_dict())
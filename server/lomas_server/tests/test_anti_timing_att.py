@@ -0,0 +1,86 @@
+import asyncio
+import time
+import unittest
+from typing import Callable, Optional
+
+import httpx
+from fastapi import FastAPI, Request, Response
+
+from lomas_server.constants import TimeAttackMethod
+from lomas_server.utils.anti_timing_att import (
+    anti_timing_att,
+    get_response_delay,
+)
+from lomas_server.utils.config import TimeAttack
+from lomas_server.utils.logger import LOG
+
+MAGNITUDE = 0.2
+NB_REQUESTS = 50
+
+
+def make_app(time_attack: Optional[TimeAttack]) -> FastAPI:
+    """Make an app protected against timing attacks"""
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def middleware(
+        request: Request, call_next: Callable[[Request], Response]
+    ) -> Response:
+        return await anti_timing_att(request, call_next, time_attack)
+
+    @app.get("/state")
+    async def state() -> dict:
+        return {"LIVE": True}
+
+    return app
+
+
+async def send_requests(app: FastAPI, nb_requests: int) -> float:
+    """Send concurrent requests and return the time to get all responses"""
+    transport = httpx.ASGITransport(app=app)  # type: ignore [arg-type]
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test"
+    ) as client:
+        start_time = time.perf_counter()
+        responses = await asyncio.gather(
+            *[client.get("/state") for _ in range(nb_requests)]
+        )
+        elapsed = time.perf_counter() - start_time
+    assert all(response.status_code == 200 for response in responses)
+    return elapsed
+
+
+class TestAntiTimingAttack(unittest.TestCase):
+    """
+    Tests and benchmark of the anti-timing attack middleware.
+    """
+
+    def test_response_delay(self) -> None:
+        """Test the delay added by each method"""
+        stall = TimeAttack(method=TimeAttackMethod.STALL, magnitude=1.0)
+        self.assertAlmostEqual(get_response_delay(stall, 0.25), 0.75)
+        self.assertEqual(get_response_delay(stall, 2.0), 0.0)
+
+        jitter = TimeAttack(method=TimeAttackMethod.JITTER, magnitude=1.0)
+        for _ in range(100):
+            self.assertTrue(0 <= get_response_delay(jitter, 2.0) <= 1.0)
+
+    def test_concurrent_throughput(self) -> None:
+        """Benchmark of concurrent requests with the protection enabled.
+
+        Delayed responses must not block the other requests: all the
+        requests are answered in about one delay instead of one delay
+        per request.
+        """
+        for method in TimeAttackMethod:
+            time_attack = TimeAttack(method=method, magnitude=MAGNITUDE)
+            elapsed = asyncio.run(
+                send_requests(make_app(time_attack), NB_REQUESTS)
+            )
+            LOG.info(
+                f"{method}: {NB_REQUESTS} concurrent requests in "
+                + f"{elapsed:.2f}s ({NB_REQUESTS / elapsed:.1f} requests/s)"
+            )
+            if method == TimeAttackMethod.STALL:
+                self.assertGreaterEqual(elapsed, MAGNITUDE)
+            self.assertLess(elapsed, NB_REQUESTS * MAGNITUDE / 5)
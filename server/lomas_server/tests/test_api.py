@@ -1,4 +1,5 @@
 import glob
+import gzip
 import json
 import os
 import unittest
@@ -6,6 +7,7 @@ from io import StringIO
 
 import opendp.prelude as dp_p
 import pandas as pd
+import pyarrow as pa
 from fastapi import status
 from fastapi.testclient import TestClient
 from opendp.mod import enable_features
@@ -15,7 +17,8 @@ from pymongo.database import Database
 from lomas_server.admin_database.factory import admin_database_factory
 from lomas_server.admin_database.utils import get_mongodb
 from lomas_server.app import app
-from lomas_server.constants import DPLibraries
+from lomas_server.constants import ARROW_STREAM_MEDIA_TYPE, DPLibraries
+from lomas_server.data_connector.factory import data_connector_factory
 from lomas_server.mongodb_admin import (
     add_datasets_via_yaml,
     add_users_via_yaml,
@@ -26,6 +29,7 @@ from lomas_server.tests.constants import (
     ENV_S3_INTEGRATION,
     TRUE_VALUES,
 )
+from lomas_server.utils.compression import gunzip
 from lomas_server.utils.config import CONFIG_LOADER, DBConfig
 from lomas_server.utils.error_handler import InternalServerException
 from lomas_server.utils.query_examples import (
@@ -40,7 +44,9 @@ from lomas_server.utils.query_examples import (
     example_opendp,
     example_smartnoise_sql,
     example_smartnoise_sql_cost,
+    example_stream_dummy_dataset,
 )
+from lomas_server.utils.response_encoding import ARROW_RESPONSE_KEY
 
 INITAL_EPSILON = 10
 INITIAL_DELTA = 0.005
@@ -193,6 +199,69 @@ class TestRootAPIEndpoint(unittest.TestCase):  # pylint: disable=R0904
                 + f"{self.user_name} does not have access to {other_dataset}."
             }
 
+    def test_stream_dummy_dataset(self) -> None:
+        """test_stream_dummy_dataset"""
+        with TestClient(app) as client:
+            # Expect to work
+            response = client.post(
+                "/stream_dummy_dataset",
+                json=example_stream_dummy_dataset,
+                headers=self.headers,
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert response.headers["content-type"] == "application/x-ndjson"
+
+            lines = response.content.decode("utf8").splitlines()
+            header = json.loads(lines[0])
+            assert header["datetime_columns"] == []
+            dummy_df = pd.DataFrame([json.loads(line) for line in lines[1:]])
+            dummy_df = dummy_df.astype(header["dtypes"])
+            assert dummy_df.shape == (DUMMY_NB_ROWS, len(header["dtypes"]))
+
+            # Expect to fail: user does have access to dataset
+            body = dict(example_stream_dummy_dataset)
+            body["dataset_name"] = "IRIS"
+            response = client.post(
+                "/stream_dummy_dataset", json=body, headers=self.headers
+            )
+            assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_compression(self) -> None:
+        """test_compression"""
+        with TestClient(app) as client:
+            # Large responses are compressed
+            response = client.post(
+                "/get_dummy_dataset",
+                json=example_get_dummy_dataset,
+                headers={**self.headers, "Accept-Encoding": "gzip"},
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert response.headers["content-encoding"] == "gzip"
+            assert len(response.json()["dummy_dict"]) > 0
+
+            # Gzip request bodies are decompressed
+            body = json.dumps(example_dummy_smartnoise_sql).encode("utf-8")
+            response = client.post(
+                "/dummy_smartnoise_sql_query",
+                content=gzip.compress(body),
+                headers={**self.headers, "Content-Encoding": "gzip"},
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json()["query_response"]["columns"] == ["NB_ROW"]
+
+            # Should fail: invalid gzip body
+            response = client.post(
+                "/dummy_smartnoise_sql_query",
+                content=body,
+                headers={**self.headers, "Content-Encoding": "gzip"},
+            )
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        # Should fail: body too large once decompressed
+        with self.assertRaises(ValueError):
+            gunzip(gzip.compress(b"a" * 1000), max_size=100)
+        assert gunzip(gzip.compress(b"a" * 1000), max_size=1000) == b"a" * 1000
+
     def test_get_dummy_dataset(self) -> None:
         """test_get_dummy_dataset"""
         with TestClient(app) as client:
@@ -507,6 +576,69 @@ class TestRootAPIEndpoint(unittest.TestCase):  # pylint: disable=R0904
                 df, pd.DataFrame
             ), "Response should be a pd.DataFrame"
 
+    def test_invalidate_data_cache(self) -> None:
+        """Test private datasets are cached and can be invalidated"""
+        with TestClient(app, headers=self.headers) as client:
+            new_headers = dict(self.headers)
+            new_headers["user-name"] = "BirthdayGirl"
+
+            # Loading the dataset through a connector fills the cache
+            data_connector = data_connector_factory(
+                "BIRTHDAYS",
+                app.state.admin_database,
+                app.state.private_credentials,
+                app.state.data_cache,
+            )
+            data_connector.get_pandas_df()
+
+            response = client.post(
+                "/invalidate_data_cache",
+                json={"dataset_name": "BIRTHDAYS"},
+                headers=new_headers,
+            )
+            assert response.status_code == status.HTTP_200_OK
+            response_dict = json.loads(response.content.decode("utf8"))
+            assert response_dict == {
+                "requested_by": "BirthdayGirl",
+                "invalidated_entries": 1,
+            }
+            stats = app.state.data_cache.get_stats()
+            assert "BIRTHDAYS" not in stats["datasets"]
+
+            # New connectors do not use the data cached before
+            new_connector = data_connector_factory(
+                "BIRTHDAYS",
+                app.state.admin_database,
+                app.state.private_credentials,
+                app.state.data_cache,
+            )
+            assert (
+                new_connector.get_cache_fingerprint()
+                != data_connector.get_cache_fingerprint()
+            )
+
+            # Nothing left to invalidate
+            response = client.post(
+                "/invalidate_data_cache", json={}, headers=new_headers
+            )
+            assert response.status_code == status.HTTP_200_OK
+            response_dict = json.loads(response.content.decode("utf8"))
+            assert response_dict["invalidated_entries"] == 0
+            assert app.state.data_cache.get_stats()["current_size_bytes"] == 0
+
+            # Unknown users and users without access may not invalidate
+            new_headers["user-name"] = "Anonymous"
+            response = client.post(
+                "/invalidate_data_cache", json={}, headers=new_headers
+            )
+            assert response.status_code == status.HTTP_403_FORBIDDEN
+            response = client.post(
+                "/invalidate_data_cache",
+                json={"dataset_name": "PENGUIN"},
+                headers=self.headers | {"user-name": "BirthdayGirl"},
+            )
+            assert response.status_code == status.HTTP_403_FORBIDDEN
+
     def test_smartnoise_sql_query_on_s3_dataset(self) -> None:
         """Test smartnoise-sql on s3 dataset"""
         if os.getenv(ENV_S3_INTEGRATION, "0").lower() in TRUE_VALUES:
@@ -543,6 +675,21 @@ class TestRootAPIEndpoint(unittest.TestCase):  # pylint: disable=R0904
             assert response_dict["query_response"]["data"][0][0] > 0
             assert response_dict["query_response"]["data"][0][0] < 250
 
+            # Expect to work: response as an Arrow IPC stream
+            response = client.post(
+                "/dummy_smartnoise_sql_query",
+                json=example_dummy_smartnoise_sql,
+                headers={**self.headers, "Accept": ARROW_STREAM_MEDIA_TYPE},
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert response.headers["content-type"] == ARROW_STREAM_MEDIA_TYPE
+            table = pa.ipc.open_stream(response.content).read_all()
+            assert list(table.to_pandas().columns) == ["NB_ROW"]
+            assert json.loads(table.schema.metadata[ARROW_RESPONSE_KEY]) == {
+                "epsilon": QUERY_EPSILON,
+                "delta": response_dict["delta"],
+            }
+
             # Should fail: no header
             response = client.post(
                 "/dummy_smartnoise_sql_query",
@@ -597,6 +744,63 @@ class TestRootAPIEndpoint(unittest.TestCase):  # pylint: disable=R0904
                 + f"{self.user_name} does not have access to IRIS."
             }
 
+    def test_smartnoise_sql_job(self) -> None:
+        """Test submitting a query job and getting its result"""
+        with TestClient(app, headers=self.headers) as client:
+            response = client.post(
+                "/submit_smartnoise_sql_query",
+                json=example_smartnoise_sql,
+            )
+            assert response.status_code == status.HTTP_200_OK
+            job = response.json()
+            assert job["status"] in ("pending", "running", "completed")
+            assert job["dataset_name"] == PENGUIN_DATASET
+            assert job["dp_library"] == DPLibraries.SMARTNOISE_SQL
+
+            app.state.job_manager.get(
+                job["job_id"], self.user_name
+            ).future.result()
+            response = client.post(
+                "/job_status", json={"job_id": job["job_id"]}
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json()["status"] == "completed"
+
+            response = client.post(
+                "/job_result", json={"job_id": job["job_id"]}
+            )
+            assert response.status_code == status.HTTP_200_OK
+            response_dict = response.json()
+            assert response_dict["requested_by"] == self.user_name
+            assert response_dict["spent_epsilon"] == QUERY_EPSILON
+            assert response_dict["query_response"]["columns"] == ["NB_ROW"]
+
+            # Finished jobs cannot be cancelled
+            response = client.post(
+                "/cancel_job", json={"job_id": job["job_id"]}
+            )
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+            # Should fail: job of another user
+            new_headers = dict(self.headers)
+            new_headers["user-name"] = "Tintin"
+            response = client.post(
+                "/job_result",
+                json={"job_id": job["job_id"]},
+                headers=new_headers,
+            )
+            assert response.status_code == status.HTTP_403_FORBIDDEN
+
+            # Should fail: user does not have access to dataset
+            body = dict(example_smartnoise_sql)
+            body["dataset_name"] = "IRIS"
+            response = client.post("/submit_smartnoise_sql_query", json=body)
+            assert response.status_code == status.HTTP_403_FORBIDDEN
+
+            # Should fail: unknown job
+            response = client.post("/job_status", json={"job_id": "unknown"})
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
     def test_opendp_query(self) -> None:  # pylint: disable=R0915
         """test_opendp_query"""
         enable_logging()
@@ -964,6 +1168,51 @@ class TestRootAPIEndpoint(unittest.TestCase):  # pylint: disable=R0904
                 response_dict_3["previous_queries"][1]["response"] == query_res
             )
 
+    def test_get_previous_queries_pages(self) -> None:
+        """test_get_previous_queries_pages"""
+        with TestClient(app, headers=self.headers) as client:
+            for _ in range(3):
+                client.post(
+                    "/smartnoise_sql_query", json=example_smartnoise_sql
+                )
+            client.post("/opendp_query", json=example_opendp)
+
+            # Pages of two queries
+            body = {**example_get_admin_db_data, "limit": 2}
+            response = client.post("/get_previous_queries", json=body)
+            assert response.status_code == status.HTTP_200_OK
+            page_1 = json.loads(response.content.decode("utf8"))
+            assert len(page_1["previous_queries"]) == 2
+            assert page_1["next_cursor"] is not None
+
+            body["cursor"] = page_1["next_cursor"]
+            response = client.post("/get_previous_queries", json=body)
+            page_2 = json.loads(response.content.decode("utf8"))
+            assert len(page_2["previous_queries"]) == 2
+            assert page_2["next_cursor"] is None
+            assert page_2["previous_queries"][1]["dp_librairy"] == (
+                DPLibraries.OPENDP
+            )
+
+            # Filtered and without the query responses
+            body = {
+                **example_get_admin_db_data,
+                "dp_libraries": [DPLibraries.OPENDP],
+                "metadata_only": True,
+            }
+            response = client.post("/get_previous_queries", json=body)
+            queries = json.loads(response.content.decode("utf8"))[
+                "previous_queries"
+            ]
+            assert len(queries) == 1
+            assert "query_response" not in queries[0]["response"]
+            assert queries[0]["response"]["spent_epsilon"] > 0
+
+            # Invalid cursor
+            body = {**example_get_admin_db_data, "cursor": "not a cursor"}
+            response = client.post("/get_previous_queries", json=body)
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
     def test_subsequent_budget_limit_logic(self) -> None:
         """test_subsequent_budget_limit_logic"""
         with TestClient(app, headers=self.headers) as client:
@@ -0,0 +1,156 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from lomas_server.admin_database.blob_store import (
+    LocalBlobStore,
+    S3BlobStore,
+)
+from lomas_server.admin_database.factory import blob_store_factory
+from lomas_server.admin_database.yaml_database import AdminYamlDatabase
+from lomas_server.constants import (
+    BlobStoreType,
+    PrivateDatabaseType,
+    SSynthGanSynthesizer,
+)
+from lomas_server.utils.config import (
+    ArchiveConfig,
+    S3BlobStoreConfig,
+    S3CredentialsConfig,
+)
+from lomas_server.utils.error_handler import InternalServerException
+from lomas_server.utils.query_models import SmartnoiseSynthQueryModel
+
+USER = "Dr. Antartica"
+DATASET = "PENGUIN"
+
+
+class TestBlobStore(unittest.TestCase):
+    """
+    Tests for the store of the large archived query responses.
+    """
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.blob_store = LocalBlobStore(self.tmp_dir.name, min_blob_size=100)
+        self.admin_db = AdminYamlDatabase("tests/test_data/local_db_file.yaml")
+        self.admin_db.blob_store = self.blob_store
+        self.query_json = SmartnoiseSynthQueryModel(
+            dataset_name=DATASET,
+            synth_name=SSynthGanSynthesizer.DP_CTGAN,
+            epsilon=1.0,
+            delta=0.0001,
+            select_cols=[],
+            synth_params={},
+            constraints="",
+            return_model=True,
+            condition="",
+            nb_samples=200,
+            nullable=True,
+        )
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def get_nb_blobs(self) -> int:
+        """Count the blob files"""
+        return sum(len(files) for _, _, files in os.walk(self.tmp_dir.name))
+
+    def save_query(self, query_response: object) -> None:
+        """Archive a query with the given query response"""
+        response = {
+            "requested_by": USER,
+            "query_response": query_response,
+            "spent_epsilon": 1.0,
+            "spent_delta": 0.0001,
+        }
+        self.admin_db.save_query(USER, self.query_json, response)
+
+    def test_put_and_get(self) -> None:
+        """Test blobs are content addressed and verified"""
+        digest = self.blob_store.put(b"model")
+        self.assertEqual(self.blob_store.put(b"model"), digest)
+        self.assertEqual(self.blob_store.get(digest), b"model")
+        self.assertEqual(self.get_nb_blobs(), 1)
+
+        with open(
+            os.path.join(self.tmp_dir.name, digest[:2], digest), "wb"
+        ) as f:
+            f.write(b"other")
+        with self.assertRaises(InternalServerException):
+            self.blob_store.get(digest)
+
+    def test_archives(self) -> None:
+        """Test large responses are archived once as blobs"""
+        model = "a" * 1000
+        self.save_query(model)
+        self.save_query(model)
+        self.save_query("small")
+        self.assertEqual(self.get_nb_blobs(), 1)
+
+        archives = self.admin_db.database["queries"]
+        self.assertIsNone(archives[0]["response"]["query_response"])
+        self.assertEqual(
+            archives[0]["response_blob"], archives[1]["response_blob"]
+        )
+        self.assertEqual(archives[0]["response_blob"]["size"], 1002)
+        self.assertNotIn("response_blob", archives[2])
+
+        # Queries are restored without modifying the archives
+        queries = self.admin_db.get_user_previous_queries(USER, DATASET)[0]
+        self.assertEqual(
+            [q["response"]["query_response"] for q in queries],
+            [model, model, "small"],
+        )
+        self.assertNotIn("response_blob", queries[0])
+        self.assertIsNone(archives[0]["response"]["query_response"])
+
+        # The blob store was removed from the config
+        self.admin_db.blob_store = None
+        with self.assertRaises(InternalServerException):
+            self.admin_db.get_user_previous_queries(USER, DATASET)
+
+    def test_s3_blob_store(self) -> None:
+        """Test the S3 blob store uses the S3 credentials of the config"""
+        credentials = S3CredentialsConfig(
+            db_type=PrivateDatabaseType.S3,
+            credentials_name="local_minio",
+            access_key_id="admin",
+            secret_access_key="admin123",
+        )
+        config = ArchiveConfig(
+            blob_store=S3BlobStoreConfig(
+                store_type=BlobStoreType.S3,
+                credentials_name="local_minio",
+                endpoint_url="http://localhost:9000",
+                bucket="archives",
+                prefix="queries/",
+            ),
+            min_blob_size=0,
+        )
+        with patch(
+            "lomas_server.admin_database.blob_store.create_s3_client"
+        ) as create_s3_client:
+            blob_store = blob_store_factory(config, [credentials])
+        self.assertIsInstance(blob_store, S3BlobStore)
+        s3_credentials = create_s3_client.call_args.args[0]
+        self.assertEqual(s3_credentials.endpoint_url, "http://localhost:9000")
+        self.assertFalse(hasattr(credentials, "bucket"))
+
+        client: MagicMock = create_s3_client.return_value
+        client.head_object.side_effect = Exception("Not found")
+        assert blob_store is not None
+        digest = blob_store.put(b"model")
+        client.put_object.assert_called_once_with(
+            Bucket="archives", Key=f"queries/{digest}", Body=b"model"
+        )
+
+        # Identical blobs are not uploaded again
+        client.head_object.side_effect = None
+        blob_store.put(b"model")
+        client.put_object.assert_called_once()
+
+        self.assertIsNone(blob_store_factory(ArchiveConfig(), [credentials]))
+        with self.assertRaises(InternalServerException):
+            blob_store_factory(config, [])
@@ -0,0 +1,146 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from lomas_server.admin_database.yaml_database import AdminYamlDatabase
+from lomas_server.utils.error_handler import (
+    InvalidQueryException,
+    UnauthorizedAccessException,
+)
+
+USER = "Dr. Antartica"
+DATASET = "PENGUIN"  # initial epsilon 10, initial delta 0.005
+
+
+class TestBudgetReservation(unittest.TestCase):
+    """
+    Tests for the reservations of budget of the queries.
+    """
+
+    def setUp(self) -> None:
+        self.admin_db = AdminYamlDatabase("tests/test_data/local_db_file.yaml")
+
+    def get_reservations(self) -> list:
+        """Get the reservations of the user on the dataset"""
+        _, dataset = self.admin_db.get_user_and_dataset(USER, DATASET)
+        return dataset["budget_reservations"]
+
+    def test_reserve_and_commit(self) -> None:
+        """Test reserved budget is unavailable until committed"""
+        reservation_id = self.admin_db.reserve_budget(USER, DATASET, 4.0, 0.0)
+        self.assertEqual(len(self.get_reservations()), 1)
+        with self.assertRaises(InvalidQueryException):
+            self.admin_db.reserve_budget(USER, DATASET, 7.0, 0.0)
+
+        # Only the spent budget is reported to the user
+        self.assertEqual(
+            self.admin_db.get_remaining_budget(USER, DATASET), [10.0, 0.005]
+        )
+
+        self.admin_db.commit_budget(USER, DATASET, reservation_id, 4.0, 0.0)
+        self.assertEqual(self.get_reservations(), [])
+        self.assertEqual(
+            self.admin_db.get_remaining_budget(USER, DATASET), [6.0, 0.005]
+        )
+        with self.assertRaises(InvalidQueryException) as context:
+            self.admin_db.reserve_budget(USER, DATASET, 7.0, 0.0)
+        self.assertEqual(
+            context.exception.error_message,
+            "Not enough budget for this query epsilon remaining 6.0, "
+            + "delta remaining 0.005.",
+        )
+
+    def test_refund(self) -> None:
+        """Test refunded budget is available again"""
+        reservation_id = self.admin_db.reserve_budget(
+            USER, DATASET, 10.0, 0.005
+        )
+        with self.assertRaises(InvalidQueryException):
+            self.admin_db.reserve_budget(USER, DATASET, 1.0, 0.0)
+
+        self.admin_db.refund_budget(USER, DATASET, reservation_id)
+        self.assertEqual(self.get_reservations(), [])
+        self.admin_db.reserve_budget(USER, DATASET, 10.0, 0.005)
+        self.assertEqual(
+            self.admin_db.get_remaining_budget(USER, DATASET), [10.0, 0.005]
+        )
+
+    def test_expired_reservation(self) -> None:
+        """Test expired reservations do not hold the budget"""
+        reservation_id = self.admin_db.reserve_budget(
+            USER, DATASET, 8.0, 0.0, lease_duration=0.0
+        )
+        other_id = self.admin_db.reserve_budget(USER, DATASET, 8.0, 0.0)
+        self.assertEqual(len(self.get_reservations()), 1)
+
+        # The budget was reserved by the other query: the query finishing
+        # after its reservation expired is not charged and fails
+        with self.assertRaises(InvalidQueryException):
+            self.admin_db.commit_budget(
+                USER, DATASET, reservation_id, 8.0, 0.0
+            )
+        self.admin_db.commit_budget(USER, DATASET, other_id, 8.0, 0.0)
+        self.assertEqual(self.get_reservations(), [])
+        self.assertEqual(
+            self.admin_db.get_remaining_budget(USER, DATASET), [2.0, 0.005]
+        )
+
+        # Without other query, the budget is still available
+        reservation_id = self.admin_db.reserve_budget(
+            USER, DATASET, 2.0, 0.0, lease_duration=0.0
+        )
+        self.admin_db.commit_budget(USER, DATASET, reservation_id, 2.0, 0.0)
+        self.assertEqual(
+            self.admin_db.get_remaining_budget(USER, DATASET), [0.0, 0.005]
+        )
+
+    def test_renewal(self) -> None:
+        """Test the reservation of a running query does not expire"""
+        reservation_id = self.admin_db.reserve_budget(
+            USER, DATASET, 8.0, 0.0, lease_duration=0.2
+        )
+        with self.admin_db.keep_budget_reserved(
+            USER, DATASET, reservation_id, 0.2, renewal_interval=0.05
+        ):
+            time.sleep(0.5)
+            with self.assertRaises(InvalidQueryException):
+                self.admin_db.reserve_budget(USER, DATASET, 8.0, 0.0)
+        self.admin_db.commit_budget(USER, DATASET, reservation_id, 8.0, 0.0)
+        self.assertEqual(
+            self.admin_db.get_remaining_budget(USER, DATASET), [2.0, 0.005]
+        )
+
+        # Expired reservations are not renewed
+        reservation_id = self.admin_db.reserve_budget(
+            USER, DATASET, 1.0, 0.0, lease_duration=0.0
+        )
+        self.assertFalse(
+            self.admin_db.renew_budget_reservation(
+                USER, DATASET, reservation_id
+            )
+        )
+
+    def test_concurrent_reservations(self) -> None:
+        """Test concurrent reservations do not overspend the budget"""
+
+        def reserve() -> bool:
+            try:
+                self.admin_db.reserve_budget(USER, DATASET, 1.0, 0.0001)
+            except InvalidQueryException:
+                return False
+            return True
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: reserve(), range(40)))
+        self.assertEqual(sum(results), 10)
+        self.assertEqual(len(self.get_reservations()), 10)
+
+        # Other datasets of the user are not affected
+        self.admin_db.reserve_budget(USER, "PUMS", 1.0, 0.0001)
+
+    def test_may_not_query(self) -> None:
+        """Test users blocked by the administrator cannot reserve budget"""
+        user, _ = self.admin_db.get_user_and_dataset(USER, DATASET)
+        user["may_query"] = False
+        with self.assertRaises(UnauthorizedAccessException):
+            self.admin_db.reserve_budget(USER, DATASET, 1.0, 0.0)
@@ -0,0 +1,154 @@
+import os
+import shutil
+import tempfile
+import unittest
+from typing import List, Optional
+
+import pandas as pd
+import yaml
+
+from lomas_server.data_connector.data_cache import (
+    DATA_INVALIDATION_CALLBACKS,
+    DataFrameCache,
+    get_data_generation,
+    invalidate_data,
+    on_data_invalidation,
+)
+from lomas_server.data_connector.mmap_store import MmapDatasetStore
+from lomas_server.data_connector.path_connector import PathConnector
+from lomas_server.utils.collection_models import Metadata
+
+
+class TestDataFrameCache(unittest.TestCase):
+    """
+    Tests for the process-wide cache of private datasets.
+    """
+
+    def setUp(self) -> None:
+        self.df = pd.DataFrame({"a": range(100)})
+        self.size = int(self.df.memory_usage(deep=True).sum())
+
+    def test_get_or_load(self) -> None:
+        """Test the loader is only called on a cache miss"""
+        cache = DataFrameCache(10 * self.size)
+        calls = []
+
+        def loader(columns: Optional[List[str]]) -> pd.DataFrame:
+            calls.append(columns)
+            return self.df if columns is None else self.df[columns]
+
+        df1 = cache.get_or_load("ds", "v1", loader)
+        df2 = cache.get_or_load("ds", "v1", loader)
+        self.assertIs(df1, df2)
+        self.assertEqual(len(calls), 1)
+
+        # A new fingerprint reloads and replaces the stale entry
+        cache.get_or_load("ds", "v2", loader)
+        self.assertEqual(len(calls), 2)
+        self.assertIsNone(cache.get("ds", "v1"))
+        self.assertEqual(cache.current_size_bytes, self.size)
+
+    def test_lru_eviction(self) -> None:
+        """Test least recently used entries are evicted to fit the budget"""
+        cache = DataFrameCache(2 * self.size)
+        cache.put("ds1", "v", self.df)
+        cache.put("ds2", "v", self.df)
+        cache.get("ds1", "v")  # ds2 becomes the least recently used
+        cache.put("ds3", "v", self.df)
+
+        self.assertIsNotNone(cache.get("ds1", "v"))
+        self.assertIsNone(cache.get("ds2", "v"))
+        self.assertIsNotNone(cache.get("ds3", "v"))
+        self.assertLessEqual(cache.current_size_bytes, cache.max_size_bytes)
+
+        # Too large to be cached
+        small_cache = DataFrameCache(self.size - 1)
+        small_cache.put("ds1", "v", self.df)
+        self.assertIsNone(small_cache.get("ds1", "v"))
+
+    def test_invalidate(self) -> None:
+        """Test invalidation of one dataset or the whole cache"""
+        cache = DataFrameCache(10 * self.size)
+        cache.put("ds1", "v", self.df)
+        cache.put("ds2", "v", self.df)
+
+        self.assertEqual(cache.invalidate("ds1"), 1)
+        self.assertEqual(list(cache.get_stats()["datasets"]), ["ds2"])
+        self.assertEqual(cache.invalidate(), 1)
+        self.assertEqual(cache.current_size_bytes, 0)
+
+    def test_invalidate_data(self) -> None:
+        """Test invalidations start a new generation and clear the
+        derived caches"""
+        invalidated: List[Optional[str]] = []
+        on_data_invalidation(invalidated.append)
+        self.addCleanup(DATA_INVALIDATION_CALLBACKS.remove, invalidated.append)
+
+        generation = get_data_generation("ds1")
+        other_generation = get_data_generation("ds2")
+        invalidate_data("ds1")
+        self.assertEqual(get_data_generation("ds1"), generation + 1)
+        self.assertEqual(get_data_generation("ds2"), other_generation)
+
+        invalidate_data()
+        self.assertEqual(get_data_generation("ds1"), generation + 2)
+        self.assertEqual(get_data_generation("ds2"), other_generation + 1)
+        self.assertEqual(invalidated, ["ds1", None])
+
+    def test_path_connector_reloads_modified_file(self) -> None:
+        """Test a modified local file is reloaded through the cache"""
+        with open(
+            "tests/test_data/metadata/birthday_metadata.yaml", encoding="utf-8"
+        ) as f:
+            metadata = Metadata.model_validate(yaml.safe_load(f))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "birthdays.csv")
+            shutil.copy("tests/test_data/birthdays.csv", path)
+
+            cache = DataFrameCache(1024 * 1024)
+            connector = PathConnector(metadata, path)
+            connector.set_data_cache(cache, "BIRTHDAYS")
+            df = connector.get_pandas_df()
+
+            # Another connector on the same dataset shares the dataframe
+            other_connector = PathConnector(metadata, path)
+            other_connector.set_data_cache(cache, "BIRTHDAYS")
+            self.assertIs(other_connector.get_pandas_df(), df)
+
+            with open(path, mode="a", encoding="utf-8") as f:
+                f.write("1990-01-01\n")
+            new_connector = PathConnector(metadata, path)
+            new_connector.set_data_cache(cache, "BIRTHDAYS")
+            self.assertEqual(len(new_connector.get_pandas_df()), len(df) + 1)
+            self.assertEqual(len(cache.get_stats()["datasets"]), 1)
+
+    def test_mmap_store(self) -> None:
+        """Test memory-mapped datasets are written once and shared"""
+        calls = []
+
+        def loader(columns: Optional[List[str]]) -> pd.DataFrame:
+            calls.append(columns)
+            return self.df
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # One cache per worker process, sharing the same directory
+            worker_caches = [
+                DataFrameCache(10 * self.size, MmapDatasetStore(tmp_dir))
+                for _ in range(2)
+            ]
+            dfs = [
+                cache.get_or_load("ds", "v1", loader)
+                for cache in worker_caches
+            ]
+            self.assertEqual(len(calls), 1)
+            for df in dfs:
+                pd.testing.assert_frame_equal(df, self.df)
+                # Zero-copy view of the read-only mapping
+                self.assertFalse(df["a"].to_numpy().flags.writeable)
+
+            self.assertEqual(worker_caches[0].invalidate("ds"), 1)
+            self.assertEqual(os.listdir(tmp_dir), [])
+            worker_caches[1].invalidate()
+            worker_caches[1].get_or_load("ds", "v1", loader)
+            self.assertEqual(len(calls), 2)
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from lomas_server.constants import DatasetFileFormat
+from lomas_server.data_connector.data_cache import DataFrameCache
+from lomas_server.data_connector.data_connector import get_file_format
+from lomas_server.data_connector.in_memory_connector import InMemoryConnector
+from lomas_server.data_connector.path_connector import PathConnector
+from lomas_server.dp_queries.dp_libraries.smartnoise_sql import (
+    get_query_columns,
+)
+from lomas_server.utils.collection_models import Metadata
+from lomas_server.utils.error_handler import InvalidQueryException
+
+PENGUIN_CSV = "tests/test_data/test_penguin.csv"
+
+
+class TestDataConnector(unittest.TestCase):
+    """
+    Tests for the dataset file formats and column projection.
+    """
+
+    def setUp(self) -> None:
+        with open(
+            "tests/test_data/metadata/penguin_metadata.yaml", encoding="utf-8"
+        ) as f:
+            self.metadata = Metadata.model_validate(yaml.safe_load(f))
+        self.expected_df = PathConnector(
+            self.metadata, PENGUIN_CSV
+        ).get_pandas_df()
+
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_get_file_format(self) -> None:
+        """Test file format and compression inference"""
+        self.assertEqual(
+            get_file_format("data/penguin.csv"), (DatasetFileFormat.CSV, None)
+        )
+        self.assertEqual(
+            get_file_format("https://host/penguin.CSV.gz"),
+            (DatasetFileFormat.CSV, "gzip"),
+        )
+        self.assertEqual(
+            get_file_format("penguin.parquet"),
+            (DatasetFileFormat.PARQUET, None),
+        )
+        self.assertEqual(
+            get_file_format("penguin.arrow"),
+            (DatasetFileFormat.FEATHER, None),
+        )
+        for path in ["penguin.json", "penguin.parquet.gz", "penguin"]:
+            with self.assertRaises(InvalidQueryException):
+                get_file_format(path)
+
+    def test_file_formats(self) -> None:
+        """Test all file formats load the same dataframe"""
+        dataset_df = pd.read_csv(PENGUIN_CSV)
+        paths = {
+            "penguin.csv.gz": lambda p: dataset_df.to_csv(p, index=False),
+            "penguin.parquet": dataset_df.to_parquet,
+            "penguin.feather": dataset_df.to_feather,
+        }
+        for name, writer in paths.items():
+            path = os.path.join(self.tmp_dir.name, name)
+            writer(path)
+            df = PathConnector(self.metadata, path).get_pandas_df()
+            pd.testing.assert_frame_equal(df, self.expected_df)
+
+    def test_column_projection(self) -> None:
+        """Test only the requested columns are loaded and cached"""
+        path = os.path.join(self.tmp_dir.name, "penguin.parquet")
+        pd.read_csv(PENGUIN_CSV).to_parquet(path)
+
+        cache = DataFrameCache(1024 * 1024)
+        connector = PathConnector(self.metadata, path)
+        connector.set_data_cache(cache, "PENGUIN")
+
+        # Projection is returned in the dataset column order
+        df = connector.get_pandas_df(["sex", "species"])
+        self.assertEqual(list(df.columns), ["species", "sex"])
+        pd.testing.assert_frame_equal(df, self.expected_df[["species", "sex"]])
+
+        # Once the full dataset is cached, projections are served from it
+        full_connector = PathConnector(self.metadata, path)
+        full_connector.set_data_cache(cache, "PENGUIN")
+        full_connector.get_pandas_df()
+        cache_size = cache.current_size_bytes
+
+        other_connector = PathConnector(self.metadata, path)
+        other_connector.set_data_cache(cache, "PENGUIN")
+        df = other_connector.get_pandas_df(["island"])
+        self.assertEqual(list(df.columns), ["island"])
+        self.assertEqual(cache.current_size_bytes, cache_size)
+
+        with self.assertRaises(InvalidQueryException):
+            connector.get_pandas_df(["species", "idonotexist"])
+
+    def test_get_query_columns(self) -> None:
+        """Test the columns referenced in a smartnoise-sql query"""
+        self.assertEqual(
+            get_query_columns(
+                "SELECT island, AVG(Bill_Length_mm) AS avg FROM df "
+                + "WHERE sex = 'MALE' GROUP BY island",
+                self.metadata,
+            ),
+            ["island", "bill_length_mm", "sex"],
+        )
+        self.assertEqual(
+            get_query_columns("SELECT COUNT(*) FROM df", self.metadata),
+            ["species"],
+        )
+
+    def test_in_memory_connector_copy_on_write(self) -> None:
+        """Test the in-memory dataset is shared until modified"""
+        for copy_on_write in [True, False]:
+            with pd.option_context("mode.copy_on_write", copy_on_write):
+                connector = InMemoryConnector(self.metadata, self.expected_df)
+                df = connector.get_pandas_df()
+                self.assertEqual(
+                    np.shares_memory(
+                        df["bill_length_mm"].to_numpy(),
+                        connector.df["bill_length_mm"].to_numpy(),
+                    ),
+                    copy_on_write,
+                )
+
+                df.loc[0, "bill_length_mm"] = -1.0
+                df_projected = connector.get_pandas_df(["bill_length_mm"])
+                df_projected.loc[1, "bill_length_mm"] = -1.0
+                pd.testing.assert_frame_equal(
+                    connector.get_pandas_df(), self.expected_df
+                )
@@ -0,0 +1,116 @@
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from lomas_server.admin_database.dataset_cache import DatasetCache
+from lomas_server.admin_database.mongodb_database import (
+    AdminMongoDatabase,
+    increment_datasets_version,
+)
+from lomas_server.admin_database.yaml_database import AdminYamlDatabase
+from lomas_server.utils.error_handler import InvalidQueryException
+
+PENGUIN_DATASET = {
+    "dataset_name": "PENGUIN",
+    "database_type": "PATH_DB",
+    "dataset_path": "tests/test_data/test_penguin.csv",
+}
+
+
+class TestDatasetCache(unittest.TestCase):
+    """
+    Tests for the cache of the dataset documents and metadata.
+    """
+
+    def setUp(self) -> None:
+        self.version = 0
+        self.load = MagicMock(return_value=PENGUIN_DATASET)
+
+    def get_version(self) -> int:
+        """Get the datasets version"""
+        return self.version
+
+    def test_read_through(self) -> None:
+        """Test values are loaded once"""
+        cache = DatasetCache(self.get_version)
+        for _ in range(3):
+            self.assertEqual(
+                cache.get_or_load("a", self.load), PENGUIN_DATASET
+            )
+        self.load.assert_called_once()
+
+        # Failed loads are not cached
+        self.load.side_effect = InvalidQueryException("Does not exist")
+        for _ in range(2):
+            with self.assertRaises(InvalidQueryException):
+                cache.get_or_load("b", self.load)
+        self.assertEqual(self.load.call_count, 3)
+
+    def test_time_to_live(self) -> None:
+        """Test values are reloaded once expired"""
+        cache = DatasetCache(self.get_version, ttl=0.05)
+        cache.get_or_load("a", self.load)
+        cache.get_or_load("a", self.load)
+        self.assertEqual(self.load.call_count, 1)
+
+        time.sleep(0.1)
+        cache.get_or_load("a", self.load)
+        self.assertEqual(self.load.call_count, 2)
+
+    def test_version(self) -> None:
+        """Test values are reloaded when the version changes"""
+        cache = DatasetCache(self.get_version, version_check_interval=0)
+        cache.get_or_load("a", self.load)
+        cache.get_or_load("a", self.load)
+        self.assertEqual(self.load.call_count, 1)
+
+        self.version += 1
+        cache.get_or_load("a", self.load)
+        self.assertEqual(self.load.call_count, 2)
+
+        # The version is not read again before the check interval
+        cache.version_check_interval = 60
+        self.version += 1
+        cache.get_or_load("a", self.load)
+        self.assertEqual(self.load.call_count, 2)
+
+    def test_yaml_database(self) -> None:
+        """Test the YAML database reads the metadata files once"""
+        admin_db = AdminYamlDatabase("tests/test_data/local_db_file.yaml")
+        with patch.object(
+            admin_db,
+            "load_dataset_metadata",
+            wraps=admin_db.load_dataset_metadata,
+        ) as load_metadata:
+            metadata = admin_db.get_dataset_metadata("PENGUIN")
+            self.assertIs(admin_db.get_dataset_metadata("PENGUIN"), metadata)
+            load_metadata.assert_called_once()
+        self.assertEqual(
+            admin_db.get_dataset_field("PENGUIN", "database_type"), "PATH_DB"
+        )
+
+        with self.assertRaises(InvalidQueryException):
+            admin_db.get_dataset_metadata("UNKNOWN")
+
+    def test_mongodb_database(self) -> None:
+        """Test the MongoDB database reloads after administration writes"""
+        with patch("lomas_server.admin_database.mongodb_database.MongoClient"):
+            admin_db = AdminMongoDatabase("mongodb://mongodb", "test")
+        db = MagicMock()
+        admin_db.db = db
+        admin_db.dataset_cache.version_check_interval = 0
+        db.versions.find_one.return_value = {"version": 1}
+        db.datasets.find_one.return_value = PENGUIN_DATASET
+
+        for field in ["database_type", "dataset_path", "database_type"]:
+            self.assertEqual(
+                admin_db.get_dataset_field("PENGUIN", field),
+                PENGUIN_DATASET[field],
+            )
+        db.datasets.find_one.assert_called_once()
+
+        increment_datasets_version(db)
+        db.versions.update_one.assert_called_once()
+        db.versions.find_one.return_value = {"version": 2}
+        admin_db.get_dataset_field("PENGUIN", "database_type")
+        self.assertEqual(db.datasets.find_one.call_count, 2)
@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import yaml
+from diffprivlib import models
+from diffprivlib_logger import serialise_pipeline
+from sklearn.pipeline import Pipeline
+
+from lomas_server.data_connector.path_connector import PathConnector
+from lomas_server.dp_queries.dp_libraries.diffprivlib import (
+    DiffPrivLibQuerier,
+    get_spent_budget,
+)
+from lomas_server.utils.collection_models import Metadata
+from lomas_server.utils.query_examples import example_diffprivlib
+from lomas_server.utils.query_models import DiffPrivLibQueryModel
+
+PENGUIN_CSV = "tests/test_data/test_penguin.csv"
+
+
+class TestDiffPrivLibCost(unittest.TestCase):
+    """
+    Tests for the cost estimation of diffprivlib pipelines.
+    """
+
+    def setUp(self) -> None:
+        with open(
+            "tests/test_data/metadata/penguin_metadata.yaml", encoding="utf-8"
+        ) as f:
+            metadata = Metadata.model_validate(yaml.safe_load(f))
+        self.data_connector = PathConnector(metadata, PENGUIN_CSV)
+        self.query_json = DiffPrivLibQueryModel.model_validate(
+            example_diffprivlib
+        )
+
+    def test_cost_without_fit(self) -> None:
+        """Test the cost is estimated without loading the data"""
+        querier = DiffPrivLibQuerier(self.data_connector, MagicMock())
+        with patch.object(self.data_connector, "get_pandas_df") as get_df:
+            epsilon, delta = querier.cost(self.query_json)
+            get_df.assert_not_called()
+
+        # Example pipeline: scaler (0.5) and logistic regression (1.0)
+        self.assertEqual(epsilon, 1.5)
+        self.assertEqual(delta, 0.0)
+
+    def test_query_fits_once(self) -> None:
+        """Test the query fits the model once and spends the cost"""
+        pipeline = Pipeline(
+            [
+                (
+                    "lr",
+                    models.LinearRegression(
+                        epsilon=2.0,
+                        bounds_X=(30.0, 65.0),
+                        bounds_y=(13.0, 23.0),
+                    ),
+                ),
+            ]
+        )
+        query_json = self.query_json.model_copy(
+            update={
+                "diffprivlib_json": serialise_pipeline(pipeline),
+                "feature_columns": ["bill_length_mm"],
+                "target_columns": ["bill_depth_mm"],
+            }
+        )
+        querier = DiffPrivLibQuerier(self.data_connector, MagicMock())
+        self.assertEqual(querier.cost(query_json), (2.0, 0.0))
+
+        with patch.object(
+            querier, "fit_model_on_data", wraps=querier.fit_model_on_data
+        ) as fit_model_on_data:
+            response = querier.query(query_json)
+            fit_model_on_data.assert_called_once()
+
+        self.assertIn("score", response)
+        self.assertEqual(get_spent_budget(querier.dpl_pipeline), (2.0, 0.0))
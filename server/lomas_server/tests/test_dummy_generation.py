@@ -1,7 +1,16 @@
 import unittest
 from typing import Any
+from unittest.mock import patch
 
-from lomas_server.dp_queries.dummy_dataset import make_dummy_dataset
+import pandas as pd
+
+from lomas_server.constants import NB_RANDOM_NONE
+from lomas_server.dp_queries.dummy_dataset import (
+    DUMMY_DATASETS_CACHE,
+    get_cached_dummy_dataset,
+    iter_dummy_dataset,
+    make_dummy_dataset,
+)
 from lomas_server.utils.collection_models import Metadata
 from lomas_server.utils.query_examples import DUMMY_NB_ROWS, DUMMY_SEED
 
@@ -119,6 +128,10 @@ class TestMakeDummyDataset(unittest.TestCase):
         # Should not have any null values
         self.assertFalse(df.col_datetime.isnull().values.any())
 
+        # Test within bounds
+        self.assertTrue((df["col_datetime"] >= "2000-01-01").all())
+        self.assertTrue((df["col_datetime"] <= "2010-01-01").all())
+
     def test_nullable_column(self) -> None:
         """test_nullable_column"""
         self.metadata["columns"] = {
@@ -134,6 +147,7 @@ class TestMakeDummyDataset(unittest.TestCase):
 
         # Should have null values
         self.assertTrue(df.col_nullable.isnull().values.any())
+        self.assertLessEqual(df.col_nullable.isnull().sum(), NB_RANDOM_NONE)
 
     def test_seed(self) -> None:
         """test_seed"""
@@ -161,6 +175,61 @@ class TestMakeDummyDataset(unittest.TestCase):
         df1_copy = make_dummy_dataset(metadata, seed=seed1)
         self.assertTrue(df1.equals(df1_copy))
 
+    def test_cached_dummy_dataset(self) -> None:
+        """test_cached_dummy_dataset"""
+        self.metadata["columns"] = {
+            "col_int": {
+                "type": "int",
+                "nullable": True,
+                "precision": 32,
+                "lower": 0,
+                "upper": 100,
+            },
+            "col_str": {"type": "string"},
+        }
+        metadata = Metadata.model_validate(self.metadata)
+
+        df = get_cached_dummy_dataset(metadata, seed=DUMMY_SEED)
+        self.assertTrue(df.equals(make_dummy_dataset(metadata)))
+
+        # Modifying a cached dataset does not change the next ones
+        df["col_str"] = "modified"
+        df.loc[0, "col_int"] = -1
+        df_cached = get_cached_dummy_dataset(metadata, seed=DUMMY_SEED)
+        self.assertTrue(df_cached.equals(make_dummy_dataset(metadata)))
+
+        df_other_seed = get_cached_dummy_dataset(metadata, seed=DUMMY_SEED + 1)
+        self.assertFalse(df_cached.equals(df_other_seed))
+
+        # The cache is bounded by the size of the datasets
+        self.assertGreater(DUMMY_DATASETS_CACHE.current_size_bytes, 0)
+        with patch.object(DUMMY_DATASETS_CACHE, "max_size_bytes", 0):
+            DUMMY_DATASETS_CACHE.clear()
+            get_cached_dummy_dataset(metadata, seed=DUMMY_SEED)
+            self.assertEqual(len(DUMMY_DATASETS_CACHE), 0)
+
+    def test_iter_dummy_dataset(self) -> None:
+        """test_iter_dummy_dataset"""
+        self.metadata["columns"] = {
+            "col_int": {
+                "type": "int",
+                "precision": 64,
+                "lower": 0,
+                "upper": 100,
+            }
+        }
+        metadata = Metadata.model_validate(self.metadata)
+
+        chunks = list(iter_dummy_dataset(metadata, 250, chunk_size=100))
+        self.assertEqual([len(chunk) for chunk in chunks], [100, 100, 50])
+        df = pd.concat(chunks)
+        self.assertEqual(list(df.index), list(range(250)))
+
+        # Reproducible with the same seed
+        df_copy = pd.concat(iter_dummy_dataset(metadata, 250, chunk_size=100))
+        self.assertTrue(df.equals(df_copy))
+        self.assertFalse(chunks[0].equals(chunks[1].reset_index(drop=True)))
+
     # TODO maybe remove this, see issue #335
     # def test_unknown_column(self) -> None:
     #     """test_unknown_column"""
@@ -0,0 +1,166 @@
+import threading
+import unittest
+
+from lomas_server.constants import JobStatus
+from lomas_server.dp_queries.jobs import JobManager
+from lomas_server.utils.error_handler import (
+    InternalServerException,
+    InvalidQueryException,
+    UnauthorizedAccessException,
+)
+
+TIMEOUT = 10
+
+
+class TestJobManager(unittest.TestCase):
+    """
+    Tests for the background runner of query jobs.
+    """
+
+    def setUp(self) -> None:
+        self.job_manager = JobManager(
+            max_workers=2, max_jobs_per_user=2, max_finished_jobs=2
+        )
+        self.release = threading.Event()
+
+    def tearDown(self) -> None:
+        self.release.set()
+        self.job_manager.shutdown()
+
+    def blocking_task(self) -> dict:
+        """Task waiting for the test to release it"""
+        self.release.wait(TIMEOUT)
+        return {"query_response": 42}
+
+    def wait(self, user_name: str, job_id: str) -> None:
+        """Wait for a job to finish"""
+        job = self.job_manager.get(job_id, user_name)
+        assert job.future is not None
+        job.future.result(TIMEOUT)
+
+    def test_result(self) -> None:
+        """Test the response of a job is kept once finished"""
+        job = self.job_manager.submit(
+            "alice", "PENGUIN", "opendp", self.blocking_task
+        )
+        with self.assertRaises(InvalidQueryException):
+            self.job_manager.get_result(job.job_id, "alice")
+
+        self.release.set()
+        self.wait("alice", job.job_id)
+        self.assertEqual(job.status, JobStatus.COMPLETED)
+        self.assertEqual(
+            self.job_manager.get_result(job.job_id, "alice"),
+            {"query_response": 42},
+        )
+
+        # Only the user who submitted the job may access it
+        with self.assertRaises(UnauthorizedAccessException):
+            self.job_manager.get_result(job.job_id, "bob")
+        with self.assertRaises(InvalidQueryException):
+            self.job_manager.get("unknown", "alice")
+
+    def test_failure(self) -> None:
+        """Test the exception of a failed job is raised with its result"""
+
+        def invalid_task() -> dict:
+            raise InvalidQueryException("Not enough budget")
+
+        def broken_task() -> dict:
+            raise ValueError("Unexpected")
+
+        job = self.job_manager.submit(
+            "alice", "PENGUIN", "opendp", invalid_task
+        )
+        self.wait("alice", job.job_id)
+        self.assertEqual(job.status, JobStatus.FAILED)
+        self.assertEqual(job.to_dict()["error"], "Not enough budget")
+        with self.assertRaises(InvalidQueryException):
+            self.job_manager.get_result(job.job_id, "alice")
+
+        job = self.job_manager.submit(
+            "alice", "PENGUIN", "opendp", broken_task
+        )
+        self.wait("alice", job.job_id)
+        with self.assertRaises(InternalServerException):
+            self.job_manager.get_result(job.job_id, "alice")
+
+    def test_user_jobs_run_in_order(self) -> None:
+        """Test the jobs of a user run one at a time"""
+        first = self.job_manager.submit(
+            "alice", "PENGUIN", "opendp", self.blocking_task
+        )
+        second = self.job_manager.submit(
+            "alice", "PENGUIN", "opendp", lambda: {}
+        )
+        other = self.job_manager.submit("bob", "PENGUIN", "opendp", dict)
+
+        # Other users are not blocked
+        self.wait("bob", other.job_id)
+        self.assertEqual(second.status, JobStatus.PENDING)
+
+        # The maximum number of unfinished jobs is reached
+        with self.assertRaises(UnauthorizedAccessException):
+            self.job_manager.submit("alice", "PENGUIN", "opendp", dict)
+
+        self.release.set()
+        self.wait("alice", first.job_id)
+        self.wait("alice", second.job_id)
+        self.assertEqual(second.status, JobStatus.COMPLETED)
+
+    def test_cancel(self) -> None:
+        """Test only pending jobs can be cancelled"""
+        first = self.job_manager.submit(
+            "alice", "PENGUIN", "opendp", self.blocking_task
+        )
+        second = self.job_manager.submit("alice", "PENGUIN", "opendp", dict)
+
+        self.job_manager.cancel(second.job_id, "alice")
+        self.assertEqual(second.status, JobStatus.CANCELLED)
+        with self.assertRaises(InvalidQueryException):
+            self.job_manager.get_result(second.job_id, "alice")
+        with self.assertRaises(InvalidQueryException):
+            self.job_manager.cancel(second.job_id, "alice")
+
+        # A running job cannot be cancelled
+        while first.status == JobStatus.PENDING:
+            threading.Event().wait(0.01)
+        with self.assertRaises(InvalidQueryException):
+            self.job_manager.cancel(first.job_id, "alice")
+
+    def test_finished_jobs_expire(self) -> None:
+        """Test only the most recently finished jobs are kept"""
+        job_ids = []
+        for _ in range(3):
+            job = self.job_manager.submit("alice", "PENGUIN", "opendp", dict)
+            self.wait("alice", job.job_id)
+            job_ids.append(job.job_id)
+
+        with self.assertRaises(InvalidQueryException):
+            self.job_manager.get(job_ids[0], "alice")
+        for job_id in job_ids[1:]:
+            self.job_manager.get(job_id, "alice")
+
+    def test_finished_jobs_bounds(self) -> None:
+        """Test finished jobs are forgotten beyond the size of their
+        results and their time to live"""
+        job_manager = JobManager(
+            max_workers=1, max_finished_jobs=10, results_max_size_bytes=100
+        )
+        self.addCleanup(job_manager.shutdown)
+        job_ids = []
+        for _ in range(2):
+            job = job_manager.submit(
+                "alice", "PENGUIN", "opendp", lambda: {"model": "m" * 60}
+            )
+            assert job.future is not None
+            job.future.result(TIMEOUT)
+            job_ids.append(job.job_id)
+
+        with self.assertRaises(InvalidQueryException):
+            job_manager.get(job_ids[0], "alice")
+        job_manager.get(job_ids[1], "alice")
+
+        job_manager.result_ttl = 0
+        with self.assertRaises(InvalidQueryException):
+            job_manager.get(job_ids[1], "alice")
@@ -30,6 +30,7 @@ from lomas_server.mongodb_admin import (
     get_list_of_users,
     get_metadata_of_dataset,
     get_user,
+    migrate_metadata,
     set_budget_field,
     set_may_query,
 )
@@ -541,9 +542,9 @@ class TestMongoDBAdmin(unittest.TestCase):  # pylint: disable=R0904
         del dataset_found["_id"]
         self.assertEqual(dataset_found, expected_dataset)
 
-        metadata_found = self.db.metadata.find_one(
-            {dataset: {"$exists": True}}
-        )[dataset]
+        metadata_found = self.db.metadata.find_one({"dataset_name": dataset})[
+            "metadata"
+        ]
         self.assertEqual(metadata_found, expected_metadata)
 
         # Add already present dataset
@@ -662,9 +663,9 @@ class TestMongoDBAdmin(unittest.TestCase):  # pylint: disable=R0904
         response = s3_client.get_object(Bucket=bucket, Key=key_metadata)
         expected_metadata = yaml.safe_load(response["Body"])
 
-        metadata_found = self.db.metadata.find_one(
-            {dataset: {"$exists": True}}
-        )[dataset]
+        metadata_found = self.db.metadata.find_one({"dataset_name": dataset})[
+            "metadata"
+        ]
         self.assertEqual(metadata_found, expected_metadata)
 
     def test_add_datasets_via_yaml(self) -> None:
@@ -693,8 +694,8 @@ class TestMongoDBAdmin(unittest.TestCase):  # pylint: disable=R0904
             self.assertEqual(penguin_found, penguin)
 
             metadata_found = self.db.metadata.find_one(
-                {"PENGUIN": {"$exists": True}}
-            )["PENGUIN"]
+                {"dataset_name": "PENGUIN"}
+            )["metadata"]
             self.assertEqual(metadata_found, penguin_metadata)
 
             iris_found = self.db.datasets.find_one({"dataset_name": "IRIS"})
@@ -702,8 +703,8 @@ class TestMongoDBAdmin(unittest.TestCase):  # pylint: disable=R0904
             self.assertEqual(iris_found, iris)
 
             metadata_found = self.db.metadata.find_one(
-                {"IRIS": {"$exists": True}}
-            )["IRIS"]
+                {"dataset_name": "IRIS"}
+            )["metadata"]
             self.assertEqual(metadata_found, penguin_metadata)
 
         path = "./tests/test_data/test_datasets.yaml"
@@ -800,8 +801,8 @@ class TestMongoDBAdmin(unittest.TestCase):  # pylint: disable=R0904
         self.assertEqual(tintin_found, tintin)
 
         metadata_found = self.db.metadata.find_one(
-            {"TINTIN_S3_TEST": {"$exists": True}}
-        )["TINTIN_S3_TEST"]
+            {"dataset_name": "TINTIN_S3_TEST"}
+        )["metadata"]
         self.assertEqual(metadata_found, tintin_metadata)
 
     def test_del_dataset(self) -> None:
@@ -844,7 +845,7 @@ class TestMongoDBAdmin(unittest.TestCase):  # pylint: disable=R0904
             dataset_path=dataset_path,
             metadata_path=metadata_path,
         )
-        self.db.metadata.delete_many({dataset: {"$exists": True}})
+        self.db.metadata.delete_many({"dataset_name": dataset})
         with self.assertRaises(ValueError):
             del_dataset(self.db, dataset)
 
@@ -903,6 +904,32 @@ class TestMongoDBAdmin(unittest.TestCase):  # pylint: disable=R0904
             expected_metadata = yaml.safe_load(f)
         self.assertEqual(metadata_found, expected_metadata)
 
+    def test_migrate_metadata(self) -> None:
+        """Test migration of metadata keyed by dataset name"""
+        with open(
+            "./tests/test_data/metadata/penguin_metadata.yaml",
+            encoding="utf-8",
+        ) as f:
+            penguin_metadata = yaml.safe_load(f)
+
+        # Metadata of the former schema, one or several per document
+        self.db.metadata.insert_one({"PENGUIN": penguin_metadata})
+        self.db.metadata.insert_one(
+            {"IRIS": penguin_metadata, "PUMS": penguin_metadata}
+        )
+
+        migrate_metadata(self.db)
+        self.assertEqual(self.db.metadata.count_documents({}), 3)
+        for dataset in ["PENGUIN", "IRIS", "PUMS"]:
+            metadata_found = self.db.metadata.find_one(
+                {"dataset_name": dataset}
+            )["metadata"]
+            self.assertEqual(metadata_found, penguin_metadata)
+
+        # Migrated documents are left unchanged
+        migrate_metadata(self.db)
+        self.assertEqual(self.db.metadata.count_documents({}), 3)
+
     def test_get_list_of_datasets(self) -> None:
         """Test get list of datasets"""
         list_datasets = get_list_of_datasets(self.db)
@@ -946,6 +973,9 @@ class TestMongoDBAdmin(unittest.TestCase):  # pylint: disable=R0904
         nb_datasets = self.db.datasets.count_documents({})
         self.assertEqual(nb_datasets, 0)
 
+        # The lookup indexes are still there
+        self.assertIn("dataset_name_1", self.db.datasets.index_information())
+
     def test_get_collection(self) -> None:
         """Test show collection from db"""
         dataset_collection = get_collection(self.db, "datasets")
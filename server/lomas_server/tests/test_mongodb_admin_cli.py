@@ -481,9 +481,9 @@ class TestMongoDBAdmin(unittest.TestCase):  # pylint: disable=R0904
         del dataset_found["_id"]
         self.assertEqual(dataset_found, expected_dataset)
 
-        metadata_found = self.db.metadata.find_one(
-            {dataset: {"$exists": True}}
-        )[dataset]
+        metadata_found = self.db.metadata.find_one({"dataset_name": dataset})[
+            "metadata"
+        ]
         self.assertEqual(metadata_found, expected_metadata)
 
     def test_add_datasets_via_yaml_cli(self) -> None:
@@ -512,8 +512,8 @@ class TestMongoDBAdmin(unittest.TestCase):  # pylint: disable=R0904
             self.assertEqual(penguin_found, penguin)
 
             metadata_found = self.db.metadata.find_one(
-                {"PENGUIN": {"$exists": True}}
-            )["PENGUIN"]
+                {"dataset_name": "PENGUIN"}
+            )["metadata"]
             self.assertEqual(metadata_found, penguin_metadata)
 
             iris_found = self.db.datasets.find_one({"dataset_name": "IRIS"})
@@ -521,8 +521,8 @@ class TestMongoDBAdmin(unittest.TestCase):  # pylint: disable=R0904
             self.assertEqual(iris_found, iris)
 
             metadata_found = self.db.metadata.find_one(
-                {"IRIS": {"$exists": True}}
-            )["IRIS"]
+                {"dataset_name": "IRIS"}
+            )["metadata"]
             self.assertEqual(metadata_found, penguin_metadata)
 
         path = "./tests/test_data/test_datasets.yaml"
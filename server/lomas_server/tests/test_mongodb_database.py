@@ -0,0 +1,197 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from pymongo import ASCENDING
+
+from lomas_server.admin_database.admin_database import encode_queries_cursor
+from lomas_server.admin_database.mongodb_database import AdminMongoDatabase
+from lomas_server.constants import DPLibraries
+from lomas_server.utils.error_handler import (
+    InvalidQueryException,
+    UnauthorizedAccessException,
+)
+from lomas_server.utils.query_models import GetPreviousQueries
+
+USER = "Dr. Antartica"
+DATASET = "PENGUIN"
+
+
+class TestAdminMongoDatabaseRoundTrips(unittest.TestCase):
+    """
+    Tests of the number of requests sent to MongoDB by the budget
+    operations, the database is mocked.
+    """
+
+    def setUp(self) -> None:
+        with patch(
+            "lomas_server.admin_database.mongodb_database.MongoClient"
+        ) as client:
+            self.admin_db = AdminMongoDatabase("mongodb://mongodb", "test")
+        self.assertIs(self.admin_db.db, client.return_value["test"])
+
+        self.db = MagicMock()
+        self.admin_db.db = self.db
+        self.users = self.db.users
+        self.users.update_one.return_value = MagicMock(
+            acknowledged=True, modified_count=1
+        )
+        self.users.find_one.return_value = {
+            "user_name": USER,
+            "may_query": True,
+            "datasets_list": [
+                {
+                    "dataset_name": DATASET,
+                    "initial_epsilon": 10.0,
+                    "initial_delta": 0.005,
+                    "total_spent_epsilon": 8.0,
+                    "total_spent_delta": 0.001,
+                }
+            ],
+        }
+
+    def test_budget_single_request(self) -> None:
+        """Test all the budget fields are read in a single request"""
+        self.assertEqual(
+            self.admin_db.get_remaining_budget(USER, DATASET), [2.0, 0.004]
+        )
+        self.assertEqual(
+            self.admin_db.get_initial_budget(USER, DATASET), [10.0, 0.005]
+        )
+        self.assertEqual(
+            self.admin_db.get_total_spent_budget(USER, DATASET), [8.0, 0.001]
+        )
+        self.assertEqual(len(self.db.method_calls), 3)
+
+        _, projection = self.users.find_one.call_args.args
+        self.assertEqual(projection["datasets_list.$"], 1)
+
+    def test_reserve_single_request(self) -> None:
+        """Test the access and budget are checked by the reservation"""
+        self.admin_db.reserve_budget(USER, DATASET, 1.0, 0.001)
+        self.admin_db.commit_budget(USER, DATASET, "id", 1.0, 0.001)
+        self.assertEqual(
+            [call[0] for call in self.db.method_calls],
+            ["users.update_one", "users.update_one"],
+        )
+
+    def test_commit_expired_reservation(self) -> None:
+        """Test the commit is filtered on the reservation or the budget"""
+        self.admin_db.commit_budget(USER, DATASET, "id", 1.0, 0.001)
+        query = self.users.update_one.call_args.args[0]
+        self.assertIn("$expr", query["$or"][1])
+        self.assertEqual(
+            query["$or"][0]["datasets_list"]["$elemMatch"][
+                "budget_reservations"
+            ]["$elemMatch"]["reservation_id"],
+            "id",
+        )
+
+        # The reservation expired and its budget was reserved meanwhile
+        self.users.update_one.return_value.modified_count = 0
+        with self.assertRaises(InvalidQueryException):
+            self.admin_db.commit_budget(USER, DATASET, "id", 1.0, 0.001)
+        pull = self.users.update_one.call_args.args[1]["$pull"]
+        self.assertIn("datasets_list.$.budget_reservations", pull)
+
+        self.assertFalse(
+            self.admin_db.renew_budget_reservation(USER, DATASET, "id")
+        )
+        _, update = self.users.update_one.call_args.args
+        self.assertEqual(
+            list(update["$set"]),
+            [
+                "datasets_list.$[dataset].budget_reservations"
+                + ".$[reservation].expires_at"
+            ],
+        )
+
+    def test_reserve_not_enough_budget(self) -> None:
+        """Test the reason of a failed reservation is looked up"""
+        self.users.update_one.return_value.modified_count = 0
+        with self.assertRaises(InvalidQueryException) as context:
+            self.admin_db.reserve_budget(USER, DATASET, 4.0, 0.001)
+        self.assertEqual(
+            context.exception.error_message,
+            "Not enough budget for this query epsilon remaining 2.0, "
+            + "delta remaining 0.004.",
+        )
+
+    def test_no_access(self) -> None:
+        """Test users without access to the dataset get the same errors"""
+        self.users.find_one.return_value = None
+        self.users.count_documents.return_value = 0
+        with self.assertRaises(UnauthorizedAccessException) as context:
+            self.admin_db.get_remaining_budget(USER, DATASET)
+        self.assertIn("does not exist", context.exception.error_message)
+
+        self.users.count_documents.return_value = 1
+        self.db.datasets.count_documents.return_value = 1
+        with self.assertRaises(UnauthorizedAccessException) as context:
+            self.admin_db.get_remaining_budget(USER, DATASET)
+        self.assertEqual(
+            context.exception.error_message,
+            f"{USER} does not have access to {DATASET}.",
+        )
+
+    def test_indexed_lookups(self) -> None:
+        """Test the lookups by name filter on the indexed fields"""
+        self.admin_db.create_indexes()
+        indexes = [(call[0], call.args[0]) for call in self.db.method_calls]
+        self.assertIn(
+            ("datasets.create_index", [("dataset_name", ASCENDING)]), indexes
+        )
+        self.assertIn(
+            ("metadata.create_index", [("dataset_name", ASCENDING)]), indexes
+        )
+
+        self.db.datasets.count_documents.return_value = 1
+        self.assertTrue(self.admin_db.does_dataset_exist(DATASET))
+        self.db.datasets.count_documents.assert_called_with(
+            {"dataset_name": DATASET}, limit=1
+        )
+        self.db.datasets.find.assert_not_called()
+
+    def test_previous_queries_page(self) -> None:
+        """Test pages of previous queries are indexed queries"""
+        self.users.count_documents.return_value = 1
+        self.db.datasets.count_documents.return_value = 1
+        find = self.db.queries_archives.find
+        cursor = find.return_value.sort.return_value
+        cursor.skip.return_value = cursor
+        cursor.limit.return_value = [
+            {"timestamp": 2.0, "response": {}},
+            {"timestamp": 2.0, "response": {}},
+            {"timestamp": 3.0, "response": {}},
+        ]
+
+        query_filter = GetPreviousQueries(
+            dataset_name=DATASET,
+            limit=2,
+            cursor=encode_queries_cursor(None, [{"timestamp": 2.0}]),
+            start_time=1.0,
+            end_time=5.0,
+            dp_libraries=[DPLibraries.OPENDP],
+            metadata_only=True,
+        )
+        page, next_cursor = self.admin_db.get_user_previous_queries(
+            USER, DATASET, query_filter
+        )
+        self.assertEqual(len(page), 2)
+        mongo_filter, projection = find.call_args.args
+        self.assertEqual(
+            mongo_filter,
+            {
+                "user_name": USER,
+                "dataset_name": DATASET,
+                "timestamp": {"$gte": 2.0, "$lt": 5.0},
+                "dp_librairy": {"$in": [DPLibraries.OPENDP]},
+            },
+        )
+        self.assertEqual(projection["response.query_response"], 0)
+        cursor.skip.assert_called_once_with(1)
+        cursor.limit.assert_called_once_with(3)
+
+        # The next page skips the 3 queries at timestamp 2.0
+        self.assertEqual(
+            next_cursor, encode_queries_cursor(None, [{"timestamp": 2.0}] * 3)
+        )
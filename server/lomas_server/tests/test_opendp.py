@@ -0,0 +1,129 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import opendp.prelude as dp_p
+import yaml
+from opendp.mod import enable_features
+from opendp_logger import enable_logging
+
+from lomas_server.data_connector.data_cache import invalidate_data
+from lomas_server.data_connector.path_connector import PathConnector
+from lomas_server.dp_queries.dp_libraries import opendp
+from lomas_server.dp_queries.dp_libraries.opendp import (
+    CSV_INPUTS_CACHE,
+    PIPELINES_CACHE,
+    PRIVACY_MAPS_CACHE,
+    OpenDPQuerier,
+    reconstruct_measurement_pipeline,
+)
+from lomas_server.utils.collection_models import Metadata
+from lomas_server.utils.error_handler import InvalidQueryException
+from lomas_server.utils.query_models import OpenDPRequestModel
+
+PENGUIN_CSV = "tests/test_data/test_penguin.csv"
+
+enable_logging()
+enable_features("contrib")
+
+
+class TestOpenDPInput(unittest.TestCase):
+    """
+    Tests for the input of the dataset to opendp pipelines.
+    """
+
+    def setUp(self) -> None:
+        with open(
+            "tests/test_data/metadata/penguin_metadata.yaml", encoding="utf-8"
+        ) as f:
+            self.metadata = Metadata.model_validate(yaml.safe_load(f))
+        for cache in [CSV_INPUTS_CACHE, PIPELINES_CACHE, PRIVACY_MAPS_CACHE]:
+            cache.clear()
+
+    def test_csv_input_domain(self) -> None:
+        """Test pipelines must take the dataset as a csv string"""
+        pipeline = (
+            dp_p.t.make_split_dataframe(separator=",", col_names=["a"])
+            >> dp_p.t.make_select_column(key="a", TOA=str)
+            >> dp_p.t.then_count()
+            >> dp_p.m.then_laplace(scale=1.0)
+        )
+        reconstruct_measurement_pipeline(pipeline.to_json())
+
+        pipeline = (
+            (
+                dp_p.vector_domain(dp_p.atom_domain(T=int)),
+                dp_p.symmetric_distance(),
+            )
+            >> dp_p.t.then_count()
+            >> dp_p.m.then_laplace(scale=1.0)
+        )
+        with self.assertRaises(InvalidQueryException):
+            reconstruct_measurement_pipeline(pipeline.to_json())
+
+    def test_csv_input_cache(self) -> None:
+        """Test the csv string is encoded once per dataset version"""
+        data_connector = PathConnector(self.metadata, PENGUIN_CSV)
+        querier = OpenDPQuerier(data_connector, MagicMock())
+        expected = data_connector.get_pandas_df().to_csv(
+            header=False, index=False
+        )
+
+        with patch.object(
+            data_connector,
+            "get_pandas_df",
+            wraps=data_connector.get_pandas_df,
+        ) as get_pandas_df:
+            self.assertEqual(querier.get_csv_input(), expected)
+            self.assertEqual(querier.get_csv_input(), expected)
+            get_pandas_df.assert_called_once()
+        self.assertEqual(len(CSV_INPUTS_CACHE), 1)
+
+        # Datasets without fingerprint are not cached
+        with patch.object(
+            data_connector, "get_fingerprint", return_value=None
+        ):
+            self.assertEqual(querier.get_csv_input(), expected)
+        self.assertEqual(len(CSV_INPUTS_CACHE), 1)
+
+        # Invalidating the dataset drops its csv string
+        invalidate_data("PENGUIN")
+        self.assertEqual(len(CSV_INPUTS_CACHE), 0)
+
+        # Csv strings larger than the byte budget are not cached
+        CSV_INPUTS_CACHE.clear()
+        with patch.object(
+            CSV_INPUTS_CACHE, "max_size_bytes", len(expected) // 2
+        ):
+            self.assertEqual(querier.get_csv_input(), expected)
+        self.assertEqual(len(CSV_INPUTS_CACHE), 0)
+
+    def test_pipeline_cache(self) -> None:
+        """Test pipelines are reconstructed and mapped once"""
+        pipeline = (
+            dp_p.t.make_split_dataframe(separator=",", col_names=["a"])
+            >> dp_p.t.make_select_column(key="a", TOA=str)
+            >> dp_p.t.then_count()
+            >> dp_p.m.then_laplace(scale=1.0)
+        ).to_json()
+        request = OpenDPRequestModel(
+            dataset_name="PENGUIN", opendp_json=pipeline
+        )
+        data_connector = PathConnector(self.metadata, PENGUIN_CSV)
+
+        with patch.object(
+            opendp, "make_load_json", wraps=opendp.make_load_json
+        ) as make_load_json:
+            costs = [
+                OpenDPQuerier(data_connector, MagicMock()).cost(request)
+                for _ in range(2)
+            ]
+            self.assertIs(
+                reconstruct_measurement_pipeline(pipeline),
+                reconstruct_measurement_pipeline(pipeline),
+            )
+            make_load_json.assert_called_once()
+
+        self.assertEqual(costs[0], costs[1])
+        self.assertEqual(costs[0][1], 0)
+        self.assertEqual(len(PIPELINES_CACHE), 1)
+        self.assertEqual(len(PRIVACY_MAPS_CACHE), 1)
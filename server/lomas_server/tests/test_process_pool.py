@@ -0,0 +1,203 @@
+import pickle
+import unittest
+from typing import List, Optional
+from unittest.mock import MagicMock
+
+import opendp.prelude as dp_p
+import yaml
+from opendp.mod import enable_features
+from opendp_logger import enable_logging
+
+from lomas_server.constants import DPLibraries
+from lomas_server.data_connector.data_cache import (
+    DATA_INVALIDATION_CALLBACKS,
+    DataFrameCache,
+    get_data_generation,
+    on_data_invalidation,
+    set_worker_data_cache,
+)
+from lomas_server.data_connector.path_connector import PathConnector
+from lomas_server.dp_queries.dp_libraries.factory import querier_factory
+from lomas_server.dp_queries.process_pool import QueryProcessPool
+from lomas_server.utils.collection_models import Metadata
+from lomas_server.utils.config import DataCacheConfig, OpenDPConfig
+from lomas_server.utils.error_handler import ExternalLibraryException
+from lomas_server.utils.query_models import (
+    OpenDPQueryModel,
+    SmartnoiseSQLQueryModel,
+)
+
+PENGUIN_CSV = "tests/test_data/test_penguin.csv"
+
+enable_logging()
+enable_features("contrib")
+
+
+class TestQueryProcessPool(unittest.TestCase):
+    """
+    Tests for the worker processes running the DP computations.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.process_pool = QueryProcessPool(
+            1,
+            OpenDPConfig(
+                contrib=True, floating_point=True, honest_but_curious=False
+            ),
+            DataCacheConfig(),
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.process_pool.shutdown()
+
+    def setUp(self) -> None:
+        with open(
+            "tests/test_data/metadata/penguin_metadata.yaml", encoding="utf-8"
+        ) as f:
+            self.metadata = Metadata.model_validate(yaml.safe_load(f))
+
+    def get_data_connector(self) -> PathConnector:
+        """Get a connector of the dataset using a data cache"""
+        data_connector = PathConnector(self.metadata, PENGUIN_CSV)
+        data_connector.set_data_cache(DataFrameCache(2**20), "PENGUIN")
+        return data_connector
+
+    def test_connector_pickling(self) -> None:
+        """Test connectors are sent without their data and data cache"""
+        data_connector = self.get_data_connector()
+        data_connector.get_pandas_df()
+        self.assertIsNotNone(data_connector.df)
+
+        copy = pickle.loads(pickle.dumps(data_connector))
+        self.assertIsNone(copy.df)
+        self.assertIsNone(copy.data_cache)
+        self.assertEqual(copy.dataset_name, "PENGUIN")
+
+        # In a worker process, the worker data cache is used
+        worker_data_cache = DataFrameCache(2**20)
+        set_worker_data_cache(worker_data_cache)
+        try:
+            copy = pickle.loads(pickle.dumps(data_connector))
+        finally:
+            set_worker_data_cache(None)
+        self.assertIs(copy.data_cache, worker_data_cache)
+        self.assertEqual(
+            len(copy.get_pandas_df()), len(data_connector.get_pandas_df())
+        )
+        self.assertEqual(len(worker_data_cache.get_stats()["datasets"]), 1)
+
+    def test_invalidation_sent_to_workers(self) -> None:
+        """Test workers catch up with the invalidations of the server"""
+        data_connector = self.get_data_connector()
+        data_connector.generation = get_data_generation("PENGUIN") + 2
+
+        # Restoring a connector of a newer generation clears the caches
+        invalidated: List[Optional[str]] = []
+        on_data_invalidation(invalidated.append)
+        try:
+            pickle.loads(pickle.dumps(data_connector))
+            pickle.loads(pickle.dumps(data_connector))
+        finally:
+            DATA_INVALIDATION_CALLBACKS.remove(invalidated.append)
+        self.assertEqual(invalidated, ["PENGUIN"])
+        self.assertEqual(
+            get_data_generation("PENGUIN"), data_connector.generation
+        )
+
+        # The generation is sent to the workers with the tasks
+        querier = querier_factory(
+            DPLibraries.SMARTNOISE_SQL,
+            data_connector,
+            MagicMock(),
+            self.process_pool,
+        )
+        querier.run_cost(
+            SmartnoiseSQLQueryModel(
+                query_str="SELECT COUNT(*) AS n FROM df",
+                dataset_name="PENGUIN",
+                epsilon=1.0,
+                delta=0.0001,
+                mechanisms={},
+                postprocess=True,
+            )
+        )
+        self.assertEqual(
+            self.process_pool.run(get_data_generation, "PENGUIN"),
+            data_connector.generation,
+        )
+
+    def test_query_in_worker(self) -> None:
+        """Test queries give the same results in the worker processes"""
+        query_json = SmartnoiseSQLQueryModel(
+            query_str="SELECT COUNT(*) AS nb_penguins FROM df",
+            dataset_name="PENGUIN",
+            epsilon=1.0,
+            delta=0.0001,
+            mechanisms={},
+            postprocess=True,
+        )
+        querier = querier_factory(
+            DPLibraries.SMARTNOISE_SQL,
+            self.get_data_connector(),
+            MagicMock(),
+            self.process_pool,
+        )
+        local_querier = querier_factory(
+            DPLibraries.SMARTNOISE_SQL,
+            self.get_data_connector(),
+            MagicMock(),
+        )
+        self.assertEqual(
+            querier.run_cost(query_json), local_querier.run_cost(query_json)
+        )
+        response = querier.run_query(query_json)
+        assert isinstance(response, dict)
+        self.assertEqual(response["columns"], ["nb_penguins"])
+
+        # The querier is unchanged in the server process
+        self.assertIsNone(querier.reader)  # type: ignore [attr-defined]
+
+    def test_opendp_in_worker(self) -> None:
+        """Test the OpenDP features are enabled in the worker processes"""
+        pipeline = (
+            dp_p.t.make_split_dataframe(separator=",", col_names=["a"])
+            >> dp_p.t.make_select_column(key="a", TOA=str)
+            >> dp_p.t.then_count()
+            >> dp_p.m.then_laplace(scale=1.0)
+        )
+        querier = querier_factory(
+            DPLibraries.OPENDP,
+            self.get_data_connector(),
+            MagicMock(),
+            self.process_pool,
+        )
+        query_json = OpenDPQueryModel(
+            dataset_name="PENGUIN", opendp_json=pipeline.to_json()
+        )
+        self.assertEqual(querier.run_cost(query_json), (1.0, 0))
+        self.assertIsInstance(querier.run_query(query_json), int)
+
+    def test_exceptions_from_worker(self) -> None:
+        """Test exceptions raised in the worker processes are raised"""
+        querier = querier_factory(
+            DPLibraries.SMARTNOISE_SQL,
+            self.get_data_connector(),
+            MagicMock(),
+            self.process_pool,
+        )
+        query_json = SmartnoiseSQLQueryModel(
+            query_str="SELECT COUNT(*) AS n FROM unknown",
+            dataset_name="PENGUIN",
+            epsilon=1.0,
+            delta=0.0001,
+            mechanisms={},
+            postprocess=True,
+        )
+        with self.assertRaises(ExternalLibraryException):
+            querier.run_cost(query_json)
+
+        # The pool is still usable
+        query_json.query_str = "SELECT COUNT(*) AS n FROM df"
+        self.assertEqual(querier.run_cost(query_json)[0], 1.0)
@@ -0,0 +1,128 @@
+import json
+import pickle
+import unittest
+from base64 import b64encode
+from typing import Tuple
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pyarrow as pa
+from fastapi.responses import JSONResponse
+
+from lomas_server.constants import ARROW_STREAM_MEDIA_TYPE, DPLibraries
+from lomas_server.utils.response_encoding import (
+    ARROW_RESPONSE_KEY,
+    accepts_arrow,
+    encode_arrow_response,
+    encode_query_response,
+)
+
+
+def decode(content: bytes) -> Tuple[dict, pa.Table]:
+    """Read the response fields and the table of an Arrow IPC stream"""
+    table = pa.ipc.open_stream(content).read_all()
+    fields = json.loads(table.schema.metadata[ARROW_RESPONSE_KEY])
+    return fields, table
+
+
+def make_request(accept: str) -> MagicMock:
+    """Request with the given Accept header"""
+    request = MagicMock()
+    request.headers = {"accept": accept}
+    return request
+
+
+class TestResponseEncoding(unittest.TestCase):
+    """
+    Tests for the Arrow IPC encoding of the query responses.
+    """
+
+    def setUp(self) -> None:
+        self.df = pd.DataFrame({"species": ["Adelie", None], "NB": [3, 4]})
+        self.model = b64encode(pickle.dumps({"weights": [1, 2]})).decode()
+
+    def test_accepts_arrow(self) -> None:
+        """Test the Accept header is parsed"""
+        self.assertTrue(accepts_arrow(make_request(ARROW_STREAM_MEDIA_TYPE)))
+        self.assertTrue(
+            accepts_arrow(
+                make_request(
+                    f"application/json;q=0.5, {ARROW_STREAM_MEDIA_TYPE}"
+                )
+            )
+        )
+        self.assertFalse(accepts_arrow(make_request("*/*")))
+        self.assertFalse(accepts_arrow(make_request("")))
+
+    def test_dataframes(self) -> None:
+        """Test dataframes are sent as the table of the stream"""
+        response = {
+            "requested_by": "Dr. Antartica",
+            "query_response": self.df.to_dict(orient="tight"),
+            "spent_epsilon": 0.1,
+            "spent_delta": 0.0,
+        }
+        fields, table = decode(
+            encode_arrow_response(DPLibraries.SMARTNOISE_SQL, response)
+        )
+        self.assertEqual(
+            fields,
+            {
+                "requested_by": "Dr. Antartica",
+                "spent_epsilon": 0.1,
+                "spent_delta": 0.0,
+            },
+        )
+        pd.testing.assert_frame_equal(table.to_pandas(), self.df)
+
+        response["query_response"] = self.df.to_dict(orient="records")
+        _, table = decode(
+            encode_arrow_response(DPLibraries.SMARTNOISE_SYNTH, response)
+        )
+        pd.testing.assert_frame_equal(table.to_pandas(), self.df)
+
+    def test_models(self) -> None:
+        """Test pickled models are sent as raw bytes"""
+        response = {"query_response": self.model, "epsilon": 1.0}
+        fields, table = decode(
+            encode_arrow_response(DPLibraries.SMARTNOISE_SYNTH, response)
+        )
+        self.assertEqual(fields, {"epsilon": 1.0})
+        model = table.column("model")[0].as_py()
+        self.assertEqual(pickle.loads(model), {"weights": [1, 2]})
+
+        response = {"query_response": {"score": 0.5, "model": self.model}}
+        fields, table = decode(
+            encode_arrow_response(DPLibraries.DIFFPRIVLIB, response)
+        )
+        self.assertEqual(fields, {"query_response": {"score": 0.5}})
+        model = table.column("model")[0].as_py()
+        self.assertEqual(pickle.loads(model), {"weights": [1, 2]})
+
+    def test_negotiation(self) -> None:
+        """Test JSON is sent unless the client accepts Arrow"""
+        response = {"query_response": self.df.to_dict(orient="tight")}
+        arrow_request = make_request(ARROW_STREAM_MEDIA_TYPE)
+
+        encoded = encode_query_response(
+            arrow_request, DPLibraries.SMARTNOISE_SQL, response
+        )
+        self.assertEqual(encoded.media_type, ARROW_STREAM_MEDIA_TYPE)
+
+        encoded = encode_query_response(
+            make_request("application/json"),
+            DPLibraries.SMARTNOISE_SQL,
+            response,
+        )
+        self.assertIsInstance(encoded, JSONResponse)
+
+        # Results without dataframe and dataframes Arrow cannot convert
+        encoded = encode_query_response(
+            arrow_request, DPLibraries.OPENDP, {"query_response": 1.0}
+        )
+        self.assertIsInstance(encoded, JSONResponse)
+        mixed = {"query_response": [{"a": 1}, {"a": "b"}]}
+        encoded = encode_query_response(
+            arrow_request, DPLibraries.SMARTNOISE_SYNTH, mixed
+        )
+        self.assertIsInstance(encoded, JSONResponse)
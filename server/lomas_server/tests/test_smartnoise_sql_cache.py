@@ -0,0 +1,176 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+import yaml
+from snsql.metadata import Metadata as SmartnoiseMetadata
+
+from lomas_server.data_connector.data_cache import invalidate_data
+from lomas_server.data_connector.path_connector import PathConnector
+from lomas_server.dp_queries.dp_libraries.smartnoise_sql import (
+    COSTS_CACHE,
+    PARSED_QUERIES_CACHE,
+    READERS_CACHE,
+    SharedPandasReader,
+    SmartnoiseSQLQuerier,
+    convert_to_smartnoise_metadata,
+)
+from lomas_server.utils.collection_models import Metadata
+from lomas_server.utils.lru_cache import LRUCache
+from lomas_server.utils.query_models import SmartnoiseSQLRequestModel
+
+PENGUIN_CSV = "tests/test_data/test_penguin.csv"
+COUNT_QUERY = "SELECT COUNT(*) AS nb_penguins FROM df"
+
+
+class TestLRUCache(unittest.TestCase):
+    """
+    Tests for the generic LRU cache.
+    """
+
+    def test_eviction(self) -> None:
+        """Test the least recently used value is evicted first"""
+        cache: LRUCache[int] = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+
+        cache.put("c", 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_eviction_by_bytes(self) -> None:
+        """Test values are evicted to stay within the byte budget"""
+        cache: LRUCache[str] = LRUCache(10, max_size_bytes=10, sizeof=len)
+        cache.put("a", "aaaa")
+        cache.put("b", "bbbb")
+        self.assertEqual(cache.current_size_bytes, 8)
+
+        cache.put("c", "cccc")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.current_size_bytes, 8)
+
+        # Replacing a value updates the size
+        cache.put("c", "cc")
+        self.assertEqual(cache.current_size_bytes, 6)
+
+        # Values larger than the budget are not cached
+        cache.put("d", "d" * 11)
+        self.assertIsNone(cache.get("d"))
+        self.assertEqual(cache.get("b"), "bbbb")
+
+        cache.clear()
+        self.assertEqual(cache.current_size_bytes, 0)
+
+    def test_get_or_create(self) -> None:
+        """Test the factory is only called on a cache miss"""
+        cache: LRUCache[int] = LRUCache(2)
+        factory = MagicMock(return_value=42)
+        self.assertEqual(cache.get_or_create("a", factory), 42)
+        self.assertEqual(cache.get_or_create("a", factory), 42)
+        factory.assert_called_once()
+
+
+class TestSmartnoiseSQLCache(unittest.TestCase):
+    """
+    Tests for the reuse of smartnoise-sql readers and parsed queries.
+    """
+
+    def setUp(self) -> None:
+        with open(
+            "tests/test_data/metadata/penguin_metadata.yaml", encoding="utf-8"
+        ) as f:
+            self.metadata = Metadata.model_validate(yaml.safe_load(f))
+        self.data_connector = PathConnector(self.metadata, PENGUIN_CSV)
+
+        for cache in [READERS_CACHE, PARSED_QUERIES_CACHE, COSTS_CACHE]:
+            cache.clear()
+
+    def test_shared_reader_across_threads(self) -> None:
+        """Test a shared reader can be queried from another thread"""
+        df = self.data_connector.get_pandas_df()
+        reader = SharedPandasReader(
+            df,
+            SmartnoiseMetadata.from_(
+                convert_to_smartnoise_metadata(self.metadata)
+            ),
+        )
+
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(reader.execute(COUNT_QUERY))
+        )
+        thread.start()
+        thread.join()
+
+        self.assertEqual(results[0][1][0], len(df))
+
+    def test_cost_reuses_reader_and_parsed_query(self) -> None:
+        """Test readers and parsed queries are shared by cost estimations"""
+        request = SmartnoiseSQLRequestModel(
+            query_str=COUNT_QUERY,
+            dataset_name="PENGUIN",
+            epsilon=1.0,
+            delta=0.0001,
+            mechanisms={},
+        )
+        costs = []
+        for _ in range(2):
+            querier = SmartnoiseSQLQuerier(self.data_connector, MagicMock())
+            costs.append(querier.cost(request))
+            self.assertIsNotNone(querier.reader)
+
+        self.assertEqual(costs[0], costs[1])
+        self.assertEqual(len(READERS_CACHE), 1)
+        self.assertEqual(len(PARSED_QUERIES_CACHE), 1)
+        self.assertEqual(len(COSTS_CACHE), 1)
+
+        # Another query on the same data reuses the reader
+        querier = SmartnoiseSQLQuerier(self.data_connector, MagicMock())
+        querier.cost(
+            request.model_copy(
+                update={"query_str": "SELECT COUNT(*) AS n FROM df"}
+            )
+        )
+        self.assertEqual(len(READERS_CACHE), 1)
+        self.assertEqual(len(PARSED_QUERIES_CACHE), 2)
+
+        # Queries on other columns of the dataset reuse the reader too
+        for column in ["bill_length_mm", "body_mass_g"]:
+            querier = SmartnoiseSQLQuerier(self.data_connector, MagicMock())
+            querier.cost(
+                request.model_copy(
+                    update={"query_str": f"SELECT AVG({column}) AS a FROM df"}
+                )
+            )
+        self.assertEqual(len(READERS_CACHE), 1)
+
+    def test_readers_invalidation(self) -> None:
+        """Test readers are bounded by bytes and dropped on invalidation"""
+        request = SmartnoiseSQLRequestModel(
+            query_str=COUNT_QUERY,
+            dataset_name="PENGUIN",
+            epsilon=1.0,
+            delta=0.0001,
+            mechanisms={},
+        )
+        self.data_connector.set_dataset_name("PENGUIN")
+        SmartnoiseSQLQuerier(self.data_connector, MagicMock()).cost(request)
+        self.assertEqual(len(READERS_CACHE), 1)
+        self.assertGreater(READERS_CACHE.current_size_bytes, 0)
+
+        invalidate_data("PENGUIN")
+        self.assertEqual(len(READERS_CACHE), 0)
+
+        # Connectors of the new generation load a new reader
+        data_connector = PathConnector(self.metadata, PENGUIN_CSV)
+        data_connector.set_dataset_name("PENGUIN")
+        self.assertNotEqual(
+            data_connector.get_cache_fingerprint(),
+            self.data_connector.get_cache_fingerprint(),
+        )
@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import yaml
+
+from lomas_server.constants import SSynthGanSynthesizer
+from lomas_server.data_connector.in_memory_connector import InMemoryConnector
+from lomas_server.dp_queries.dp_libraries.smartnoise_synth import (
+    SmartnoiseSynthQuerier,
+    get_spent_budget,
+)
+from lomas_server.dp_queries.dummy_dataset import make_dummy_dataset
+from lomas_server.utils.collection_models import Metadata
+from lomas_server.utils.error_handler import ExternalLibraryException
+from lomas_server.utils.query_examples import example_smartnoise_synth_query
+from lomas_server.utils.query_models import SmartnoiseSynthQueryModel
+
+
+class TestSmartnoiseSynthCost(unittest.TestCase):
+    """
+    Tests for the train-free cost estimation of synthesizers.
+    """
+
+    def setUp(self) -> None:
+        with open(
+            "tests/test_data/metadata/penguin_metadata.yaml", encoding="utf-8"
+        ) as f:
+            metadata = Metadata.model_validate(yaml.safe_load(f))
+        self.data_connector = InMemoryConnector(
+            metadata, make_dummy_dataset(metadata, 344)
+        )
+
+    def get_query(
+        self, synth_name: str, epsilon: float, synth_params: dict
+    ) -> SmartnoiseSynthQueryModel:
+        """Get a synthesizer query on the dataset"""
+        body = dict(example_smartnoise_synth_query)
+        body["synth_name"] = synth_name
+        body["epsilon"] = epsilon
+        body["synth_params"] = dict(synth_params)
+        return SmartnoiseSynthQueryModel.model_validate(body)
+
+    def test_cost_matches_training(self) -> None:
+        """Test the estimated cost is the budget spent by the training"""
+        for synth_name, epsilon, synth_params in [
+            (SSynthGanSynthesizer.DP_CTGAN, 0.1, {"batch_size": 50}),
+            (
+                SSynthGanSynthesizer.DP_CTGAN,
+                1.0,
+                {"batch_size": 50, "epochs": 3},
+            ),
+            (SSynthGanSynthesizer.DP_GAN, 1.0, {"epochs": 1}),
+        ]:
+            query_json = self.get_query(synth_name, epsilon, synth_params)
+            querier = SmartnoiseSynthQuerier(self.data_connector, MagicMock())
+
+            with patch.object(
+                self.data_connector, "get_pandas_df"
+            ) as get_pandas_df:
+                cost = querier.cost(query_json)
+                get_pandas_df.assert_not_called()
+
+            querier.query(query_json)
+            self.assertEqual(cost, get_spent_budget(querier.model, synth_name))
+
+    def test_cost_invalid_batch_size(self) -> None:
+        """Test a batch size larger than the dataset is rejected"""
+        query_json = self.get_query(SSynthGanSynthesizer.DP_CTGAN, 1.0, {})
+        querier = SmartnoiseSynthQuerier(self.data_connector, MagicMock())
+        with self.assertRaises(ExternalLibraryException):
+            querier.cost(query_json)
@@ -0,0 +1,370 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import yaml
+
+from lomas_server.admin_database.yaml_database import AdminYamlDatabase
+from lomas_server.admin_database.yaml_journal import read_journal
+from lomas_server.constants import DPLibraries
+from lomas_server.dp_queries.dp_querier import DPQuerier
+from lomas_server.utils.error_handler import (
+    InvalidQueryException,
+    UnauthorizedAccessException,
+)
+from lomas_server.utils.logger import LOG
+from lomas_server.utils.query_models import (
+    GetPreviousQueries,
+    SmartnoiseSQLQueryModel,
+)
+
+NB_QUERIES = 200
+USER = "Dr. Antartica"
+DATASET = "PENGUIN"  # initial epsilon 10, initial delta 0.005
+DATASETS_PER_USER = 3
+
+
+class ConstantQuerier(DPQuerier):
+    """Querier without computation, to time the admin database only"""
+
+    def cost(self, query_json: Any) -> tuple[float, float]:
+        return query_json.epsilon, query_json.delta
+
+    def query(self, query_json: Any) -> dict:
+        return {"res": 1}
+
+
+def write_database(path: str, nb_users: int, nb_datasets: int) -> None:
+    """Write a yaml database with users having a few datasets each"""
+    datasets = [
+        {
+            "dataset_name": f"DATASET_{i}",
+            "database_type": "PATH_DB",
+            "dataset_path": "tests/test_data/test_penguin.csv",
+            "metadata": {
+                "database_type": "PATH_DB",
+                "metadata_path": "tests/test_data/metadata/"
+                + "penguin_metadata.yaml",
+            },
+        }
+        for i in range(nb_datasets)
+    ]
+    users = [
+        {
+            "user_name": f"user_{i}",
+            "may_query": True,
+            "datasets_list": [
+                {
+                    "dataset_name": f"DATASET_{(i + j) % nb_datasets}",
+                    "initial_epsilon": 1000.0,
+                    "initial_delta": 0.001,
+                    "total_spent_epsilon": 0.0,
+                    "total_spent_delta": 0.0,
+                }
+                for j in range(DATASETS_PER_USER)
+            ],
+        }
+        for i in range(nb_users)
+    ]
+    with open(path, mode="w", encoding="utf-8") as f:
+        yaml.dump(
+            {"datasets": datasets, "users": users, "queries": []},
+            f,
+            Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper),
+        )
+
+
+class TestAdminYamlDatabase(unittest.TestCase):
+    """
+    Tests and benchmark of the indexes of the yaml database.
+    """
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def load_database(
+        self, nb_users: int, nb_datasets: int
+    ) -> AdminYamlDatabase:
+        """Write and load a database of the given size"""
+        path = os.path.join(self.tmp_dir.name, f"db_{nb_users}.yaml")
+        write_database(path, nb_users, nb_datasets)
+        return AdminYamlDatabase(path)
+
+    def time_queries(self, admin_db: AdminYamlDatabase, user: str) -> float:
+        """Time queries of a user on its last dataset"""
+        dataset_name = admin_db.users[user]["datasets_list"][-1][
+            "dataset_name"
+        ]
+        query_json = SmartnoiseSQLQueryModel(
+            query_str="SELECT COUNT(*) FROM df",
+            dataset_name=dataset_name,
+            epsilon=0.001,
+            delta=0.000001,
+            mechanisms={},
+            postprocess=True,
+        )
+        querier = ConstantQuerier(MagicMock(), admin_db)
+        start_time = time.perf_counter()
+        for _ in range(NB_QUERIES):
+            querier.handle_query(query_json, user)
+            admin_db.get_remaining_budget(user, dataset_name)
+            admin_db.get_user_previous_queries(user, dataset_name)
+        return time.perf_counter() - start_time
+
+    def test_indexes(self) -> None:
+        """Test the indexes follow the changes of the database"""
+        admin_db = self.load_database(10, 5)
+        self.assertTrue(admin_db.does_user_exist("user_9"))
+        self.assertFalse(admin_db.does_user_exist("user_10"))
+        self.assertTrue(admin_db.does_dataset_exist("DATASET_4"))
+        self.assertFalse(admin_db.does_dataset_exist("DATASET_5"))
+        self.assertTrue(
+            admin_db.has_user_access_to_dataset("user_1", "DATASET_3")
+        )
+        self.assertFalse(
+            admin_db.has_user_access_to_dataset("user_1", "DATASET_0")
+        )
+        with self.assertRaises(UnauthorizedAccessException):
+            admin_db.has_user_access_to_dataset("user_10", "DATASET_0")
+
+        # Budget updates are seen in the database documents
+        admin_db.update_budget("user_1", "DATASET_3", 1.0, 0.0001)
+        self.assertEqual(
+            admin_db.database["users"][1]["datasets_list"][2][
+                "total_spent_epsilon"
+            ],
+            1.0,
+        )
+        self.assertEqual(
+            admin_db.get_remaining_budget("user_1", "DATASET_3"),
+            [999.0, 0.0009],
+        )
+
+        # Saved queries are found by user and dataset
+        self.time_queries(admin_db, "user_1")
+        self.assertEqual(len(admin_db.database["queries"]), NB_QUERIES)
+        self.assertEqual(
+            len(admin_db.get_user_previous_queries("user_1", "DATASET_3")[0]),
+            NB_QUERIES,
+        )
+        self.assertEqual(
+            admin_db.get_user_previous_queries("user_2", "DATASET_3")[0], []
+        )
+
+    def test_previous_queries_pages(self) -> None:
+        """Test the pagination and filters of the previous queries"""
+        admin_db = self.load_database(10, 5)
+        libraries = [DPLibraries.OPENDP, DPLibraries.SMARTNOISE_SQL]
+        timestamps = [1.0, 2.0, 2.0, 2.0, 2.0, 3.0, 4.0]
+        for i, timestamp in enumerate(timestamps):
+            admin_db.add_query(
+                {
+                    "user_name": "user_1",
+                    "dataset_name": "DATASET_3",
+                    "dp_librairy": libraries[i % 2],
+                    "client_input": {"id": i},
+                    "response": {"query_response": i, "spent_epsilon": 0.1},
+                    "timestamp": timestamp,
+                }
+            )
+
+        def get_ids(**kwargs: Any) -> list:
+            """Get the ids of the queries, page by page"""
+            ids = []
+            cursor = None
+            while True:
+                query_filter = GetPreviousQueries(
+                    dataset_name="DATASET_3", cursor=cursor, **kwargs
+                )
+                page, cursor = admin_db.get_user_previous_queries(
+                    "user_1", "DATASET_3", query_filter
+                )
+                ids.append([q["client_input"]["id"] for q in page])
+                if cursor is None:
+                    return ids
+
+        # Queries at the same timestamp are split between pages
+        self.assertEqual(get_ids(limit=2), [[0, 1], [2, 3], [4, 5], [6]])
+        self.assertEqual(get_ids(limit=7), [[0, 1, 2, 3, 4, 5, 6]])
+        self.assertEqual(get_ids(), [[0, 1, 2, 3, 4, 5, 6]])
+        self.assertEqual(
+            get_ids(limit=1, dp_libraries=[DPLibraries.SMARTNOISE_SQL]),
+            [[1], [3], [5]],
+        )
+        self.assertEqual(
+            get_ids(limit=3, start_time=2.0, end_time=4.0),
+            [[1, 2, 3], [4, 5]],
+        )
+
+        page, _ = admin_db.get_user_previous_queries(
+            "user_1",
+            "DATASET_3",
+            GetPreviousQueries(dataset_name="DATASET_3", metadata_only=True),
+        )
+        self.assertEqual(page[0]["response"], {"spent_epsilon": 0.1})
+        self.assertEqual(
+            admin_db.database["queries"][0]["response"]["query_response"], 0
+        )
+
+        with self.assertRaises(InvalidQueryException):
+            admin_db.get_user_previous_queries(
+                "user_1",
+                "DATASET_3",
+                GetPreviousQueries(dataset_name="DATASET_3", cursor="1"),
+            )
+
+    def test_scaling(self) -> None:
+        """Benchmark of the query path with 10k users and 1k datasets.
+
+        Lookups are indexed: the time of a query does not grow with the
+        number of users and datasets.
+        """
+        small_db = self.load_database(10, 10)
+        large_db = self.load_database(10_000, 1_000)
+        # Warm up the metadata and dataset caches
+        self.time_queries(small_db, "user_9")
+        self.time_queries(large_db, "user_9999")
+
+        small_time = self.time_queries(small_db, "user_9")
+        large_time = self.time_queries(large_db, "user_9999")
+        LOG.info(
+            f"{NB_QUERIES} queries: {small_time:.3f}s with 10 users, "
+            + f"{large_time:.3f}s with 10k users and 1k datasets"
+        )
+        self.assertLess(large_time, 5 * small_time)
+
+
+class TestYamlJournal(unittest.TestCase):
+    """
+    Tests of the journal of the budgets and queries of the yaml database.
+    """
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.db_path = os.path.join(self.tmp_dir.name, "db.yaml")
+        self.journal_path = os.path.join(self.tmp_dir.name, "journal.jsonl")
+        shutil.copy("tests/test_data/local_db_file.yaml", self.db_path)
+        self.query_json = SmartnoiseSQLQueryModel(
+            query_str="SELECT COUNT(*) FROM df",
+            dataset_name=DATASET,
+            epsilon=0.1,
+            delta=0.0001,
+            mechanisms={},
+            postprocess=True,
+        )
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def load_database(self, **kwargs: Any) -> AdminYamlDatabase:
+        """Load the database with its journal"""
+        return AdminYamlDatabase(
+            self.db_path, journal_path=self.journal_path, **kwargs
+        )
+
+    def test_replay(self) -> None:
+        """Test the changes are recovered if the server stops"""
+        admin_db = self.load_database()
+        reservation_id = admin_db.reserve_budget(USER, DATASET, 0.1, 0.0001)
+        admin_db.commit_budget(USER, DATASET, reservation_id, 0.1, 0.0001)
+        admin_db.update_budget(USER, DATASET, 1.0, 0.001)
+        admin_db.save_query(USER, self.query_json, {"res": 1})
+        self.assertEqual(len(list(read_journal(self.journal_path))), 4)
+
+        # Without save_current_database
+        admin_db = self.load_database()
+        self.assertEqual(
+            admin_db.get_total_spent_budget(USER, DATASET), [1.1, 0.0011]
+        )
+        queries = admin_db.get_user_previous_queries(USER, DATASET)[0]
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(queries[0]["response"], {"res": 1})
+
+        # The journal was compacted in the yaml file at startup
+        self.assertEqual(list(read_journal(self.journal_path)), [])
+        self.assertEqual(admin_db.journal_seq, 4)
+        with open(self.db_path, mode="r", encoding="utf-8") as f:
+            snapshot = yaml.safe_load(f)
+        self.assertEqual(snapshot["journal_seq"], 4)
+        self.assertEqual(len(snapshot["queries"]), 1)
+
+        # Records of a compaction that stopped before removing the rotated
+        # journal are not applied twice
+        admin_db.update_budget(USER, DATASET, 1.0, 0.0)
+        with open(self.journal_path, mode="rb") as f:
+            journal = f.read()
+        admin_db.save_current_database()
+        with open(self.journal_path + ".compacting", mode="wb") as f:
+            f.write(journal)
+        admin_db = self.load_database()
+        self.assertEqual(
+            admin_db.get_total_spent_budget(USER, DATASET), [2.1, 0.0011]
+        )
+        self.assertFalse(os.path.exists(self.journal_path + ".compacting"))
+
+    def test_incomplete_record(self) -> None:
+        """Test a record partially written is skipped"""
+        admin_db = self.load_database()
+        admin_db.update_budget(USER, DATASET, 1.0, 0.001)
+        with open(self.journal_path, mode="a", encoding="utf-8") as f:
+            f.write('{"type": "budget", "user_name": ')
+
+        admin_db = self.load_database()
+        self.assertEqual(
+            admin_db.get_total_spent_budget(USER, DATASET), [1.0, 0.001]
+        )
+
+    def test_compaction(self) -> None:
+        """Test the journal is compacted in the background"""
+        admin_db = self.load_database(compaction_records=5)
+        for _ in range(12):
+            admin_db.update_budget(USER, DATASET, 0.5, 0.0)
+        for _ in range(100):
+            if not admin_db.compacting:
+                break
+            time.sleep(0.05)
+        # One record for epsilon and one for delta per update
+        self.assertGreater(admin_db.journal_seq, 0)
+        self.assertLess(len(list(read_journal(self.journal_path))), 24)
+
+        admin_db = self.load_database()
+        self.assertEqual(
+            admin_db.get_total_spent_budget(USER, DATASET), [6.0, 0.0]
+        )
+
+    def test_concurrent_queries(self) -> None:
+        """Test concurrent writers share the fsync of their records"""
+        admin_db = self.load_database()
+        querier = ConstantQuerier(MagicMock(), admin_db)
+        query_json = self.query_json.model_copy(
+            update={"epsilon": 0.01, "delta": 0.000001}
+        )
+        with patch(
+            "lomas_server.admin_database.yaml_journal.os.fsync",
+            wraps=os.fsync,
+        ) as fsync:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(
+                    executor.map(
+                        lambda _: querier.handle_query(query_json, USER),
+                        range(100),
+                    )
+                )
+        # Two records per query
+        LOG.info(f"{fsync.call_count} fsync for 200 journal records")
+        self.assertLessEqual(fsync.call_count, 200)
+
+        admin_db = self.load_database()
+        spent_epsilon, _ = admin_db.get_total_spent_budget(USER, DATASET)
+        self.assertAlmostEqual(spent_epsilon, 1.0)
+        self.assertEqual(
+            len(admin_db.get_user_previous_queries(USER, DATASET)[0]), 100
+        )
@@ -1,51 +1,70 @@
+import asyncio
 import random
 import time
-from typing import Callable
+from typing import Callable, Optional
 
 from fastapi import Request, Response
 
-from lomas_server.utils.config import Config
+from lomas_server.constants import TimeAttackMethod
+from lomas_server.utils.config import TimeAttack
 from lomas_server.utils.error_handler import InternalServerException
 
 
+def get_response_delay(time_attack: TimeAttack, process_time: float) -> float:
+    """
+    Get the delay to add to a response against timing attacks.
+
+    Args:
+        time_attack (TimeAttack): The anti-timing attack config.
+        process_time (float): The time spent processing the request.
+
+    Raises:
+        InternalServerException: If the method is not supported.
+
+    Returns:
+        float: The delay in seconds.
+    """
+    match time_attack.method:
+        case TimeAttackMethod.STALL:
+            # if stall is used slow fast callbacks
+            # to a minimum response time defined by magnitude
+            return max(time_attack.magnitude - process_time, 0.0)
+        case TimeAttackMethod.JITTER:
+            # if jitter is used it just adds some time
+            # between 0 and magnitude secs
+            return time_attack.magnitude * random.uniform(0, 1)
+        case _:
+            raise InternalServerException("Time attack method not supported.")
+
+
 async def anti_timing_att(
-    request: Request, call_next: Callable, config: Config
+    request: Request,
+    call_next: Callable,
+    time_attack: Optional[TimeAttack],
 ) -> Response:
     """
     Anti-timing attack mechanism.
 
     Changes the response time to either a minimum or by adding
-    random noïse in order to avoid timing attacks.
+    random noïse in order to avoid timing attacks. The response is
+    delayed without blocking the event loop, other requests are
+    processed in the meantime.
 
     Args:
         request (Request): The FastApi request.
         call_next (Callable): The FastApi endpoint to call.
-        config (Config): The server config.
+        time_attack (Optional[TimeAttack]): The anti-timing attack config,
+            responses are not delayed if None.
 
     Returns:
         Response: The reponse from call_next.
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     response = await call_next(request)
-    process_time = time.time() - start_time
-
-    if config.server.time_attack:
-        match config.server.time_attack.method:
-            case "stall":
-                # if stall is used slow fast callbacks
-                # to a minimum response time defined by magnitude
-                if process_time < config.server.time_attack.magnitude:
-                    time.sleep(
-                        config.server.time_attack.magnitude - process_time
-                    )
-            case "jitter":
-                # if jitter is used it just adds some time
-                # between 0 and magnitude secs
-                time.sleep(
-                    config.server.time_attack.magnitude * random.uniform(0, 1)
-                )
-            case _:
-                raise InternalServerException(
-                    "Time attack method not supported."
-                )
+    process_time = time.perf_counter() - start_time
+
+    if time_attack:
+        delay = get_response_delay(time_attack, process_time)
+        if delay > 0:
+            await asyncio.sleep(delay)
     return response
@@ -0,0 +1,105 @@
+import zlib
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from lomas_server.constants import GZIP_MAX_REQUEST_SIZE
+
+
+def gunzip(data: bytes, max_size: int) -> bytes:
+    """Decompress a gzip body, refusing bodies larger than max_size.
+
+    Args:
+        data (bytes): The gzip compressed body.
+        max_size (int): Maximum size in bytes of the decompressed body.
+
+    Raises:
+        ValueError: If the body is not valid gzip or too large.
+
+    Returns:
+        bytes: The decompressed body.
+    """
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    try:
+        body = decompressor.decompress(data, max_size + 1)
+    except zlib.error as e:
+        raise ValueError(f"Invalid gzip request body: {e}") from e
+    if len(body) > max_size or decompressor.unconsumed_tail:
+        raise ValueError(
+            f"Request body is larger than {max_size} bytes once decompressed."
+        )
+    if not decompressor.eof:
+        raise ValueError("Truncated gzip request body.")
+    return body
+
+
+class GZipRequestMiddleware:  # pylint: disable=too-few-public-methods
+    """
+    Decompresses the request bodies sent with "Content-Encoding: gzip".
+
+    Responses are compressed by starlette's GZipMiddleware, this
+    middleware handles the other direction.
+    """
+
+    def __init__(
+        self, app: ASGIApp, max_size: int = GZIP_MAX_REQUEST_SIZE
+    ) -> None:
+        """Initializer.
+
+        Args:
+            app (ASGIApp): The wrapped application.
+            max_size (int, optional): Maximum size in bytes of the
+                decompressed bodies. Defaults to GZIP_MAX_REQUEST_SIZE.
+        """
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Decompress the body of gzip requests before calling the app.
+
+        Args:
+            scope (Scope): The ASGI connection scope.
+            receive (Receive): The ASGI receive channel.
+            send (Send): The ASGI send channel.
+        """
+        headers = scope.get("headers", [])
+        encoding = dict(headers).get(b"content-encoding", b"")
+        if scope["type"] != "http" or encoding.lower() != b"gzip":
+            await self.app(scope, receive, send)
+            return
+
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        try:
+            body = gunzip(b"".join(chunks), self.max_size)
+        except ValueError as e:
+            response = JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"InvalidQueryException": str(e)},
+            )
+            await response(scope, receive, send)
+            return
+
+        headers = [
+            (k, v)
+            for k, v in headers
+            if k not in (b"content-encoding", b"content-length")
+        ]
+        headers.append((b"content-length", str(len(body)).encode()))
+        scope = {**scope, "headers": headers}
+
+        sent = False
+
+        async def receive_body() -> Message:
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, receive_body, send)
@@ -1,12 +1,22 @@
-from typing import Dict, List, Literal, Union
+from typing import Dict, List, Literal, Optional, Union
 
 import yaml
 from pydantic import BaseModel, ConfigDict, Field
 
 from lomas_server.constants import (
+    ARCHIVE_MIN_BLOB_SIZE,
     CONFIG_PATH,
+    DATA_CACHE_MAX_SIZE_MB,
+    JOBS_MAX_FINISHED,
+    JOBS_MAX_PER_USER,
+    JOBS_MAX_WORKERS,
+    JOBS_RESULT_TTL,
+    JOBS_RESULTS_MAX_SIZE_MB,
+    PROCESS_POOL_MAX_WORKERS,
     SECRETS_PATH,
+    YAML_JOURNAL_COMPACTION_RECORDS,
     AdminDBType,
+    BlobStoreType,
     ConfigKeys,
     PrivateDatabaseType,
     TimeAttackMethod,
@@ -41,6 +51,13 @@ class YamlDBConfig(DBConfig):
 
     db_type: Literal[AdminDBType.YAML]  # type: ignore
     db_file: str
+    # Journal of the budgets and queries, replayed at startup and compacted
+    # in db_file. Changes are only kept in memory if not set.
+    journal_file: Optional[str] = None
+    journal_fsync: bool = True
+    journal_compaction_records: int = Field(
+        default=YAML_JOURNAL_COMPACTION_RECORDS, gt=0
+    )
 
 
 class MongoDBConfig(DBConfig):
@@ -83,6 +100,67 @@ class DPLibraryConfig(BaseModel):
     opendp: OpenDPConfig
 
 
+class DataCacheConfig(BaseModel):
+    """BaseModel for the in-memory cache of private datasets"""
+
+    enabled: bool = True
+    max_size_mb: float = Field(default=DATA_CACHE_MAX_SIZE_MB, ge=0)
+    # Directory of memory-mapped datasets shared by the worker processes,
+    # datasets are loaded in process memory if not set.
+    mmap_dir: Optional[str] = None
+
+
+class JobsConfig(BaseModel):
+    """BaseModel for the asynchronous query jobs"""
+
+    max_workers: int = Field(default=JOBS_MAX_WORKERS, gt=0)
+    max_jobs_per_user: int = Field(default=JOBS_MAX_PER_USER, gt=0)
+    max_finished_jobs: int = Field(default=JOBS_MAX_FINISHED, gt=0)
+    results_max_size_mb: float = Field(default=JOBS_RESULTS_MAX_SIZE_MB, ge=0)
+    result_ttl: float = Field(default=JOBS_RESULT_TTL, gt=0)
+
+
+class ProcessPoolConfig(BaseModel):
+    """BaseModel for the worker processes running the DP computations"""
+
+    # Computations run in the server process if disabled
+    enabled: bool = False
+    max_workers: int = Field(default=PROCESS_POOL_MAX_WORKERS, gt=0)
+
+
+class BlobStoreConfig(BaseModel):
+    """BaseModel for the store of the archived query responses"""
+
+
+class LocalBlobStoreConfig(BlobStoreConfig):
+    """BaseModel for archived query responses in a local directory"""
+
+    store_type: Literal[BlobStoreType.LOCAL]  # type: ignore
+    directory: str
+
+
+class S3BlobStoreConfig(BlobStoreConfig):
+    """BaseModel for archived query responses in a S3 bucket"""
+
+    store_type: Literal[BlobStoreType.S3]  # type: ignore
+    # Name of S3 credentials in private_db_credentials
+    credentials_name: str
+    endpoint_url: str
+    bucket: str
+    prefix: str = ""
+
+
+class ArchiveConfig(BaseModel):
+    """BaseModel for the archives of the queries"""
+
+    # Query responses of min_blob_size bytes or more are stored once in the
+    # blob store and referenced by the archives. Inline if not set.
+    blob_store: Optional[Union[LocalBlobStoreConfig, S3BlobStoreConfig]] = (
+        Field(default=None, discriminator="store_type")
+    )
+    min_blob_size: int = Field(default=ARCHIVE_MIN_BLOB_SIZE, ge=0)
+
+
 class Config(BaseModel):
     """
     Server runtime config.
@@ -107,6 +185,14 @@ class Config(BaseModel):
 
     dp_libraries: DPLibraryConfig
 
+    data_cache: DataCacheConfig = DataCacheConfig()
+
+    jobs: JobsConfig = JobsConfig()
+
+    process_pool: ProcessPoolConfig = ProcessPoolConfig()
+
+    archive: ArchiveConfig = ArchiveConfig()
+
 
 class ConfigLoader:
     """Singleton object that holds the config for the server.
@@ -0,0 +1,121 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+ValueT = TypeVar("ValueT")
+
+
+class LRUCache(Generic[ValueT]):
+    """
+    Thread-safe cache keeping a bounded number of recently used values.
+
+    The cache can also be bounded by the total size in bytes of its values,
+    values larger than this budget are not cached.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        max_size_bytes: Optional[int] = None,
+        sizeof: Callable[[ValueT], int] = sys.getsizeof,
+    ) -> None:
+        """Initializer.
+
+        Args:
+            max_size (int): Maximum number of cached values.
+            max_size_bytes (Optional[int], optional): Maximum total size in
+                bytes of the cached values. Defaults to None (no limit).
+            sizeof (Callable[[ValueT], int], optional): Function returning
+                the size in bytes of a value. Defaults to sys.getsizeof.
+        """
+        self.max_size: int = max_size
+        self.max_size_bytes: Optional[int] = max_size_bytes
+        self.current_size_bytes: int = 0
+        self._sizeof = sizeof
+        self._entries: OrderedDict[Hashable, ValueT] = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[ValueT]:
+        """Get a cached value and mark it as recently used.
+
+        Args:
+            key (Hashable): The key of the value.
+
+        Returns:
+            Optional[ValueT]: The cached value or None if absent.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: ValueT) -> None:
+        """Add a value, evicting the least recently used ones if full.
+
+        Args:
+            key (Hashable): The key of the value.
+            value (ValueT): The value to cache.
+        """
+        size = self._sizeof(value) if self.max_size_bytes is not None else 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self.max_size_bytes is not None and size > self.max_size_bytes:
+                return
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.current_size_bytes += size
+            while len(self._entries) > self.max_size or (
+                self.max_size_bytes is not None
+                and self.current_size_bytes > self.max_size_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def get_or_create(
+        self, key: Hashable, factory: Callable[[], ValueT]
+    ) -> ValueT:
+        """Get a cached value or create it with factory and cache it.
+
+        Concurrent misses may create the value more than once, the last
+        created value is kept.
+
+        Args:
+            key (Hashable): The key of the value.
+            factory (Callable[[], ValueT]): Function creating the value.
+
+        Returns:
+            ValueT: The cached or created value.
+        """
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Remove all the cached values."""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.current_size_bytes = 0
+
+    def __len__(self) -> int:
+        """Get the number of cached values.
+
+        Returns:
+            int: The number of cached values.
+        """
+        with self._lock:
+            return len(self._entries)
+
+    def _remove(self, key: Hashable) -> None:
+        """Remove a value, the cache lock must be held by the caller.
+
+        Args:
+            key (Hashable): The key of the value to remove.
+        """
+        del self._entries[key]
+        self.current_size_bytes -= self._sizes.pop(key)
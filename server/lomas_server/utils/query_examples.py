@@ -50,6 +50,21 @@ example_get_dummy_dataset = {
     "dummy_seed": DUMMY_SEED,
 }
 
+example_stream_dummy_dataset = {
+    "dataset_name": PENGUIN_DATASET,
+    "dummy_nb_rows": DUMMY_NB_ROWS,
+    "dummy_seed": DUMMY_SEED,
+    "chunk_size": DUMMY_NB_ROWS // 2,
+}
+
+example_invalidate_data_cache = {
+    "dataset_name": PENGUIN_DATASET,
+}
+
+example_job = {
+    "job_id": "5f0f4a0e-0e2c-4c8e-9c1b-3d6a2b8c9e71",
+}
+
 # Smartnoise-SQL
 example_smartnoise_sql_cost = {
     "query_str": SQL_QUERY,
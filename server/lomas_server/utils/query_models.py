@@ -3,6 +3,8 @@ from typing import List, Optional, Union
 from pydantic import BaseModel, Field
 
 from lomas_server.constants import (
+    DUMMY_STREAM_CHUNK_SIZE,
+    PREVIOUS_QUERIES_MAX_LIMIT,
     DPLibraries,
     SSynthGanSynthesizer,
     SSynthMarginalSynthesizer,
@@ -16,6 +18,23 @@ class GetDbData(BaseModel):
     dataset_name: str
 
 
+class GetPreviousQueries(GetDbData):
+    """Model input to get the previous queries of a user on a dataset"""
+
+    # Number of queries per page, all the queries if not set
+    limit: Optional[int] = Field(
+        default=None, gt=0, le=PREVIOUS_QUERIES_MAX_LIMIT
+    )
+    # next_cursor of the previous page
+    cursor: Optional[str] = None
+    # Timestamps of the queries, start included and end excluded
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+    dp_libraries: Optional[List[DPLibraries]] = None
+    # Without the query responses
+    metadata_only: bool = False
+
+
 class GetDummyDataset(BaseModel):
     """Model input to get a dummy dataset"""
 
@@ -24,6 +43,24 @@ class GetDummyDataset(BaseModel):
     dummy_seed: int
 
 
+class StreamDummyDataset(GetDummyDataset):
+    """Model input to stream a dummy dataset by chunks"""
+
+    chunk_size: int = Field(default=DUMMY_STREAM_CHUNK_SIZE, gt=0)
+
+
+class InvalidateDataCache(BaseModel):
+    """Model input to invalidate entries of the private datasets cache"""
+
+    dataset_name: Optional[str] = None
+
+
+class JobModel(BaseModel):
+    """Model input to get or cancel a query job"""
+
+    job_id: str
+
+
 class RequestModel(BaseModel):
     """
     Base input model for any request on a dataset.
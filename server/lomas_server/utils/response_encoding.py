@@ -0,0 +1,117 @@
+import json
+from base64 import b64decode
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+from lomas_server.constants import ARROW_STREAM_MEDIA_TYPE, DPLibraries
+from lomas_server.utils.logger import LOG
+
+# Schema metadata key of the response fields other than the table
+ARROW_RESPONSE_KEY = b"lomas_response"
+
+
+def accepts_arrow(request: Request) -> bool:
+    """Check if the client accepts query responses as Arrow IPC streams.
+
+    Args:
+        request (Request): Raw request object
+
+    Returns:
+        bool: True if the Accept header lists the Arrow stream media type.
+    """
+    accept = request.headers.get("accept", "")
+    media_types = [m.split(";")[0].strip() for m in accept.split(",")]
+    return ARROW_STREAM_MEDIA_TYPE in media_types
+
+
+def model_table(serialised: str) -> pa.Table:
+    """Table with the raw bytes of a pickled model in its "model" column.
+
+    Args:
+        serialised (str): base64 encoded pickled model.
+
+    Returns:
+        pa.Table: A single row table.
+    """
+    return pa.table({"model": pa.array([b64decode(serialised)], pa.binary())})
+
+
+def encode_arrow_response(dp_library: str, response: dict) -> bytes:
+    """Encode a query response as an Arrow IPC stream.
+
+    Dataframes are sent as the table of the stream and pickled models as
+    raw bytes, without base64. The other fields of the response are
+    stored as JSON in the schema metadata.
+
+    Args:
+        dp_library (str): The DP library of the query.
+        response (dict): The response, as sent in JSON.
+
+    Raises:
+        pa.ArrowException: If the dataframe cannot be converted to Arrow.
+
+    Returns:
+        bytes: The Arrow IPC stream.
+    """
+    fields = dict(response)
+    query_response = fields.pop("query_response")
+    table: Optional[pa.Table] = None
+    match dp_library:
+        case DPLibraries.SMARTNOISE_SQL:
+            df = pd.DataFrame.from_dict(query_response, orient="tight")
+            table = pa.Table.from_pandas(df)
+        case DPLibraries.SMARTNOISE_SYNTH:
+            if isinstance(query_response, str):
+                table = model_table(query_response)
+            else:
+                table = pa.Table.from_pandas(pd.DataFrame(query_response))
+        case DPLibraries.DIFFPRIVLIB:
+            fields["query_response"] = {
+                k: v for k, v in query_response.items() if k != "model"
+            }
+            table = model_table(query_response["model"])
+        case _:
+            fields["query_response"] = query_response
+    if table is None:
+        table = pa.table({})
+
+    metadata = dict(table.schema.metadata or {})
+    metadata[ARROW_RESPONSE_KEY] = json.dumps(fields).encode("utf-8")
+    table = table.replace_schema_metadata(metadata)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_query_response(
+    request: Request, dp_library: str, response: dict
+) -> Response:
+    """Send a query response in the encoding requested by the client.
+
+    Clients listing the Arrow stream media type in their Accept header
+    receive an Arrow IPC stream (see :py:func:`encode_arrow_response`),
+    the others and the responses without dataframe or model receive JSON.
+
+    Args:
+        request (Request): Raw request object
+        dp_library (str): The DP library of the query.
+        response (dict): The response of the query.
+
+    Returns:
+        Response: The encoded response.
+    """
+    if accepts_arrow(request) and dp_library != DPLibraries.OPENDP:
+        try:
+            return Response(
+                content=encode_arrow_response(dp_library, response),
+                media_type=ARROW_STREAM_MEDIA_TYPE,
+            )
+        except pa.ArrowException as e:
+            LOG.warning(f"Sending response as JSON, not Arrow: {e}")
+    return JSONResponse(content=response)